@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+# AnTIGonE – Copyright 2020 EDF
+
+import pulp
+import numpy as np
+
+
+NOMBRE_JOURS = 365
+NOMBRE_HEURES_JOUR = 24
+
+
+class AgregationTemporelle:
+    """
+    Agrégation d'une année horaire en jours représentatifs.
+
+    Chaque jour de l'année est représenté par l'un des jours représentatifs, dont le poids est le nombre de jours
+    qu'il représente. Les modèles agrégés sont écrits sur les pas de temps des jours représentatifs mis bout à bout :
+    le pas de temps p correspond à l'heure heures[p] de l'année et compte pour poids[p] heures.
+
+    Attributs
+    ---------
+    jours : np.array
+        indices des jours représentatifs dans l'année, par ordre chronologique
+    affectation : np.array
+        indice du jour représentatif de chaque jour de l'année
+    poids_jours : np.array
+        nombre de jours de l'année représentés par chaque jour représentatif
+    heures : np.array
+        heure de l'année correspondant à chaque pas de temps
+    poids : np.array
+        nombre d'heures de l'année représentées par chaque pas de temps
+    nombre_pas : int
+        nombre de pas de temps du modèle agrégé
+
+    Méthodes
+    --------
+    agregation(self, serie)
+        Renvoie les valeurs d'une série horaire aux pas de temps du modèle agrégé.
+    reconstitution(self, valeurs)
+        Reconstitue une série horaire à partir de valeurs aux pas de temps du modèle agrégé.
+    erreurs(self, serie)
+        Calcule les erreurs commises en remplaçant une série horaire par sa reconstitution.
+    """
+
+    def __init__(self, jours, affectation):
+        self.jours = np.asarray(jours, dtype=int)
+        self.affectation = np.asarray(affectation, dtype=int)
+        self.poids_jours = np.bincount(self.affectation, minlength=len(self.jours))
+        self.heures = (self.jours[:, None] * NOMBRE_HEURES_JOUR + np.arange(NOMBRE_HEURES_JOUR)).ravel()
+        self.poids = np.repeat(self.poids_jours, NOMBRE_HEURES_JOUR).astype(float)
+        self.nombre_pas = len(self.heures)
+
+    def agregation(self, serie):
+        """
+        Renvoie les valeurs d'une série horaire aux pas de temps du modèle agrégé.
+
+        Paramètres
+        ----------
+        serie : np.array
+            série de 8760 valeurs horaires
+
+        Retours
+        -------
+        np.array
+            valeurs de la série aux heures des jours représentatifs
+        """
+
+        return np.asarray(serie, dtype=float)[self.heures]
+
+    def reconstitution(self, valeurs):
+        """
+        Reconstitue une série horaire à partir de valeurs aux pas de temps du modèle agrégé, chaque jour de l'année
+        prenant les valeurs de son jour représentatif.
+
+        Paramètres
+        ----------
+        valeurs : np.array
+            valeurs aux pas de temps du modèle agrégé
+
+        Retours
+        -------
+        np.array
+            série de 8760 valeurs horaires
+        """
+
+        valeurs_jours = np.asarray(valeurs, dtype=float).reshape(len(self.jours), NOMBRE_HEURES_JOUR)
+        return valeurs_jours[self.affectation].ravel()
+
+    def erreurs(self, serie):
+        """
+        Calcule les erreurs commises en remplaçant une série horaire par sa reconstitution à partir des jours
+        représentatifs.
+
+        Paramètres
+        ----------
+        serie : np.array
+            série de 8760 valeurs horaires
+
+        Retours
+        -------
+        dict
+            dictionnaire contenant l'erreur relative sur la somme annuelle ("erreur_energie") et l'écart quadratique
+            moyen entre les monotones de la série et de sa reconstitution, rapporté à la valeur maximale de la série
+            ("erreur_monotone")
+        """
+
+        serie = np.asarray(serie, dtype=float)
+        serie_reconstituee = self.reconstitution(self.agregation(serie))
+
+        somme = np.sum(serie)
+        erreur_energie = 0
+        if somme != 0:
+            erreur_energie = (np.sum(serie_reconstituee) - somme) / abs(somme)
+
+        echelle = np.max(np.abs(serie))
+        erreur_monotone = 0
+        if echelle > 0:
+            erreur_monotone = np.sqrt(np.mean((np.sort(serie_reconstituee) - np.sort(serie))**2)) / echelle
+
+        return {"erreur_energie": erreur_energie, "erreur_monotone": erreur_monotone}
+
+
+def jours_representatifs(series, nombre_jours, nombre_iterations_max=100):
+    """
+    Choisit des jours représentatifs d'une année horaire par la méthode des k-médoïdes.
+
+    Les profils journaliers des séries données, normalisées par leur valeur maximale, sont comparés par distance
+    euclidienne. Les médoïdes sont initialisés de manière gloutonne (chaque nouveau médoïde est le jour qui réduit le
+    plus la somme des distances des jours à leur médoïde), puis améliorés en alternant affectation des jours au
+    médoïde le plus proche et choix, dans chaque groupe, du jour minimisant la somme des distances aux autres. La
+    méthode est déterministe : les mêmes séries donnent toujours les mêmes jours représentatifs.
+
+    Paramètres
+    ----------
+    series : list
+        liste de séries de 8760 valeurs horaires (demande, facteurs de production...)
+    nombre_jours : int
+        nombre de jours représentatifs
+    nombre_iterations_max : int
+        nombre maximal d'itérations de l'alternance affectation / choix des médoïdes
+
+    Retours
+    -------
+    AgregationTemporelle
+        agrégation de l'année en jours représentatifs
+    """
+
+    if nombre_jours >= NOMBRE_JOURS:
+        return AgregationTemporelle(np.arange(NOMBRE_JOURS), np.arange(NOMBRE_JOURS))
+
+    liste_profils = []
+    for serie in series:
+        serie = np.asarray(serie, dtype=float)
+        echelle = np.max(np.abs(serie))
+        if echelle > 0:
+            serie = serie / echelle
+        liste_profils.append(serie.reshape(NOMBRE_JOURS, NOMBRE_HEURES_JOUR))
+    profils = np.hstack(liste_profils)
+
+    normes = np.sum(profils**2, axis=1)
+    distances = np.sqrt(np.maximum(normes[:, None] + normes[None, :] - 2 * profils @ profils.T, 0))
+
+    # initialisation gloutonne
+    medoides = [int(np.argmin(np.sum(distances, axis=1)))]
+    distances_medoides = distances[medoides[0]].copy()
+    while len(medoides) < nombre_jours:
+        gains = np.sum(np.maximum(distances_medoides[None, :] - distances, 0), axis=1)
+        gains[medoides] = -1
+        nouveau_medoide = int(np.argmax(gains))
+        medoides.append(nouveau_medoide)
+        distances_medoides = np.minimum(distances_medoides, distances[nouveau_medoide])
+
+    for iteration in range(nombre_iterations_max):
+        affectation = np.argmin(distances[:, medoides], axis=1)
+        nouveaux_medoides = []
+        for indice_groupe, medoide in enumerate(medoides):
+            jours_groupe = np.flatnonzero(affectation == indice_groupe)
+            if len(jours_groupe) == 0:
+                nouveaux_medoides.append(medoide)
+                continue
+            sommes_distances = np.sum(distances[np.ix_(jours_groupe, jours_groupe)], axis=1)
+            nouveaux_medoides.append(int(jours_groupe[np.argmin(sommes_distances)]))
+        if nouveaux_medoides == medoides:
+            break
+        medoides = nouveaux_medoides
+
+    # les jours représentatifs sont rangés par ordre chronologique
+    medoides = np.sort(medoides)
+    affectation = np.argmin(distances[:, medoides], axis=1)
+    affectation[medoides] = np.arange(len(medoides))
+
+    return AgregationTemporelle(medoides, affectation)
+
+
+def contraintes_stockage_jours_representatifs(probleme, agregation, stock, puissance_charge, puissance_decharge, borne_superieure_stock, rendement_charge, rendement_decharge, nom):
+    """
+    Ajoute au problème les contraintes de continuité et de bornes du stock d'un actif de stockage sur une année
+    agrégée en jours représentatifs.
+
+    Le stock est décomposé en un niveau en début de chaque jour de l'année, enchaîné chronologiquement (et de
+    manière cyclique sur l'année) à l'aide de la variation de stock du jour représentatif de chaque jour, et en une
+    variation intra-journalière portée par les variables de stock des jours représentatifs, nulles en début de
+    journée. Le stock reste compris entre 0 et sa borne supérieure tous les jours de l'année grâce aux variations
+    minimale et maximale de chaque jour représentatif.
+
+    Paramètres
+    ----------
+    probleme : pulp.LpProblem
+        problème auquel ajouter les contraintes
+    agregation : AgregationTemporelle
+        agrégation de l'année en jours représentatifs
+    stock : dict
+        variables de variation intra-journalière du stock à chaque pas de temps, qui ne doivent pas être bornées
+        inférieurement
+    puissance_charge : dict
+        variables de puissance de charge à chaque pas de temps
+    puissance_decharge : dict
+        variables de puissance de décharge à chaque pas de temps
+    borne_superieure_stock : pulp.LpAffineExpression
+        expression de la capacité de stockage installée
+    rendement_charge : float
+        rendement de charge
+    rendement_decharge : float
+        rendement de décharge
+    nom : str
+        suffixe des noms des variables et des contraintes ajoutées
+
+    Retours
+    -------
+    pulp.LpVariable.dict
+        variables de niveau de stock en début de chaque jour de l'année
+    """
+
+    nombre_jours_representatifs = len(agregation.jours)
+
+    niveau_debut_jour = pulp.LpVariable.dict("niveau_stock_debut_jour_%s" % nom, range(NOMBRE_JOURS), lowBound=0, cat="Continuous")
+    variation_min = pulp.LpVariable.dict("variation_stock_min_%s" % nom, range(nombre_jours_representatifs), cat="Continuous")
+    variation_max = pulp.LpVariable.dict("variation_stock_max_%s" % nom, range(nombre_jours_representatifs), cat="Continuous")
+
+    variation_jour = []
+    for jour_representatif in range(nombre_jours_representatifs):
+        premier_pas = jour_representatif * NOMBRE_HEURES_JOUR
+        dernier_pas = premier_pas + NOMBRE_HEURES_JOUR - 1
+
+        stock[premier_pas].bounds(0, 0)
+
+        for pas in range(premier_pas, dernier_pas):
+            contrainte = pulp.LpConstraint(
+                e=stock[pas + 1] - stock[pas] + puissance_decharge[pas] * 1 / rendement_decharge - puissance_charge[pas] * rendement_charge,
+                sense=pulp.LpConstraintEQ,
+                rhs=0,
+                name="continuite_stock_%s_pas_%d" % (nom, pas)
+            )
+            probleme.addConstraint(contrainte)
+
+        variation = stock[dernier_pas] - puissance_decharge[dernier_pas] * 1 / rendement_decharge + puissance_charge[dernier_pas] * rendement_charge
+        variation_jour.append(variation)
+
+        for indice, expression in enumerate([stock[pas] for pas in range(premier_pas, dernier_pas + 1)] + [variation]):
+            probleme.addConstraint(pulp.LpConstraint(
+                e=expression - variation_min[jour_representatif],
+                sense=pulp.LpConstraintGE,
+                rhs=0,
+                name="variation_stock_min_%s_jour_%d_%d" % (nom, jour_representatif, indice)
+            ))
+            probleme.addConstraint(pulp.LpConstraint(
+                e=expression - variation_max[jour_representatif],
+                sense=pulp.LpConstraintLE,
+                rhs=0,
+                name="variation_stock_max_%s_jour_%d_%d" % (nom, jour_representatif, indice)
+            ))
+
+    for jour in range(NOMBRE_JOURS):
+        jour_representatif = agregation.affectation[jour]
+
+        contrainte = pulp.LpConstraint(
+            e=niveau_debut_jour[(jour + 1) % NOMBRE_JOURS] - niveau_debut_jour[jour] - variation_jour[jour_representatif],
+            sense=pulp.LpConstraintEQ,
+            rhs=0,
+            name="continuite_stock_jours_%s_%d" % (nom, jour)
+        )
+        probleme.addConstraint(contrainte)
+
+        contrainte = pulp.LpConstraint(
+            e=niveau_debut_jour[jour] + variation_min[jour_representatif],
+            sense=pulp.LpConstraintGE,
+            rhs=0,
+            name="borne_inferieure_stock_%s_jour_%d" % (nom, jour)
+        )
+        probleme.addConstraint(contrainte)
+
+        contrainte = pulp.LpConstraint(
+            e=borne_superieure_stock - niveau_debut_jour[jour] - variation_max[jour_representatif],
+            sense=pulp.LpConstraintGE,
+            rhs=0,
+            name="borne_superieure_stock_%s_jour_%d" % (nom, jour)
+        )
+        probleme.addConstraint(contrainte)
+
+    return niveau_debut_jour
+
+
+def stock_horaire(agregation, valeurs_stock, valeurs_niveau_debut_jour):
+    """
+    Reconstitue le stock horaire de l'année à partir des variations intra-journalières des jours représentatifs et
+    des niveaux de stock en début de chaque jour.
+
+    Paramètres
+    ----------
+    agregation : AgregationTemporelle
+        agrégation de l'année en jours représentatifs
+    valeurs_stock : np.array
+        valeurs des variations intra-journalières à chaque pas de temps
+    valeurs_niveau_debut_jour : np.array
+        valeurs des niveaux de stock en début de chaque jour de l'année
+
+    Retours
+    -------
+    np.array
+        stock à chaque heure de l'année
+    """
+
+    variations = agregation.reconstitution(valeurs_stock)
+    return variations + np.repeat(np.asarray(valeurs_niveau_debut_jour, dtype=float), NOMBRE_HEURES_JOUR)
+
+
+def series_meteo(donnees_entree, meteo):
+    """
+    Renvoie les chroniques d'une météo sur lesquelles sont choisis les jours représentatifs : la demande et le facteur
+    de production de chaque actif ENR.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    meteo : DonneesEntree.Meteo
+        météo considérée
+
+    Retours
+    -------
+    dict
+        dictionnaire contenant, pour chaque nom de chronique, la série de ses 8760 valeurs horaires
+    """
+
+    series = {"demande": meteo.demande_annuelle(0)}
+    for actif in donnees_entree.actifs_ENR():
+        series["facteur_production_%s" % actif.cle] = meteo.facteurs_production_ENR(actif.cle)
+    return series
+
+
+def agregation_meteo(donnees_entree, meteo):
+    """
+    Calcule l'agrégation en jours représentatifs d'une météo, à partir de sa demande et des facteurs de production
+    des actifs ENR.
+
+    Elle est utilisée par les problèmes complets de génération de mix cible et de mix optimal, mais pas par les
+    sous-problèmes de la décomposition de Benders du mix cible, qui restent écrits sur les 8760 heures.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    meteo : DonneesEntree.Meteo
+        météo à agréger
+
+    Retours
+    -------
+    AgregationTemporelle
+        agrégation de la météo, ou None si nombre_jours_representatifs est nul
+    """
+
+    nombre_jours_representatifs = donnees_entree.parametres_simulation.nombre_jours_representatifs
+    if nombre_jours_representatifs <= 0:
+        return None
+
+    return jours_representatifs(list(series_meteo(donnees_entree, meteo).values()), nombre_jours_representatifs)
+
+
+def erreurs_series(agregation, series):
+    """
+    Calcule les erreurs commises sur plusieurs séries horaires par leur reconstitution à partir des jours
+    représentatifs.
+
+    Paramètres
+    ----------
+    agregation : AgregationTemporelle
+        agrégation de l'année en jours représentatifs
+    series : dict
+        dictionnaire contenant, pour chaque nom de série, ses 8760 valeurs horaires
+
+    Retours
+    -------
+    dict
+        dictionnaire contenant, pour chaque erreur de AgregationTemporelle.erreurs et chaque série, la valeur de
+        l'erreur sous la clé "<erreur>_<série>"
+    """
+
+    dict_erreurs = dict()
+    for nom_serie, serie in series.items():
+        for nom_erreur, erreur in agregation.erreurs(serie).items():
+            dict_erreurs["%s_%s" % (nom_erreur, nom_serie)] = erreur
+    return dict_erreurs
@@ -101,58 +101,72 @@ def anticipation_resultats_annuels_parc_exogene(annee_debut_anticipation, annee_
         dispatchs sur les ambiances, années et météos correspondantes
     """
 
+    anticipation = (annee_debut_anticipation, annee_fin_anticipation, dico_nb_unites_ambiances_test, writeLP, LP_name)
+
+    return anticipations_resultats_annuels_parc_exogene([anticipation], donnees_entree, donnees_simulation)[0]
+
+def anticipations_resultats_annuels_parc_exogene(liste_anticipations, donnees_entree, donnees_simulation):
+    """
+    Réalise plusieurs anticipations sur parc exogène en soumettant l'ensemble de leurs dispatchs en une seule fois
+    au pool de processus de DispatchV0.lancement_dispatchs_annuels, ce qui permet de calculer en parallèle des
+    anticipations indépendantes (par exemple les tests d'ajout des différents actifs éligibles).
+
+    Parametres
+    ----------
+    liste_anticipations : list
+        liste de tuples (annee_debut_anticipation, annee_fin_anticipation, dico_nb_unites_ambiances, writeLP, LP_name)
+        décrivant chaque anticipation, avec les mêmes conventions que anticipation_resultats_annuels_parc_exogene
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser
+
+    Retours
+    -------
+    list
+        liste, dans l'ordre de liste_anticipations, des matrices indexées par [ambiance][annee][meteo] contenant les
+        instances de DispatchV0.ResultatAnnuel resultant des dispatchs de chaque anticipation
+    """
+
     annee_courante = donnees_simulation.annee_courante
-    matrice_threads_dispatch_annuel = []
-    for indice_ambiance,ambiance in enumerate(donnees_entree.ambiances):
-    
-        matrice_threads_dispatch_annuel_ambiance = []
-        
-        for annee_anticipee in range(annee_debut_anticipation, annee_fin_anticipation):
+    nb_meteo = donnees_entree.parametres_simulation.nb_meteo
 
-            liste_threads_dispatch_annuel_ambiance_annee = []
+    # description de l'ensemble des dispatchs à calculer, dans l'ordre [anticipation][ambiance][annee][meteo]
+    liste_taches = []
+    for annee_debut_anticipation, annee_fin_anticipation, dico_nb_unites_ambiances, writeLP, LP_name in liste_anticipations:
+
+        for ambiance in donnees_entree.ambiances:
+
+            for annee_anticipee in range(annee_debut_anticipation, annee_fin_anticipation):
 
-            for indice_meteo in range(donnees_entree.parametres_simulation.nb_meteo):
-            
                 compte_unites = dict()
-                
+
                 for actif in donnees_entree.tous_actifs():
-                
-                    compte_unites[actif.cle] = dico_nb_unites_ambiances_test[ambiance].at[annee_anticipee,actif.cle]
-
-                donnees_dispatch = donnees_entree.ambiances[ambiance][annee_courante]["meteo_%d"%indice_meteo]
-                donnees_couts_var = donnees_entree.ambiances[ambiance][annee_courante]["couts_combustibles"]
-                
-                thread_dispatch_annuel = DispatchV0.ThreadDispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch,donnees_couts_var,annee_courante,annee_anticipee,writeLP,LP_name)
-                
-                liste_threads_dispatch_annuel_ambiance_annee.append(thread_dispatch_annuel)
-                thread_dispatch_annuel.start()
 
-            matrice_threads_dispatch_annuel_ambiance.append(liste_threads_dispatch_annuel_ambiance_annee)
+                    compte_unites[actif.cle] = dico_nb_unites_ambiances[ambiance].at[annee_anticipee,actif.cle]
 
-        matrice_threads_dispatch_annuel.append(matrice_threads_dispatch_annuel_ambiance)
+                for indice_meteo in range(nb_meteo):
 
-    for indice_ambiance,ambiance in enumerate(donnees_entree.ambiances):
-        for annee_anticipee in range(annee_debut_anticipation, annee_fin_anticipation):
-            for indice_meteo in range(donnees_entree.parametres_simulation.nb_meteo):
-                matrice_threads_dispatch_annuel[indice_ambiance][annee_anticipee - annee_debut_anticipation][indice_meteo].join()
+                    liste_taches.append((ambiance, annee_courante, indice_meteo, compte_unites, annee_anticipee, writeLP, LP_name))
 
-    matrice_resultats_annuels = []
-    for indice_ambiance,ambiance in enumerate(donnees_entree.ambiances):
+    liste_resultats_annuels = DispatchV0.lancement_dispatchs_annuels(donnees_entree, liste_taches)
 
-        matrice_resultats_annuels_ambiance = []
+    liste_matrices_resultats_annuels = []
+    indice_tache = 0
+    for annee_debut_anticipation, annee_fin_anticipation, dico_nb_unites_ambiances, writeLP, LP_name in liste_anticipations:
 
-        for annee_anticipee in range(annee_debut_anticipation, annee_fin_anticipation):
-            liste_resultats_annuels_ambiance_annee = []
-
-            for indice_meteo in range(donnees_entree.parametres_simulation.nb_meteo):
-                resultat_annuel = matrice_threads_dispatch_annuel[indice_ambiance][annee_anticipee - annee_debut_anticipation][indice_meteo].resultat_annuel
-                liste_resultats_annuels_ambiance_annee.append(resultat_annuel)
+        matrice_resultats_annuels = []
 
-            matrice_resultats_annuels_ambiance.append(liste_resultats_annuels_ambiance_annee)
+        for ambiance in donnees_entree.ambiances:
 
-        matrice_resultats_annuels.append(matrice_resultats_annuels_ambiance)
+            matrice_resultats_annuels_ambiance = []
 
-    return matrice_resultats_annuels
+            for annee_anticipee in range(annee_debut_anticipation, annee_fin_anticipation):
+                matrice_resultats_annuels_ambiance.append(liste_resultats_annuels[indice_tache:indice_tache + nb_meteo])
+                indice_tache += nb_meteo
 
+            matrice_resultats_annuels.append(matrice_resultats_annuels_ambiance)
 
+        liste_matrices_resultats_annuels.append(matrice_resultats_annuels)
 
+    return liste_matrices_resultats_annuels
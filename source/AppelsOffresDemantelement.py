@@ -93,8 +93,7 @@ def sequence_appels_offres_demantelement(donnees_entree, donnees_simulation):
     df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
     
     nom_fic = "DF_PR_DivestAO_%s.csv"%(str(annee_courante))    
-    path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-    df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+    Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
         
     #### Lecture du parc exogène 
         
@@ -114,12 +113,14 @@ def sequence_appels_offres_demantelement(donnees_entree, donnees_simulation):
         
         dico_df_nb_unites_ambiances = {}
         
+        if donnees_entree.parametres_simulation.extrapolation_capa :
+            df_nb_unites_extrapole = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,donnees_entree.parametres_simulation.nb_annee_extrapolation_capa)
+
         for ambiance in donnees_entree.ambiances :
 
             if donnees_entree.parametres_simulation.extrapolation_capa :
             
-                nb_annee_extrapolation =  donnees_entree.parametres_simulation.nb_annee_extrapolation_capa          
-                dico_df_nb_unites_ambiances[ambiance] = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,nb_annee_extrapolation)
+                dico_df_nb_unites_ambiances[ambiance] = df_nb_unites_extrapole.copy()
                 
             else :
                 dico_df_nb_unites_ambiances[ambiance] = df_nb_unites.copy()
@@ -127,8 +128,7 @@ def sequence_appels_offres_demantelement(donnees_entree, donnees_simulation):
     for ambiance in donnees_entree.ambiances :
     
         nom_fic = "DF_PA_%s_DivestAO_%s.csv"%(ambiance,str(annee_courante))    
-        path_df = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        dico_df_nb_unites_ambiances[ambiance].to_csv(path_df,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[ambiance])
 
                 
     fin_anticipation = np.min([annee_courante+horizon_prevision,
@@ -163,27 +163,39 @@ def sequence_appels_offres_demantelement(donnees_entree, donnees_simulation):
         donnees_simulation.df_resume.at[idx,"year"] = annee_courante
         
         liste_unites_actives_avec_cout_fermeture = []
+
+        # le coût de fermeture anticipée est calculé une seule fois par cohorte d'unités identiques
+        dict_couts_fermeture_anticipee_cohortes = dict()
+
         for unite in donnees_simulation.parc.unites_actives(actif.cle, annee_courante):
-            # calcul des revenus annuels de l'unité à partir des résultats annuels avec extrapolation éventuelle des
-            # revenus des années non anticipées jusqu'à la fin de la durée de vie
-            matrice_revenus_annuels = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_courante, unite.annee_fermeture, donnees_entree, donnees_simulation)
 
-            nbAnneeCalculNPV = unite.annee_fermeture - annee_courante 
+            cle_cohorte = IndicateursEconomiques.cle_cohorte_revenus(unite)
+
+            if cle_cohorte not in dict_couts_fermeture_anticipee_cohortes:
+                # calcul des revenus annuels de l'unité à partir des résultats annuels avec extrapolation éventuelle des
+                # revenus des années non anticipées jusqu'à la fin de la durée de vie
+                matrice_revenus_annuels = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_courante, unite.annee_fermeture, donnees_entree, donnees_simulation)
+
+                nbAnneeCalculNPV = unite.annee_fermeture - annee_courante 
             
-            taux_actualisation = actif.taux_actualisation
-            investissement_initial = 0
+                taux_actualisation = actif.taux_actualisation
+                investissement_initial = 0
             
             
-            VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeCalculNPV)
-            VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeCalculNPV)]).sum() 
+                VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeCalculNPV)
+                VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeCalculNPV)]).sum() 
 
             
-            # on calcule le coût de fermeture anticipée comme la VAN sur le reste de la durée de vie de l'unité
-            # sans investissement initial ni durée de construction
-            cout_fermeture_anticipee = VAN_equivalente
+                # on calcule le coût de fermeture anticipée comme la VAN sur le reste de la durée de vie de l'unité
+                # sans investissement initial ni durée de construction
+                cout_fermeture_anticipee = VAN_equivalente
+
+                # si l'unité est déficitaire, la fermer ne coûte rien
+                cout_fermeture_anticipee = max(0, cout_fermeture_anticipee)
+
+                dict_couts_fermeture_anticipee_cohortes[cle_cohorte] = cout_fermeture_anticipee
 
-            # si l'unité est déficitaire, la fermer ne coûte rien
-            cout_fermeture_anticipee = max(0, cout_fermeture_anticipee)
+            cout_fermeture_anticipee = dict_couts_fermeture_anticipee_cohortes[cle_cohorte]
 
             liste_unites_actives_avec_cout_fermeture.append((unite, cout_fermeture_anticipee))
 
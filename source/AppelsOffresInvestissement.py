@@ -178,8 +178,7 @@ def sequence_appels_offres_investissement(donnees_entree, donnees_simulation):
     df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
 
     nom_fic = "DF_PR_InvestAO_%s.csv"%(str(annee_courante))    
-    path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-    df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+    Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
 
 
     if donnees_entree.parametres_simulation.anticipation_parc_exogene :
@@ -195,8 +194,7 @@ def sequence_appels_offres_investissement(donnees_entree, donnees_simulation):
         for ambiance in donnees_entree.ambiances :
         
             nom_fic = "DF_PA_%s_InvestAO_%s.csv"%(ambiance,str(annee_courante))    
-            path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-            dico_df_nb_unites_ambiances[ambiance].to_csv(path_df_parc_reel,sep=";")
+            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[ambiance])
 
 
         print("realisation d'une anticiation entre %s et %s"%(annee_debut_anticipation,fin_anticipation-1))
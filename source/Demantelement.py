@@ -87,8 +87,7 @@ def sequence_demantelement(donnees_entree, donnees_simulation):
         df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
         
         nom_fic = "DF_PR_MerchDivest_%s_%s.csv"%(str(annee_courante),str(boucle_demantelement))    
-        path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
      
         # anticipation des résultats annuels pour la prochaine année de fonctionnement
         
@@ -119,13 +118,14 @@ def sequence_demantelement(donnees_entree, donnees_simulation):
             
             dico_df_nb_unites_ambiances = {}
             
+            if donnees_entree.parametres_simulation.extrapolation_capa :
+                df_nb_unites_extrapole = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,donnees_entree.parametres_simulation.nb_annee_extrapolation_capa)
+
             for ambiance in donnees_entree.ambiances :
              
                 if donnees_entree.parametres_simulation.extrapolation_capa :
                     print("\t\t\t extrapolation des capacités")                
-                    nb_annee_extrapolation =  donnees_entree.parametres_simulation.nb_annee_extrapolation_capa
-                    
-                    dico_df_nb_unites_ambiances[ambiance] = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,nb_annee_extrapolation)   
+                    dico_df_nb_unites_ambiances[ambiance] = df_nb_unites_extrapole.copy()   
                 else : 
                     print("\t\t\t pas d'extrapolation des capacités")       
                     
@@ -133,8 +133,7 @@ def sequence_demantelement(donnees_entree, donnees_simulation):
 
         for ambiance in donnees_entree.ambiances :
             nom_fic = "DF_PA_%s_MerchDivest_%s_%s.csv"%(ambiance,str(annee_courante),str(boucle_demantelement))
-            path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-            dico_df_nb_unites_ambiances[ambiance].to_csv(path_df_parc_reel,sep=";")
+            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[ambiance])
         
         print("\t\t Anticipation des résultats pour l'année courante : année %s"%(annee_courante))
             
@@ -151,18 +150,27 @@ def sequence_demantelement(donnees_entree, donnees_simulation):
 
             liste_unites_en_sursis_actif = []
 
+            # les revenus sont calculés une seule fois par cohorte d'unités identiques
+            dict_cohortes_deficitaires = dict()
+
             for unite in donnees_simulation.parc.unites_actives(actif.cle, annee_courante):
+
+                cle_cohorte = IndicateursEconomiques.cle_cohorte_revenus(unite)
+
+                if cle_cohorte not in dict_cohortes_deficitaires:
                 
-                # calcul des revenus de l'unité examinée pour l'année courante dans les différentes ambiances et météos
-                matrice_revenus_annuels_annee_courante = IndicateursEconomiques.calcul_matrice_revenus_annuels(unite, matrice_resultats_annuels_annee_courante, annee_courante, annee_courante + 1, donnees_entree, donnees_simulation)
-                
-                deficitaire = False
-                for indice_ambiance in range(len(matrice_revenus_annuels_annee_courante)):
-                    for indice_meteo in range(len(matrice_revenus_annuels_annee_courante[indice_ambiance][0])):
-                        if matrice_revenus_annuels_annee_courante[indice_ambiance][0][indice_meteo] < 0:
-                            deficitaire = True
+                    # calcul des revenus de l'unité examinée pour l'année courante dans les différentes ambiances et météos
+                    matrice_revenus_annuels_annee_courante = IndicateursEconomiques.calcul_matrice_revenus_annuels(unite, matrice_resultats_annuels_annee_courante, annee_courante, annee_courante + 1, donnees_entree, donnees_simulation)
+                    
+                    deficitaire = False
+                    for indice_ambiance in range(len(matrice_revenus_annuels_annee_courante)):
+                        for indice_meteo in range(len(matrice_revenus_annuels_annee_courante[indice_ambiance][0])):
+                            if matrice_revenus_annuels_annee_courante[indice_ambiance][0][indice_meteo] < 0:
+                                deficitaire = True
+
+                    dict_cohortes_deficitaires[cle_cohorte] = deficitaire
 
-                if deficitaire:
+                if dict_cohortes_deficitaires[cle_cohorte]:
                     liste_unites_en_sursis_actif.append(unite)
 
             if(len(liste_unites_en_sursis_actif) > 0):
@@ -194,30 +202,41 @@ def sequence_demantelement(donnees_entree, donnees_simulation):
 
             for cle_actif, liste_unites_en_sursis_actif in dict_unites_en_sursis.items():
                 liste_unites_en_sursis_et_revenu_moyen_terme_equivalent_actif = []
+
+                # revenu moyen terme équivalent de chaque cohorte d'unités identiques
+                dict_revenus_moyen_terme_equivalents_cohortes = dict()
                 
                 for unite in liste_unites_en_sursis_actif:
+
+                    cle_cohorte = IndicateursEconomiques.cle_cohorte_revenus(unite)
+
+                    if cle_cohorte not in dict_revenus_moyen_terme_equivalents_cohortes:
+
+                        if donnees_entree.parametres_simulation.extrapolation_EOM :
+                            annee_fin_calcul_NPV = annee_courante + unite.actif.duree_vie
+                        else : 
+                            annee_fin_calcul_NPV = annee_fin_anticipation          
                     
-                    if donnees_entree.parametres_simulation.extrapolation_EOM :
-                        annee_fin_calcul_NPV = annee_courante + unite.actif.duree_vie
-                    else : 
-                        annee_fin_calcul_NPV = annee_fin_anticipation          
-                    
-                    nbAnneeNPV = annee_fin_calcul_NPV - annee_courante
-                    
-                    matrice_revenus_sans_CF_annuels_unite = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels_horizon_prevision, annee_courante, annee_fin_calcul_NPV , donnees_entree, donnees_simulation)
+                        nbAnneeNPV = annee_fin_calcul_NPV - annee_courante
                     
-                    revenu_sans_CF_moyen_terme_equivalent_unite,revenu_sans_CF_moyen_terme_equivalent_unite_annualise, prime_risque, liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_sans_CF_annuels_unite, unite.actif.taux_actualisation, donnees_entree,0,nbAnneeNPV)
+                        matrice_revenus_sans_CF_annuels_unite = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels_horizon_prevision, annee_courante, annee_fin_calcul_NPV , donnees_entree, donnees_simulation)
                     
-                    couts_fixes_maintenance = 0
-                    for annee in range (annee_courante, annee_fin_calcul_NPV) : 
-                        if (unite.annee_ouverture <= annee < unite.annee_fermeture):
-                            couts_fixes_annee = unite.actif.cout_fixe_maintenance* (1+unite.actif.taux_actualisation)**(-(annee - annee_courante))
-                        else :
-                            couts_fixes_annee = 0 
-                        couts_fixes_maintenance += couts_fixes_annee  
-                        
+                        revenu_sans_CF_moyen_terme_equivalent_unite,revenu_sans_CF_moyen_terme_equivalent_unite_annualise, prime_risque, liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_sans_CF_annuels_unite, unite.actif.taux_actualisation, donnees_entree,0,nbAnneeNPV)
                     
+                        couts_fixes_maintenance = 0
+                        for annee in range (annee_courante, annee_fin_calcul_NPV) : 
+                            if (unite.annee_ouverture <= annee < unite.annee_fermeture):
+                                couts_fixes_annee = unite.actif.cout_fixe_maintenance* (1+unite.actif.taux_actualisation)**(-(annee - annee_courante))
+                            else :
+                                couts_fixes_annee = 0 
+                            couts_fixes_maintenance += couts_fixes_annee  
+
+
+                        dict_revenus_moyen_terme_equivalents_cohortes[cle_cohorte] = (revenu_sans_CF_moyen_terme_equivalent_unite, couts_fixes_maintenance)
+
+                    revenu_sans_CF_moyen_terme_equivalent_unite, couts_fixes_maintenance = dict_revenus_moyen_terme_equivalents_cohortes[cle_cohorte]
                     revenu_moyen_terme_equivalent_unite = revenu_sans_CF_moyen_terme_equivalent_unite - couts_fixes_maintenance
+
                     print(unite.annee_ouverture, unite.annee_fermeture, revenu_sans_CF_moyen_terme_equivalent_unite, couts_fixes_maintenance, revenu_moyen_terme_equivalent_unite < 0)
                     if(revenu_moyen_terme_equivalent_unite < 0):
                         # mise à jour des variables faisant le compte des années consécutives où la fermeture de l'unité
@@ -6,8 +6,12 @@ import os
 import pulp
 import numpy as np
 import pandas as pd
+import scipy.sparse
+import scipy.optimize
 import time
 from threading import Thread
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from pathlib import Path
 
@@ -411,6 +415,466 @@ class ProblemeDispatchPartiel(pulp.LpProblem):
                     taux_contrainte = stock_contraint_actif / ( actif_stockage.capacite * compte_unites[actif_stockage.cle] )
                     self.stock["indic_"+actif_stockage.cle][heure_contrainte].bounds(low=taux_contrainte * actif_stockage.duree , up=taux_contrainte * actif_stockage.duree)
 
+    def resultats_fenetre(self, donnees_entree):
+        """
+        Renvoie, sous forme de tableaux numpy couvrant les heures de la fenêtre, les valeurs des variables et les
+        variables duales du problème résolu. Chaque famille de variables est lue en une seule passe, sans passer par
+        les structures annuelles.
+
+        Retours
+        -------
+        dict
+            dictionnaire contenant la valeur objectif ("cout"), les productions ("production"), les stocks ("stock",
+            heures 1 à nombre_heures), les charges ("charge"), les décharges ("decharge"), la défaillance
+            ("defaillance"), les variables duales de satisfaction de la demande ("cout_marginal") et de stock maximal
+            ("variable_duale_stockage") et les puissances disponibles des actifs ENR ("puissance_disponible")
+        """
+
+        def valeurs(variables):
+            return np.fromiter((variable.varValue for variable in variables.values()), dtype=float, count=len(variables))
+
+        def duales(contraintes):
+            return np.fromiter((contrainte.pi for contrainte in contraintes), dtype=float, count=len(contraintes))
+
+        resultats_fenetre = dict()
+        resultats_fenetre["cout"] = pulp.value(self.objective)
+        resultats_fenetre["production"] = {cle: valeurs(variables) for cle, variables in self.puissance_produite.items()}
+        resultats_fenetre["stock"] = {cle: valeurs(variables) for cle, variables in self.stock.items()}
+        resultats_fenetre["charge"] = {cle: valeurs(variables) for cle, variables in self.puissance_charge.items()}
+        resultats_fenetre["decharge"] = {cle: valeurs(variables) for cle, variables in self.puissance_decharge.items()}
+        resultats_fenetre["defaillance"] = valeurs(self.defaillance)
+        resultats_fenetre["cout_marginal"] = duales(self.liste_contraintes_satisfaction_demande)
+        resultats_fenetre["variable_duale_stockage"] = {cle: duales(contraintes) for cle, contraintes in self.contraintes_max_stock.items()}
+        resultats_fenetre["puissance_disponible"] = dict()
+        for actif_ENR in donnees_entree.actifs_ENR():
+            variables = self.puissance_produite[actif_ENR.cle]
+            resultats_fenetre["puissance_disponible"][actif_ENR.cle] = np.fromiter((variable.upBound for variable in variables.values()), dtype=float, count=len(variables))
+
+        return resultats_fenetre
+
+def couts_variables_actifs_hors_stockage(donnees_entree, donnees_couts_var, annee):
+    """
+    Renvoie un dictionnaire contenant, pour chaque actif hors stockage, son coût variable de production pour l'année
+    considérée (coût du combustible et du carbone pour les actifs pilotables, coût variable pour les actifs ENR).
+    """
+
+    dict_cout_var = dict()
+    cout_carbone = donnees_couts_var.at["cout_CO2", "Annee_%d" % annee]
+    for actif_pilotable in donnees_entree.actifs_pilotables():
+        cout_combu = donnees_couts_var.at[actif_pilotable.combustible, "Annee_%d" % annee]
+        dict_cout_var[actif_pilotable.cle] = ((1/actif_pilotable.rendement)*cout_combu) + (actif_pilotable.emission_carbone*cout_carbone)
+    for actif_ENR in donnees_entree.actifs_ENR():
+        dict_cout_var[actif_ENR.cle] = actif_ENR.cout_variable
+
+    return dict_cout_var
+
+
+def _serie_fenetre(data_frame, colonne, heure_debut, nombre_heures):
+    """
+    Renvoie les valeurs de la colonne sur la fenêtre [heure_debut, heure_debut + nombre_heures[, les heures situées
+    au delà de la fin de l'année étant complétées par des zéros.
+    """
+
+    return data_frame[colonne].reindex(range(heure_debut, heure_debut + nombre_heures), fill_value=0).values.astype(float)
+
+
+class ProblemeDispatchPartielMatriciel:
+    """
+    Problème de dispatch sur une partie de l'année, construit sous forme matricielle.
+
+    Cette classe représente le même sous-problème que ProblemeDispatchPartiel (mêmes variables de production, de
+    défaillance, de stock, de charge et de décharge, mêmes contraintes de satisfaction de la demande, de continuité et
+    de niveau maximal du stock) mais, au lieu de créer une variable et une contrainte pulp par heure, les matrices de
+    contraintes sont assemblées en une fois avec scipy.sparse et les bornes des variables sont stockées dans des
+    vecteurs numpy. Les attributs puissance_produite, defaillance, stock, puissance_charge et puissance_decharge
+    contiennent les indices des colonnes correspondantes et les attributs de contraintes les indices des lignes.
+
+    Attributs
+    ---------
+    nombre_heures : int
+        nombre d'heures que couvre le problème
+    nombre_variables : int
+        nombre total de variables du problème
+    puissance_produite : dict
+        dictionnaire stockant, pour chaque type d'actif, les indices des colonnes de puissance produite à chaque heure
+    defaillance : np.array
+        indices des colonnes des puissances non-fournies à chaque heure
+    stock : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les indices des colonnes de stock (heures 1 à
+        nombre_heures)
+    puissance_charge : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les indices des colonnes de puissance de charge
+    puissance_decharge : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les indices des colonnes de puissance de décharge
+    liste_contraintes_satisfaction_demande : np.array
+        indices des lignes de la matrice d'égalité imposant la satisfaction de la demande à chaque heure
+    contraintes_continuite_stock : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les indices des lignes de la matrice d'égalité
+        imposant la continuité du stock d'une heure sur l'autre
+    contraintes_max_stock : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les indices des lignes de la matrice d'inégalité
+        bornant le niveau du stock
+    cout : np.array
+        coefficients de la fonction objectif
+    matrice_egalite, second_membre_egalite : scipy.sparse.csr_matrix, np.array
+        contraintes d'égalité du problème
+    matrice_inegalite, second_membre_inegalite : scipy.sparse.csr_matrix, np.array
+        contraintes d'inégalité (inférieur ou égal) du problème
+    borne_inf, borne_sup : np.array
+        bornes des variables
+    status : int
+        statut de la dernière résolution, selon la convention de pulp (1 si une solution optimale a été trouvée)
+    valeurs : np.array
+        valeurs des variables à l'issue de la dernière résolution
+    duales_egalite, duales_inegalite : np.array
+        variables duales des contraintes à l'issue de la dernière résolution
+
+    Méthodes
+    --------
+    mise_a_jour_second_membre(self, donnees_entree, compte_unites, donnees_dispatch, annee, donnees_couts_var,
+    heure_debut, stock_depart, contraindre_stock = False, heure_contrainte = None, stock_contraint = None)
+        Adapte les seconds membres et les bornes du problème à la fenêtre horaire définie par heure_debut.
+    resoudre(self)
+        Résout le problème et enregistre les valeurs primales et duales. Si le paramètre solver vaut "highs", le
+        modèle est conservé en mémoire dans une instance HiGHS persistante (module highspy) : seules les bornes et les
+        seconds membres sont transmis d'une fenêtre à l'autre et chaque résolution repart de la base précédente.
+        Sinon, le problème est résolu avec le solveur HiGHS de scipy.
+    """
+
+    def __init__(self, donnees_entree, compte_unites, donnees_dispatch, annee, donnees_couts_var, nombre_heures):
+
+        self.nombre_heures = nombre_heures
+        indicatrice = donnees_entree.parametres_simulation.indicatrice
+
+        # ######### #
+        # VARIABLES #
+        # ######### #
+
+        # les variables sont numérotées par blocs de nombre_heures colonnes
+        self.nombre_variables = 0
+        liste_borne_inf = []
+        liste_borne_sup = []
+        liste_cout = []
+
+        def ajout_bloc(borne_sup, cout=0):
+            indices = np.arange(self.nombre_variables, self.nombre_variables + nombre_heures)
+            self.nombre_variables += nombre_heures
+            liste_borne_inf.append(np.zeros(nombre_heures))
+            liste_borne_sup.append(np.full(nombre_heures, borne_sup, dtype=float))
+            liste_cout.append(np.full(nombre_heures, cout, dtype=float))
+            return indices
+
+        # coûts variables des actifs hors stockage pour l'année considérée
+        dict_cout_var = couts_variables_actifs_hors_stockage(donnees_entree, donnees_couts_var, annee)
+
+        # valeurs de la production des actifs hors stockage, bornes supérieures mises à jour à chaque étape
+        self.puissance_produite = dict()
+        for actif in donnees_entree.actifs_hors_stockage():
+            self.puissance_produite[actif.cle] = ajout_bloc(0, dict_cout_var[actif.cle])
+
+        # valeur de la défaillance, non bornée supérieurement
+        self.defaillance = ajout_bloc(np.inf, donnees_entree.parametres_simulation.plafond_prix)
+
+        # valeurs de stock (heures 1 à nombre_heures), de charge et de décharge pour chaque type d'actif de stockage
+        self.stock = dict()
+        self.puissance_charge = dict()
+        self.puissance_decharge = dict()
+        for actif_stockage in donnees_entree.actifs_stockage():
+            self.stock[actif_stockage.cle] = ajout_bloc(np.inf)
+            self.puissance_charge[actif_stockage.cle] = ajout_bloc(actif_stockage.puissance_nominale_charge * compte_unites[actif_stockage.cle])
+            self.puissance_decharge[actif_stockage.cle] = ajout_bloc(actif_stockage.puissance_nominale_decharge * compte_unites[actif_stockage.cle], actif_stockage.cout_variable)
+
+        #### Indicatrices (unités de 1 MW)
+        if indicatrice:
+            for actif in donnees_entree.actifs_pilotables():
+                self.puissance_produite["indic_"+actif.cle] = ajout_bloc(1, dict_cout_var[actif.cle])
+            for actif in donnees_entree.actifs_ENR():
+                self.puissance_produite["indic_"+actif.cle] = ajout_bloc(0, dict_cout_var[actif.cle])
+            for actif_stockage in donnees_entree.actifs_stockage():
+                self.stock["indic_"+actif_stockage.cle] = ajout_bloc(actif_stockage.duree)
+                self.puissance_charge["indic_"+actif_stockage.cle] = ajout_bloc(1)
+                self.puissance_decharge["indic_"+actif_stockage.cle] = ajout_bloc(1, actif_stockage.cout_variable)
+
+        self.borne_inf = np.concatenate(liste_borne_inf)
+        self.borne_sup = np.concatenate(liste_borne_sup)
+        self.cout = np.concatenate(liste_cout)
+
+        # ########### #
+        # CONTRAINTES #
+        # ########### #
+
+        heures = np.arange(nombre_heures)
+        lignes = []
+        colonnes = []
+        coefficients = []
+
+        def ajout_coefficients(indices_lignes, indices_colonnes, coefficient):
+            lignes.append(indices_lignes)
+            colonnes.append(indices_colonnes)
+            coefficients.append(np.full(len(indices_lignes), coefficient, dtype=float))
+
+        # contrainte de satisfaction de la demande : lignes 0 à nombre_heures - 1
+        self.liste_contraintes_satisfaction_demande = heures
+        for cle, indices in self.puissance_produite.items():
+            ajout_coefficients(heures, indices, 1)
+        for cle, indices in self.puissance_charge.items():
+            ajout_coefficients(heures, indices, -1)
+        for cle, indices in self.puissance_decharge.items():
+            ajout_coefficients(heures, indices, 1)
+        ajout_coefficients(heures, self.defaillance, 1)
+
+        # contrainte de continuité du stock
+        # ligne de l'heure h : stock[h+1] - stock[h] - rendement_charge * charge[h] + 1/rendement_decharge * decharge[h]
+        # le stock de l'heure 0 n'est pas une variable, il intervient dans le second membre de la première ligne
+        nombre_lignes_egalite = nombre_heures
+        self.contraintes_continuite_stock = dict()
+        for actif_stockage in donnees_entree.actifs_stockage():
+            for prefixe in (["", "indic_"] if indicatrice else [""]):
+                cle = prefixe + actif_stockage.cle
+                lignes_actif = heures + nombre_lignes_egalite
+                nombre_lignes_egalite += nombre_heures
+                ajout_coefficients(lignes_actif, self.stock[cle], 1)
+                ajout_coefficients(lignes_actif[1:], self.stock[cle][:-1], -1)
+                ajout_coefficients(lignes_actif, self.puissance_charge[cle], -actif_stockage.rendement_charge)
+                ajout_coefficients(lignes_actif, self.puissance_decharge[cle], 1/actif_stockage.rendement_decharge)
+                self.contraintes_continuite_stock[cle] = lignes_actif
+
+        self.matrice_egalite = scipy.sparse.coo_matrix((np.concatenate(coefficients), (np.concatenate(lignes), np.concatenate(colonnes))), shape=(nombre_lignes_egalite, self.nombre_variables)).tocsr()
+        self.second_membre_egalite = np.zeros(nombre_lignes_egalite)
+
+        # contrainte stock_max
+        lignes = []
+        colonnes = []
+        coefficients = []
+        liste_second_membre_inegalite = []
+        nombre_lignes_inegalite = 0
+        self.contraintes_max_stock = dict()
+        for actif_stockage in donnees_entree.actifs_stockage():
+            lignes_actif = heures + nombre_lignes_inegalite
+            nombre_lignes_inegalite += nombre_heures
+            ajout_coefficients(lignes_actif, self.stock[actif_stockage.cle], 1)
+            liste_second_membre_inegalite.append(np.full(nombre_heures, actif_stockage.capacite * compte_unites[actif_stockage.cle], dtype=float))
+            self.contraintes_max_stock[actif_stockage.cle] = lignes_actif
+
+        if nombre_lignes_inegalite > 0:
+            self.matrice_inegalite = scipy.sparse.coo_matrix((np.concatenate(coefficients), (np.concatenate(lignes), np.concatenate(colonnes))), shape=(nombre_lignes_inegalite, self.nombre_variables)).tocsr()
+            self.second_membre_inegalite = np.concatenate(liste_second_membre_inegalite)
+        else:
+            self.matrice_inegalite = None
+            self.second_membre_inegalite = None
+
+        self.status = 0
+        self.valeur_objectif = None
+        self.valeurs = None
+        self.duales_egalite = None
+        self.duales_inegalite = None
+
+        # instance HiGHS persistante, créée lors de la première résolution
+        self.solver = donnees_entree.parametres_simulation.solver
+        self.highs = None
+
+    def mise_a_jour_second_membre(self, donnees_entree, compte_unites, donnees_dispatch, annee, donnees_couts_var, heure_debut, stock_depart, contraindre_stock = False, heure_contrainte = None, stock_contraint = None):
+        """
+        Met à jour les seconds membres et les bornes pour les adapter à la fenêtre horaire sur laquelle on veut
+        calculer le prochain dispatch partiel. Les paramètres sont les mêmes que pour
+        ProblemeDispatchPartiel.mise_a_jour_second_membre.
+        """
+
+        indicatrice = donnees_entree.parametres_simulation.indicatrice
+        nombre_heures = self.nombre_heures
+
+        # mise à jour de la première contrainte de continuité du stock avec le nouveau stock de départ
+        for actif_stockage in donnees_entree.actifs_stockage():
+
+            stock_depart_actif = stock_depart[actif_stockage.cle]
+            self.second_membre_egalite[self.contraintes_continuite_stock[actif_stockage.cle][0]] = stock_depart_actif
+
+            if indicatrice:
+                if compte_unites[actif_stockage.cle] > 0:
+                    taux_remplissage = stock_depart_actif / (actif_stockage.capacite * compte_unites[actif_stockage.cle])
+                else:
+                    taux_remplissage = 0
+                self.second_membre_egalite[self.contraintes_continuite_stock["indic_"+actif_stockage.cle][0]] = taux_remplissage * actif_stockage.duree
+
+        # mise à jour des bornes des puissances produites par les actifs ENR qui dépend de la météo
+        for actif_ENR in donnees_entree.actifs_ENR():
+            facteur_production = _serie_fenetre(donnees_dispatch["fc"], actif_ENR.cle+"_%d" % annee, heure_debut, nombre_heures)
+            self.borne_sup[self.puissance_produite[actif_ENR.cle]] = compte_unites[actif_ENR.cle] * actif_ENR.puissance_reference * facteur_production
+            if indicatrice:
+                self.borne_sup[self.puissance_produite["indic_"+actif_ENR.cle]] = facteur_production
+
+        # mise à jour des pmax pour les pilotables
+        for actif in donnees_entree.actifs_pilotables():
+            p_inst = actif.puissance_nominale * compte_unites[actif.cle]
+            col = actif.cle+"_%d" % annee
+            if col in donnees_dispatch["dispo"].columns:
+                self.borne_sup[self.puissance_produite[actif.cle]] = p_inst * _serie_fenetre(donnees_dispatch["dispo"], col, heure_debut, nombre_heures)
+            else:
+                self.borne_sup[self.puissance_produite[actif.cle]] = p_inst * (heure_debut + np.arange(nombre_heures) < 8760)
+
+        # mise à jour du second membre des contraintes de satisfaction de la demande, nul au delà de la fin de l'année
+        self.second_membre_egalite[self.liste_contraintes_satisfaction_demande] = _serie_fenetre(donnees_dispatch["demande"], "Annee_%d" % annee, heure_debut, nombre_heures)
+
+        # si une contrainte doit être imposée sur la valeur du stockage pour une des heures de la fenêtre,
+        # les bornes du stock sont "reserrées" à la même valeur
+        if contraindre_stock:
+            for actif_stockage in donnees_entree.actifs_stockage():
+                stock_contraint_actif = stock_contraint[actif_stockage.cle]
+                indice = self.stock[actif_stockage.cle][heure_contrainte - 1]
+                self.borne_inf[indice] = stock_contraint_actif
+                self.borne_sup[indice] = stock_contraint_actif
+
+                if indicatrice:
+                    if compte_unites[actif_stockage.cle] > 0:
+                        taux_contrainte = stock_contraint_actif / (actif_stockage.capacite * compte_unites[actif_stockage.cle])
+                    else:
+                        taux_contrainte = 0
+                    indice = self.stock["indic_"+actif_stockage.cle][heure_contrainte - 1]
+                    self.borne_inf[indice] = taux_contrainte * actif_stockage.duree
+                    self.borne_sup[indice] = taux_contrainte * actif_stockage.duree
+
+    def resoudre(self):
+        """
+        Résout le problème et enregistre la valeur de l'objectif, les valeurs des variables et les variables duales
+        des contraintes. Le statut est exprimé selon la convention de pulp.
+        """
+
+        if self.solver == "highs":
+            return self.resoudre_highs()
+
+        resultat = scipy.optimize.linprog(self.cout,
+                                          A_ub=self.matrice_inegalite,
+                                          b_ub=self.second_membre_inegalite,
+                                          A_eq=self.matrice_egalite,
+                                          b_eq=self.second_membre_egalite,
+                                          bounds=np.column_stack((self.borne_inf, self.borne_sup)),
+                                          method="highs")
+
+        if resultat.status != 0:
+            self.status = -1
+            return self.status
+
+        self.status = 1
+        self.valeur_objectif = resultat.fun
+        self.valeurs = resultat.x
+        self.duales_egalite = resultat.eqlin.marginals
+        if self.matrice_inegalite is not None:
+            self.duales_inegalite = resultat.ineqlin.marginals
+
+        return self.status
+
+    def resoudre_highs(self):
+        """
+        Résout le problème avec une instance HiGHS conservée d'une fenêtre à l'autre. Lors du premier appel, le
+        modèle complet est transmis au solveur ; lors des appels suivants, seules les bornes des variables et les
+        seconds membres des contraintes d'égalité sont mis à jour, ce qui permet à HiGHS de repartir de la base
+        optimale de la fenêtre précédente au lieu de résoudre le problème depuis le début.
+        """
+
+        # highspy n'est nécessaire que pour ce solveur, il n'est donc importé qu'ici
+        import highspy
+
+        nombre_lignes_egalite = self.matrice_egalite.shape[0]
+
+        if self.highs is None:
+
+            if self.matrice_inegalite is not None:
+                matrice = scipy.sparse.vstack([self.matrice_egalite, self.matrice_inegalite]).tocsc()
+                borne_inf_lignes = np.concatenate((self.second_membre_egalite, np.full(self.matrice_inegalite.shape[0], -np.inf)))
+                borne_sup_lignes = np.concatenate((self.second_membre_egalite, self.second_membre_inegalite))
+            else:
+                matrice = self.matrice_egalite.tocsc()
+                borne_inf_lignes = self.second_membre_egalite
+                borne_sup_lignes = self.second_membre_egalite
+
+            lp = highspy.HighsLp()
+            lp.num_col_ = self.nombre_variables
+            lp.num_row_ = matrice.shape[0]
+            lp.col_cost_ = self.cout
+            lp.col_lower_ = self.borne_inf
+            lp.col_upper_ = self.borne_sup
+            lp.row_lower_ = borne_inf_lignes
+            lp.row_upper_ = borne_sup_lignes
+            lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+            lp.a_matrix_.start_ = matrice.indptr
+            lp.a_matrix_.index_ = matrice.indices
+            lp.a_matrix_.value_ = matrice.data
+
+            self.highs = highspy.Highs()
+            self.highs.setOptionValue("output_flag", False)
+            self.highs.passModel(lp)
+
+        else:
+
+            indices_colonnes = np.arange(self.nombre_variables, dtype=np.int32)
+            self.highs.changeColsBounds(self.nombre_variables, indices_colonnes, self.borne_inf, self.borne_sup)
+            indices_lignes = np.arange(nombre_lignes_egalite, dtype=np.int32)
+            self.highs.changeRowsBounds(nombre_lignes_egalite, indices_lignes, self.second_membre_egalite, self.second_membre_egalite)
+
+        self.highs.run()
+
+        if self.highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            self.status = -1
+            return self.status
+
+        solution = self.highs.getSolution()
+        duales = np.array(solution.row_dual)
+
+        self.status = 1
+        self.valeur_objectif = self.highs.getInfo().objective_function_value
+        self.valeurs = np.array(solution.col_value)
+        self.duales_egalite = duales[:nombre_lignes_egalite]
+        if self.matrice_inegalite is not None:
+            self.duales_inegalite = duales[nombre_lignes_egalite:]
+
+        return self.status
+
+    def resultats_fenetre(self, donnees_entree):
+        """
+        Renvoie les valeurs des variables et les variables duales du problème résolu, dans le même format que
+        ProblemeDispatchPartiel.resultats_fenetre, en les extrayant des vecteurs de la solution.
+        """
+
+        valeurs = self.valeurs
+
+        resultats_fenetre = dict()
+        resultats_fenetre["cout"] = self.valeur_objectif
+        resultats_fenetre["production"] = {cle: valeurs[indices] for cle, indices in self.puissance_produite.items()}
+        resultats_fenetre["stock"] = {cle: valeurs[indices] for cle, indices in self.stock.items()}
+        resultats_fenetre["charge"] = {cle: valeurs[indices] for cle, indices in self.puissance_charge.items()}
+        resultats_fenetre["decharge"] = {cle: valeurs[indices] for cle, indices in self.puissance_decharge.items()}
+        resultats_fenetre["defaillance"] = valeurs[self.defaillance]
+        resultats_fenetre["cout_marginal"] = self.duales_egalite[self.liste_contraintes_satisfaction_demande]
+        resultats_fenetre["variable_duale_stockage"] = {cle: self.duales_inegalite[lignes] for cle, lignes in self.contraintes_max_stock.items()}
+        resultats_fenetre["puissance_disponible"] = dict()
+        for actif_ENR in donnees_entree.actifs_ENR():
+            resultats_fenetre["puissance_disponible"][actif_ENR.cle] = self.borne_sup[self.puissance_produite[actif_ENR.cle]]
+
+        return resultats_fenetre
+
+    def writeLP(self, chemin):
+        """
+        Sauvegarde les matrices, seconds membres et bornes du problème au format npz (le chemin donné est complété
+        par l'extension .npz).
+        """
+
+        donnees = dict(cout=self.cout,
+                       second_membre_egalite=self.second_membre_egalite,
+                       borne_inf=self.borne_inf,
+                       borne_sup=self.borne_sup)
+        matrice_egalite = self.matrice_egalite.tocoo()
+        donnees["egalite_lignes"] = matrice_egalite.row
+        donnees["egalite_colonnes"] = matrice_egalite.col
+        donnees["egalite_coefficients"] = matrice_egalite.data
+        if self.matrice_inegalite is not None:
+            matrice_inegalite = self.matrice_inegalite.tocoo()
+            donnees["second_membre_inegalite"] = self.second_membre_inegalite
+            donnees["inegalite_lignes"] = matrice_inegalite.row
+            donnees["inegalite_colonnes"] = matrice_inegalite.col
+            donnees["inegalite_coefficients"] = matrice_inegalite.data
+        np.savez(chemin, **donnees)
+
+
 class ResultatAnnuel:
     """
     Cette classe sythétise les informations résultant d'un calcul de dispatch annuel.
@@ -445,6 +909,10 @@ class ResultatAnnuel:
         météo pour laquelle le résultat a été calculé
     annee : int
         année pour laquelle le résultat a été calculé
+    revenus_unitaires_sans_CF : np.array
+        revenus hors contrat et hors coûts fixes d'une unité de chaque actif, dans l'ordre de
+        donnees_entree.tous_actifs(), calculés à la première demande par
+        IndicateursEconomiques.revenus_unitaires_sans_CF
     """
 
     def __init__(self,donnees_entree, cout_total, production, cout_marginal, stockage, charge, decharge, defaillance, ecretement, compte_unites,donnees_dispatch,donnees_couts_var,annee_courante,annee,variable_duale_stockage,demande):
@@ -473,15 +941,36 @@ class ResultatAnnuel:
         self.annee = annee
         self.donnees_dispatch = donnees_dispatch
         self.donnees_couts_var = donnees_couts_var
+
+        self.revenus_unitaires_sans_CF = None
           
-        # creation du dataframe
+        # creation du dataframe : celui des résultats horaires n'est construit qu'à sa première utilisation
         
-        self.build_df_data()
+        self._data_frame_resultat_annuel = None
         self.build_df_cv()
         
         
         if donnees_entree.parametres_simulation.filtre_propagation :
             self.filtre_cm()
+
+    def __getstate__(self):
+        # les données d'entrée et les chroniques de la météo ne sont pas transmises d'un processus à l'autre,
+        # le processus qui reçoit le résultat les rattache avec la méthode rattachement_donnees
+        etat = self.__dict__.copy()
+        etat["donnees_entree"] = None
+        etat["donnees_dispatch"] = None
+        etat["donnees_couts_var"] = None
+        return etat
+
+    def rattachement_donnees(self, donnees_entree, donnees_dispatch, donnees_couts_var):
+        """
+        Rattache au résultat les données d'entrée et les données de dispatch avec lesquelles il a été calculé,
+        lorsqu'il provient d'un autre processus.
+        """
+
+        self.donnees_entree = donnees_entree
+        self.donnees_dispatch = donnees_dispatch
+        self.donnees_couts_var = donnees_couts_var
         
     def production_unitaire(self, cle_actif):
         """
@@ -505,6 +994,12 @@ class ResultatAnnuel:
         # si le nombre d'unités est 0, on renvoie directement le vecteur de production qui devrait être uniformément nul
         return self.production[cle_actif]
 
+    @property
+    def data_frame_resultat_annuel(self):
+        if self._data_frame_resultat_annuel is None:
+            self.build_df_data()
+        return self._data_frame_resultat_annuel
+
     def build_df_data(self):
 
         data_frame_resultat_annuel = pd.DataFrame(index=range(8760))
@@ -532,7 +1027,7 @@ class ResultatAnnuel:
             data_frame_resultat_annuel["ecretement %s" % cle_actif] = ecretement_actif
 
     
-        self.data_frame_resultat_annuel = data_frame_resultat_annuel
+        self._data_frame_resultat_annuel = data_frame_resultat_annuel
     
         return None
 
@@ -647,6 +1142,123 @@ class ResultatAnnuel:
         
         return None
         
+def extraction_fenetre(resultats_fenetre, donnees_entree, heure_debut, heure_fin, production, stockage, charge, decharge, defaillance, ecretement, cout_marginal, variable_duale_stockage):
+    """
+    Recopie dans les tableaux annuels les résultats d'une fenêtre renvoyés par la méthode resultats_fenetre du
+    problème de dispatch partiel, les heures [heure_debut, heure_fin[ étant écrites par tranches.
+    """
+
+    nombre_heures_fenetre = heure_fin - heure_debut
+    # le stock et sa variable duale sont enregistrés à l'heure suivante, dans la limite de l'année
+    nombre_heures_stock = min(heure_fin, 8759) - heure_debut
+
+    # enregistrement de la production des actifs hors stockage
+    for cle_actif, production_fenetre in resultats_fenetre["production"].items():
+        production[cle_actif][heure_debut:heure_fin] = production_fenetre[:nombre_heures_fenetre]
+
+    # enregistrement des valeurs du stockage, charge et décharge des actifs de stockage
+    for actif_stockage in donnees_entree.actifs_stockage():
+        stockage[actif_stockage.cle][heure_debut+1:heure_debut+1+nombre_heures_stock] = resultats_fenetre["stock"][actif_stockage.cle][:nombre_heures_stock]
+        variable_duale_stockage[actif_stockage.cle][heure_debut+1:heure_debut+1+nombre_heures_stock] = resultats_fenetre["variable_duale_stockage"][actif_stockage.cle][:nombre_heures_stock]
+
+    for cle_actif, decharge_fenetre in resultats_fenetre["decharge"].items():
+        production[cle_actif][heure_debut:heure_fin] = decharge_fenetre[:nombre_heures_fenetre]
+        decharge[cle_actif][heure_debut:heure_fin] = decharge_fenetre[:nombre_heures_fenetre]
+
+    for cle_actif, charge_fenetre in resultats_fenetre["charge"].items():
+        charge[cle_actif][heure_debut:heure_fin] = charge_fenetre[:nombre_heures_fenetre]
+
+    # enregistrement des coûts marginaux d'après les variables duales de la contrainte de satisfaction de la demande
+    cout_marginal[heure_debut:heure_fin] = resultats_fenetre["cout_marginal"][:nombre_heures_fenetre]
+
+    # enregistrement de la défaillance
+    defaillance[heure_debut:heure_fin] = resultats_fenetre["defaillance"][:nombre_heures_fenetre]
+
+    # enregistrement des valeurs de l'écrêtement
+    for cle_actif, puissance_disponible in resultats_fenetre["puissance_disponible"].items():
+        ecretement[cle_actif][heure_debut:heure_fin] = puissance_disponible[:nombre_heures_fenetre] - resultats_fenetre["production"][cle_actif][:nombre_heures_fenetre]
+
+
+def DispatchAnnuelOrdreMerite(donnees_entree, compte_unites, donnees_dispatch, donnees_couts_var, annee_courante, annee):
+    """
+    Calcule le dispatch annuel par empilement des coûts variables (ordre de mérite), sans résoudre de problème
+    linéaire, et renvoie le résultat annuel correspondant.
+
+    Lorsque le parc ne comporte aucune unité de stockage et que les indicatrices ne sont pas utilisées, les heures de
+    l'année sont indépendantes et le problème de dispatch de chaque heure consiste à appeler les actifs par coûts
+    variables croissants jusqu'à satisfaire la demande. Les 8760 heures sont traitées simultanément : la production
+    de chaque actif est la part de la demande résiduelle qu'il peut couvrir, le coût marginal est le coût variable du
+    dernier actif appelé, ou le plafond de prix en cas de défaillance. Les paramètres sont les mêmes que pour
+    DispatchAnnuel.
+
+    Retours
+    -------
+    ResultatAnnuel
+        résultat de dispatch annuel
+    """
+
+    dict_cout_var = couts_variables_actifs_hors_stockage(donnees_entree, donnees_couts_var, annee)
+    liste_actifs = list(donnees_entree.actifs_hors_stockage())
+    cles_actifs_ENR = [actif_ENR.cle for actif_ENR in donnees_entree.actifs_ENR()]
+    demande = donnees_dispatch["demande"]["Annee_%d"%annee]
+    tableau_demande = _serie_fenetre(donnees_dispatch["demande"], "Annee_%d"%annee, 0, 8760)
+
+    # puissance disponible de chaque actif à chaque heure (heures en lignes, actifs en colonnes)
+    puissance_disponible = np.zeros((8760, len(liste_actifs)))
+    for indice_actif, actif in enumerate(liste_actifs):
+        col = actif.cle+"_%d"%annee
+        if actif.cle in cles_actifs_ENR:
+            puissance_disponible[:, indice_actif] = compte_unites[actif.cle] * actif.puissance_reference * _serie_fenetre(donnees_dispatch["fc"], col, 0, 8760)
+        elif col in donnees_dispatch["dispo"].columns:
+            puissance_disponible[:, indice_actif] = actif.puissance_nominale * compte_unites[actif.cle] * _serie_fenetre(donnees_dispatch["dispo"], col, 0, 8760)
+        else:
+            puissance_disponible[:, indice_actif] = actif.puissance_nominale * compte_unites[actif.cle]
+
+    # empilement des actifs par coûts variables croissants
+    couts_variables = np.array([dict_cout_var[actif.cle] for actif in liste_actifs], dtype=float)
+    ordre_merite = np.argsort(couts_variables, kind="stable")
+    puissance_disponible_triee = puissance_disponible[:, ordre_merite]
+    puissance_cumulee = np.cumsum(puissance_disponible_triee, axis=1)
+
+    production_triee = np.clip(tableau_demande[:, None] - (puissance_cumulee - puissance_disponible_triee), 0, puissance_disponible_triee)
+    defaillance = np.maximum(tableau_demande - puissance_cumulee[:, -1], 0) if len(liste_actifs) > 0 else tableau_demande.copy()
+
+    # le coût marginal est celui du premier actif dont la puissance cumulée couvre la demande
+    cout_marginal = np.full(8760, donnees_entree.parametres_simulation.plafond_prix, dtype=float)
+    if len(liste_actifs) > 0:
+        demande_couverte = puissance_cumulee >= tableau_demande[:, None]
+        heures_couvertes = demande_couverte.any(axis=1)
+        indice_marginal = demande_couverte.argmax(axis=1)
+        cout_marginal[heures_couvertes] = couts_variables[ordre_merite][indice_marginal[heures_couvertes]]
+
+    # structures identiques à celles renvoyées par DispatchAnnuel
+    production = dict()
+    for actif in donnees_entree.tous_actifs():
+        production[actif.cle] = np.zeros(8760)
+    ecretement = dict()
+    for position, indice_actif in enumerate(ordre_merite):
+        actif = liste_actifs[indice_actif]
+        production[actif.cle] = production_triee[:, position].copy()
+        if actif.cle in cles_actifs_ENR:
+            ecretement[actif.cle] = puissance_disponible[:, indice_actif] - production[actif.cle]
+
+    stockage = dict()
+    charge = dict()
+    decharge = dict()
+    variable_duale_stockage = dict()
+    for actif_stockage in donnees_entree.actifs_stockage():
+        stockage[actif_stockage.cle] = np.zeros(8760)
+        charge[actif_stockage.cle] = np.zeros(8760)
+        decharge[actif_stockage.cle] = np.zeros(8760)
+        variable_duale_stockage[actif_stockage.cle] = np.zeros(8760)
+
+    cout_total = np.sum(production_triee * couts_variables[ordre_merite]) + donnees_entree.parametres_simulation.plafond_prix * np.sum(defaillance)
+
+    resultat_annuel = ResultatAnnuel(donnees_entree,cout_total, production, cout_marginal, stockage, charge, decharge, defaillance, ecretement, compte_unites, donnees_dispatch,donnees_couts_var,annee_courante,annee,variable_duale_stockage,demande)
+
+    return resultat_annuel
+
+
 def DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_couts_var,annee_courante,annee,writeLP ,LP_name):
     """
     Calcule le dispatch annuel et renvoie le résultat annuel correspondant.
@@ -669,6 +1281,11 @@ def DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_cout
     """
 
 
+    # sans stockage ni indicatrices, les heures sont indépendantes et le dispatch est obtenu par ordre de mérite
+    if donnees_entree.parametres_simulation.dispatch_ordre_merite and not donnees_entree.parametres_simulation.indicatrice :
+        if all(compte_unites[actif_stockage.cle] == 0 for actif_stockage in donnees_entree.actifs_stockage()) :
+            return DispatchAnnuelOrdreMerite(donnees_entree, compte_unites, donnees_dispatch, donnees_couts_var, annee_courante, annee)
+
     fenetre_optimisation = donnees_entree.parametres_optimisation.fenetre_optimisation
     vision_supplementaire = donnees_entree.parametres_optimisation.vision_supplementaire
     nombre_optimisations_partielles = 8760//fenetre_optimisation
@@ -713,7 +1330,13 @@ def DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_cout
     # initialisation de l'instance de problème d'optimisation qui sera mise à jour et réutilisée à chaque étape
     # (la création de problème et l'ajout de contraintes étant couteux en temps, réutiliser la même instance
     # en changeant le second membre est avantageux)
-    probleme_dispatch_partiel = ProblemeDispatchPartiel(donnees_entree, compte_unites,  donnees_dispatch, annee,donnees_couts_var, fenetre_optimisation + vision_supplementaire)
+    # le problème peut être construit variable par variable avec pulp ou directement sous forme matricielle
+    # le solveur HiGHS persistant nécessite le problème sous forme matricielle
+    modele_matriciel = (donnees_entree.parametres_simulation.modele_dispatch == "matriciel" or donnees_entree.parametres_simulation.solver == "highs")
+    if modele_matriciel :
+        probleme_dispatch_partiel = ProblemeDispatchPartielMatriciel(donnees_entree, compte_unites,  donnees_dispatch, annee,donnees_couts_var, fenetre_optimisation + vision_supplementaire)
+    else :
+        probleme_dispatch_partiel = ProblemeDispatchPartiel(donnees_entree, compte_unites,  donnees_dispatch, annee,donnees_couts_var, fenetre_optimisation + vision_supplementaire)
 
     # variable utilisée pour assurer la continuité de la quantité d'énergie stockée d'une fenêtre à l'autre
     stock_depart = dict()
@@ -744,15 +1367,19 @@ def DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_cout
         # résolution
 
        
+        if modele_matriciel :
+            probleme_dispatch_partiel.resoudre()
+
+        else :
         
-        if donnees_entree.parametres_simulation.solver == "cplex" : 
-            solver = pulp.CPLEX_CMD(path=donnees_entree.parametres_simulation.solver_path)
-       
-        if donnees_entree.parametres_simulation.solver == "glpk" : 
-            solver = pulp.GLPK_CMD(path=donnees_entree.parametres_simulation.solver_path,msg=0)       
+            if donnees_entree.parametres_simulation.solver == "cplex" : 
+                solver = pulp.CPLEX_CMD(path=donnees_entree.parametres_simulation.solver_path)
+           
+            if donnees_entree.parametres_simulation.solver == "glpk" : 
+                solver = pulp.GLPK_CMD(path=donnees_entree.parametres_simulation.solver_path,msg=0)       
 
-    
-        probleme_dispatch_partiel.solve(solver)
+        
+            probleme_dispatch_partiel.solve(solver)
 
 
  
@@ -775,63 +1402,10 @@ def DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_cout
             sys.exit()
         
         
-        # ajout de la valeur objectif au cout total
-        cout_total += pulp.value(probleme_dispatch_partiel.objective)
-
-        # enregistrement de la production des actifs hors stockage
-        for actif in donnees_entree.actifs_hors_stockage():
-            production_actif = production[actif.cle]
-            variables_puissance_produite_actif = probleme_dispatch_partiel.puissance_produite[actif.cle]
-            for heure in range(heure_debut, heure_fin):
-                heure_etape = heure - heure_debut
-                production_actif[heure] = variables_puissance_produite_actif[heure_etape].value()
-                if donnees_entree.parametres_simulation.indicatrice :  
-                    production["indic_"+actif.cle][heure] = probleme_dispatch_partiel.puissance_produite["indic_"+actif.cle][heure_etape].value()
-        
-        # enregistrement des valeurs du stockage, charge et décharge des actifs de stockage
-        for actif_stockage in donnees_entree.actifs_stockage():
-            stockage_actif = stockage[actif_stockage.cle]
-            production_actif = production[actif_stockage.cle]
-            charge_actif = charge[actif_stockage.cle]
-            decharge_actif = decharge[actif_stockage.cle]
-            variables_puissance_charge_actif = probleme_dispatch_partiel.puissance_charge[actif_stockage.cle]
-            variables_puissance_decharge_actif = probleme_dispatch_partiel.puissance_decharge[actif_stockage.cle]
-            variables_stock_actif = probleme_dispatch_partiel.stock[actif_stockage.cle]
-            for heure in range(heure_debut, heure_fin):
-                heure_etape = heure-heure_debut
-                if(heure + 1 < 8760):
-                    stockage_actif[heure + 1] = variables_stock_actif[heure_etape+1].value()
-                    variable_duale_stockage[actif_stockage.cle][heure+1] =  probleme_dispatch_partiel.contraintes_max_stock[actif_stockage.cle][heure_etape].pi
-                    
-                production_actif[heure] = variables_puissance_decharge_actif[heure_etape].value()
-                charge_actif[heure] = variables_puissance_charge_actif[heure_etape].value()
-                decharge_actif[heure] = variables_puissance_decharge_actif[heure_etape].value()
-                
-          
-                # indicatrices
-                if donnees_entree.parametres_simulation.indicatrice :  
-                    production["indic_"+actif_stockage.cle][heure] = probleme_dispatch_partiel.puissance_decharge["indic_"+actif_stockage.cle][heure_etape].value()
-                    decharge["indic_"+actif_stockage.cle][heure] = probleme_dispatch_partiel.puissance_decharge["indic_"+actif_stockage.cle][heure_etape].value()
-                    charge["indic_"+actif_stockage.cle][heure] = probleme_dispatch_partiel.puissance_charge["indic_"+actif_stockage.cle][heure_etape].value()
-                
-        # enregistrement des coûts marginaux d'après les variables duales de la contrainte de satisfaction de la demande
-        for heure in range(heure_debut, heure_fin):
-            heure_etape = heure - heure_debut
-            cout_marginal[heure] = probleme_dispatch_partiel.liste_contraintes_satisfaction_demande[heure_etape].pi
-
-        # enregistrement de la défaillance
-        for heure in range(heure_debut, heure_fin):
-            heure_etape = heure - heure_debut
-            defaillance[heure] = probleme_dispatch_partiel.defaillance[heure_etape].value()
-
-        # enregistrement des valeurs de l'écrêtement
-        for actif_ENR in donnees_entree.actifs_ENR():
-            puissance_produite_actif = probleme_dispatch_partiel.puissance_produite[actif_ENR.cle]
-            ecretement_actif = ecretement[actif_ENR.cle]
-            for heure in range(heure_debut, heure_fin):
-                heure_etape = heure - heure_debut
-                puissance_produite_actif_heure = puissance_produite_actif[heure_etape]
-                ecretement_actif[heure] = puissance_produite_actif_heure.getUb() - puissance_produite_actif_heure.value()
+        # ajout de la valeur objectif au cout total et enregistrement des résultats de la fenêtre
+        resultats_fenetre = probleme_dispatch_partiel.resultats_fenetre(donnees_entree)
+        cout_total += resultats_fenetre["cout"]
+        extraction_fenetre(resultats_fenetre, donnees_entree, heure_debut, heure_fin, production, stockage, charge, decharge, defaillance, ecretement, cout_marginal, variable_duale_stockage)
 
         # mise à jour de la variable de stock de départ pour l'étape suivante
         if (heure_debut + fenetre_optimisation < 8760):
@@ -899,3 +1473,242 @@ class ThreadDispatchAnnuel(Thread):
         """
 
         self.resultat_annuel = DispatchAnnuel(self.donnees_entree, self.compte_unites, self.donnees_dispatch, self.donnees_couts_var,self.annee_courante, self.annee,self.writeLP ,self.LP_name)
+
+
+
+# données d'entrée des processus de calcul de dispatch, transmises une seule fois à la création de chaque processus
+_donnees_entree_processus = None
+
+
+def _initialisation_processus_dispatch(donnees_entree):
+    global _donnees_entree_processus
+    _donnees_entree_processus = donnees_entree
+
+
+# pool de processus de calcul de dispatch ouvert pour toute une simulation et données d'entrée qui lui ont été
+# transmises, None si aucun pool n'est ouvert
+_pool_dispatch = None
+_donnees_entree_pool_dispatch = None
+
+
+def _nombre_processus_dispatch(donnees_entree):
+    nb_processus = donnees_entree.parametres_simulation.nb_processus_dispatch
+    if nb_processus <= 0:
+        nb_processus = os.cpu_count()
+    return nb_processus
+
+
+def ouverture_pool_dispatch(donnees_entree):
+    """
+    Ouvre le pool de processus utilisé par lancement_dispatchs_annuels pour toute la durée d'une simulation, afin de
+    ne créer les processus et de ne leur transmettre les données d'entrée qu'une seule fois. Les données d'entrée
+    utilisées par les dispatchs ne doivent donc plus être modifiées tant que le pool est ouvert. Aucun pool n'est
+    ouvert si nb_processus_dispatch vaut 1.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser pour les dispatchs
+    """
+
+    global _pool_dispatch, _donnees_entree_pool_dispatch
+
+    fermeture_pool_dispatch()
+
+    nb_processus = _nombre_processus_dispatch(donnees_entree)
+    if nb_processus > 1:
+        _pool_dispatch = ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialisation_processus_dispatch, initargs=(donnees_entree,))
+        _donnees_entree_pool_dispatch = donnees_entree
+
+
+def fermeture_pool_dispatch():
+    """
+    Ferme le pool de processus ouvert par ouverture_pool_dispatch, s'il y en a un.
+    """
+
+    global _pool_dispatch, _donnees_entree_pool_dispatch
+
+    if _pool_dispatch is not None:
+        _pool_dispatch.shutdown()
+    _pool_dispatch = None
+    _donnees_entree_pool_dispatch = None
+
+
+def donnees_tache_dispatch(donnees_entree, ambiance, annee_courante, indice_meteo):
+    """
+    Renvoie les données de dispatch (demande, facteurs de production, disponibilités) et les coûts variables à utiliser
+    pour une ambiance et une météo. Si ambiance vaut None, les données de l'ambiance réalisée sont renvoyées.
+    """
+
+    if ambiance is None:
+        donnees_annee = donnees_entree.realisation
+    else:
+        donnees_annee = donnees_entree.ambiances[ambiance][annee_courante]
+
+    return donnees_annee["meteo_%d" % indice_meteo], donnees_annee["couts_combustibles"]
+
+
+def _calcul_tache_dispatch(tache, donnees_entree=None):
+    if donnees_entree is None:
+        donnees_entree = _donnees_entree_processus
+    ambiance, annee_courante, indice_meteo, compte_unites, annee, writeLP, LP_name = tache
+    donnees_dispatch, donnees_couts_var = donnees_tache_dispatch(donnees_entree, ambiance, annee_courante, indice_meteo)
+    return DispatchAnnuel(donnees_entree, compte_unites, donnees_dispatch, donnees_couts_var, annee_courante, annee, writeLP, LP_name)
+
+
+class CacheResultatsAnnuels:
+    """
+    Cette classe mémorise les résultats de dispatch annuels calculés au cours d'une année de simulation.
+
+    Un résultat est identifié par l'ambiance, l'année courante (qui détermine les données de dispatch et de coûts
+    utilisées), la météo, l'année anticipée et le nombre d'unités de chaque actif. Lorsqu'un résultat est demandé pour
+    une nouvelle année courante, le cache est vidé. Au delà de taille_max résultats, les moins récemment utilisés
+    sont supprimés.
+
+    Attributs
+    ---------
+    annee_courante : int
+        année courante des résultats présents dans le cache
+    resultats : collections.OrderedDict
+        résultats mémorisés, du moins récemment utilisé au plus récemment utilisé
+    nombre_recherches : int
+        nombre de résultats demandés au cache
+    nombre_succes : int
+        nombre de résultats trouvés dans le cache
+    """
+
+    def __init__(self):
+        self.annee_courante = None
+        self.resultats = OrderedDict()
+        self.nombre_recherches = 0
+        self.nombre_succes = 0
+
+    @staticmethod
+    def cle(tache):
+        """
+        Renvoie la clé identifiant le résultat de la tâche de dispatch tache.
+        """
+
+        ambiance, annee_courante, indice_meteo, compte_unites, annee = tache[:5]
+        compte_unites_trie = tuple(sorted((cle_actif, float(nombre_unites)) for cle_actif, nombre_unites in compte_unites.items()))
+        return (ambiance, annee_courante, indice_meteo, annee, compte_unites_trie)
+
+    def recherche(self, cle):
+        """
+        Renvoie le résultat correspondant à la clé s'il est présent dans le cache, None sinon.
+        """
+
+        annee_courante = cle[1]
+        if annee_courante != self.annee_courante:
+            self.vidage()
+            self.annee_courante = annee_courante
+
+        self.nombre_recherches += 1
+        resultat_annuel = self.resultats.get(cle)
+        if resultat_annuel is not None:
+            self.nombre_succes += 1
+            self.resultats.move_to_end(cle)
+        return resultat_annuel
+
+    def enregistrement(self, cle, resultat_annuel, taille_max):
+        """
+        Ajoute un résultat au cache, en supprimant si besoin les résultats les moins récemment utilisés pour ne pas
+        dépasser taille_max résultats (pas de limite si taille_max est nul).
+        """
+
+        self.resultats[cle] = resultat_annuel
+        self.resultats.move_to_end(cle)
+        if taille_max > 0:
+            while len(self.resultats) > taille_max:
+                self.resultats.popitem(last=False)
+
+    def vidage(self):
+        """
+        Supprime tous les résultats du cache.
+        """
+
+        self.resultats.clear()
+
+
+# cache des résultats de dispatch de l'année courante, partagé par toutes les séquences du processus principal
+cache_resultats_annuels = CacheResultatsAnnuels()
+
+
+def lancement_dispatchs_annuels(donnees_entree, liste_taches):
+    """
+    Calcule les dispatchs annuels décrits par liste_taches sur un ensemble borné de processus et renvoie les résultats
+    dans le même ordre que les tâches.
+
+    Le nombre de processus est donné par le paramètre nb_processus_dispatch (0 pour utiliser tous les coeurs
+    disponibles). Les données d'entrée ne sont transmises qu'une fois à chaque processus, chaque tâche ne contient que
+    la description du dispatch à effectuer et les résultats sont renvoyés sans les données d'entrée, qui leur sont
+    rattachées à la réception. Avec un seul processus, les dispatchs sont calculés successivement dans le processus
+    courant.
+
+    Le pool ouvert par ouverture_pool_dispatch pour ces données d'entrée est utilisé s'il y en a un ; sinon un pool
+    est créé le temps de l'appel.
+
+    Si le paramètre cache_dispatch est activé, les résultats déjà calculés au cours de l'année courante pour la même
+    ambiance, la même météo, la même année et le même nombre d'unités de chaque actif sont repris du cache au lieu
+    d'être recalculés, de même que les tâches identiques au sein d'un même appel ne sont calculées qu'une fois.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser pour les dispatchs
+    liste_taches : list
+        liste de tuples (ambiance, annee_courante, indice_meteo, compte_unites, annee, writeLP, LP_name), ambiance
+        valant None pour un dispatch sur l'ambiance réalisée
+
+    Retours
+    -------
+    list
+        liste des instances de ResultatAnnuel correspondant aux tâches
+    """
+
+    utilisation_cache = donnees_entree.parametres_simulation.cache_dispatch
+
+    if not utilisation_cache:
+        return _calcul_taches_dispatch(donnees_entree, liste_taches)
+
+    # recherche des résultats déjà disponibles, les tâches identiques ne sont calculées qu'une fois
+    dict_resultats_annuels = dict()
+    liste_taches_a_calculer = []
+    for tache in liste_taches:
+        cle = CacheResultatsAnnuels.cle(tache)
+        if cle in dict_resultats_annuels:
+            continue
+        resultat_annuel = cache_resultats_annuels.recherche(cle)
+        dict_resultats_annuels[cle] = resultat_annuel
+        if resultat_annuel is None:
+            liste_taches_a_calculer.append(tache)
+
+    liste_resultats_calcules = _calcul_taches_dispatch(donnees_entree, liste_taches_a_calculer)
+
+    for tache, resultat_annuel in zip(liste_taches_a_calculer, liste_resultats_calcules):
+        cle = CacheResultatsAnnuels.cle(tache)
+        dict_resultats_annuels[cle] = resultat_annuel
+        cache_resultats_annuels.enregistrement(cle, resultat_annuel, donnees_entree.parametres_simulation.taille_cache_dispatch)
+
+    return [dict_resultats_annuels[CacheResultatsAnnuels.cle(tache)] for tache in liste_taches]
+
+
+def _calcul_taches_dispatch(donnees_entree, liste_taches):
+
+    nb_processus = min(_nombre_processus_dispatch(donnees_entree), len(liste_taches))
+
+    if nb_processus <= 1:
+        return [_calcul_tache_dispatch(tache, donnees_entree) for tache in liste_taches]
+
+    if _pool_dispatch is not None and _donnees_entree_pool_dispatch is donnees_entree:
+        liste_resultats_annuels = list(_pool_dispatch.map(_calcul_tache_dispatch, liste_taches))
+    else:
+        with ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialisation_processus_dispatch, initargs=(donnees_entree,)) as executeur:
+            liste_resultats_annuels = list(executeur.map(_calcul_tache_dispatch, liste_taches))
+
+    for tache, resultat_annuel in zip(liste_taches, liste_resultats_annuels):
+        ambiance, annee_courante, indice_meteo = tache[:3]
+        donnees_dispatch, donnees_couts_var = donnees_tache_dispatch(donnees_entree, ambiance, annee_courante, indice_meteo)
+        resultat_annuel.rattachement_donnees(donnees_entree, donnees_dispatch, donnees_couts_var)
+
+    return liste_resultats_annuels
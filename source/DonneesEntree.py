@@ -5,6 +5,9 @@ import numpy as np
 import pandas as pd
 import sys
 import os
+import collections
+import threading
+from collections.abc import Mapping
 
 import Lecture
 import DonneesSimulation
@@ -536,6 +539,198 @@ class Ambiance:
 
 # #### CLASSE DE DONNEES D'ENTREE ####
 
+class MagasinAmbiances(Mapping):
+    """
+    Cette classe donne accès aux chroniques des ambiances (coûts des combustibles, demande, facteurs de production
+    ENR et disponibilités des actifs pilotables) en ne les lisant qu'à la première demande.
+
+    Le magasin se consulte comme le dictionnaire indexé par [ambiance][annee] que construisait la lecture des
+    données : magasin[ambiance][annee]["couts_combustibles"] renvoie le DataFrame des coûts et
+    magasin[ambiance][annee]["meteo_%d" % indice_meteo] le dictionnaire des DataFrame "demande", "fc" et "dispo".
+    Chaque tranche (ambiance, année, météo), ou (ambiance, année) pour les coûts, est lue par
+    Lecture.lecture_tranche_ambiance lors de son premier accès. Lorsque la mémoire occupée par les tranches lues
+    dépasse memoire_max, les tranches les moins récemment utilisées sont oubliées et seront relues au besoin. Sauf
+    après un chargement complet, les tranches lues ne sont pas transmises lorsque le magasin est copié vers un autre
+    processus.
+
+    Attributs
+    ---------
+    noms_ambiances : list
+        noms des ambiances, dans l'ordre de lecture des dossiers
+    nombre_annees : int
+        nombre d'années de chaque ambiance
+    nb_meteo : int
+        nombre de météos de chaque année
+    chemin_dossier : str
+        chemin du dossier de données d'entrée
+    dossier_cache : str
+        dossier du cache de lecture, None pour lire les fichiers sans cache
+    memoire_max : float
+        mémoire maximale occupée par les tranches lues, en octets, 0 pour ne pas limiter la mémoire
+    tranches : collections.OrderedDict
+        tranches lues, de la moins récemment utilisée à la plus récemment utilisée
+    memoire_tranches : dict
+        mémoire occupée par chaque tranche lue, en octets
+    memoire_totale : float
+        mémoire occupée par l'ensemble des tranches lues, en octets
+    complet : bool
+        vaut True si toutes les tranches ont été lues par chargement_complet
+
+    Méthodes
+    --------
+    tranche(self, ambiance, annee, cle)
+        Renvoie la tranche demandée, en la lisant si nécessaire.
+    chargement_complet(self)
+        Lit toutes les tranches des ambiances.
+    """
+
+    def __init__(self, noms_ambiances, nombre_annees, nb_meteo, chemin_dossier, dossier_cache, memoire_max=0):
+        self.noms_ambiances = list(noms_ambiances)
+        self.nombre_annees = nombre_annees
+        self.nb_meteo = nb_meteo
+        self.chemin_dossier = chemin_dossier
+        self.dossier_cache = dossier_cache
+        self.memoire_max = memoire_max
+        self.tranches = collections.OrderedDict()
+        self.memoire_tranches = dict()
+        self.memoire_totale = 0
+        self.complet = False
+        self.verrou = threading.Lock()
+
+    def __getstate__(self):
+        # les tranches lues ne sont pas transmises, sauf après un chargement complet, le processus destinataire relit
+        # les tranches au besoin
+        etat = self.__dict__.copy()
+        etat["verrou"] = None
+        if self.complet:
+            return etat
+        etat["tranches"] = collections.OrderedDict()
+        etat["memoire_tranches"] = dict()
+        etat["memoire_totale"] = 0
+        return etat
+
+    def __setstate__(self, etat):
+        self.__dict__.update(etat)
+        self.verrou = threading.Lock()
+
+    def __getitem__(self, ambiance):
+        if ambiance not in self.noms_ambiances:
+            raise KeyError(ambiance)
+        return VueAmbiance(self, ambiance)
+
+    def __iter__(self):
+        return iter(self.noms_ambiances)
+
+    def __len__(self):
+        return len(self.noms_ambiances)
+
+    def tranche(self, ambiance, annee, cle):
+        """
+        Renvoie la tranche demandée, en la lisant si elle n'a pas encore été lue ou a été oubliée.
+
+        Paramètres
+        ----------
+        ambiance : str
+            nom de l'ambiance
+        annee : int
+            année de l'ambiance
+        cle : str
+            "couts_combustibles" ou "meteo_%d"
+
+        Retours
+        -------
+        pandas.DataFrame ou dict
+            DataFrame des coûts, ou dictionnaire des DataFrame "demande", "fc" et "dispo" de la météo
+        """
+
+        cle_tranche = (ambiance, annee, cle)
+
+        with self.verrou:
+            if cle_tranche in self.tranches:
+                self.tranches.move_to_end(cle_tranche)
+                return self.tranches[cle_tranche]
+
+        valeur = Lecture.lecture_tranche_ambiance(self.chemin_dossier, self.dossier_cache, ambiance, annee, cle)
+
+        if isinstance(valeur, dict):
+            memoire = sum(data_frame.memory_usage(index=True).sum() for data_frame in valeur.values())
+        else:
+            memoire = valeur.memory_usage(index=True).sum()
+
+        with self.verrou:
+            if cle_tranche not in self.tranches:
+                self.tranches[cle_tranche] = valeur
+                self.memoire_tranches[cle_tranche] = memoire
+                self.memoire_totale += memoire
+
+            # oubli des tranches les moins récemment utilisées, la tranche demandée étant conservée
+            while self.memoire_max > 0 and self.memoire_totale > self.memoire_max and len(self.tranches) > 1:
+                cle_oubliee, valeur_oubliee = self.tranches.popitem(last=False)
+                self.memoire_totale -= self.memoire_tranches.pop(cle_oubliee)
+
+            self.tranches.move_to_end(cle_tranche)
+            return self.tranches[cle_tranche]
+
+    def chargement_complet(self):
+        """
+        Lit toutes les tranches des ambiances, comme le faisait la lecture non paresseuse des données.
+        """
+
+        for ambiance in self.noms_ambiances:
+            for annee in range(self.nombre_annees):
+                self.tranche(ambiance, annee, "couts_combustibles")
+                for indice_meteo in range(self.nb_meteo):
+                    self.tranche(ambiance, annee, "meteo_%d" % indice_meteo)
+
+        self.complet = True
+
+
+class VueAmbiance(Mapping):
+    """
+    Vue d'une ambiance de MagasinAmbiances, indexée par année.
+    """
+
+    def __init__(self, magasin, ambiance):
+        self.magasin = magasin
+        self.ambiance = ambiance
+
+    def __getitem__(self, annee):
+        if not (isinstance(annee, (int, np.integer)) and 0 <= annee < self.magasin.nombre_annees):
+            raise KeyError(annee)
+        return VueAnneeAmbiance(self.magasin, self.ambiance, int(annee))
+
+    def __iter__(self):
+        return iter(range(self.magasin.nombre_annees))
+
+    def __len__(self):
+        return self.magasin.nombre_annees
+
+
+class VueAnneeAmbiance(Mapping):
+    """
+    Vue d'une année d'une ambiance de MagasinAmbiances, indexée par "couts_combustibles" et "meteo_%d".
+    """
+
+    def __init__(self, magasin, ambiance, annee):
+        self.magasin = magasin
+        self.ambiance = ambiance
+        self.annee = annee
+
+    def cles(self):
+        return ["couts_combustibles"] + ["meteo_%d" % indice_meteo for indice_meteo in range(self.magasin.nb_meteo)]
+
+    def __getitem__(self, cle):
+        if cle not in self.cles():
+            raise KeyError(cle)
+        return self.magasin.tranche(self.ambiance, self.annee, cle)
+
+    def __iter__(self):
+        return iter(self.cles())
+
+    def __len__(self):
+        return len(self.cles())
+
+
 class DonneesEntree:
     """
     Cette classe regroupe les données résultant de la lecture des fichiers d'entrée.
@@ -563,6 +758,9 @@ class DonneesEntree:
         paramètres d'appels d'offres
     mix_cible : dict
         dictionnaire contenant, pour chaque actif, le tableau annuel du nombre d'unités cible
+    facteurs_charge_mecapa : dict
+        table des facteurs de charge du mécanisme de capacité indexée par année puis par clé d'actif, remplie à la 
+        première demande de chaque année
     """
 
     def __init__(self, dict_actifs_pilotables, dict_actifs_ENR, dict_actifs_stockage, ambiances, realisation, parametres_optimisation, parametres_simulation, df_parametres_ponderation):
@@ -582,6 +780,7 @@ class DonneesEntree:
         # initialisation des paramètres facultatifs pour le mécanisme de capacité
         self.parametres_mecanisme_capacite = None
         self.capacite_cible = dict()
+        self.facteurs_charge_mecapa = dict()
 
     def trouve_actif(self, cle_actif):
         """
@@ -729,60 +928,52 @@ class DonneesEntree:
         """
 
         df_parc = parc.get_df_nb_unites()
+        horizon_simulation = self.parametres_simulation.horizon_simulation
+        liste_actifs = list(self.tous_actifs())
+        cles_actifs = [actif.cle for actif in liste_actifs]
+
+        # tableaux indexés par [annee][actif]
+        nb_unites_parc = df_parc[cles_actifs].values
+
+        # types d'actifs concernés par les ajustements de l'année cible et par le rythme de déclassement borné par le
+        # parc réel
+        ajoutable_seul = np.array([actif.ajoutable and not actif.demantelable for actif in liste_actifs], dtype=bool)
+        demantelable_seul = np.array([actif.demantelable and not actif.ajoutable for actif in liste_actifs], dtype=bool)
                           
         dico_df_nb_unites_ambiances = {}
         
         for ambiance in self.ambiances :
-        
-            df_nb_unites = pd.DataFrame()
             
             parc_ambiance = dico_parcs_anticipes_boucle[ambiance]
             
             df_parc_ambiance = parc_ambiance.get_df_nb_unites()
-            df_rythme_parc_ambiance = df_parc_ambiance.diff().fillna(df_parc_ambiance)
-            
-            df_diff = df_parc_ambiance - df_parc
+            nb_unites_parc_ambiance = df_parc_ambiance[cles_actifs].values
+            rythme_parc_ambiance = df_parc_ambiance.diff().fillna(df_parc_ambiance)[cles_actifs].values
 
-            for actif in self.tous_actifs():
-            
-                # pour toutes les annees de 0 a l'annee cible, le nombre d'unites
-                # correspond au nombre reel d'unites
-                
-                for n in range(annee+1):
-                
-                    df_nb_unites.at[n,actif.cle] = df_parc.at[n,actif.cle]
+            nb_unites = np.zeros((horizon_simulation, len(cles_actifs)))
 
-                # pour l'annee cible, on ajoute eventuellement les investissements et déclassements correspondant au parc
-                # anticipe
-                
-                if add_current_investment : 
-                    if actif.ajoutable and not actif.demantelable :
-                        df_nb_unites.at[annee,actif.cle] = df_nb_unites.at[annee,actif.cle] + df_rythme_parc_ambiance.at[annee,actif.cle]
-                if add_current_divestment :
-                    if not actif.ajoutable and actif.demantelable :
-                        if df_nb_unites.at[annee,actif.cle] >= df_parc_ambiance.at[annee,actif.cle]:
-                            nb_unite_a_fermer = df_nb_unites.at[annee,actif.cle] -  df_parc_ambiance.at[annee,actif.cle]
-                            df_nb_unites.at[annee,actif.cle] = df_nb_unites.at[annee,actif.cle] - nb_unite_a_fermer
-                        
-                for n in range(annee+1,self.parametres_simulation.horizon_simulation):           
-                                       
-                    # si une techno  est demantelable mais pas ajoutable, on veille a ce que
-                    # le parc anticipe ne declasse pas moins vite que ce que les durees de vie permettent
-                    # (par exemple en cas de retard au declassement)
-                                       
-                    if actif.demantelable and not actif.ajoutable  :
-                    
-                        val_rythme = df_nb_unites.at[n-1,actif.cle] + df_rythme_parc_ambiance.at[n,actif.cle]
-                        val_reelle = df_parc.at[n,actif.cle]
-                        val_min = np.min([val_rythme,val_reelle])
-                        
-                        df_nb_unites.at[n,actif.cle] = val_min
-                        
-                    else :
-                    
-                        df_nb_unites.at[n,actif.cle] = df_nb_unites.at[n-1,actif.cle] + df_rythme_parc_ambiance.at[n,actif.cle]
-                                                        
-                        
+            # pour toutes les annees de 0 a l'annee cible, le nombre d'unites
+            # correspond au nombre reel d'unites
+            nb_unites[:annee+1] = nb_unites_parc[:annee+1]
+
+            # pour l'annee cible, on ajoute eventuellement les investissements et déclassements correspondant au parc
+            # anticipe
+            if add_current_investment :
+                nb_unites[annee, ajoutable_seul] = nb_unites[annee, ajoutable_seul] + rythme_parc_ambiance[annee, ajoutable_seul]
+            if add_current_divestment :
+                fermeture = demantelable_seul & (nb_unites[annee] >= nb_unites_parc_ambiance[annee])
+                nb_unite_a_fermer = nb_unites[annee, fermeture] - nb_unites_parc_ambiance[annee, fermeture]
+                nb_unites[annee, fermeture] = nb_unites[annee, fermeture] - nb_unite_a_fermer
+
+            for n in range(annee+1, horizon_simulation):
+
+                # les années suivantes suivent le rythme du parc anticipé ; si une techno est demantelable mais pas
+                # ajoutable, on veille a ce que le parc anticipe ne declasse pas moins vite que ce que les durees de vie
+                # permettent (par exemple en cas de retard au declassement)
+                val_rythme = nb_unites[n-1] + rythme_parc_ambiance[n]
+                nb_unites[n] = np.where(demantelable_seul, np.minimum(val_rythme, nb_unites_parc[n]), val_rythme)
+
+            df_nb_unites = pd.DataFrame(nb_unites, index=np.arange(horizon_simulation), columns=cles_actifs)
             df_nb_unites = df_nb_unites.clip(lower=0,upper=None)
             dico_df_nb_unites_ambiances[ambiance] = df_nb_unites
 
@@ -830,54 +1021,70 @@ class DonneesEntree:
         df_derating_factor = pd.DataFrame()
         df_nb_unites = parc_ambiance.get_df_nb_unites().loc[0:]
         
+        # les météos ne sont pas répliquées autant de fois qu'elles représentent de scénarios : 
+        # chaque heure porte le poids de sa météo et le quantile est lu sur les poids cumulés
+        poids_meteo = np.array([self.df_parametres_ponderation.at[meteo, "nb_scenario_represente"] for meteo in range(nb_meteo)], dtype=int)
+        meteos_representees = [meteo for meteo in range(nb_meteo) if poids_meteo[meteo] > 0]
+        nb_scenario = sum(self.df_parametres_ponderation["nb_scenario_represente"])
+        rang_critere = critere_besoin_capacitaire * nb_scenario
+        
+        actifs_non_eligibles = [self.trouve_actif(cle_actif) for cle_actif in liste_actifs_non_eligibles_mecapa]
+        
+        def disponibilite_actif(actif, annee, meteo) :
+            # chronique de disponibilité de l'actif, 1 par défaut
+            donnees_meteo = ambiance[annee]["meteo_%d"%meteo]
+            colonne = "%s_%d"%(actif.cle, annee)
+            if actif.categorie == "Pilotable" and colonne in donnees_meteo["dispo"].columns :
+                return donnees_meteo["dispo"][colonne].to_numpy(dtype=float)
+            if actif.categorie == "ENR" and colonne in donnees_meteo["fc"].columns :
+                return donnees_meteo["fc"][colonne].to_numpy(dtype=float)
+            return None
+        
         # les fichiers de demande et les fichiers de chronique de disponibilité sont identiques dans chaque années car ils contiennent toutes les années, il suffit donc d'en regarder un seul
         for annee in ambiance :
             
-            demande_residuelle_annee = pd.DataFrame()
+            puissances_installees = np.zeros(len(actifs_non_eligibles))
+            for indice, actif in enumerate(actifs_non_eligibles) :
+                puissance = 0
+                if actif.categorie == "Stockage":
+                    puissance = actif.puissance_nominale_decharge
+                elif actif.categorie == "Pilotable":
+                    puissance = actif.puissance_nominale
+                elif actif.categorie == "ENR":
+                    puissance = actif.puissance_reference
+                puissances_installees[indice] = df_nb_unites.at[annee, actif.cle] * puissance
             
-            for meteo in range(nb_meteo) : 
-                
-                demande_brute_annee_meteo = ambiance[annee]["meteo_%d"%meteo]["demande"]["Annee_%d"%annee].copy()
-                dispo_pilot_meteo = ambiance[annee]["meteo_%d"%meteo]["dispo"]
-                facteur_charge_enr_meteo = ambiance[annee]["meteo_%d"%meteo]["fc"]
+            demande_residuelle_annee = np.empty((len(meteos_representees), 8760))
+            for ligne, meteo in enumerate(meteos_representees) : 
                 
-                demande_residuelle_annee_meteo = pd.DataFrame()
-                demande_residuelle_annee_meteo["demande_residuelle"] = demande_brute_annee_meteo
-                for cle_actif in liste_actifs_non_eligibles_mecapa : 
-                    actif = self.trouve_actif(cle_actif)
-                    disponibilite = pd.DataFrame([1 for k in range(8760)], columns = ["Annee_%d"%annee])["Annee_%d"%annee]
-                    
-                    if actif.categorie == "Pilotable":
-                        try :
-                            disponibilite = dispo_pilot_meteo["%s_%d"%(cle_actif, annee)]
-                        except KeyError:
-                            pass
-                    elif actif.categorie == "ENR":
-                        try : 
-                            disponibilite = facteur_charge_enr_meteo["%s_%d"%(cle_actif, annee)]
-                        except KeyError:
-                            pass
-                        
-                    nbr_unite_actif_annee = df_nb_unites.at[annee, cle_actif]
-                    puissance = 0
-                    if actif.categorie == "Stockage":
-                        puissance = actif.puissance_nominale_decharge
-                    elif actif.categorie == "Pilotable":
-                        puissance = actif.puissance_nominale
-                    elif actif.categorie == "ENR":
-                        puissance = actif.puissance_reference
-                    
-
-                    demande_residuelle_annee_meteo["demande_residuelle"] -=  nbr_unite_actif_annee * puissance * disponibilite
-                    demande_residuelle_annee_meteo[cle_actif] = disponibilite
-                
-                for i in range(self.df_parametres_ponderation.at[meteo, "nb_scenario_represente"]) :     
-                    demande_residuelle_annee = pd.concat([demande_residuelle_annee, demande_residuelle_annee_meteo], ignore_index = True)
-                    
-            demande_residuelle_annee_sort =  demande_residuelle_annee.sort_values(ascending = False, by="demande_residuelle", ignore_index = True)  
-            nb_scenario = sum(self.df_parametres_ponderation["nb_scenario_represente"])
-            capa_annee = demande_residuelle_annee_sort.iloc[critere_besoin_capacitaire*nb_scenario]["demande_residuelle"]
-            df_derating_factor[annee] = demande_residuelle_annee_sort.iloc[critere_besoin_capacitaire * nb_scenario][1:]
+                demande_residuelle_meteo = ambiance[annee]["meteo_%d"%meteo]["demande"]["Annee_%d"%annee].to_numpy(dtype=float).copy()
+                for indice, actif in enumerate(actifs_non_eligibles) :
+                    disponibilite = disponibilite_actif(actif, annee, meteo)
+                    if disponibilite is None :
+                        demande_residuelle_meteo -= puissances_installees[indice]
+                    else :
+                        demande_residuelle_meteo -= puissances_installees[indice] * disponibilite
+                demande_residuelle_annee[ligne] = demande_residuelle_meteo
+            
+            # seules les rang_critere + 1 heures les plus chargées peuvent contenir le quantile recherché, 
+            # elles sont isolées par np.argpartition puis triées par demande résiduelle décroissante
+            valeurs = demande_residuelle_annee.ravel()
+            poids = np.repeat(poids_meteo[meteos_representees], 8760)
+            nb_candidats = min(rang_critere + 1, valeurs.size)
+            candidats = np.argpartition(-valeurs, nb_candidats - 1)[:nb_candidats]
+            candidats = candidats[np.argsort(-valeurs[candidats], kind="stable")]
+            position = np.searchsorted(np.cumsum(poids[candidats]), rang_critere, side="right")
+            if position >= nb_candidats :
+                raise IndexError("critère de besoin capacitaire supérieur au nombre d'heures des scénarios météo")
+            ligne, heure = divmod(int(candidats[position]), 8760)
+            meteo = meteos_representees[ligne]
+            
+            capa_annee = demande_residuelle_annee[ligne, heure]
+            derating_annee = []
+            for actif in actifs_non_eligibles :
+                disponibilite = disponibilite_actif(actif, annee, meteo)
+                derating_annee.append(1. if disponibilite is None else disponibilite[heure])
+            df_derating_factor[annee] = pd.Series(derating_annee, index=liste_actifs_non_eligibles_mecapa, dtype=float)
 
             capacite_cible_ambiance.append(capa_annee)    
             
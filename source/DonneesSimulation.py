@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 # AnTIGonE – Copyright 2020 EDF
 
+import bisect
+import copy
 import numpy as np
 import os
+import weakref
 import sys
 import pandas as pd
 
@@ -41,19 +44,67 @@ class Parc:
     """
     Cette classe représente le parc de production.
 
+    Le parc est stocké sous forme de matrices de cohortes : pour chaque type d'actif, le nombre d'unités est indexé par
+    année d'ouverture et année de fermeture. Les instances d'Unite ne sont créées qu'au moment où elles sont demandées
+    (unites_actives, unites_ouvertes, toutes_unites, fermetures), les unités ajoutées par ajout_unite étant conservées
+    telles quelles.
+
+    Les instantanés obtenus par instantane() partagent les registres du parc d'origine : les registres d'un actif ne
+    sont copiés qu'à la première modification de cet actif par l'un des parcs, et une unité n'est copiée que lorsque
+    sa date de fermeture est modifiée par un autre parc lié.
+
     Attributs
     ---------
-    _registre_unites_ouvertes : dict
-        dictionnaire contenant, pour chaque type d'actif, le tableau annuel des listes d'unités ouvertes
-    _registre_unites_actives : dict
-        dictionnaire contenant, pour chaque type d'actif, le tableau annuel des listes d'unités actives
+    _cohortes : dict
+        dictionnaire contenant, pour chaque type d'actif, la matrice du nombre d'unités indexée par
+        [année d'ouverture, année de fermeture]
+    _nombre_unites_actives : dict
+        dictionnaire contenant, pour chaque type d'actif, le tableau annuel du nombre d'unités actives
+    _unites : dict
+        dictionnaire contenant, pour chaque type d'actif, le dictionnaire des listes de couples (rang d'ajout, unité)
+        déjà instanciés indexé par (année d'ouverture, année de fermeture)
+    _rang_prochain_ajout : dict
+        dictionnaire contenant, pour chaque type d'actif, le rang d'ajout de la prochaine unité ajoutée au parc
+    _cohortes_initiales : dict
+        dictionnaire contenant, pour chaque type d'actif, les tableaux des années d'ouverture et de fermeture des
+        unités issues des registres initiaux
+    _cles_partagees : set
+        clés des actifs dont les registres sont partagés avec d'autres parcs et doivent être copiés avant modification
+    _groupe : list
+        références faibles vers les parcs liés par des instantanés, partagée par tous les parcs du groupe
+    _actifs : dict
+        dictionnaire des actifs indexé par leur clé
     _memorisation_tests_ajout_unite : list
         liste des unités ajoutées au parc en tant que test, mémorisées en vue de les retirer si besoin
 
     Méthodes
     --------
-    _calcul_registre_unites_actives(self, cle_actif, annee_depart=0)
-        Met à jour _registre_unites_actives à partir de _registre_unites_ouvertes.
+    instantane(self)
+        Retourne un instantané du parc, dont les registres ne sont copiés qu'en cas de modification.
+    restauration(self, instantane)
+        Rétablit le parc dans l'état de l'instantané donné.
+    _partage_registres(self, parc_source)
+        Fait pointer les registres du parc vers ceux du parc source, en les marquant comme partagés dans les deux parcs.
+    _preparation_ecriture(self, cle_actif)
+        Copie les registres de l'actif donné s'ils sont partagés avec d'autres parcs.
+    _gel_unite(self, unite)
+        Remplace l'unité donnée par une copie, avant sa modification par un autre parc lié.
+    _indice_fermeture(self, cle_actif, annee_fermeture)
+        Retourne la colonne de la matrice de cohortes correspondant à l'année de fermeture donnée.
+    _mise_a_jour_cohorte(self, cle_actif, annee_ouverture, annee_fermeture, variation)
+        Modifie le nombre d'unités d'une cohorte et le nombre d'unités actives correspondant.
+    _instanciation_cohorte(self, cle_actif, annee_ouverture, indice_fermeture)
+        Crée les instances d'Unite manquantes d'une cohorte et renvoie la liste des unités de la cohorte.
+    _liste_unites(self, cle_actif, annees_ouverture, indices_fermeture)
+        Retourne la liste des unités des cohortes données, dans l'ordre d'ajout au parc.
+    _recherche_unite(self, unite)
+        Retourne la cohorte contenant l'unité donnée ainsi que sa position dans la liste de la cohorte.
+    _extraction_unite(self, unite)
+        Retire l'unité donnée de sa cohorte et met à jour les nombres d'unités.
+    _deplacement_unite(self, unite, annee)
+        Reprogramme la fermeture d'une unité en la déplaçant vers la cohorte correspondante.
+    _fermeture_cohorte(self, cle_actif, annee, plus_proche)
+        Ferme une unité active de la cohorte dont la fermeture prévue est la plus proche ou la plus lointaine.
     nombre_unites(self, cle_actif, annee)
         Retourne le nombre d'unités de l'actif correspondant à la clé actives dans le parc à l'année donnée.
     unites_actives(self, cle_actif, annee)
@@ -81,11 +132,26 @@ class Parc:
 
     def __init__(self, parc_initial, registre_ouverture_initial, registre_fermeture_initial, donnees_entree):
 
-        # attribut permettant d'accéder aux unites ouvertes par cle d'actif et par annee
-        self._registre_unites_ouvertes = dict()
+        # matrices du nombre d'unités par cle d'actif, indexées par [annee_ouverture, annee_fermeture]
+        self._cohortes = dict()
+
+        # nombre d'unités actives par cle d'actif et par annee
+        self._nombre_unites_actives = dict()
+
+        # unités déjà instanciées par cle d'actif et par cohorte (annee_ouverture, annee_fermeture)
+        self._unites = dict()
+
+        self._actifs = dict()
+
+        # rang d'ajout des unités au parc, qui fixe leur ordre parmi les unités ouvertes la même année
+        self._rang_prochain_ajout = dict()
 
-        # attribut permettant d'accéder aux unites actives par cle d'actif et par annee
-        self._registre_unites_actives = dict()
+        # cohortes des unités issues des registres initiaux, dans leur ordre d'ajout
+        self._cohortes_initiales = dict()
+
+        # actifs dont les registres sont partagés avec des instantanés, et parcs liés par ces instantanés
+        self._cles_partagees = set()
+        self._groupe = [weakref.ref(self)]
 
         # initialisation des registres
         self._initialisation_registres(parc_initial, registre_ouverture_initial, registre_fermeture_initial, donnees_entree)
@@ -98,41 +164,376 @@ class Parc:
         self.registre_fermeture_initial = registre_fermeture_initial
         
         
+    def __getstate__(self):
+        # une copie complète ou un passage entre processus ne partage rien avec le parc d'origine
+        etat = self.__dict__.copy()
+        etat["_cles_partagees"] = set()
+        del etat["_groupe"]
+        return etat
+
+    def __setstate__(self, etat):
+        self.__dict__.update(etat)
+        self._groupe = [weakref.ref(self)]
+
+    def instantane(self):
+        """
+        Retourne un instantané du parc, dont les registres ne sont copiés qu'en cas de modification.
+
+        L'instantané et le parc d'origine évoluent ensuite indépendamment : chacun copie les registres d'un actif avant
+        de le modifier. Les unités restent partagées tant qu'aucun des deux parcs ne modifie leur date de fermeture ;
+        les autres attributs des unités (contrat, compteurs de fermeture) restent partagés.
+
+        Retours
+        -------
+        Parc
+            instantané du parc
+        """
+
+        instantane = copy.copy(self)
+        instantane._partage_registres(self)
+        instantane._groupe = self._groupe
+
+        self._groupe[:] = [reference for reference in self._groupe if reference() is not None]
+        self._groupe.append(weakref.ref(instantane))
+
+        return instantane
+
+    def restauration(self, instantane):
+        """
+        Rétablit le parc dans l'état de l'instantané donné.
+
+        L'instantané reste utilisable et partage ses registres avec le parc restauré jusqu'à la prochaine modification.
+
+        Paramètres
+        ----------
+        instantane : Parc
+            instantané obtenu par la méthode instantane()
+        """
+
+        self._partage_registres(instantane)
+
+        # le parc restauré rejoint le groupe de l'instantané
+        if self._groupe is not instantane._groupe:
+            self._groupe[:] = [reference for reference in self._groupe if reference() is not None and reference() is not self]
+            self._groupe = instantane._groupe
+            self._groupe.append(weakref.ref(self))
+
+    def _partage_registres(self, parc_source):
+        """
+        Fait pointer les registres du parc vers ceux du parc source, en les marquant comme partagés dans les deux parcs.
+
+        Cette méthode est supposée être privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
+
+        Paramètres
+        ----------
+        parc_source : Parc
+            parc dont les registres sont partagés
+        """
+
+        self._cohortes = dict(parc_source._cohortes)
+        self._nombre_unites_actives = dict(parc_source._nombre_unites_actives)
+        self._unites = dict(parc_source._unites)
+        self._rang_prochain_ajout = dict(parc_source._rang_prochain_ajout)
+        self._cohortes_initiales = parc_source._cohortes_initiales
+        self._memorisation_tests_ajout_unite = list(parc_source._memorisation_tests_ajout_unite)
+
+        self._cles_partagees = set(self._cohortes.keys())
+        parc_source._cles_partagees = set(parc_source._cohortes.keys())
+
+    def _preparation_ecriture(self, cle_actif):
+        """
+        Copie les registres de l'actif donné s'ils sont partagés avec d'autres parcs.
+
+        Cette méthode doit être appelée avant toute modification des registres d'un actif. Elle est supposée être
+        privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif dont les registres vont être modifiés
+        """
+
+        if cle_actif in self._cles_partagees:
+            self._cohortes[cle_actif] = self._cohortes[cle_actif].copy()
+            self._nombre_unites_actives[cle_actif] = self._nombre_unites_actives[cle_actif].copy()
+            self._unites[cle_actif] = {cle_cohorte : list(cohorte) for cle_cohorte, cohorte in self._unites[cle_actif].items()}
+            self._cles_partagees.discard(cle_actif)
+
+    def _gel_unite(self, unite):
+        """
+        Remplace l'unité donnée par une copie, avant sa modification par un autre parc lié.
 
-    def _calcul_registre_unites_actives(self, cle_actif, annee_depart=0):
+        Cette méthode est supposée être privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
+
+        Paramètres
+        ----------
+        unite : Unite
+            unité sur le point d'être modifiée
+        """
+
+        cle_cohorte, indice = self._recherche_unite(unite)
+        if cle_cohorte is not None:
+            self._preparation_ecriture(unite.actif.cle)
+            cohorte = self._unites[unite.actif.cle][cle_cohorte]
+            rang, unite = cohorte[indice]
+            cohorte[indice] = (rang, copy.copy(unite))
+
+    def _indice_fermeture(self, cle_actif, annee_fermeture):
+        """
+        Retourne la colonne de la matrice de cohortes correspondant à l'année de fermeture donnée.
+
+        Les années de fermeture situées au-delà de la dernière colonne sont regroupées dans celle-ci, ce qui est sans
+        effet sur les unités actives puisque le registre s'arrête avant.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif concerné
+        annee_fermeture : int
+            année de fermeture de l'unité
+
+        Retours
+        -------
+        int
+            indice de colonne dans la matrice de cohortes
+        """
+
+        return int(min(max(annee_fermeture, 0), self._cohortes[cle_actif].shape[1] - 1))
+
+    def _mise_a_jour_cohorte(self, cle_actif, annee_ouverture, annee_fermeture, variation):
+        """
+        Modifie le nombre d'unités d'une cohorte et le nombre d'unités actives correspondant.
+
+        Cette méthode est supposée être privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif concerné
+        annee_ouverture : int
+            année d'ouverture de la cohorte
+        annee_fermeture : int
+            année de fermeture de la cohorte
+        variation : int
+            nombre d'unités à ajouter (positif) ou à retirer (négatif)
+        """
+
+        self._preparation_ecriture(cle_actif)
+        indice_fermeture = self._indice_fermeture(cle_actif, annee_fermeture)
+        self._cohortes[cle_actif][annee_ouverture, indice_fermeture] += variation
+        # une unité est active de son année d'ouverture incluse à son année de fermeture exclue
+        if annee_fermeture > annee_ouverture:
+            self._nombre_unites_actives[cle_actif][annee_ouverture:annee_fermeture] += variation
+
+    def _instanciation_cohorte(self, cle_actif, annee_ouverture, indice_fermeture):
         """
-        Met à jour _registre_unites_actives à partir de _registre_unites_ouvertes.
+        Crée les instances d'Unite manquantes d'une cohorte et renvoie la liste des unités de la cohorte.
 
-        Cette méthode est appelée suite à un ajout ou un retrait d'unité du parc pour apporter les modifications
-        nécessaires à _registre_unites_actives. Elle est supposée être privée et ne devrait donc pas être appelée
-        en dehors des méthodes de Parc.
+        Les unités manquantes sont celles issues des registres initiaux, qui reçoivent leur rang d'ajout au parc
+        initial. Chaque élément de la liste renvoyée est un couple (rang d'ajout, unité), la liste étant triée par rang.
 
         Paramètres
         ----------
         cle_actif : str
-            clé de l'actif dont le registre des unités actives doit être mis à jour
-        annee_depart : int
-            année à partir de laquelle le registre doit être mis à jour, pour les cas où la modification opérée sur le
-            parc n'a d'impact sur les unités actives qu'à partir d'une certaine date
-        """
-
-        registre_unites_ouvertes = self._registre_unites_ouvertes[cle_actif]
-        registre_unites_actives = self._registre_unites_actives[cle_actif]
-        liste_unites_actives_annee_precedente = []
-        if(annee_depart > 0):
-            liste_unites_actives_annee_precedente = registre_unites_actives[annee_depart - 1]
-        for annee in range(annee_depart, registre_unites_ouvertes.shape[0]):
-            liste_unites_actives = []
-            # les unites actives à l'année précédentes et qui ne ferment pas restent actives
-            for unite in liste_unites_actives_annee_precedente:
-                if(unite.annee_fermeture > annee):
-                    liste_unites_actives.append(unite)
-            # les unités qui ouvrent à l'année considérée sont actives si elles ne ferment pas immédiatement
-            for unite_ouverte in registre_unites_ouvertes[annee]:
-                if (unite_ouverte.annee_fermeture > annee):
-                    liste_unites_actives.append(unite_ouverte)
-            registre_unites_actives[annee] = liste_unites_actives
-            liste_unites_actives_annee_precedente = liste_unites_actives
+            clé de l'actif concerné
+        annee_ouverture : int
+            année d'ouverture de la cohorte
+        indice_fermeture : int
+            colonne de la matrice de cohortes correspondant à l'année de fermeture
+
+        Retours
+        -------
+        list
+            liste des couples (rang d'ajout, unité) de la cohorte
+        """
+
+        cle_cohorte = (annee_ouverture, indice_fermeture)
+        cohorte = self._unites[cle_actif].get(cle_cohorte, [])
+        nombre_manquant = int(self._cohortes[cle_actif][annee_ouverture, indice_fermeture]) - len(cohorte)
+        if nombre_manquant > 0:
+            self._preparation_ecriture(cle_actif)
+            unites_actif = self._unites[cle_actif]
+            cohorte = unites_actif.get(cle_cohorte, [])
+            actif = self._actifs[cle_actif]
+            ouvertures_initiales, fermetures_initiales = self._cohortes_initiales[cle_actif]
+            rangs = np.nonzero((ouvertures_initiales == annee_ouverture) & (fermetures_initiales == indice_fermeture))[0]
+            nouvelles_unites = [(int(rang), Unite(actif, annee_ouverture, indice_fermeture, contrat=None)) for rang in rangs[:nombre_manquant]]
+            cohorte = sorted(nouvelles_unites + cohorte, key=lambda element: element[0])
+            unites_actif[cle_cohorte] = cohorte
+        return cohorte
+
+    def _liste_unites(self, cle_actif, annees_ouverture, indices_fermeture):
+        """
+        Retourne la liste des unités des cohortes données, dans l'ordre d'ajout au parc.
+
+        Les unités sont triées par année d'ouverture puis par rang d'ajout, ce qui correspond à l'ordre des listes
+        d'unités actives tenues année par année.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif concerné
+        annees_ouverture : numpy.ndarray
+            années d'ouverture des cohortes
+        indices_fermeture : numpy.ndarray
+            colonnes de la matrice de cohortes correspondant aux années de fermeture
+
+        Retours
+        -------
+        list
+            liste des unités
+        """
+
+        elements = []
+        for annee_ouverture, indice_fermeture in zip(annees_ouverture, indices_fermeture):
+            for rang, unite in self._instanciation_cohorte(cle_actif, int(annee_ouverture), int(indice_fermeture)):
+                elements.append((int(annee_ouverture), rang, unite))
+        elements.sort(key=lambda element: element[:2])
+
+        return [unite for annee_ouverture, rang, unite in elements]
+
+    def _recherche_unite(self, unite):
+        """
+        Retourne la cohorte contenant l'unité donnée ainsi que sa position dans la liste de la cohorte.
+
+        Paramètres
+        ----------
+        unite : Unite
+            unité à rechercher, il doit s'agir du même objet que celui préalablement ajouté et non d'une instance
+            identique
+
+        Retours
+        -------
+        tuple
+            clé de la cohorte et indice de l'unité dans sa liste, (None, None) si l'unité n'est pas dans le parc
+        """
+
+        unites_actif = self._unites[unite.actif.cle]
+        cle_cohorte = (unite.annee_ouverture, self._indice_fermeture(unite.actif.cle, unite.annee_fermeture))
+        # recherche directe dans la cohorte attendue puis, à défaut, dans toutes les cohortes de même année d'ouverture
+        cles_candidates = [cle_cohorte] + [cle for cle in unites_actif if cle[0] == unite.annee_ouverture and cle != cle_cohorte]
+        for cle in cles_candidates:
+            cohorte = unites_actif.get(cle, [])
+            for indice in range(len(cohorte)):
+                if cohorte[indice][1] is unite:
+                    return cle, indice
+        return None, None
+
+    def _extraction_unite(self, unite):
+        """
+        Retire l'unité donnée de sa cohorte et met à jour les nombres d'unités.
+
+        Cette méthode est supposée être privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
+
+        Paramètres
+        ----------
+        unite : Unite
+            unité à retirer, il doit s'agir du même objet que celui préalablement ajouté et non d'une instance identique
+
+        Retours
+        -------
+        tuple
+            année d'ouverture de la cohorte dont l'unité a été retirée et rang d'ajout de l'unité, (None, None) si
+            l'unité n'est pas dans le parc
+        """
+
+        cle_actif = unite.actif.cle
+        cle_cohorte, indice = self._recherche_unite(unite)
+        if cle_cohorte is None:
+            return None, None
+
+        self._preparation_ecriture(cle_actif)
+        unites_actif = self._unites[cle_actif]
+        cohorte = unites_actif[cle_cohorte]
+        rang, unite = cohorte.pop(indice)
+        if not cohorte:
+            del unites_actif[cle_cohorte]
+
+        # si la date de fermeture de l'unité a été modifiée hors du parc, c'est celle de la cohorte qui fait foi
+        annee_fermeture = unite.annee_fermeture
+        if self._indice_fermeture(cle_actif, annee_fermeture) != cle_cohorte[1]:
+            annee_fermeture = cle_cohorte[1]
+        self._mise_a_jour_cohorte(cle_actif, cle_cohorte[0], annee_fermeture, -1)
+        return cle_cohorte[0], rang
+
+    def _deplacement_unite(self, unite, annee):
+        """
+        Reprogramme la fermeture d'une unité en la déplaçant vers la cohorte correspondante.
+
+        La présence de l'unité dans le parc n'est pas vérifiée : si elle n'y figure pas, seule sa date de fermeture est
+        modifiée.
+
+        Paramètres
+        ----------
+        unite : Unite
+            unité dont la fermeture est à reprogrammer
+        annee : int
+            nouvelle année de fermeture
+        """
+
+        cle_actif = unite.actif.cle
+
+        # les parcs liés qui contiennent l'unité en conservent une copie dans son état actuel
+        self._groupe[:] = [reference for reference in self._groupe if reference() is not None]
+        for reference in self._groupe:
+            parc_lie = reference()
+            if parc_lie is not None and parc_lie is not self:
+                parc_lie._gel_unite(unite)
+
+        annee_ouverture, rang = self._extraction_unite(unite)
+        if annee_ouverture is not None:
+            # l'unité garde son rang d'ajout dans sa nouvelle cohorte
+            indice_fermeture = self._indice_fermeture(cle_actif, annee)
+            self._preparation_ecriture(cle_actif)
+            cohorte = self._instanciation_cohorte(cle_actif, annee_ouverture, indice_fermeture)
+            bisect.insort(cohorte, (rang, unite))
+            self._unites[cle_actif][(annee_ouverture, indice_fermeture)] = cohorte
+            self._mise_a_jour_cohorte(cle_actif, annee_ouverture, annee, 1)
+        unite.annee_fermeture = annee
+
+    def _fermeture_cohorte(self, cle_actif, annee, plus_proche):
+        """
+        Ferme une unité active de la cohorte dont la fermeture prévue est la plus proche ou la plus lointaine.
+
+        À date de fermeture égale, l'unité ouverte le plus tôt puis ajoutée le plus tôt au parc est retenue.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif concerné
+        annee : int
+            année de fermeture
+        plus_proche : bool
+            True pour fermer l'unité dont la fermeture prévue est la plus proche, False pour la plus lointaine
+
+        Retours
+        -------
+        Unite
+            unité fermée, None si aucune unité n'est active
+        """
+
+        cohortes = self._cohortes[cle_actif]
+        # cohortes actives à l'année donnée : ouvertes au plus tard cette année et fermant strictement après
+        cohortes_actives = cohortes[:annee + 1, annee + 1:]
+        ouvertures, fermetures = np.nonzero(cohortes_actives)
+        if len(ouvertures) == 0:
+            return None
+        fermetures = fermetures + annee + 1
+        if plus_proche:
+            fermeture_retenue = fermetures.min()
+        else:
+            fermeture_retenue = fermetures.max()
+
+        # seule la dernière colonne peut regrouper plusieurs dates de fermeture, les dates exactes sont donc comparées
+        # sur l'ensemble des cohortes de la colonne retenue
+        signe = 1 if plus_proche else -1
+        candidats = []
+        for annee_ouverture in ouvertures[fermetures == fermeture_retenue]:
+            for rang, unite in self._instanciation_cohorte(cle_actif, int(annee_ouverture), int(fermeture_retenue)):
+                candidats.append((signe * unite.annee_fermeture, int(annee_ouverture), rang, unite))
+        unite = min(candidats, key=lambda candidat: candidat[:3])[3]
+        self._deplacement_unite(unite, annee)
+        return unite
 
     def nombre_unites(self, cle_actif, annee):
         """
@@ -151,19 +552,15 @@ class Parc:
             nombre d'unités
         """
 
-        return len(self._registre_unites_actives[cle_actif][annee])
+        return int(self._nombre_unites_actives[cle_actif][annee])
 
     def get_df_nb_unites(self) :
     
-        df_nb_units = pd.DataFrame()
-        
-        annee_debut = 0 
         annee_fin = self.donnees_entree.parametres_simulation.horizon_simulation
-        for n in range(annee_debut,annee_fin):
-            for actif in self.donnees_entree.tous_actifs():
-            
-                df_nb_units.at[n,actif.cle] = self.nombre_unites(actif.cle, n) 
-        
+        cles_actifs = [actif.cle for actif in self.donnees_entree.tous_actifs()]
+
+        nb_unites = {cle : self._nombre_unites_actives[cle][:annee_fin].astype(float) for cle in cles_actifs}
+        df_nb_units = pd.DataFrame(nb_unites, index=range(annee_fin), columns=cles_actifs)
             
         return df_nb_units
         
@@ -181,10 +578,15 @@ class Parc:
         Retours
         -------
         list
-            liste des unités actives
+            liste des unités actives, triée par année d'ouverture
         """
 
-        return self._registre_unites_actives[cle_actif][annee]
+        if annee >= self._cohortes[cle_actif].shape[0]:
+            raise IndexError("année %d hors du registre de l'actif %s" % (annee, cle_actif))
+
+        annees_ouverture, indices_fermeture = np.nonzero(self._cohortes[cle_actif][:annee + 1, annee + 1:])
+
+        return self._liste_unites(cle_actif, annees_ouverture, indices_fermeture + annee + 1)
         
     def nombre_unites_ouvertes(self, cle_actif, annee):
         """
@@ -203,7 +605,7 @@ class Parc:
             nombre d'unités ouvertes
         """
 
-        return len(self._registre_unites_ouvertes[cle_actif][annee])
+        return int(self._cohortes[cle_actif][annee].sum())
     
     def print_parc(self, head,path=None):
         """
@@ -226,13 +628,10 @@ class Parc:
                 pass
 
         towrite = head + '\n'
-        for cle_actif in self._registre_unites_actives.keys():
-            to_print = str(cle_actif)
+        for cle_actif, nombre_unites_actives in self._nombre_unites_actives.items():
             towrite += str(cle_actif)
-            for annee in range(0,len(self._registre_unites_ouvertes[cle_actif])):
-                to_print += '   ' + str(len(self._registre_unites_actives[cle_actif][annee]))
-                towrite += '; ' + str(len(self._registre_unites_actives[cle_actif][annee]))
-            #print(to_print)
+            for nombre in nombre_unites_actives:
+                towrite += '; ' + str(nombre)
             towrite += '\n'
 
 
@@ -263,13 +662,11 @@ class Parc:
         df = pd.DataFrame(index=range(nb_annee))
         
         
-        for cle_actif in self._registre_unites_actives.keys():
+        for cle_actif, nombre_unites_actives in self._nombre_unites_actives.items():
 
-            annee_max = np.min([ len(self._registre_unites_ouvertes[cle_actif])  , nb_annee ])
-            
-            for n in range(annee_max):
+            annee_max = np.min([ len(nombre_unites_actives)  , nb_annee ])
             
-                df.at[n,cle_actif] = len(self._registre_unites_actives[cle_actif][n])
+            df.loc[:annee_max - 1, cle_actif] = nombre_unites_actives[:annee_max].astype(float)
                    
         df.to_csv(path,sep=";")
         
@@ -286,9 +683,7 @@ class Parc:
         
         """
 
-        actif = unite.actif
-        unite.annee_fermeture = annee
-        self._calcul_registre_unites_actives(actif.cle)    
+        self._deplacement_unite(unite, annee)
     
     
     
@@ -311,7 +706,9 @@ class Parc:
             liste des unités ouvertes
         """
 
-        return self._registre_unites_ouvertes[cle_actif][annee]
+        indices_fermeture = np.nonzero(self._cohortes[cle_actif][annee])[0]
+
+        return self._liste_unites(cle_actif, np.full(len(indices_fermeture), annee), indices_fermeture)
 
     def ajout_unite(self, unite):
         """
@@ -329,11 +726,16 @@ class Parc:
         """
 
         annee_ouverture = unite.annee_ouverture
-        actif = unite.actif
-        registre_unites_ouvertes_actif = self._registre_unites_ouvertes[actif.cle]
-        if annee_ouverture < len(registre_unites_ouvertes_actif):
-            registre_unites_ouvertes_actif[annee_ouverture].append(unite)
-            self._calcul_registre_unites_actives(actif.cle, annee_depart=annee_ouverture)
+        cle_actif = unite.actif.cle
+        if 0 <= annee_ouverture < self._cohortes[cle_actif].shape[0]:
+            # les unités manquantes de la cohorte sont instanciées au préalable pour conserver l'ordre d'ajout
+            self._preparation_ecriture(cle_actif)
+            indice_fermeture = self._indice_fermeture(cle_actif, unite.annee_fermeture)
+            cohorte = self._instanciation_cohorte(cle_actif, annee_ouverture, indice_fermeture)
+            cohorte.append((self._rang_prochain_ajout[cle_actif], unite))
+            self._unites[cle_actif][(annee_ouverture, indice_fermeture)] = cohorte
+            self._rang_prochain_ajout[cle_actif] += 1
+            self._mise_a_jour_cohorte(cle_actif, annee_ouverture, unite.annee_fermeture, 1)
             return True
         return False
 
@@ -352,19 +754,7 @@ class Parc:
             True si l'unité a été retirée avec succès, False sinon
         """
 
-        annee_ouverture = unite.annee_ouverture
-        actif = unite.actif
-        registre_unites_ouvertes_actif = self._registre_unites_ouvertes[actif.cle]
-        liste_unites_ouvertes_annee_ouverture = registre_unites_ouvertes_actif[annee_ouverture]
-        for indice in range(len(liste_unites_ouvertes_annee_ouverture)):
-            # parcours de la liste des unités ouvertes la même année que l'unité fournie en argument
-            if(liste_unites_ouvertes_annee_ouverture[indice] is unite):
-                # si on retrouve l'unité passée en argument dans la liste, on la retire et on recalcule les registres
-                # il doit s'agir de la même instance d'unité (comparaison avec is) et non d'une instance identique
-                liste_unites_ouvertes_annee_ouverture.pop(indice)
-                self._calcul_registre_unites_actives(actif.cle, annee_depart=annee_ouverture)
-                return True
-        return False
+        return self._extraction_unite(unite)[0] is not None
 
     def test_ajout_unite(self, unite):
         """
@@ -426,8 +816,7 @@ class Parc:
         if(annee > annee_ouverture + actif.duree_vie):
             return False
 
-        unite.annee_fermeture = annee
-        self._calcul_registre_unites_actives(actif.cle)
+        self._deplacement_unite(unite, annee)
         return True
 
     def fermeture_anticipee_plus_proche(self,cle_actif,annee):
@@ -440,54 +829,19 @@ class Parc:
         
         """
         
-
-        # on cherche l'unité de la techno dont la date de fermeture prévues
-        # est la plus proche de l'année courante
-        
-        fermeture_la_plus_proche = np.inf
-       
-        for unite in self._registre_unites_actives[cle_actif][annee] :
-            if unite.annee_fermeture <= fermeture_la_plus_proche :
-                fermeture_la_plus_proche = unite.annee_fermeture
-                
-        # maintenant que la date est connue, on supprime l'unité
-
-        for unite in self._registre_unites_actives[cle_actif][annee] :
-            if unite.annee_fermeture == fermeture_la_plus_proche :               
-                unite.annee_fermeture = annee
-                self._calcul_registre_unites_actives(cle_actif)
-                break
-                    
-        return unite
+        return self._fermeture_cohorte(cle_actif, annee, plus_proche=True)
 
     def fermeture_anticipee_plus_lointaine(self,cle_actif,annee):
         
         """
         
         Ferme une unité de l'actif donné pendant l'année donnée. 
-        L'unité qui va être déclassée correspond à celle à qui il reste moins d'année
+        L'unité qui va être déclassée correspond à celle à qui il reste le plus d'années
         de fonctionnement
         
         """
 
-        # on cherche l'unité de la techno dont la date de fermeture prévues
-        # est la plus proche de l'année courante
-        
-        fermeture_la_plus_proche = 0
-       
-        for unite in self._registre_unites_actives[cle_actif][annee] :
-            if unite.annee_fermeture >= fermeture_la_plus_proche :
-                fermeture_la_plus_proche = unite.annee_fermeture
-                
-        # maintenant que la date est connue, on supprime l'unité
-
-        for unite in self._registre_unites_actives[cle_actif][annee] :
-            if unite.annee_fermeture == fermeture_la_plus_proche :               
-                unite.annee_fermeture = annee
-                self._calcul_registre_unites_actives(cle_actif)
-                break
-                    
-        return unite
+        return self._fermeture_cohorte(cle_actif, annee, plus_proche=False)
        
         
     def toutes_unites(self):
@@ -501,9 +855,8 @@ class Parc:
         """
 
         liste_unites = []
-        for cle_actif, registre_unites_ouvertes_actif in self._registre_unites_ouvertes.items():
-            for liste_unites_ouvertes in registre_unites_ouvertes_actif:
-                liste_unites += liste_unites_ouvertes
+        for cle_actif, cohortes in self._cohortes.items():
+            liste_unites += self._liste_unites(cle_actif, *np.nonzero(cohortes))
 
         return liste_unites
 
@@ -511,6 +864,7 @@ class Parc:
         """
         Initialise les registres du parc à partir des éléments issus de la lecture des données d'entrée.
 
+        Seules les matrices de cohortes sont remplies, les unités correspondantes sont instanciées à la demande.
         Cette méthode est supposée être privée et ne devrait donc pas être appelée en dehors des méthodes de Parc.
 
         Paramètres
@@ -527,58 +881,44 @@ class Parc:
 
         for actif in donnees_entree.tous_actifs():
             nombre_annees = donnees_entree.parametres_simulation.horizon_simulation + donnees_entree.parametres_simulation.horizon_prevision + actif.duree_construction + actif.duree_vie
-            registre_unites_ouvertes_actif = np.empty(nombre_annees, dtype=list)
-            registre_unites_actives_actif = np.empty(nombre_annees, dtype=list)
 
-            # remplissage des registres par des listes vides
-            for annee in range(nombre_annees):
-                registre_unites_ouvertes_actif[annee] = []
-                registre_unites_actives_actif[annee] = []
+            # les unités ajoutées en cours de simulation peuvent fermer jusqu'à duree_vie années après la fin du registre
+            self._cohortes[actif.cle] = np.zeros((nombre_annees, nombre_annees + actif.duree_vie + 1), dtype=np.int64)
+            self._nombre_unites_actives[actif.cle] = np.zeros(nombre_annees, dtype=np.int64)
+            self._unites[actif.cle] = dict()
+            self._actifs[actif.cle] = actif
 
-            # ajout des unités présentes dans le parc initial
+            # années d'ouverture des unités présentes dans le parc initial
             # et de celles dont l'ouverture est contrainte par le registre d'ouverture initial
-            annees_ouverture = []
-            annees_fermeture = []
-
-            nombre_unites_initial = parc_initial[actif.cle]
-            for indice_unite in range(nombre_unites_initial):
-                annees_ouverture.append(0)
-
-            registre_ouverture_initial_actif = registre_ouverture_initial[actif.cle]
-            for annee in range(registre_ouverture_initial_actif.shape[0]):
-                for indice_unite in range(int(registre_ouverture_initial_actif[annee])):
-                    annees_ouverture.append(annee)
-                       
-            registre_fermeture_initial_actif = registre_fermeture_initial[actif.cle]
-            for annee in range(registre_fermeture_initial_actif.shape[0]):
-                for indice_unite in range(int(registre_fermeture_initial_actif[annee])):
-                    annees_fermeture.append(annee)
-                    
+            registre_ouverture_initial_actif = np.asarray(registre_ouverture_initial[actif.cle]).astype(int)
+            annees_ouverture = np.concatenate([np.zeros(int(parc_initial[actif.cle]), dtype=int),
+                                               np.repeat(np.arange(registre_ouverture_initial_actif.shape[0]), registre_ouverture_initial_actif)])
+
+            registre_fermeture_initial_actif = np.asarray(registre_fermeture_initial[actif.cle]).astype(int)
+            annees_fermeture = np.repeat(np.arange(registre_fermeture_initial_actif.shape[0]), registre_fermeture_initial_actif)
+
             #if(len(annees_fermeture) > len(annees_ouverture)):
             #    print("Le nombre de fermetures fournies en entrée pour %s dépasse le nombre d'unités ouvertes.\nCertaines seront ignorées."%actif.cle)
 
-            if(len(annees_fermeture) < len(annees_ouverture)):
-                # s'il y a trop peu de fermetures, on considère que les unités sont fermées après la fin du registre
-                nombre_fermetures_manquantes = len(annees_ouverture) - len(annees_fermeture)
-                for fermeture_manquante in range(nombre_fermetures_manquantes):
-                    annees_fermeture.append(nombre_annees)
-
-            fermetures_avancees = False
-            for indice in range(len(annees_ouverture)):
-                annee_ouverture = annees_ouverture[indice]
-                annee_fermeture = annees_fermeture[indice]
-                if(annee_fermeture - annee_ouverture > actif.duree_vie):
-                    fermetures_avancees = True
-                    annee_fermeture = annee_ouverture + actif.duree_vie
-                unite = Unite(actif, annee_ouverture, annee_fermeture, contrat=None)
-                registre_unites_ouvertes_actif[annee_ouverture].append(unite)
+            # s'il y a trop peu de fermetures, on considère que les unités sont fermées après la fin du registre
+            nombre_fermetures_manquantes = max(len(annees_ouverture) - len(annees_fermeture), 0)
+            annees_fermeture = np.concatenate([annees_fermeture, np.full(nombre_fermetures_manquantes, nombre_annees, dtype=int)])[:len(annees_ouverture)]
+
+            # les fermetures causant un dépassement de durée de vie sont avancées
+            annees_fermeture = np.minimum(annees_fermeture, annees_ouverture + actif.duree_vie)
 
             #if(fermetures_avancees):
             #    print("Les dates de fermeture fournies en entrée pour %s causent des dépassements de durée de vie.\nCertaines ont été avancées."%actif.cle)
 
-            self._registre_unites_ouvertes[actif.cle] = registre_unites_ouvertes_actif
-            self._registre_unites_actives[actif.cle] = registre_unites_actives_actif
-            self._calcul_registre_unites_actives(actif.cle)
+            # le rang d'ajout d'une unité initiale est sa position dans ces tableaux
+            self._cohortes_initiales[actif.cle] = (annees_ouverture, annees_fermeture)
+            self._rang_prochain_ajout[actif.cle] = len(annees_ouverture)
+
+            np.add.at(self._cohortes[actif.cle], (annees_ouverture, annees_fermeture), 1)
+            for annee_ouverture, annee_fermeture in zip(*np.nonzero(self._cohortes[actif.cle])):
+                nombre = self._cohortes[actif.cle][annee_ouverture, annee_fermeture]
+                if annee_fermeture > annee_ouverture:
+                    self._nombre_unites_actives[actif.cle][annee_ouverture:annee_fermeture] += nombre
 
     def retrait_ouveture_parc_anticipee(self,annee):
         
@@ -597,10 +937,30 @@ class Parc:
 
     def get_nb_unites_actives(self,cle_actif,annee):
     
-        return len(self._registre_unites_actives[cle_actif][annee])
+        return self.nombre_unites(cle_actif, annee)
+
 
     def get_df_nb_unites_extrapole(self, annee, k):
+        """
+        Renvoie le nombre d'unités de chaque actif jusqu'à la fin de l'horizon de simulation, les années postérieures à
+        annee étant extrapolées par régression linéaire sur les k dernières années pour les actifs démantelables ou
+        ajoutables.
 
+        L'extrapolation ne dépend que du parc, et pas de l'ambiance : les modules qui construisent un parc anticipé par
+        ambiance l'appellent une seule fois et en copient le résultat pour chaque ambiance.
+
+        Paramètres
+        ----------
+        annee : int
+            dernière année dont le nombre d'unités est lu dans le parc
+        k : int
+            nombre d'années utilisées pour la régression
+
+        Retours
+        -------
+        pandas.DataFrame
+            tableau du nombre d'unités indexé par année, avec une colonne par actif
+        """
 
         df_nb_units = pd.DataFrame()
 
@@ -7,15 +7,148 @@ import MecanismeCapacite
 
 import pandas as pd
 import os
+import re
 import time
 import  numpy as np
 import sys
-import shutil
 
 def pjoin(*args, **kwargs):
     return os.path.join(*args, **kwargs).replace(os.sep, '//')
     
 
+def cle_archive(chemin_relatif):
+    """
+    Convertit le chemin relatif d'une sortie intermédiaire en clé de l'archive HDF5.
+
+    Chaque composante du chemin est réduite aux caractères alphanumériques et préfixée si elle commence par un
+    chiffre, afin de former un nom de noeud valide.
+
+    Paramètres
+    ----------
+    chemin_relatif : str
+        chemin du fichier CSV correspondant, relatif au dossier de sortie
+
+    Retours
+    -------
+    str
+        clé de la table dans l'archive
+    """
+
+    chemin_sans_extension = os.path.splitext(chemin_relatif)[0]
+    composantes = []
+    for composante in re.split(r"[\\/]+", chemin_sans_extension):
+        if composante == "":
+            continue
+        composante = re.sub(r"\W", "_", composante)
+        if composante[0].isdigit():
+            composante = "_" + composante
+        composantes.append(composante)
+    return "/" + "/".join(composantes)
+
+
+# archive HDF5 des sorties intermédiaires ouverte pour un lot de sorties (une année de simulation), None si aucune
+# archive n'est ouverte
+_archive_sorties_intermediaires = None
+
+
+def ouverture_archive_sorties_intermediaires(donnees_entree):
+    """
+    Ouvre l'archive des sorties intermédiaires pour un lot d'écritures, typiquement une année de simulation, afin de
+    ne pas rouvrir le fichier HDF5 à chaque sortie. Rien n'est ouvert si le niveau de sortie n'est pas "archive".
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    """
+
+    global _archive_sorties_intermediaires
+
+    fermeture_archive_sorties_intermediaires()
+
+    if donnees_entree.parametres_simulation.niveau_sortie == "archive":
+        chemin_archive = os.path.join(donnees_entree.dossier_sortie, "resultats_intermediaires.h5")
+        _archive_sorties_intermediaires = pd.HDFStore(chemin_archive, mode="a", complevel=5, complib="blosc")
+
+
+def fermeture_archive_sorties_intermediaires():
+    """
+    Ferme l'archive des sorties intermédiaires ouverte par ouverture_archive_sorties_intermediaires, s'il y en a une.
+    """
+
+    global _archive_sorties_intermediaires
+
+    if _archive_sorties_intermediaires is not None:
+        _archive_sorties_intermediaires.close()
+    _archive_sorties_intermediaires = None
+
+
+def ecriture_sorties_intermediaires(donnees_entree, sorties):
+    """
+    Ecrit les sorties intermédiaires données selon le niveau de sortie choisi par l'utilisateur.
+
+    Le paramètre niveau_sortie peut prendre les valeurs suivantes :
+    - "minimal" : les sorties intermédiaires ne sont pas écrites
+    - "archive" : chaque sortie est une table de l'archive HDF5 resultats_intermediaires.h5 du dossier de sortie, dont
+      la clé reprend le chemin du fichier CSV correspondant ; l'archive ouverte par
+      ouverture_archive_sorties_intermediaires est utilisée s'il y en a une, sinon l'archive est ouverte le temps de
+      l'appel
+    - "complet" (valeur par défaut) : chaque sortie est écrite dans un fichier CSV du dossier de sortie, comme dans
+      les versions précédentes
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    sorties : iterable
+        couples (chemin relatif au dossier de sortie, DataFrame) à écrire, les DataFrames ne sont construits que si
+        le niveau de sortie le nécessite lorsqu'un générateur est fourni
+    """
+
+    niveau_sortie = donnees_entree.parametres_simulation.niveau_sortie
+
+    if niveau_sortie == "minimal":
+        return
+
+    if niveau_sortie == "complet":
+        for chemin_relatif, data_frame in sorties:
+            chemin_fichier = os.path.join(donnees_entree.dossier_sortie, chemin_relatif)
+            dossier = os.path.dirname(chemin_fichier)
+            if not os.path.isdir(dossier):
+                os.makedirs(dossier)
+            data_frame.to_csv(chemin_fichier, sep=";")
+
+    elif niveau_sortie == "archive":
+        if _archive_sorties_intermediaires is not None:
+            for chemin_relatif, data_frame in sorties:
+                _archive_sorties_intermediaires.put(cle_archive(chemin_relatif), data_frame, format="fixed")
+            return
+        chemin_archive = os.path.join(donnees_entree.dossier_sortie, "resultats_intermediaires.h5")
+        with pd.HDFStore(chemin_archive, mode="a", complevel=5, complib="blosc") as archive:
+            for chemin_relatif, data_frame in sorties:
+                archive.put(cle_archive(chemin_relatif), data_frame, format="fixed")
+
+    else:
+        raise ValueError("Paramètre niveau_sortie %s non reconnu" % niveau_sortie)
+
+
+def ecriture_sortie_intermediaire(donnees_entree, chemin_relatif, data_frame):
+    """
+    Ecrit une sortie intermédiaire selon le niveau de sortie choisi par l'utilisateur.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    chemin_relatif : str
+        chemin du fichier CSV correspondant, relatif au dossier de sortie
+    data_frame : pandas.DataFrame
+        DataFrame à écrire
+    """
+
+    ecriture_sorties_intermediaires(donnees_entree, [(chemin_relatif, data_frame)])
+
+
 
 def ecriture_rapport_boucle_demantelement(chemin_fichier, rapport_boucle_demantelement):
     """
@@ -301,26 +434,25 @@ def ecriture_dispatch_CFD(matrice_resultats_annuels,donnees_entree,donnees_simul
     
     annee_courante = donnees_simulation.annee_courante
     
-    
-    for idxAmbiance,nom in enumerate(donnees_entree.ambiances) : 
+    def sorties():
+        for idxAmbiance,nom in enumerate(donnees_entree.ambiances) : 
 
-        nbAnnees = len(matrice_resultats_annuels[idxAmbiance])
-        
-        for annee in range(nbAnnees):
-        
-            nbMeteo = len(matrice_resultats_annuels[idxAmbiance][annee])
+            nbAnnees = len(matrice_resultats_annuels[idxAmbiance])
+            
+            for annee in range(nbAnnees):
             
-            for meteo in range(nbMeteo):
-                  
-                dossier_dispatch = os.path.join(donnees_entree.dossier_sortie,"Dispatch","annee_"+ str(annee_courante),"AO_" + str(annee_anticipee))
+                nbMeteo = len(matrice_resultats_annuels[idxAmbiance][annee])
                 
-                if not os.path.isdir(dossier_dispatch):
-                    os.makedirs(dossier_dispatch)
+                for meteo in range(nbMeteo):
+                      
+                    dossier_dispatch = os.path.join("Dispatch","annee_"+ str(annee_courante),"AO_" + str(annee_anticipee))
+                        
+                    nom_fichier = "%s_annee_%s_meteo_%s.csv"%(nom,str(annee_anticipee+annee),str(meteo))
+                    chemin_fichier = os.path.join(dossier_dispatch,nom_fichier)   
                     
-                nom_fichier = "%s_annee_%s_meteo_%s.csv"%(nom,str(annee_anticipee+annee),str(meteo))
-                chemin_fichier = os.path.join(dossier_dispatch,nom_fichier)   
-                
-                ecriture_resultat_annuel(chemin_fichier,matrice_resultats_annuels[idxAmbiance][annee][meteo])    
+                    yield chemin_fichier, matrice_resultats_annuels[idxAmbiance][annee][meteo].data_frame_resultat_annuel
+
+    ecriture_sorties_intermediaires(donnees_entree, sorties())
 
     return None
 
@@ -341,32 +473,31 @@ def ecriture_dispatch_boucle(matrice_resultats_annuels,donnees_entree,donnees_si
     
     annee_courante = donnees_simulation.annee_courante
     
-    
-    for idxAmbiance,nom in enumerate(donnees_entree.ambiances) : 
+    def sorties():
+        for idxAmbiance,nom in enumerate(donnees_entree.ambiances) : 
 
-        
-        nbAnnees = len(matrice_resultats_annuels[idxAmbiance])
-        
-        for annee in range(nbAnnees):
-        
-            nbMeteo = len(matrice_resultats_annuels[idxAmbiance][annee])
             
-            for meteo in range(nbMeteo):
-                  
-                dossier_dispatch = os.path.join(donnees_entree.dossier_sortie,"annee_"+ str(annee_courante),boucle,str(nb_iter))
-                
-                if not os.path.isdir(dossier_dispatch):
-                    os.makedirs(dossier_dispatch)
-                    
-                num_annee = premiere_annee_matrice + annee
+            nbAnnees = len(matrice_resultats_annuels[idxAmbiance])
+            
+            for annee in range(nbAnnees):
+            
+                nbMeteo = len(matrice_resultats_annuels[idxAmbiance][annee])
                 
-                if unite == None : 
-                    nom_fichier = "%s_annee_%s_meteo_%s.csv"%(nom,str(num_annee),str(meteo))
-                else : 
-                    nom_fichier = "%s_annee_%s_meteo_%s_unite_%s.csv"%(nom,str(num_annee),str(meteo),unite)
+                for meteo in range(nbMeteo):
+                      
+                    dossier_dispatch = os.path.join("annee_"+ str(annee_courante),boucle,str(nb_iter))
+                        
+                    num_annee = premiere_annee_matrice + annee
                     
-                chemin_fichier = os.path.join(dossier_dispatch,nom_fichier)   
-                ecriture_resultat_annuel(chemin_fichier,matrice_resultats_annuels[idxAmbiance][annee][meteo])    
+                    if unite == None : 
+                        nom_fichier = "%s_annee_%s_meteo_%s.csv"%(nom,str(num_annee),str(meteo))
+                    else : 
+                        nom_fichier = "%s_annee_%s_meteo_%s_unite_%s.csv"%(nom,str(num_annee),str(meteo),unite)
+                        
+                    chemin_fichier = os.path.join(dossier_dispatch,nom_fichier)   
+                    yield chemin_fichier, matrice_resultats_annuels[idxAmbiance][annee][meteo].data_frame_resultat_annuel
+
+    ecriture_sorties_intermediaires(donnees_entree, sorties())
 
     return None
     
@@ -652,180 +783,6 @@ def ecriture_registre_contribution_capacitaire(dossier_sortie, donnees_entree, d
     df_contribution_capacitaire.to_csv(fichier_contribution_capacitaire, sep=";")
     
     
-def ecriture_entrees_gep(donnees_entree, donnees_simulation):
-
-    dossier_sortie = donnees_entree.dossier_sortie
-    
-    annee_courante = donnees_simulation.annee_courante
-    
-    chemins_gep = []
-    
-    for indice_ambiance,ambiance in enumerate(donnees_entree.ambiances):
-    
-        entrees_gep = pjoin(dossier_sortie,"INPUT_GEP_%d_%s"%(annee_courante,ambiance))
-        os.makedirs(entrees_gep)
-        
-        chemins_gep.append(entrees_gep)
-        
-        # copie du repertoire actif
-        
-        src = pjoin(donnees_entree.chemin_dossier,"Actifs")
-        dst = pjoin(entrees_gep,"Actifs")
-        shutil.copytree(src,dst)
-        
-        # copie du repertoire parametres
-
-        src = pjoin(donnees_entree.chemin_dossier,"Parametres")
-        dst = pjoin(entrees_gep,"Parametres")
-        shutil.copytree(src,dst)    
-        
-        # modif du nombre d'années dans parametres
-        
-        path = pjoin(entrees_gep,"Parametres","parametres_simulation.csv")
-        df_param = pd.read_csv(path,sep=";",index_col=0)
-        
-        horizon_total = int(df_param.at["horizon_simulation","value"])
-        
-        df_param_modif = df_param.copy()
-        df_param_modif.at["horizon_simulation","value"] = int( horizon_total - annee_courante)
-        df_param_modif.to_csv(path,sep=";")
-        
-        # copie du repertoire realisation
-
-        src = pjoin(donnees_entree.chemin_dossier,"Ambiances",ambiance,"Annee_%d"%annee_courante)
-        dst = pjoin(entrees_gep,"Realisation")
-        shutil.copytree(src,dst)
-        
-        # modif des colonnes 
-        
-        ## CCC
-        
-        path = pjoin(entrees_gep,"Realisation","couts_combustibles_et_carbone.csv")
-        df_ccc = pd.read_csv(path,sep=";",index_col = 0)
-        
-        cols = ["Annee_%d"%n for n in np.arange(annee_courante,horizon_total)]
-        df_ccc = df_ccc[cols]
-        
-        cols_rename = ["Annee_%d"%n for n in (np.arange(annee_courante,horizon_total) - annee_courante  )]
-        df_ccc.columns = cols_rename
-        
-        df_ccc.to_csv(path,sep=";")
-        
-        for indice_meteo in range(donnees_entree.parametres_simulation.nb_meteo):
-        
-            ## Demande
-            
-            path = pjoin(entrees_gep,"Realisation","meteo_%d"%indice_meteo,"demande.csv")
-            df_demande = pd.read_csv(path,sep=";",index_col=0)
-            df_demande = df_demande[cols]
-            df_demande.columns = cols_rename
-            df_demande.to_csv(path,sep=";")
-            
-            ## Disponibilite
-
-            path = pjoin(entrees_gep,"Realisation","meteo_%d"%indice_meteo,"disponibilite_pilot.csv")
-            df_dispo_pilot = pd.read_csv(path,sep=";",index_col=0)
-            
-            
-            list_tech = np.unique([ "_".join(col.split("_")[:-1]) for col in df_dispo_pilot.columns])
-            
-            cols = [tech + "_%d"%n  for tech in list_tech for n in range(annee_courante,horizon_total) ]
-            
-            df_dispo_pilot = df_dispo_pilot[cols]
-            
-            
-            cols_rename = [tech + "_%d"%n  for tech in list_tech for n in (np.arange(annee_courante,horizon_total) - annee_courante) ]
-            df_dispo_pilot.columns = cols_rename
-            
-            df_dispo_pilot.to_csv(path,sep=";")
-            
-            
-            ### EnR
-            
-            path = pjoin(entrees_gep,"Realisation","meteo_%d"%indice_meteo,"facteurs_production_ENR.csv")
-            df_enr = pd.read_csv(path,sep=";",index_col=0)
-            
-            
-            list_tech = np.unique([ "_".join(col.split("_")[:-1]) for col in df_enr.columns])
-            
-            cols = [tech + "_%d"%n  for tech in list_tech for n in np.arange(annee_courante,horizon_total) ]
-            
-            df_enr = df_enr[cols]
-            cols_rename = [tech + "_%d"%n  for tech in list_tech for n in (np.arange(annee_courante,horizon_total) - annee_courante) ]
-            df_enr.columns = cols_rename
-
-            df_enr.to_csv(path,sep=";")
-            
-            
-            
-        
-        # copie du repertoire GenerationMixCible
-
-        src = pjoin(donnees_entree.chemin_dossier,"GenerationMixCible")
-        dst = pjoin(entrees_gep,"GenerationMixCible")
-        shutil.copytree(src,dst)    
-        
-        # modif des colonnes
-        
-        #### contraintes trajectoires
-        
-        path = pjoin(entrees_gep,"GenerationMixCible","contraintes_trajectoire.csv")
-        df_contraintes_traj = pd.read_csv(path,sep=";",index_col=0)
-        
-        cols = ["type_contrainte","grandeur_concernee"] + ["annee_%d"%n for n in np.arange(annee_courante,horizon_total)]
-        df_contraintes_traj = df_contraintes_traj[cols]
-
-        df_contraintes_traj.columns = ["type_contrainte","grandeur_concernee"] + ["annee_%d"%n for n in (np.arange(annee_courante,horizon_total)-annee_courante)]
-        df_contraintes_traj.to_csv(path,sep=";")
-        
-        #### contraintes CO2
-        
-        path = pjoin(entrees_gep,"GenerationMixCible","co2_quota.csv")
-        df_quota = pd.read_csv(path,sep=";",index_col=0)
-        
-        rows = ["Annee_%d"%n for n in np.arange(annee_courante,horizon_total)]
-        df_quota = df_quota.loc[rows]
-        df_quota["CO2_quota"] = "inf"
-        df_quota.index = ["Annee_%d"%n for n in (np.arange(annee_courante,horizon_total) - annee_courante)]
-        
-        df_quota.to_csv(path,sep=";")
-        
-        
-        
-                
-        # repertoire parc
-        
-        path_rep_parc = pjoin(entrees_gep,"Parc")
-        os.makedirs(path_rep_parc)
-        
-        df_parc = donnees_simulation.parc.get_df_nb_unites()
-        
-        path = pjoin(entrees_gep,"Parc","parc_initial.csv")
-        df_parc_initial = df_parc.loc[annee_courante].T.astype(int)
-        df_parc_initial = df_parc_initial.rename("nombre")
-        df_parc_initial.to_csv(path,sep=";")
-
-        
-        df_parc = df_parc.loc[annee_courante:]
-        df_parc.index = df_parc.index.to_numpy() - annee_courante
-        
-        
-        df_rythme = df_parc.diff().fillna(0)
-        
-        df_rythme_ouverture = df_rythme.clip(lower=0).T.astype(int)
-        df_rythme_fermeture = -1* df_rythme.clip(upper=0).T.astype(int)
-                
-        path_ouverture = pjoin(entrees_gep,"Parc","registre_ouvertures.csv")
-        df_rythme_ouverture.to_csv(path_ouverture,sep=";")
-        
-        path_fermeture = pjoin(entrees_gep,"Parc","registre_fermetures.csv")
-        df_rythme_fermeture.to_csv(path_fermeture,sep=";")
-
-   
-
-    return chemins_gep
-    
-
 def ecriture_registres_generaux(chemin_dossier, donnees_entree, donnees_simulation):
     """
     Ecrit les fichiers de sortie regroupant les données annuelles générales dans le dossier donné.
@@ -3,11 +3,15 @@
 
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import pulp
 import numpy as np
+import scipy.sparse
+import scipy.optimize
 
 import IndicateursEconomiques
+import AgregationTemporelle
 
 
 class ContrainteTrajectoire:
@@ -19,14 +23,13 @@ class ContrainteTrajectoire:
         self.tableau_valeurs_second_membre = tableau_valeurs_second_membre
 
 
-class ProblemeGenerationMixCible(pulp.LpProblem):
+class ProblemeParcGenerationMixCible(pulp.LpProblem):
     """
-    Problème de génération de mix cible.
-
-    Cette classe représente un problème d'optimisation calculant un mix cible qui minimise les coûts en partant d'un
-    certain parc initial et en fixant la trajectoire de certains actifs, elle hérite de la classe de problème linéaire
-    de pulp.
+    Partie du problème de génération de mix cible portant sur l'évolution du parc.
 
+    Cette classe contient les variables de nombre d'unités, les contraintes d'évolution du parc (durée de vie,
+    gisement, ouvertures forcées, contraintes de trajectoire imposées par l'utilisateur) et les coûts de construction
+    et de maintenance. Elle est commune au problème complet et au problème maître de la décomposition de Benders.
 
     Attributs
     ---------
@@ -37,38 +40,19 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
         dictionnaire contenant, pour chaque actif et pour chaque année, les variables de nombre d'unités ouvertes
     nombre_unites_fermees : dict
         dictionnaire contenant, pour chaque actif et pour chaque année, les variables de nombre d'unités fermées
-    production : dict
-        dictionnaire contenant, pour chaque type d'actif, les variables de quantité d'énergie produite pour chaque
-        année, pour chaque météo et à chaque heure
-    defaillance : pulp.LpVariable.dict
-        dictionnaire contenant les variables des puissances non-fournies pour chaque année, pour chaque météo et à
-        chaque heure
-    stock : dict
-        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de stock
-    puissance_charge : dict
-        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de puissance de charge
-    puissance_decharge : dict
-        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de puissance de décharge
     dict_contraintes_personnalisees : dict
         dictionnaire contenant les contraintes personnalisées imposées par l'utilisateur
-    cout_production : pulp.LpAffineExpression
-        expression du coût de production en fonction des variables du problème
-    cout_defaillance : pulp.LpAffineExpression
-        expression du coût de défaillance en fonction des variables du problème
     cout_maintenance : pulp.LpAffineExpression
         expression du coût de maintenance en fonction des variables du problème
     cout_construction : pulp.LpAffineExpression
         expression du coût de construction en fonction des variables du problème
-    cout_total : pulp.LpAffineExpression
-        expression du coût total en fonction des variables du problème
     """
 
-    def __init__(self, donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, df_co2_quota,taux_actualisation = 0):
+    def __init__(self, nom, donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, taux_actualisation=0):
 
-        super().__init__("Generation_mix_cible", pulp.LpMinimize)
+        super().__init__(nom, pulp.LpMinimize)
 
-        #nombre_annees = donnees_entree.parametres_simulation.horizon_simulation + donnees_entree.parametres_simulation.horizon_prevision
-        nombre_annees = donnees_entree.parametres_simulation.horizon_simulation # AL
+        nombre_annees = donnees_entree.parametres_simulation.horizon_simulation
 
         parc_initial = dict()
         for actif in donnees_entree.tous_actifs():
@@ -131,58 +115,6 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
             for actif in donnees_entree.tous_actifs():
                 self.nombre_unites_ouverture_forcee_fermees[actif.cle] = pulp.LpVariable.dict("nombre_unites_ouverture_forcee_fermees_%s" % (actif.cle), range(nombre_annees), lowBound=0, cat="Integer")
                 self.nombre_unites_ouverture_forcee[actif.cle] = pulp.LpVariable.dict("nombre_unites_ouverture_forcee_%s" % (actif.cle), range(nombre_annees), lowBound=0, cat="Integer")
-        
-                   
-        
-        # initialisation des variables de production des actifs hors stockage
-        self.production = dict()
-        for actif_hors_stockage in donnees_entree.actifs_hors_stockage():
-            production_actif = []
-            for annee in range(nombre_annees):
-                production_actif_annee = []
-                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    production_actif_annee_meteo = pulp.LpVariable.dict("production_%s_annee_%d_meteo_%d" % (actif_hors_stockage.cle, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                    production_actif_annee.append(production_actif_annee_meteo)
-                production_actif.append(production_actif_annee)
-            self.production[actif_hors_stockage.cle] = production_actif
-
-        # initialisation des variables de stock, puissance de charge et puissance de décharge des actifs de stockage
-        self.stock = dict()
-        self.puissance_charge = dict()
-        self.puissance_decharge = dict()
-        for actif_stockage in donnees_entree.actifs_stockage():
-            stock_actif = []
-            puissance_charge_actif = []
-            puissance_decharge_actif = []
-            for annee in range(nombre_annees):
-                stock_actif_annee = []
-                puissance_charge_actif_annee = []
-                puissance_decharge_actif_annee = []
-                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    stock_actif_annee_meteo = pulp.LpVariable.dict("stock_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                    puissance_charge_actif_annee_meteo = pulp.LpVariable.dict("puissance_charge_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                    puissance_decharge_actif_annee_meteo = pulp.LpVariable.dict("puissance_decharge_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                    stock_actif_annee.append(stock_actif_annee_meteo)
-                    puissance_charge_actif_annee.append(puissance_charge_actif_annee_meteo)
-                    puissance_decharge_actif_annee.append(puissance_decharge_actif_annee_meteo)
-                stock_actif.append(stock_actif_annee)
-                puissance_charge_actif.append(puissance_charge_actif_annee)
-                puissance_decharge_actif.append(puissance_decharge_actif_annee)
-            self.stock[actif_stockage.cle] = stock_actif
-            self.puissance_charge[actif_stockage.cle] = puissance_charge_actif
-            self.puissance_decharge[actif_stockage.cle] = puissance_decharge_actif
-
-        # initialisation des variables de défaillance
-        self.defaillance = []
-        for annee in range(nombre_annees):
-            defaillance_annee = []
-            donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-            for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                defaillance_annee_meteo = pulp.LpVariable.dict("defaillance_annee_%d_meteo_%d" % (annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                defaillance_annee.append(defaillance_annee_meteo)
-            self.defaillance.append(defaillance_annee)
 
         # ########### #
         # CONTRAINTES #
@@ -213,35 +145,6 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
                     )
                     self.addConstraint(contrainte)
 
-        # contraintes de trajectoire CO2
-        
-        self.liste_contrainte_CO2 = {}
-        
-        for annee in range(nombre_annees):
-
-            quota = df_co2_quota.at["Annee_"+str(annee),"CO2_quota"]
-            
-            if quota < np.inf :
-            
-                print("ecriture des contraintes quota CO2")
-                     
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-
-                    somme_emissions = pulp.lpSum([self.production[actif.cle][annee][indice_meteo][heure]*actif.emission_carbone for actif in donnees_entree.actifs_pilotables() for heure in range(8760) ])
-                    
-                    contrainte = pulp.LpConstraint(
-                        e=somme_emissions,
-                        sense=pulp.LpConstraintLE,
-                        rhs=quota,
-                        name="contrainte_co2_annee_%s_meteo_%s" % (str(annee),str(indice_meteo))
-                        )
-                    
-                    self.addConstraint(contrainte)
-                    self.liste_contrainte_CO2[annee] = contrainte
-
-            else :
-                print("pas d'ecriture de contraintes quota CO2")
-                    
         # contraintes de trajectoire imposées par l'utilisateur
         self.dict_contraintes_personnalisees = dict()
         for contrainte_trajectoire in liste_contraintes_trajectoire:
@@ -299,138 +202,6 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
                 liste_contraintes_personnalisees_annuelles.append(contrainte)
             self.dict_contraintes_personnalisees[nom_contrainte_trajectoire] = liste_contraintes_personnalisees_annuelles
 
-        # contraintes de satisfaction de la demande
-        self.contraintes_satisfaction_demande = []
-        for annee in range(nombre_annees):
-            contraintes_satisfaction_demande_annee = []
-            donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-            for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                contraintes_satisfaction_demande_annee_meteo = []
-                meteo = donnees_annuelles[indice_meteo]
-                for heure in range(8760):
-                    somme_productions = pulp.lpSum([production_actif[annee][indice_meteo][heure] for cle_actif, production_actif in self.production.items()])
-                    somme_puissances_charge = pulp.lpSum([puissance_charge_actif[annee][indice_meteo][heure] for cle_actif, puissance_charge_actif in self.puissance_charge.items()])
-                    somme_puissances_decharge = pulp.lpSum([puissance_decharge_actif[annee][indice_meteo][heure] for cle_actif, puissance_decharge_actif in self.puissance_decharge.items()])
-                    demande = meteo.demande(0, heure)
-                    defaillance = self.defaillance[annee][indice_meteo][heure]
-                    contrainte = pulp.LpConstraint(
-                        e=somme_productions - somme_puissances_charge + somme_puissances_decharge + defaillance,
-                        sense=pulp.LpConstraintEQ,
-                        rhs=demande,
-                        name="satisfaction_demande_annee_%d_meteo_%d_heure_%d" % (annee, indice_meteo, heure)
-                    )
-                    self.addConstraint(contrainte)
-                    contraintes_satisfaction_demande_annee_meteo.append(contrainte)
-                contraintes_satisfaction_demande_annee.append(contraintes_satisfaction_demande_annee_meteo)
-            self.contraintes_satisfaction_demande.append(contraintes_satisfaction_demande_annee)
-
-        # contraintes de continuité du stock
-        for actif_stockage in donnees_entree.actifs_stockage():
-            stock_actif = self.stock[actif_stockage.cle]
-            puissance_decharge_actif = self.puissance_decharge[actif_stockage.cle]
-            puissance_charge_actif = self.puissance_charge[actif_stockage.cle]
-            for annee in range(nombre_annees):
-                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    for heure in range(8760):
-                        stock = stock_actif[annee][indice_meteo][heure]
-                        stock_suivant = stock_actif[annee][indice_meteo][(heure+1)%8760]
-                        puissance_charge = puissance_charge_actif[annee][indice_meteo][heure]
-                        puissance_decharge = puissance_decharge_actif[annee][indice_meteo][heure]
-                        contrainte = pulp.LpConstraint(
-                            e= stock_suivant - stock + puissance_decharge * 1 / actif_stockage.rendement_decharge - puissance_charge * actif_stockage.rendement_charge,
-                            sense=pulp.LpConstraintEQ,
-                            rhs=0,
-                            name="continuite_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
-                        )
-                        self.addConstraint(contrainte)
-
-        # contrainte sur la valeur du stock de départ
-        # ceci revient à contraindre également le stock d'arrivée étant donné le "cycle" formé par les contraintes de
-        # continuité du stock
-        
-        # for actif_stockage in donnees_entree.actifs_stockage():
-            # stock_actif = self.stock[actif_stockage.cle]
-            # nombre_unites_actif = self.nombre_unites[actif_stockage.cle]
-            # for annee in range(nombre_annees):
-                # donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                # for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    # stock_depart = stock_actif[annee][indice_meteo][0]
-                    # valeur_contrainte = nombre_unites_actif[annee] * actif_stockage.capacite * actif_stockage.stock_initial
-                    # contrainte = pulp.LpConstraint(
-                        # e=stock_depart - valeur_contrainte,
-                        # sense=pulp.LpConstraintEQ,
-                        # rhs=0,
-                        # name="stock_initial_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo)
-                    # )
-                    # self.addConstraint(contrainte)
-
-        # contrainte de borne supérieure sur la production
-        for actif in donnees_entree.actifs_hors_stockage():
-            production_actif = self.production[actif.cle]
-            nombre_unites_actif = self.nombre_unites[actif.cle]
-            for annee in range(nombre_annees):
-                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    meteo = donnees_annuelles[indice_meteo]
-                    for heure in range(8760):
-                        production = production_actif[annee][indice_meteo][heure]
-                        borne_superieure_production = None
-                        if(actif.categorie == "ENR"):
-                            borne_superieure_production = nombre_unites_actif[annee] * actif.puissance * meteo.facteur_production_ENR(actif.cle, heure)
-                        else:
-                            borne_superieure_production = nombre_unites_actif[annee] * actif.puissance
-                        contrainte = pulp.LpConstraint(
-                            e=borne_superieure_production - production,
-                            sense=pulp.LpConstraintGE,
-                            rhs=0,
-                            name="borne_superieure_production_%s_annee_%d_meteo_%d_heure_%d" % (actif.cle, annee, indice_meteo, heure)
-                        )
-                        self.addConstraint(contrainte)
-
-        # contraintes de bornes supérieures sur le stock, la puissance de charge et la puissance de décharge
-        for actif_stockage in donnees_entree.actifs_stockage():
-            stock_actif = self.stock[actif_stockage.cle]
-            puissance_charge_actif = self.puissance_charge[actif_stockage.cle]
-            puissance_decharge_actif = self.puissance_decharge[actif_stockage.cle]
-
-            nombre_unites_actif = self.nombre_unites[actif_stockage.cle]
-            for annee in range(nombre_annees):
-                borne_superieure_stock = nombre_unites_actif[annee] * actif_stockage.capacite
-                borne_superieure_puissance_charge = nombre_unites_actif[annee] * actif_stockage.puissance_nominale_charge
-                borne_superieure_puissance_decharge = nombre_unites_actif[annee] * actif_stockage.puissance_nominale_decharge
-
-                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                    for heure in range(8760):
-                        stock = stock_actif[annee][indice_meteo][heure]
-                        puissance_charge = puissance_charge_actif[annee][indice_meteo][heure]
-                        puissance_decharge = puissance_decharge_actif[annee][indice_meteo][heure]
-
-                        contrainte = pulp.LpConstraint(
-                            e=borne_superieure_stock - stock,
-                            sense=pulp.LpConstraintGE,
-                            rhs=0,
-                            name="borne_superieure_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
-                        )
-                        self.addConstraint(contrainte)
-
-                        contrainte = pulp.LpConstraint(
-                            e=borne_superieure_puissance_charge - puissance_charge,
-                            sense=pulp.LpConstraintGE,
-                            rhs=0,
-                            name="borne_superieure_puissance_charge_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
-                        )
-                        self.addConstraint(contrainte)
-
-                        contrainte = pulp.LpConstraint(
-                            e=borne_superieure_puissance_decharge - puissance_decharge,
-                            sense=pulp.LpConstraintGE,
-                            rhs=0,
-                            name="borne_superieure_puissance_decharge_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
-                        )
-                        self.addConstraint(contrainte)
-
         # contraintes imposant que les actifs ne dépassent pas leur durée de vie
         for actif in donnees_entree.tous_actifs():
             duree_vie = actif.duree_vie
@@ -554,54 +325,13 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
                         rhs=0,
                         name="Actif_non_ajoutable_%s_%d" % (actif.cle, annee)
                     )
-                    self.addConstraint(contrainte)                
-                        
-        
-        
+                    self.addConstraint(contrainte)
+
         # ################# #
         # FONCTION OBJECTIF #
         # ################# #
-               
-        
-        self.cout_production = pulp.lpSum([
-            pulp.lpSum([
-                pulp.lpSum([
-                    pulp.lpSum([
-                        pulp.lpSum([
-                            (donnees_entree.ambiance_realisee[annee].prix_combustible(actif_pilotable, 0) / actif_pilotable.rendement + donnees_entree.ambiance_realisee[annee].prix_carbone(0) * actif_pilotable.emission_carbone) * self.production[actif_pilotable.cle][annee][indice_meteo][heure] for heure in range(8760)
-                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
-                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
-                ]) for actif_pilotable in donnees_entree.actifs_pilotables()
-            ]),
-            pulp.lpSum([
-                pulp.lpSum([
-                    pulp.lpSum([
-                        pulp.lpSum([
-                            actif_ENR.cout_variable * self.production[actif_ENR.cle][annee][indice_meteo][heure] for heure in range(8760)
-                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
-                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
-                ]) for actif_ENR in donnees_entree.actifs_ENR()
-            ]),
-            pulp.lpSum([
-                pulp.lpSum([
-                    pulp.lpSum([
-                        pulp.lpSum([
-                            actif_stockage.cout_variable * self.puissance_decharge[actif_stockage.cle][annee][indice_meteo][heure] for heure in range(8760)
-                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
-                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
-                ]) for actif_stockage in donnees_entree.actifs_stockage()])
-            ])
 
-        self.cout_defaillance = pulp.lpSum([
-            pulp.lpSum([
-                pulp.lpSum([
-                    donnees_entree.parametres_simulation.plafond_prix * self.defaillance[annee][indice_meteo][heure] for heure in range(8760)
-                ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
-            ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
-        ])
-        
-            
-        self.cout_construction = pulp.lpSum([
+        self.cout_construction = pulp.lpSum([
             pulp.lpSum([
                 #IndicateursEconomiques.calcul_investissement_IDC_annualise(actif, max(0, annee - actif.duree_construction)) * 1 / (1 + taux_actualisation)**annee * sum([1 / (1 + taux_actualisation)**annee_future for annee_future in range(min(actif.duree_vie, nombre_annees - annee))]) * self.nombre_unites_ouvertes[actif.cle][annee] for annee in range(nombre_annees)
                 IndicateursEconomiques.calcul_investissement_IDC_annualise(actif, max(0, annee - actif.duree_construction)) * 1 / (1 + taux_actualisation) ** annee * sum([1 / (1 + taux_actualisation) ** annee_future for annee_future in range(min(actif.duree_vie, nombre_annees - annee))]) * self.nombre_unites_ouvertes[actif.cle][annee] for annee in range(nombre_annees)
@@ -614,16 +344,532 @@ class ProblemeGenerationMixCible(pulp.LpProblem):
             ]) for actif in donnees_entree.tous_actifs()
         ])
 
+
+class ProblemeGenerationMixCible(ProblemeParcGenerationMixCible):
+    """
+    Problème de génération de mix cible.
+
+    Cette classe représente un problème d'optimisation calculant un mix cible qui minimise les coûts en partant d'un
+    certain parc initial et en fixant la trajectoire de certains actifs. Elle hérite de la classe
+    ProblemeParcGenerationMixCible, qui porte les variables et les contraintes d'évolution du parc, et lui ajoute le
+    dispatch horaire de chaque année et de chaque météo.
+
+
+    Attributs
+    ---------
+    nombre_unites : dict
+        dictionnaire contenant, pour chaque actif et pour chaque année, les variables de nombre d'unités présentes dans
+        le parc
+    nombre_unites_ouvertes : dict
+        dictionnaire contenant, pour chaque actif et pour chaque année, les variables de nombre d'unités ouvertes
+    nombre_unites_fermees : dict
+        dictionnaire contenant, pour chaque actif et pour chaque année, les variables de nombre d'unités fermées
+    production : dict
+        dictionnaire contenant, pour chaque type d'actif, les variables de quantité d'énergie produite pour chaque
+        année, pour chaque météo et à chaque heure
+    defaillance : pulp.LpVariable.dict
+        dictionnaire contenant les variables des puissances non-fournies pour chaque année, pour chaque météo et à
+        chaque heure
+    stock : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de stock
+    puissance_charge : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de puissance de charge
+    puissance_decharge : dict
+        dictionnaire contenant, pour chaque type d'actif de stockage, les variables de puissance de décharge
+    dict_contraintes_personnalisees : dict
+        dictionnaire contenant les contraintes personnalisées imposées par l'utilisateur
+    cout_production : pulp.LpAffineExpression
+        expression du coût de production en fonction des variables du problème
+    cout_defaillance : pulp.LpAffineExpression
+        expression du coût de défaillance en fonction des variables du problème
+    cout_maintenance : pulp.LpAffineExpression
+        expression du coût de maintenance en fonction des variables du problème
+    cout_construction : pulp.LpAffineExpression
+        expression du coût de construction en fonction des variables du problème
+    cout_total : pulp.LpAffineExpression
+        expression du coût total en fonction des variables du problème
+    agregations : list
+        liste contenant, pour chaque année et pour chaque météo, l'agrégation en jours représentatifs utilisée, ou
+        None si le dispatch est écrit sur les 8760 heures
+    heures : list
+        liste contenant, pour chaque année et pour chaque météo, l'heure de l'année de chaque pas de temps du dispatch
+    poids : list
+        liste contenant, pour chaque année et pour chaque météo, le nombre d'heures représentées par chaque pas de
+        temps du dispatch
+    niveaux_stock_debut_jour : dict
+        dictionnaire contenant, pour chaque actif de stockage, année et météo agrégée, les variables de niveau de
+        stock en début de chaque jour de l'année
+
+    Méthodes
+    --------
+    valeurs_horaires(self, variables, annee, indice_meteo)
+        Renvoie les valeurs à chaque heure de l'année des variables de dispatch données.
+    prix_horaires(self, annee, indice_meteo)
+        Renvoie les variables duales des contraintes de satisfaction de la demande à chaque heure de l'année.
+    stock_horaire(self, cle_actif, annee, indice_meteo)
+        Renvoie le stock d'un actif de stockage à chaque heure de l'année.
+    """
+
+    def __init__(self, donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, df_co2_quota,taux_actualisation = 0):
+
+        super().__init__("Generation_mix_cible", donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, taux_actualisation)
+
+        #nombre_annees = donnees_entree.parametres_simulation.horizon_simulation + donnees_entree.parametres_simulation.horizon_prevision
+        nombre_annees = donnees_entree.parametres_simulation.horizon_simulation # AL
+
+        # pas de temps du dispatch : les 8760 heures de l'année, ou les heures des jours représentatifs de chaque
+        # année et de chaque météo si nombre_jours_representatifs est strictement positif
+        self.agregations = []
+        self.heures = []
+        self.poids = []
+        for annee in range(nombre_annees):
+            donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+            agregations_annee = [AgregationTemporelle.agregation_meteo(donnees_entree, donnees_annuelles[indice_meteo]) for indice_meteo in range(donnees_annuelles.nombre_meteos())]
+            self.agregations.append(agregations_annee)
+            self.heures.append([list(range(8760)) if agregation is None else agregation.heures.tolist() for agregation in agregations_annee])
+            self.poids.append([[1.0] * 8760 if agregation is None else agregation.poids.tolist() for agregation in agregations_annee])
+
+        # initialisation des variables de production des actifs hors stockage
+        self.production = dict()
+        for actif_hors_stockage in donnees_entree.actifs_hors_stockage():
+            production_actif = []
+            for annee in range(nombre_annees):
+                production_actif_annee = []
+                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    production_actif_annee_meteo = pulp.LpVariable.dict("production_%s_annee_%d_meteo_%d" % (actif_hors_stockage.cle, annee, indice_meteo), range(len(self.heures[annee][indice_meteo])), lowBound=0, cat="Continuous")
+                    production_actif_annee.append(production_actif_annee_meteo)
+                production_actif.append(production_actif_annee)
+            self.production[actif_hors_stockage.cle] = production_actif
+
+        # initialisation des variables de stock, puissance de charge et puissance de décharge des actifs de stockage
+        self.stock = dict()
+        self.puissance_charge = dict()
+        self.puissance_decharge = dict()
+        for actif_stockage in donnees_entree.actifs_stockage():
+            stock_actif = []
+            puissance_charge_actif = []
+            puissance_decharge_actif = []
+            for annee in range(nombre_annees):
+                stock_actif_annee = []
+                puissance_charge_actif_annee = []
+                puissance_decharge_actif_annee = []
+                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    pas_temps = range(len(self.heures[annee][indice_meteo]))
+                    # avec des jours représentatifs, les variables de stock portent la variation du stock depuis le
+                    # début de la journée, qui peut être négative
+                    borne_inferieure_stock = 0
+                    if self.agregations[annee][indice_meteo] is not None:
+                        borne_inferieure_stock = None
+                    stock_actif_annee_meteo = pulp.LpVariable.dict("stock_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), pas_temps, lowBound=borne_inferieure_stock, cat="Continuous")
+                    puissance_charge_actif_annee_meteo = pulp.LpVariable.dict("puissance_charge_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), pas_temps, lowBound=0, cat="Continuous")
+                    puissance_decharge_actif_annee_meteo = pulp.LpVariable.dict("puissance_decharge_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo), pas_temps, lowBound=0, cat="Continuous")
+                    stock_actif_annee.append(stock_actif_annee_meteo)
+                    puissance_charge_actif_annee.append(puissance_charge_actif_annee_meteo)
+                    puissance_decharge_actif_annee.append(puissance_decharge_actif_annee_meteo)
+                stock_actif.append(stock_actif_annee)
+                puissance_charge_actif.append(puissance_charge_actif_annee)
+                puissance_decharge_actif.append(puissance_decharge_actif_annee)
+            self.stock[actif_stockage.cle] = stock_actif
+            self.puissance_charge[actif_stockage.cle] = puissance_charge_actif
+            self.puissance_decharge[actif_stockage.cle] = puissance_decharge_actif
+
+        # initialisation des variables de défaillance
+        self.defaillance = []
+        for annee in range(nombre_annees):
+            defaillance_annee = []
+            donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+            for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                defaillance_annee_meteo = pulp.LpVariable.dict("defaillance_annee_%d_meteo_%d" % (annee, indice_meteo), range(len(self.heures[annee][indice_meteo])), lowBound=0, cat="Continuous")
+                defaillance_annee.append(defaillance_annee_meteo)
+            self.defaillance.append(defaillance_annee)
+
+        # ########### #
+        # CONTRAINTES #
+        # ########### #
+
+        # contraintes de trajectoire CO2
+        
+        self.liste_contrainte_CO2 = {}
+        
+        for annee in range(nombre_annees):
+
+            quota = df_co2_quota.at["Annee_"+str(annee),"CO2_quota"]
+            
+            if quota < np.inf :
+            
+                print("ecriture des contraintes quota CO2")
+                     
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+
+                    poids = self.poids[annee][indice_meteo]
+                    somme_emissions = pulp.lpSum([poids[pas]*self.production[actif.cle][annee][indice_meteo][pas]*actif.emission_carbone for actif in donnees_entree.actifs_pilotables() for pas in range(len(poids)) ])
+                    
+                    contrainte = pulp.LpConstraint(
+                        e=somme_emissions,
+                        sense=pulp.LpConstraintLE,
+                        rhs=quota,
+                        name="contrainte_co2_annee_%s_meteo_%s" % (str(annee),str(indice_meteo))
+                        )
+                    
+                    self.addConstraint(contrainte)
+                    self.liste_contrainte_CO2[annee] = contrainte
+
+            else :
+                print("pas d'ecriture de contraintes quota CO2")
+                    
+        # contraintes de satisfaction de la demande
+        self.contraintes_satisfaction_demande = []
+        for annee in range(nombre_annees):
+            contraintes_satisfaction_demande_annee = []
+            donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+            for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                contraintes_satisfaction_demande_annee_meteo = []
+                meteo = donnees_annuelles[indice_meteo]
+                for pas, heure in enumerate(self.heures[annee][indice_meteo]):
+                    somme_productions = pulp.lpSum([production_actif[annee][indice_meteo][pas] for cle_actif, production_actif in self.production.items()])
+                    somme_puissances_charge = pulp.lpSum([puissance_charge_actif[annee][indice_meteo][pas] for cle_actif, puissance_charge_actif in self.puissance_charge.items()])
+                    somme_puissances_decharge = pulp.lpSum([puissance_decharge_actif[annee][indice_meteo][pas] for cle_actif, puissance_decharge_actif in self.puissance_decharge.items()])
+                    demande = meteo.demande(0, heure)
+                    defaillance = self.defaillance[annee][indice_meteo][pas]
+                    contrainte = pulp.LpConstraint(
+                        e=somme_productions - somme_puissances_charge + somme_puissances_decharge + defaillance,
+                        sense=pulp.LpConstraintEQ,
+                        rhs=demande,
+                        name="satisfaction_demande_annee_%d_meteo_%d_heure_%d" % (annee, indice_meteo, heure)
+                    )
+                    self.addConstraint(contrainte)
+                    contraintes_satisfaction_demande_annee_meteo.append(contrainte)
+                contraintes_satisfaction_demande_annee.append(contraintes_satisfaction_demande_annee_meteo)
+            self.contraintes_satisfaction_demande.append(contraintes_satisfaction_demande_annee)
+
+        # contraintes de continuité du stock
+        self.niveaux_stock_debut_jour = dict()
+        for actif_stockage in donnees_entree.actifs_stockage():
+            stock_actif = self.stock[actif_stockage.cle]
+            puissance_decharge_actif = self.puissance_decharge[actif_stockage.cle]
+            puissance_charge_actif = self.puissance_charge[actif_stockage.cle]
+            for annee in range(nombre_annees):
+                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    agregation = self.agregations[annee][indice_meteo]
+                    if agregation is not None:
+                        # le stock est enchaîné entre les jours de l'année à travers leurs jours représentatifs
+                        self.niveaux_stock_debut_jour[actif_stockage.cle, annee, indice_meteo] = AgregationTemporelle.contraintes_stockage_jours_representatifs(
+                            self,
+                            agregation,
+                            stock_actif[annee][indice_meteo],
+                            puissance_charge_actif[annee][indice_meteo],
+                            puissance_decharge_actif[annee][indice_meteo],
+                            self.nombre_unites[actif_stockage.cle][annee] * actif_stockage.capacite,
+                            actif_stockage.rendement_charge,
+                            actif_stockage.rendement_decharge,
+                            "%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo)
+                        )
+                        continue
+                    for heure in range(8760):
+                        stock = stock_actif[annee][indice_meteo][heure]
+                        stock_suivant = stock_actif[annee][indice_meteo][(heure+1)%8760]
+                        puissance_charge = puissance_charge_actif[annee][indice_meteo][heure]
+                        puissance_decharge = puissance_decharge_actif[annee][indice_meteo][heure]
+                        contrainte = pulp.LpConstraint(
+                            e= stock_suivant - stock + puissance_decharge * 1 / actif_stockage.rendement_decharge - puissance_charge * actif_stockage.rendement_charge,
+                            sense=pulp.LpConstraintEQ,
+                            rhs=0,
+                            name="continuite_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
+                        )
+                        self.addConstraint(contrainte)
+
+        # contrainte sur la valeur du stock de départ
+        # ceci revient à contraindre également le stock d'arrivée étant donné le "cycle" formé par les contraintes de
+        # continuité du stock
+        
+        # for actif_stockage in donnees_entree.actifs_stockage():
+            # stock_actif = self.stock[actif_stockage.cle]
+            # nombre_unites_actif = self.nombre_unites[actif_stockage.cle]
+            # for annee in range(nombre_annees):
+                # donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                # for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    # stock_depart = stock_actif[annee][indice_meteo][0]
+                    # valeur_contrainte = nombre_unites_actif[annee] * actif_stockage.capacite * actif_stockage.stock_initial
+                    # contrainte = pulp.LpConstraint(
+                        # e=stock_depart - valeur_contrainte,
+                        # sense=pulp.LpConstraintEQ,
+                        # rhs=0,
+                        # name="stock_initial_%s_annee_%d_meteo_%d" % (actif_stockage.cle, annee, indice_meteo)
+                    # )
+                    # self.addConstraint(contrainte)
+
+        # contrainte de borne supérieure sur la production
+        for actif in donnees_entree.actifs_hors_stockage():
+            production_actif = self.production[actif.cle]
+            nombre_unites_actif = self.nombre_unites[actif.cle]
+            for annee in range(nombre_annees):
+                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    meteo = donnees_annuelles[indice_meteo]
+                    for pas, heure in enumerate(self.heures[annee][indice_meteo]):
+                        production = production_actif[annee][indice_meteo][pas]
+                        borne_superieure_production = None
+                        if(actif.categorie == "ENR"):
+                            borne_superieure_production = nombre_unites_actif[annee] * actif.puissance * meteo.facteur_production_ENR(actif.cle, heure)
+                        else:
+                            borne_superieure_production = nombre_unites_actif[annee] * actif.puissance
+                        contrainte = pulp.LpConstraint(
+                            e=borne_superieure_production - production,
+                            sense=pulp.LpConstraintGE,
+                            rhs=0,
+                            name="borne_superieure_production_%s_annee_%d_meteo_%d_heure_%d" % (actif.cle, annee, indice_meteo, heure)
+                        )
+                        self.addConstraint(contrainte)
+
+        # contraintes de bornes supérieures sur le stock, la puissance de charge et la puissance de décharge
+        for actif_stockage in donnees_entree.actifs_stockage():
+            stock_actif = self.stock[actif_stockage.cle]
+            puissance_charge_actif = self.puissance_charge[actif_stockage.cle]
+            puissance_decharge_actif = self.puissance_decharge[actif_stockage.cle]
+
+            nombre_unites_actif = self.nombre_unites[actif_stockage.cle]
+            for annee in range(nombre_annees):
+                borne_superieure_stock = nombre_unites_actif[annee] * actif_stockage.capacite
+                borne_superieure_puissance_charge = nombre_unites_actif[annee] * actif_stockage.puissance_nominale_charge
+                borne_superieure_puissance_decharge = nombre_unites_actif[annee] * actif_stockage.puissance_nominale_decharge
+
+                donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+                for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                    for pas, heure in enumerate(self.heures[annee][indice_meteo]):
+                        stock = stock_actif[annee][indice_meteo][pas]
+                        puissance_charge = puissance_charge_actif[annee][indice_meteo][pas]
+                        puissance_decharge = puissance_decharge_actif[annee][indice_meteo][pas]
+
+                        # avec des jours représentatifs, les bornes du stock sont imposées jour par jour par
+                        # AgregationTemporelle.contraintes_stockage_jours_representatifs
+                        if self.agregations[annee][indice_meteo] is None:
+                            contrainte = pulp.LpConstraint(
+                                e=borne_superieure_stock - stock,
+                                sense=pulp.LpConstraintGE,
+                                rhs=0,
+                                name="borne_superieure_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
+                            )
+                            self.addConstraint(contrainte)
+
+                        contrainte = pulp.LpConstraint(
+                            e=borne_superieure_puissance_charge - puissance_charge,
+                            sense=pulp.LpConstraintGE,
+                            rhs=0,
+                            name="borne_superieure_puissance_charge_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
+                        )
+                        self.addConstraint(contrainte)
+
+                        contrainte = pulp.LpConstraint(
+                            e=borne_superieure_puissance_decharge - puissance_decharge,
+                            sense=pulp.LpConstraintGE,
+                            rhs=0,
+                            name="borne_superieure_puissance_decharge_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage.cle, annee, indice_meteo, heure)
+                        )
+                        self.addConstraint(contrainte)
+
+        # ################# #
+        # FONCTION OBJECTIF #
+        # ################# #
+               
+        
+        self.cout_production = pulp.lpSum([
+            pulp.lpSum([
+                pulp.lpSum([
+                    pulp.lpSum([
+                        pulp.lpSum([
+                            (donnees_entree.ambiance_realisee[annee].prix_combustible(actif_pilotable, 0) / actif_pilotable.rendement + donnees_entree.ambiance_realisee[annee].prix_carbone(0) * actif_pilotable.emission_carbone) * self.poids[annee][indice_meteo][pas] * self.production[actif_pilotable.cle][annee][indice_meteo][pas] for pas in range(len(self.heures[annee][indice_meteo]))
+                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
+                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
+                ]) for actif_pilotable in donnees_entree.actifs_pilotables()
+            ]),
+            pulp.lpSum([
+                pulp.lpSum([
+                    pulp.lpSum([
+                        pulp.lpSum([
+                            actif_ENR.cout_variable * self.poids[annee][indice_meteo][pas] * self.production[actif_ENR.cle][annee][indice_meteo][pas] for pas in range(len(self.heures[annee][indice_meteo]))
+                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
+                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
+                ]) for actif_ENR in donnees_entree.actifs_ENR()
+            ]),
+            pulp.lpSum([
+                pulp.lpSum([
+                    pulp.lpSum([
+                        pulp.lpSum([
+                            actif_stockage.cout_variable * self.poids[annee][indice_meteo][pas] * self.puissance_decharge[actif_stockage.cle][annee][indice_meteo][pas] for pas in range(len(self.heures[annee][indice_meteo]))
+                        ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
+                    ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
+                ]) for actif_stockage in donnees_entree.actifs_stockage()])
+            ])
+
+        self.cout_defaillance = pulp.lpSum([
+            pulp.lpSum([
+                pulp.lpSum([
+                    donnees_entree.parametres_simulation.plafond_prix * self.poids[annee][indice_meteo][pas] * self.defaillance[annee][indice_meteo][pas] for pas in range(len(self.heures[annee][indice_meteo]))
+                ]) for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos())
+            ]) / max(1, donnees_entree.ambiance_realisee[annee].nombre_meteos()) * 1 / (1 + taux_actualisation)**annee for annee in range(nombre_annees)
+        ])
+
         self.cout_total = pulp.lpSum([self.cout_production, self.cout_defaillance, self.cout_construction, self.cout_maintenance])
 
         self.setObjective(self.cout_total)
 
+    def valeurs_horaires(self, variables, annee, indice_meteo):
+        """
+        Renvoie les valeurs à chaque heure de l'année des variables de dispatch données, reconstituées à partir des
+        jours représentatifs si l'année et la météo sont agrégées.
+
+        Paramètres
+        ----------
+        variables : dict
+            variables de dispatch de l'année et de la météo, indexées par pas de temps
+        annee : int
+            année des variables
+        indice_meteo : int
+            indice de la météo des variables
+
+        Retours
+        -------
+        list
+            valeurs des variables à chaque heure de l'année
+        """
+
+        valeurs = [variables[pas].value() for pas in range(len(self.heures[annee][indice_meteo]))]
+        agregation = self.agregations[annee][indice_meteo]
+        if agregation is None:
+            return valeurs
+        return list(agregation.reconstitution(valeurs))
+
+    def prix_horaires(self, annee, indice_meteo):
+        """
+        Renvoie les variables duales des contraintes de satisfaction de la demande à chaque heure de l'année. Pour une
+        année et une météo agrégées, la variable duale d'un pas de temps est rapportée au nombre d'heures qu'il
+        représente.
+
+        Paramètres
+        ----------
+        annee : int
+            année considérée
+        indice_meteo : int
+            indice de la météo considérée
+
+        Retours
+        -------
+        list
+            variables duales à chaque heure de l'année
+        """
+
+        contraintes = self.contraintes_satisfaction_demande[annee][indice_meteo]
+        agregation = self.agregations[annee][indice_meteo]
+        if agregation is None:
+            return [contrainte.pi for contrainte in contraintes]
+        return list(agregation.reconstitution(np.array([contrainte.pi for contrainte in contraintes]) / agregation.poids))
+
+    def stock_horaire(self, cle_actif, annee, indice_meteo):
+        """
+        Renvoie le stock d'un actif de stockage à chaque heure de l'année.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif de stockage
+        annee : int
+            année considérée
+        indice_meteo : int
+            indice de la météo considérée
+
+        Retours
+        -------
+        list
+            stock à chaque heure de l'année
+        """
+
+        stock = self.stock[cle_actif][annee][indice_meteo]
+        agregation = self.agregations[annee][indice_meteo]
+        if agregation is None:
+            return [stock[heure].value() for heure in range(8760)]
+        niveaux_stock_debut_jour = self.niveaux_stock_debut_jour[cle_actif, annee, indice_meteo]
+        valeurs_stock = [stock[pas].value() for pas in range(agregation.nombre_pas)]
+        valeurs_niveaux = [niveaux_stock_debut_jour[jour].value() for jour in range(AgregationTemporelle.NOMBRE_JOURS)]
+        return list(AgregationTemporelle.stock_horaire(agregation, valeurs_stock, valeurs_niveaux))
+
+
+def rapport_erreur_agregation(donnees_entree, probleme, df_co2_quota, taux_actualisation, registre_couts, registre_annuel):
+    """
+    Mesure l'erreur commise par l'agrégation en jours représentatifs du problème de génération de mix cible et
+    l'ajoute aux registres.
+
+    Deux erreurs sont mesurées : l'erreur sur les chroniques de demande et de facteurs de production reconstituées à
+    partir des jours représentatifs, et l'erreur sur le coût d'exploitation (production et défaillance). Pour cette
+    dernière, le parc obtenu est évalué par un dispatch sur les 8760 heures de chaque année et de chaque météo.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    probleme : ProblemeGenerationMixCible
+        problème agrégé résolu
+    df_co2_quota : pandas.DataFrame
+        quotas d'émissions de CO2 de chaque année
+    taux_actualisation : float
+        taux d'actualisation utilisé dans le problème
+    registre_couts : dict
+        registre des coûts, complété par le coût d'exploitation sur les heures complètes et l'erreur relative
+    registre_annuel : dict
+        registre annuel, complété par les erreurs moyennes sur les chroniques de chaque année
+    """
+
+    nombre_annees = donnees_entree.parametres_simulation.horizon_simulation
+
+    cout_exploitation_heures_completes = 0
+    erreurs_chroniques = dict()
+    for annee in range(nombre_annees):
+        donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+        nombre_unites = {actif.cle: max(0, probleme.nombre_unites[actif.cle][annee].value()) for actif in donnees_entree.tous_actifs()}
+        quota = df_co2_quota.at["Annee_"+str(annee), "CO2_quota"]
+        for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+            agregation = probleme.agregations[annee][indice_meteo]
+            meteo = donnees_annuelles[indice_meteo]
+
+            series = AgregationTemporelle.series_meteo(donnees_entree, meteo)
+            for cle_registre, erreur in AgregationTemporelle.erreurs_series(agregation, series).items():
+                if cle_registre not in erreurs_chroniques:
+                    erreurs_chroniques[cle_registre] = np.zeros(nombre_annees)
+                erreurs_chroniques[cle_registre][annee] += erreur / donnees_annuelles.nombre_meteos()
+
+            sous_probleme = SousProblemeGenerationMixCible(donnees_entree, annee, indice_meteo, quota, taux_actualisation)
+            resultat = sous_probleme.resoudre(nombre_unites)
+            if not(resultat["status"] == 1):
+                print("/!\\ /!\\ LE DISPATCH SUR LES HEURES COMPLETES N'A PAS PU ETRE RESOLU /!\\ /!\\")
+                continue
+            cout_exploitation_heures_completes += resultat["cout"]
+
+    cout_exploitation_agrege = registre_couts["cout_production"][0] + registre_couts["cout_defaillance"][0]
+    erreur_cout_exploitation = 0
+    if cout_exploitation_heures_completes != 0:
+        erreur_cout_exploitation = (cout_exploitation_agrege - cout_exploitation_heures_completes) / abs(cout_exploitation_heures_completes)
+
+    print("coût d'exploitation sur les jours représentatifs : ", cout_exploitation_agrege)
+    print("coût d'exploitation sur les heures complètes : ", cout_exploitation_heures_completes)
+    print("erreur relative d'agrégation sur le coût d'exploitation : ", erreur_cout_exploitation)
+
+    registre_couts["cout_exploitation_heures_completes"] = [cout_exploitation_heures_completes]
+    registre_couts["erreur_agregation_cout_exploitation"] = [erreur_cout_exploitation]
+    registre_annuel.update(erreurs_chroniques)
+
 
 def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim,df_co2_quota,taux_actualisation=0.0):
     """
     Génère un mix cible en optimisant les trajectoires des actifs non-contraints pour minimiser les coûts de
     construction, de production, de défaillance et de maintenance, éventuellement actualisés.
 
+    Si nombre_jours_representatifs est strictement positif, le dispatch de chaque année et de chaque météo est écrit
+    sur des jours représentatifs et l'erreur d'agrégation est ajoutée aux registres. Les jours représentatifs ne
+    s'appliquent qu'au problème complet : la décomposition de Benders (decomposition_generation_mix_cible) écrit ses
+    sous-problèmes sur les 8760 heures et refuse un nombre de jours représentatifs non nul.
+
     Paramètres
     ----------
     donnees_entree : DonneesEntree.DonneesEntree
@@ -641,6 +887,9 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
         dictionnaire contenant, pour chaque actif, la trajectoire cible
     """
 
+    if donnees_entree.parametres_simulation.decomposition_generation_mix_cible:
+        return generation_mix_cible_benders(donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, df_co2_quota, taux_actualisation)
+
     probleme_genration_mix_cible = ProblemeGenerationMixCible(donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim,df_co2_quota,taux_actualisation)
 
     
@@ -686,8 +935,9 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
     heures_defaillance = np.zeros(nombre_annees, dtype=int)
     volume_defaillance = np.zeros(nombre_annees)
     for annee in range(nombre_annees):
-        heures_defaillance[annee] = sum([1 * (probleme_genration_mix_cible.defaillance[annee][0][heure].value() > 0) for heure in range(8760)])
-        volume_defaillance[annee] = sum([probleme_genration_mix_cible.defaillance[annee][0][heure].value() for heure in range(8760)])
+        defaillance_horaire = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.defaillance[annee][0], annee, 0)
+        heures_defaillance[annee] = sum([1 * (defaillance_horaire[heure] > 0) for heure in range(8760)])
+        volume_defaillance[annee] = sum([defaillance_horaire[heure] for heure in range(8760)])
     print(heures_defaillance)
     print(volume_defaillance)
 
@@ -695,7 +945,8 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
     for actif_renouvelable in donnees_entree.actifs_ENR():
         ecretement_actif = []
         for annee in range(nombre_annees):
-            ecretement_actif_annee = sum([probleme_genration_mix_cible.nombre_unites[actif_renouvelable.cle][annee].value() * actif_renouvelable.puissance * donnees_entree.ambiance_realisee[annee][0].facteur_production_ENR(actif_renouvelable.cle, heure) - probleme_genration_mix_cible.production[actif_renouvelable.cle][annee][0][heure].value() for heure in range(8760)])
+            production_horaire = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.production[actif_renouvelable.cle][annee][0], annee, 0)
+            ecretement_actif_annee = sum([probleme_genration_mix_cible.nombre_unites[actif_renouvelable.cle][annee].value() * actif_renouvelable.puissance * donnees_entree.ambiance_realisee[annee][0].facteur_production_ENR(actif_renouvelable.cle, heure) - production_horaire[heure] for heure in range(8760)])
             ecretement_actif.append(ecretement_actif_annee)
         ecretement[actif_renouvelable.cle] = ecretement_actif
     print(ecretement)
@@ -707,6 +958,79 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
     registre_couts["cout_maintenance"] = [probleme_genration_mix_cible.cout_maintenance.value()]
     registre_couts["cout_total"] = [probleme_genration_mix_cible.cout_total.value()]
 
+    mix_cible, registre_annuel = registres_parc(donnees_entree, probleme_genration_mix_cible)
+
+    variables_duales_CO2 = []
+    
+    for annee in range(nombre_annees):
+        if annee in probleme_genration_mix_cible.liste_contrainte_CO2.keys():
+            variables_duales_CO2.append( -1* probleme_genration_mix_cible.liste_contrainte_CO2[annee].pi    )
+        else :
+             variables_duales_CO2.append(0)
+             
+    variables_duales_CO2 = np.array(variables_duales_CO2)
+    
+    registre_annuel["variables_duales_co2"] = variables_duales_CO2
+
+    if donnees_entree.parametres_simulation.nombre_jours_representatifs > 0:
+        rapport_erreur_agregation(donnees_entree, probleme_genration_mix_cible, df_co2_quota, taux_actualisation, registre_couts, registre_annuel)
+    
+    registre_horaire = []
+
+    for annee in range(nombre_annees):
+        liste_donnees_horaires_annee = []
+        donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+        for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+        
+            meteo = donnees_annuelles[indice_meteo]
+            
+            donnees_horaires_meteo_annee = dict()
+            for actif in donnees_entree.actifs_hors_stockage():
+                production = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.production[actif.cle][annee][indice_meteo], annee, indice_meteo)
+                donnees_horaires_meteo_annee["production_%s"%actif.cle] = production
+                if(actif.categorie == "ENR"):
+                    ecretement =  [  ((actif.puissance* probleme_genration_mix_cible.nombre_unites[actif.cle][annee].value() * meteo.facteur_production_ENR(actif.cle, heure))  - production[heure]) for heure in range(8760)]
+                    donnees_horaires_meteo_annee["ecretement_%s"%actif.cle] = ecretement
+            for actif_stockage in donnees_entree.actifs_stockage():
+                puissance_charge = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.puissance_charge[actif_stockage.cle][annee][indice_meteo], annee, indice_meteo)
+                puissance_decharge = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.puissance_decharge[actif_stockage.cle][annee][indice_meteo], annee, indice_meteo)
+                stock = probleme_genration_mix_cible.stock_horaire(actif_stockage.cle, annee, indice_meteo)
+                donnees_horaires_meteo_annee["puissance_charge_%s" % actif_stockage.cle] = puissance_charge
+                donnees_horaires_meteo_annee["puissance_decharge_%s" % actif_stockage.cle] = puissance_decharge
+                donnees_horaires_meteo_annee["stock_%s" % actif_stockage.cle] = stock
+            prix_horaires = probleme_genration_mix_cible.prix_horaires(annee, indice_meteo)
+            donnees_horaires_meteo_annee["prix_horaire"] = prix_horaires
+            defaillance = probleme_genration_mix_cible.valeurs_horaires(probleme_genration_mix_cible.defaillance[annee][indice_meteo], annee, indice_meteo)
+            donnees_horaires_meteo_annee["defaillance"] = defaillance
+            donnees_horaires_meteo_annee["demande"] = [ meteo.demande(0, heure)  for heure in range(8760)]
+            liste_donnees_horaires_annee.append(donnees_horaires_meteo_annee)
+        registre_horaire.append(liste_donnees_horaires_annee)
+
+    return mix_cible, registre_couts, registre_annuel, registre_horaire,probleme_genration_mix_cible
+
+
+def registres_parc(donnees_entree, probleme):
+    """
+    Extrait le mix cible et le registre annuel d'un problème de génération de mix cible résolu.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    probleme : ProblemeParcGenerationMixCible
+        problème résolu, complet ou maître
+
+    Retours
+    -------
+    dict
+        dictionnaire contenant, pour chaque actif, la trajectoire cible
+    dict
+        registre annuel des nombres d'unités, des ouvertures, des fermetures, des coûts variables et des variables
+        duales des contraintes personnalisées
+    """
+
+    nombre_annees = donnees_entree.parametres_simulation.horizon_simulation
+
     mix_cible = dict()
     registre_annuel = dict()
     
@@ -718,9 +1042,9 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
         nb_fermeture_non_arrondie = np.zeros(nombre_annees, dtype=float)
           
         
-        variables_nombres_unites_actif = probleme_genration_mix_cible.nombre_unites[actif.cle]
-        variables_ouvertures = probleme_genration_mix_cible.nombre_unites_ouvertes[actif.cle]
-        variables_fermetures = probleme_genration_mix_cible.nombre_unites_fermees[actif.cle]
+        variables_nombres_unites_actif = probleme.nombre_unites[actif.cle]
+        variables_ouvertures = probleme.nombre_unites_ouvertes[actif.cle]
+        variables_fermetures = probleme.nombre_unites_fermees[actif.cle]
         
         for annee in range(nombre_annees):
             trajectoire_actif[annee] = round(variables_nombres_unites_actif[annee].value(), 0)
@@ -745,53 +1069,494 @@ def generation_mix_cible(donnees_entree, donnees_simulation, liste_contraintes_t
         registre_annuel["couts_variables_%s" % actif.cle] = couts_variables
 
     # écriture des valeurs des variables duales des contraintes personnalisées
-    for nom_contrainte_trajectoire, liste_contraintes_personnalisees_annuelles in probleme_genration_mix_cible.dict_contraintes_personnalisees.items():
+    for nom_contrainte_trajectoire, liste_contraintes_personnalisees_annuelles in probleme.dict_contraintes_personnalisees.items():
         valeurs_variables_duales = np.array([contrainte.pi for contrainte in liste_contraintes_personnalisees_annuelles])
         registre_annuel["variables_duales_%s"%nom_contrainte_trajectoire] = valeurs_variables_duales
-    
-    
-    variables_duales_CO2 = []
-    
-    for annee in range(nombre_annees):
-        if annee in probleme_genration_mix_cible.liste_contrainte_CO2.keys():
-            variables_duales_CO2.append( -1* probleme_genration_mix_cible.liste_contrainte_CO2[annee].pi    )
-        else :
-             variables_duales_CO2.append(0)
-             
-    variables_duales_CO2 = np.array(variables_duales_CO2)
-    
-    registre_annuel["variables_duales_co2"] = variables_duales_CO2
-    
-    registre_horaire = []
 
-    for annee in range(nombre_annees):
-        liste_donnees_horaires_annee = []
+    return mix_cible, registre_annuel
+
+
+class ProblemeMaitreGenerationMixCible(ProblemeParcGenerationMixCible):
+    """
+    Problème maître de la décomposition de Benders du problème de génération de mix cible.
+
+    Cette classe porte les variables et les contraintes d'évolution du parc héritées de ProblemeParcGenerationMixCible.
+    Le coût de dispatch de chaque année et de chaque météo y est représenté par une variable minorée par les coupes
+    de Benders calculées à partir des sous-problèmes de dispatch.
+
+    Attributs
+    ---------
+    cout_dispatch : dict
+        dictionnaire contenant, pour chaque couple (année, indice de météo), la variable approximant le coût de
+        dispatch pondéré correspondant
+    coupes : list
+        liste des coupes de Benders ajoutées au problème
+    cout_total : pulp.LpAffineExpression
+        expression du coût total en fonction des variables du problème
+
+    Méthodes
+    --------
+    ajout_coupe(self, annee, indice_meteo, cout, gradient, nombre_unites)
+        Ajoute une coupe de Benders pour une année et une météo.
+    """
+
+    def __init__(self, donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, taux_actualisation=0):
+
+        super().__init__("Generation_mix_cible_maitre", donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, taux_actualisation)
+
+        nombre_annees = donnees_entree.parametres_simulation.horizon_simulation
+
+        # les coûts de dispatch étant positifs, les variables les approximant sont bornées inférieurement par 0, ce qui
+        # évite que le problème maître soit non borné avant l'ajout des premières coupes
+        self.cout_dispatch = dict()
+        for annee in range(nombre_annees):
+            for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos()):
+                self.cout_dispatch[annee, indice_meteo] = pulp.LpVariable("cout_dispatch_annee_%d_meteo_%d" % (annee, indice_meteo), lowBound=0, cat="Continuous")
+
+        self.coupes = []
+
+        self.cout_total = pulp.lpSum([pulp.lpSum(list(self.cout_dispatch.values())), self.cout_construction, self.cout_maintenance])
+
+        self.setObjective(self.cout_total)
+
+    def ajout_coupe(self, annee, indice_meteo, cout, gradient, nombre_unites):
+        """
+        Ajoute une coupe de Benders pour une année et une météo.
+
+        La coupe minore le coût de dispatch par son approximation au premier ordre autour du nombre d'unités pour
+        lequel le sous-problème a été résolu.
+
+        Paramètres
+        ----------
+        annee : int
+            année du sous-problème
+        indice_meteo : int
+            indice de la météo du sous-problème
+        cout : float
+            coût de dispatch pondéré obtenu par le sous-problème
+        gradient : dict
+            dictionnaire contenant, pour chaque actif, la dérivée du coût de dispatch par rapport à son nombre d'unités
+        nombre_unites : dict
+            dictionnaire contenant, pour chaque actif, le nombre d'unités pour lequel le sous-problème a été résolu
+        """
+
+        contrainte = pulp.LpConstraint(
+            e=self.cout_dispatch[annee, indice_meteo] - pulp.lpSum([derivee * self.nombre_unites[cle][annee] for cle, derivee in gradient.items()]),
+            sense=pulp.LpConstraintGE,
+            rhs=cout - sum([derivee * nombre_unites[cle] for cle, derivee in gradient.items()]),
+            name="coupe_benders_%d_annee_%d_meteo_%d" % (len(self.coupes), annee, indice_meteo)
+        )
+        self.addConstraint(contrainte)
+        self.coupes.append(contrainte)
+
+
+class SousProblemeGenerationMixCible:
+    """
+    Sous-problème de dispatch horaire d'une année et d'une météo du problème de génération de mix cible décomposé.
+
+    Pour un nombre d'unités de chaque actif fixé par le problème maître, le sous-problème calcule le dispatch horaire
+    de coût minimal avec les mêmes contraintes que le problème complet. Il est écrit sous forme matricielle et résolu
+    par scipy.optimize.linprog. Les nombres d'unités n'interviennent que dans les bornes supérieures des variables :
+    les variables duales de ces bornes donnent la dérivée du coût par rapport au nombre d'unités de chaque actif.
+
+    La matrice du problème n'est construite qu'au moment de la résolution, seules les données horaires de l'année et
+    de la météo sont conservées.
+
+    Attributs
+    ---------
+    annee : int
+        année du sous-problème
+    indice_meteo : int
+        indice de la météo du sous-problème
+    ponderation : float
+        poids du sous-problème dans la fonction objectif, qui tient compte du nombre de météos et de l'actualisation
+    demande : np.array
+        demande horaire
+    couts_production : dict
+        dictionnaire contenant, pour chaque actif hors stockage, le coût variable de production
+    productibles_unitaires : dict
+        dictionnaire contenant, pour chaque actif hors stockage, la production horaire maximale d'une unité
+    emissions : dict
+        dictionnaire contenant, pour chaque actif pilotable, l'émission de CO2 par unité d'énergie produite
+    actifs_stockage : list
+        liste des caractéristiques des actifs de stockage
+    quota_co2 : float
+        quota d'émissions de CO2 de l'année
+    plafond_prix : float
+        coût de la défaillance
+
+    Méthodes
+    --------
+    resoudre(self, nombre_unites)
+        Résout le sous-problème pour un nombre d'unités donné.
+    """
+
+    def __init__(self, donnees_entree, annee, indice_meteo, quota_co2, taux_actualisation=0):
         donnees_annuelles = donnees_entree.ambiance_realisee[annee]
-        for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-        
-            meteo = donnees_annuelles[indice_meteo]
-            
-            donnees_horaires_meteo_annee = dict()
-            for actif in donnees_entree.actifs_hors_stockage():
-                production = [probleme_genration_mix_cible.production[actif.cle][annee][indice_meteo][heure].value() for heure in range(8760)]
-                donnees_horaires_meteo_annee["production_%s"%actif.cle] = production
-                if(actif.categorie == "ENR"):
-                    ecretement =  [  ((actif.puissance* probleme_genration_mix_cible.nombre_unites[actif.cle][annee].value() * meteo.facteur_production_ENR(actif.cle, heure))  - production[heure]) for heure in range(8760)]
-                    donnees_horaires_meteo_annee["ecretement_%s"%actif.cle] = ecretement
-            for actif_stockage in donnees_entree.actifs_stockage():
-                puissance_charge = [probleme_genration_mix_cible.puissance_charge[actif_stockage.cle][annee][indice_meteo][heure].value() for heure in range(8760)]
-                puissance_decharge = [probleme_genration_mix_cible.puissance_decharge[actif_stockage.cle][annee][indice_meteo][heure].value() for heure in range(8760)]
-                stock = [probleme_genration_mix_cible.stock[actif_stockage.cle][annee][indice_meteo][heure].value() for heure in range(8760)]
-                donnees_horaires_meteo_annee["puissance_charge_%s" % actif_stockage.cle] = puissance_charge
-                donnees_horaires_meteo_annee["puissance_decharge_%s" % actif_stockage.cle] = puissance_decharge
-                donnees_horaires_meteo_annee["stock_%s" % actif_stockage.cle] = stock
-            prix_horaires = [probleme_genration_mix_cible.contraintes_satisfaction_demande[annee][indice_meteo][heure].pi for heure in range(8760)]
-            donnees_horaires_meteo_annee["prix_horaire"] = prix_horaires
-            defaillance = [probleme_genration_mix_cible.defaillance[annee][indice_meteo][heure].value() for heure in range(8760)]
-            donnees_horaires_meteo_annee["defaillance"] = defaillance
-            donnees_horaires_meteo_annee["demande"] = [ meteo.demande(0, heure)  for heure in range(8760)]
-            liste_donnees_horaires_annee.append(donnees_horaires_meteo_annee)
-        registre_horaire.append(liste_donnees_horaires_annee)
+        meteo = donnees_annuelles[indice_meteo]
 
-    return mix_cible, registre_couts, registre_annuel, registre_horaire,probleme_genration_mix_cible
+        self.annee = annee
+        self.indice_meteo = indice_meteo
+        self.ponderation = 1 / max(1, donnees_annuelles.nombre_meteos()) * 1 / (1 + taux_actualisation)**annee
+        self.demande = np.array([meteo.demande(0, heure) for heure in range(8760)], dtype=float)
+
+        self.couts_production = dict()
+        self.productibles_unitaires = dict()
+        self.emissions = dict()
+        for actif in donnees_entree.actifs_hors_stockage():
+            if actif.categorie == "ENR":
+                self.couts_production[actif.cle] = actif.cout_variable
+                self.productibles_unitaires[actif.cle] = actif.puissance * np.array([meteo.facteur_production_ENR(actif.cle, heure) for heure in range(8760)], dtype=float)
+            else:
+                self.couts_production[actif.cle] = donnees_annuelles.prix_combustible(actif, 0) / actif.rendement + donnees_annuelles.prix_carbone(0) * actif.emission_carbone
+                self.productibles_unitaires[actif.cle] = np.full(8760, actif.puissance, dtype=float)
+                self.emissions[actif.cle] = actif.emission_carbone
+
+        self.actifs_stockage = []
+        for actif_stockage in donnees_entree.actifs_stockage():
+            self.actifs_stockage.append({
+                "cle": actif_stockage.cle,
+                "capacite": actif_stockage.capacite,
+                "puissance_nominale_charge": actif_stockage.puissance_nominale_charge,
+                "puissance_nominale_decharge": actif_stockage.puissance_nominale_decharge,
+                "rendement_charge": actif_stockage.rendement_charge,
+                "rendement_decharge": actif_stockage.rendement_decharge,
+                "cout_variable": actif_stockage.cout_variable
+            })
+
+        self.quota_co2 = quota_co2
+        self.plafond_prix = donnees_entree.parametres_simulation.plafond_prix
+
+    def resoudre(self, nombre_unites):
+        """
+        Résout le sous-problème pour un nombre d'unités donné.
+
+        Paramètres
+        ----------
+        nombre_unites : dict
+            dictionnaire contenant, pour chaque actif, le nombre d'unités présentes dans le parc l'année du
+            sous-problème
+
+        Retours
+        -------
+        dict
+            dictionnaire contenant le statut de la résolution (selon la convention de pulp), les coûts pondérés de
+            production et de défaillance, la dérivée du coût par rapport au nombre d'unités de chaque actif et les
+            valeurs horaires du dispatch
+        """
+
+        nombre_heures = len(self.demande)
+        heures = np.arange(nombre_heures)
+
+        # ######### #
+        # VARIABLES #
+        # ######### #
+
+        # les variables sont numérotées par blocs de nombre_heures variables consécutives
+        nombre_variables = 0
+        liste_cout = []
+        liste_borne_sup = []
+
+        def ajout_bloc(cout, borne_sup):
+            nonlocal nombre_variables
+            indices = np.arange(nombre_variables, nombre_variables + nombre_heures)
+            nombre_variables += nombre_heures
+            liste_cout.append(np.full(nombre_heures, cout, dtype=float))
+            liste_borne_sup.append(np.broadcast_to(np.asarray(borne_sup, dtype=float), nombre_heures))
+            return indices
+
+        production = dict()
+        for cle, cout in self.couts_production.items():
+            production[cle] = ajout_bloc(self.ponderation * cout, nombre_unites[cle] * self.productibles_unitaires[cle])
+
+        stock = dict()
+        puissance_charge = dict()
+        puissance_decharge = dict()
+        for actif_stockage in self.actifs_stockage:
+            cle = actif_stockage["cle"]
+            stock[cle] = ajout_bloc(0, nombre_unites[cle] * actif_stockage["capacite"])
+            puissance_charge[cle] = ajout_bloc(0, nombre_unites[cle] * actif_stockage["puissance_nominale_charge"])
+            puissance_decharge[cle] = ajout_bloc(self.ponderation * actif_stockage["cout_variable"], nombre_unites[cle] * actif_stockage["puissance_nominale_decharge"])
+
+        defaillance = ajout_bloc(self.ponderation * self.plafond_prix, np.inf)
+
+        cout = np.concatenate(liste_cout)
+        borne_sup = np.concatenate(liste_borne_sup)
+
+        # ########### #
+        # CONTRAINTES #
+        # ########### #
+
+        lignes = []
+        colonnes = []
+        coefficients = []
+
+        def ajout_coefficients(indices_lignes, indices_colonnes, coefficient):
+            lignes.append(indices_lignes)
+            colonnes.append(indices_colonnes)
+            coefficients.append(np.full(len(indices_lignes), coefficient, dtype=float))
+
+        # contrainte de satisfaction de la demande : lignes 0 à nombre_heures - 1
+        for indices in production.values():
+            ajout_coefficients(heures, indices, 1)
+        for indices in puissance_charge.values():
+            ajout_coefficients(heures, indices, -1)
+        for indices in puissance_decharge.values():
+            ajout_coefficients(heures, indices, 1)
+        ajout_coefficients(heures, defaillance, 1)
+
+        # contrainte de continuité du stock, cyclique sur l'année
+        # ligne de l'heure h : stock[h+1] - stock[h] - rendement_charge * charge[h] + 1/rendement_decharge * decharge[h]
+        nombre_lignes_egalite = nombre_heures
+        for actif_stockage in self.actifs_stockage:
+            cle = actif_stockage["cle"]
+            lignes_actif = heures + nombre_lignes_egalite
+            nombre_lignes_egalite += nombre_heures
+            ajout_coefficients(lignes_actif, np.roll(stock[cle], -1), 1)
+            ajout_coefficients(lignes_actif, stock[cle], -1)
+            ajout_coefficients(lignes_actif, puissance_charge[cle], -actif_stockage["rendement_charge"])
+            ajout_coefficients(lignes_actif, puissance_decharge[cle], 1 / actif_stockage["rendement_decharge"])
+
+        matrice_egalite = scipy.sparse.coo_matrix((np.concatenate(coefficients), (np.concatenate(lignes), np.concatenate(colonnes))), shape=(nombre_lignes_egalite, nombre_variables)).tocsr()
+        second_membre_egalite = np.concatenate([self.demande, np.zeros(nombre_lignes_egalite - nombre_heures)])
+
+        # contrainte de quota d'émissions de CO2
+        matrice_inegalite = None
+        second_membre_inegalite = None
+        if self.quota_co2 < np.inf:
+            lignes = []
+            colonnes = []
+            coefficients = []
+            for cle, emission in self.emissions.items():
+                ajout_coefficients(np.zeros(nombre_heures, dtype=int), production[cle], emission)
+            if len(coefficients) > 0:
+                matrice_inegalite = scipy.sparse.coo_matrix((np.concatenate(coefficients), (np.concatenate(lignes), np.concatenate(colonnes))), shape=(1, nombre_variables)).tocsr()
+                second_membre_inegalite = np.array([self.quota_co2], dtype=float)
+
+        resultat = scipy.optimize.linprog(cout,
+                                          A_ub=matrice_inegalite,
+                                          b_ub=second_membre_inegalite,
+                                          A_eq=matrice_egalite,
+                                          b_eq=second_membre_egalite,
+                                          bounds=np.column_stack((np.zeros(nombre_variables), borne_sup)),
+                                          method="highs")
+
+        if resultat.status != 0:
+            return {"status": -1}
+
+        valeurs = resultat.x
+
+        # la dérivée du coût par rapport au nombre d'unités d'un actif est la somme des variables duales des bornes
+        # supérieures de ses variables, pondérées par la contribution d'une unité à ces bornes
+        duales_bornes = resultat.upper.marginals
+        gradient = dict()
+        for cle, indices in production.items():
+            gradient[cle] = np.dot(duales_bornes[indices], self.productibles_unitaires[cle])
+        for actif_stockage in self.actifs_stockage:
+            cle = actif_stockage["cle"]
+            gradient[cle] = np.sum(duales_bornes[stock[cle]]) * actif_stockage["capacite"] \
+                + np.sum(duales_bornes[puissance_charge[cle]]) * actif_stockage["puissance_nominale_charge"] \
+                + np.sum(duales_bornes[puissance_decharge[cle]]) * actif_stockage["puissance_nominale_decharge"]
+
+        cout_defaillance = np.dot(cout[defaillance], valeurs[defaillance])
+
+        variable_duale_co2 = 0
+        if matrice_inegalite is not None:
+            variable_duale_co2 = -1 * resultat.ineqlin.marginals[0]
+
+        return {
+            "status": 1,
+            "cout": resultat.fun,
+            "cout_production": resultat.fun - cout_defaillance,
+            "cout_defaillance": cout_defaillance,
+            "gradient": gradient,
+            "production": {cle: valeurs[indices] for cle, indices in production.items()},
+            "stock": {cle: valeurs[indices] for cle, indices in stock.items()},
+            "puissance_charge": {cle: valeurs[indices] for cle, indices in puissance_charge.items()},
+            "puissance_decharge": {cle: valeurs[indices] for cle, indices in puissance_decharge.items()},
+            "defaillance": valeurs[defaillance],
+            "prix_horaire": resultat.eqlin.marginals[:nombre_heures],
+            "variable_duale_co2": variable_duale_co2
+        }
+
+
+_sous_problemes_processus = None
+
+
+def _initialisation_processus_generation_mix_cible(sous_problemes):
+    global _sous_problemes_processus
+    _sous_problemes_processus = sous_problemes
+
+
+def _resolution_sous_probleme(indice_sous_probleme, nombre_unites, sous_problemes=None):
+    if sous_problemes is None:
+        sous_problemes = _sous_problemes_processus
+    return sous_problemes[indice_sous_probleme].resoudre(nombre_unites)
+
+
+def generation_mix_cible_benders(donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, df_co2_quota, taux_actualisation=0.0):
+    """
+    Génère un mix cible par décomposition de Benders du problème de génération de mix cible.
+
+    Le problème maître choisit l'évolution du parc, puis les sous-problèmes de dispatch de chaque année et de chaque
+    météo sont résolus pour ce parc, éventuellement en parallèle, et renvoient des coupes au problème maître. Les
+    itérations s'arrêtent lorsque l'écart relatif entre la borne inférieure donnée par le problème maître et le coût
+    du parc courant est inférieur à tolerance_benders, ou après nb_iterations_max_benders itérations. La mémoire
+    nécessaire est ainsi bornée par la taille d'un sous-problème plutôt que par celle du problème complet.
+
+    Le parc renvoyé est le meilleur parc évalué, c'est-à-dire celui de plus faible borne supérieure, et non le
+    dernier parc proposé par le problème maître. Si un sous-problème ne peut pas être résolu, les itérations
+    s'arrêtent et le meilleur parc évalué jusque-là est renvoyé ; une RuntimeError est levée si aucun parc n'a pu
+    être évalué.
+
+    Les sous-problèmes sont écrits sur les 8760 heures de chaque année : la décomposition n'est pas compatible avec
+    les jours représentatifs et une ValueError est levée si nombre_jours_representatifs est strictement positif.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser
+    liste_contraintes_trajectoire : list
+        liste des contraintes de trajectoire imposées par l'utilisateur
+    type_optim : str
+        "LP" ou "MIP", type des variables de nombre d'unités
+    df_co2_quota : pandas.DataFrame
+        quotas d'émissions de CO2 de chaque année
+    taux_actualisation : float
+        taux d'actualisation pour actualiser les coût payés chaque année
+
+    Retours
+    -------
+    tuple
+        mix cible, registre des coûts, registre annuel, registre horaire et problème maître, sous la même forme que
+        generation_mix_cible
+    """
+
+    parametres_simulation = donnees_entree.parametres_simulation
+    nombre_annees = parametres_simulation.horizon_simulation
+
+    if parametres_simulation.nombre_jours_representatifs > 0:
+        raise ValueError("La décomposition du problème de génération de mix cible n'est pas compatible avec les jours représentatifs : nombre_jours_representatifs doit être nul lorsque decomposition_generation_mix_cible est activé")
+
+    sous_problemes = []
+    for annee in range(nombre_annees):
+        quota = df_co2_quota.at["Annee_"+str(annee), "CO2_quota"]
+        for indice_meteo in range(donnees_entree.ambiance_realisee[annee].nombre_meteos()):
+            sous_problemes.append(SousProblemeGenerationMixCible(donnees_entree, annee, indice_meteo, quota, taux_actualisation))
 
+    probleme_maitre = ProblemeMaitreGenerationMixCible(donnees_entree, donnees_simulation, liste_contraintes_trajectoire, type_optim, taux_actualisation)
+
+    solver = pulp.CPLEX_CMD(path="/opt/cplex/12.8/cplex/bin/x86-64_linux/cplex")
+
+    nb_processus = parametres_simulation.nb_processus_dispatch
+    if nb_processus <= 0:
+        nb_processus = os.cpu_count()
+    nb_processus = min(nb_processus, len(sous_problemes))
+
+    executeur = None
+    if nb_processus > 1:
+        executeur = ProcessPoolExecutor(max_workers=nb_processus, initializer=_initialisation_processus_generation_mix_cible, initargs=(sous_problemes,))
+
+    # meilleur parc évalué : valeurs des variables et variables duales du problème maître, résultats des
+    # sous-problèmes
+    meilleure_iteration = None
+
+    try:
+        for iteration in range(parametres_simulation.nb_iterations_max_benders):
+
+            probleme_maitre.solve(solver)
+
+            if not(probleme_maitre.status == 1):
+                print("/!\\ /!\\ LE PROBLEME MAITRE N'A PAS PU ETRE RESOLU CORRECTEMENT /!\\ /!\\")
+                print("status : ", probleme_maitre.status)
+
+            # les valeurs négatives dues aux tolérances du solveur sont ramenées à 0
+            nombre_unites = dict()
+            for actif in donnees_entree.tous_actifs():
+                nombre_unites[actif.cle] = [max(0, probleme_maitre.nombre_unites[actif.cle][annee].value() or 0) for annee in range(nombre_annees)]
+
+            taches = [(indice_sous_probleme, {cle: nombre_unites_actif[sous_probleme.annee] for cle, nombre_unites_actif in nombre_unites.items()}) for indice_sous_probleme, sous_probleme in enumerate(sous_problemes)]
+            if executeur is None:
+                resultats = [_resolution_sous_probleme(indice_sous_probleme, nombre_unites_annee, sous_problemes) for indice_sous_probleme, nombre_unites_annee in taches]
+            else:
+                resultats = list(executeur.map(_resolution_sous_probleme, *zip(*taches)))
+
+            if any([not(resultat["status"] == 1) for resultat in resultats]):
+                print("/!\\ /!\\ UN SOUS-PROBLEME N'A PAS PU ETRE RESOLU CORRECTEMENT /!\\ /!\\")
+                break
+
+            borne_inferieure = probleme_maitre.cout_total.value()
+            borne_superieure = probleme_maitre.cout_construction.value() + probleme_maitre.cout_maintenance.value() + sum([resultat["cout"] for resultat in resultats])
+            print("itération %d de Benders : borne inférieure %f, borne supérieure %f" % (iteration, borne_inferieure, borne_superieure))
+
+            if meilleure_iteration is None or borne_superieure < meilleure_iteration["borne_superieure"]:
+                meilleure_iteration = {
+                    "borne_superieure": borne_superieure,
+                    "nombre_unites": nombre_unites,
+                    "resultats": resultats,
+                    "valeurs_variables": {variable.name: variable.varValue for variable in probleme_maitre.variables()},
+                    "variables_duales": {nom: contrainte.pi for nom, contrainte in probleme_maitre.constraints.items()}
+                }
+
+            if not(probleme_maitre.status == 1) or borne_superieure - borne_inferieure <= parametres_simulation.tolerance_benders * max(1, abs(borne_superieure)):
+                break
+
+            for (indice_sous_probleme, nombre_unites_annee), sous_probleme, resultat in zip(taches, sous_problemes, resultats):
+                probleme_maitre.ajout_coupe(sous_probleme.annee, sous_probleme.indice_meteo, resultat["cout"], resultat["gradient"], nombre_unites_annee)
+    finally:
+        if executeur is not None:
+            executeur.shutdown()
+
+    if meilleure_iteration is None:
+        raise RuntimeError("aucun parc n'a pu être évalué par la décomposition de Benders du problème de génération de mix cible")
+
+    # le problème maître est ramené au meilleur parc évalué, dont sont extraits les registres
+    for variable in probleme_maitre.variables():
+        variable.varValue = meilleure_iteration["valeurs_variables"].get(variable.name)
+    for nom, contrainte in probleme_maitre.constraints.items():
+        contrainte.pi = meilleure_iteration["variables_duales"].get(nom)
+    nombre_unites = meilleure_iteration["nombre_unites"]
+    resultats = meilleure_iteration["resultats"]
+
+    registre_couts = dict()
+    registre_couts["cout_production"] = [sum([resultat["cout_production"] for resultat in resultats])]
+    registre_couts["cout_defaillance"] = [sum([resultat["cout_defaillance"] for resultat in resultats])]
+    registre_couts["cout_construction"] = [probleme_maitre.cout_construction.value()]
+    registre_couts["cout_maintenance"] = [probleme_maitre.cout_maintenance.value()]
+    registre_couts["cout_total"] = [registre_couts["cout_production"][0] + registre_couts["cout_defaillance"][0] + registre_couts["cout_construction"][0] + registre_couts["cout_maintenance"][0]]
+
+    for cle, valeur in registre_couts.items():
+        print(cle, " : ", valeur[0])
+
+    for actif in donnees_entree.tous_actifs():
+        print("nombre unités ", actif.cle, nombre_unites[actif.cle])
+
+    mix_cible, registre_annuel = registres_parc(donnees_entree, probleme_maitre)
+
+    # comme pour le problème complet, la variable duale retenue pour une année est celle de sa dernière météo
+    variables_duales_CO2 = np.zeros(nombre_annees)
+    for sous_probleme, resultat in zip(sous_problemes, resultats):
+        variables_duales_CO2[sous_probleme.annee] = resultat["variable_duale_co2"]
+    registre_annuel["variables_duales_co2"] = variables_duales_CO2
+
+    registre_horaire = [[] for annee in range(nombre_annees)]
+    for sous_probleme, resultat in zip(sous_problemes, resultats):
+        donnees_horaires_meteo_annee = dict()
+        for actif in donnees_entree.actifs_hors_stockage():
+            production = list(resultat["production"][actif.cle])
+            donnees_horaires_meteo_annee["production_%s" % actif.cle] = production
+            if actif.categorie == "ENR":
+                productible = nombre_unites[actif.cle][sous_probleme.annee] * sous_probleme.productibles_unitaires[actif.cle]
+                donnees_horaires_meteo_annee["ecretement_%s" % actif.cle] = list(productible - resultat["production"][actif.cle])
+        for actif_stockage in donnees_entree.actifs_stockage():
+            donnees_horaires_meteo_annee["puissance_charge_%s" % actif_stockage.cle] = list(resultat["puissance_charge"][actif_stockage.cle])
+            donnees_horaires_meteo_annee["puissance_decharge_%s" % actif_stockage.cle] = list(resultat["puissance_decharge"][actif_stockage.cle])
+            donnees_horaires_meteo_annee["stock_%s" % actif_stockage.cle] = list(resultat["stock"][actif_stockage.cle])
+        donnees_horaires_meteo_annee["prix_horaire"] = list(resultat["prix_horaire"])
+        donnees_horaires_meteo_annee["defaillance"] = list(resultat["defaillance"])
+        donnees_horaires_meteo_annee["demande"] = list(sous_probleme.demande)
+        registre_horaire[sous_probleme.annee].append(donnees_horaires_meteo_annee)
+
+    return mix_cible, registre_couts, registre_annuel, registre_horaire, probleme_maitre
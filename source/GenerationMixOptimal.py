@@ -6,6 +6,8 @@ import pulp
 import numpy as np
 
 import IndicateursEconomiques
+import AgregationTemporelle
+import GenerationMixCible
 
 
 class ContrainteMix:
@@ -50,6 +52,25 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
         expression du coût de construction en fonction des variables du problème
     cout_total : pulp.LpAffineExpression
         expression du coût total en fonction des variables du problème
+    agregations : list
+        liste contenant, pour chaque météo, l'agrégation en jours représentatifs utilisée, ou None si le dispatch est
+        écrit sur les 8760 heures
+    heures : list
+        liste contenant, pour chaque météo, l'heure de l'année de chaque pas de temps du dispatch
+    poids : list
+        liste contenant, pour chaque météo, le nombre d'heures représentées par chaque pas de temps du dispatch
+    niveaux_stock_debut_jour : dict
+        dictionnaire contenant, pour chaque actif de stockage et météo agrégée, les variables de niveau de stock en
+        début de chaque jour de l'année
+
+    Méthodes
+    --------
+    valeurs_horaires(self, variables, indice_meteo)
+        Renvoie les valeurs à chaque heure de l'année des variables de dispatch données.
+    prix_horaires(self, indice_meteo)
+        Renvoie les variables duales des contraintes de satisfaction de la demande à chaque heure de l'année.
+    stock_horaire(self, cle_actif, indice_meteo)
+        Renvoie le stock d'un actif de stockage à chaque heure de l'année.
     """
 
     def __init__(self, donnees_entree, annee, liste_contraintes_mix):
@@ -58,6 +79,12 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
 
         donnees_annuelles = donnees_entree.ambiance_realisee[annee]
 
+        # pas de temps du dispatch : les 8760 heures de l'année, ou les heures des jours représentatifs de chaque
+        # météo si nombre_jours_representatifs est strictement positif
+        self.agregations = [AgregationTemporelle.agregation_meteo(donnees_entree, donnees_annuelles[indice_meteo]) for indice_meteo in range(donnees_annuelles.nombre_meteos())]
+        self.heures = [list(range(8760)) if agregation is None else agregation.heures.tolist() for agregation in self.agregations]
+        self.poids = [[1.0] * 8760 if agregation is None else agregation.poids.tolist() for agregation in self.agregations]
+
         # ######### #
         # VARIABLES #
         # ######### #
@@ -73,7 +100,7 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
         for actif_hors_stockage in donnees_entree.actifs_hors_stockage():
             production_actif = []
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                production_actif_meteo = pulp.LpVariable.dict("production_%s_meteo_%d" % (actif_hors_stockage.cle, indice_meteo), range(8760), lowBound=0, cat="Continuous")
+                production_actif_meteo = pulp.LpVariable.dict("production_%s_meteo_%d" % (actif_hors_stockage.cle, indice_meteo), range(len(self.heures[indice_meteo])), lowBound=0, cat="Continuous")
                 production_actif.append(production_actif_meteo)
             self.production[actif_hors_stockage.cle] = production_actif
 
@@ -86,9 +113,15 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             puissance_charge_actif = []
             puissance_decharge_actif = []
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                stock_actif_meteo = pulp.LpVariable.dict("stock_%s_meteo_%d" % (actif_stockage.cle, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                puissance_charge_actif_meteo = pulp.LpVariable.dict("puissance_charge_%s_meteo_%d" % (actif_stockage.cle, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                puissance_decharge_actif_meteo = pulp.LpVariable.dict("puissance_decharge_%s_meteo_%d" % (actif_stockage.cle,indice_meteo), range(8760), lowBound=0, cat="Continuous")
+                pas_temps = range(len(self.heures[indice_meteo]))
+                # avec des jours représentatifs, les variables de stock portent la variation du stock depuis le début
+                # de la journée, qui peut être négative
+                borne_inferieure_stock = 0
+                if self.agregations[indice_meteo] is not None:
+                    borne_inferieure_stock = None
+                stock_actif_meteo = pulp.LpVariable.dict("stock_%s_meteo_%d" % (actif_stockage.cle, indice_meteo), pas_temps, lowBound=borne_inferieure_stock, cat="Continuous")
+                puissance_charge_actif_meteo = pulp.LpVariable.dict("puissance_charge_%s_meteo_%d" % (actif_stockage.cle, indice_meteo), pas_temps, lowBound=0, cat="Continuous")
+                puissance_decharge_actif_meteo = pulp.LpVariable.dict("puissance_decharge_%s_meteo_%d" % (actif_stockage.cle,indice_meteo), pas_temps, lowBound=0, cat="Continuous")
                 stock_actif.append(stock_actif_meteo)
                 puissance_charge_actif.append(puissance_charge_actif_meteo)
                 puissance_decharge_actif.append(puissance_decharge_actif_meteo)
@@ -99,7 +132,7 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
         # initialisation des variables de défaillance
         self.defaillance = []
         for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-            defaillance_meteo = pulp.LpVariable.dict("defaillance_meteo_%d" % (indice_meteo), range(8760), lowBound=0, cat="Continuous")
+            defaillance_meteo = pulp.LpVariable.dict("defaillance_meteo_%d" % (indice_meteo), range(len(self.heures[indice_meteo])), lowBound=0, cat="Continuous")
             self.defaillance.append(defaillance_meteo)
 
         # ########### #
@@ -160,12 +193,12 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
         for indice_meteo in range(donnees_annuelles.nombre_meteos()):
             meteo = donnees_annuelles[indice_meteo]
             contraintes_satisfaction_demande_meteo = []
-            for heure in range(8760):
-                somme_productions = pulp.lpSum([production_actif[indice_meteo][heure] for cle_actif, production_actif in self.production.items()])
-                somme_puissances_charge = pulp.lpSum([puissance_charge_actif[indice_meteo][heure] for cle_actif, puissance_charge_actif in self.puissance_charge.items()])
-                somme_puissances_decharge = pulp.lpSum([puissance_decharge_actif[indice_meteo][heure] for cle_actif, puissance_decharge_actif in self.puissance_decharge.items()])
+            for pas, heure in enumerate(self.heures[indice_meteo]):
+                somme_productions = pulp.lpSum([production_actif[indice_meteo][pas] for cle_actif, production_actif in self.production.items()])
+                somme_puissances_charge = pulp.lpSum([puissance_charge_actif[indice_meteo][pas] for cle_actif, puissance_charge_actif in self.puissance_charge.items()])
+                somme_puissances_decharge = pulp.lpSum([puissance_decharge_actif[indice_meteo][pas] for cle_actif, puissance_decharge_actif in self.puissance_decharge.items()])
                 demande = meteo.demande(0, heure)
-                defaillance = self.defaillance[indice_meteo][heure]
+                defaillance = self.defaillance[indice_meteo][pas]
                 contrainte = pulp.LpConstraint(
                     e=somme_productions - somme_puissances_charge + somme_puissances_decharge + defaillance,
                     sense=pulp.LpConstraintEQ,
@@ -177,11 +210,27 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             self.contraintes_satisfaction_demande.append(contraintes_satisfaction_demande_meteo)
 
         # contraintes de continuité du stock
+        self.niveaux_stock_debut_jour = dict()
         for actif_stockage in donnees_entree.actifs_stockage():
             stock_actif = self.stock[actif_stockage.cle]
             puissance_decharge_actif = self.puissance_decharge[actif_stockage.cle]
             puissance_charge_actif = self.puissance_charge[actif_stockage.cle]
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+                agregation = self.agregations[indice_meteo]
+                if agregation is not None:
+                    # le stock est enchaîné entre les jours de l'année à travers leurs jours représentatifs
+                    self.niveaux_stock_debut_jour[actif_stockage.cle, indice_meteo] = AgregationTemporelle.contraintes_stockage_jours_representatifs(
+                        self,
+                        agregation,
+                        stock_actif[indice_meteo],
+                        puissance_charge_actif[indice_meteo],
+                        puissance_decharge_actif[indice_meteo],
+                        self.nombre_unites[actif_stockage.cle] * actif_stockage.capacite,
+                        actif_stockage.rendement_charge,
+                        actif_stockage.rendement_decharge,
+                        "%s_meteo_%d" % (actif_stockage.cle, indice_meteo)
+                    )
+                    continue
                 for heure in range(8760):
                     stock = stock_actif[indice_meteo][heure]
                     stock_suivant = stock_actif[indice_meteo][(heure+1)%8760]
@@ -203,6 +252,8 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             nombre_unites_actif = self.nombre_unites[actif_stockage.cle]
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
                 stock_depart = stock_actif[indice_meteo][0]
+                if self.agregations[indice_meteo] is not None:
+                    stock_depart = self.niveaux_stock_debut_jour[actif_stockage.cle, indice_meteo][0]
                 valeur_contrainte = nombre_unites_actif * actif_stockage.capacite * actif_stockage.stock_initial
                 contrainte = pulp.LpConstraint(
                     e=stock_depart - valeur_contrainte,
@@ -218,8 +269,8 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             nombre_unites_actif = self.nombre_unites[actif.cle]
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
                 meteo = donnees_annuelles[indice_meteo]
-                for heure in range(8760):
-                    production = production_actif[indice_meteo][heure]
+                for pas, heure in enumerate(self.heures[indice_meteo]):
+                    production = production_actif[indice_meteo][pas]
                     borne_superieure_production = None
                     if(actif.categorie == "ENR"):
                         borne_superieure_production = nombre_unites_actif * actif.puissance * meteo.facteur_production_ENR(actif.cle, heure)
@@ -246,18 +297,21 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             borne_superieure_puissance_decharge = nombre_unites_actif * actif_stockage.puissance_nominale_decharge
 
             for indice_meteo in range(donnees_annuelles.nombre_meteos()):
-                for heure in range(8760):
-                    stock = stock_actif[indice_meteo][heure]
-                    puissance_charge = puissance_charge_actif[indice_meteo][heure]
-                    puissance_decharge = puissance_decharge_actif[indice_meteo][heure]
-
-                    contrainte = pulp.LpConstraint(
-                        e=borne_superieure_stock - stock,
-                        sense=pulp.LpConstraintGE,
-                        rhs=0,
-                        name="borne_superieure_stock_%s_meteo_%d_heure_%d" % (actif_stockage.cle, indice_meteo, heure)
-                    )
-                    self.addConstraint(contrainte)
+                for pas, heure in enumerate(self.heures[indice_meteo]):
+                    stock = stock_actif[indice_meteo][pas]
+                    puissance_charge = puissance_charge_actif[indice_meteo][pas]
+                    puissance_decharge = puissance_decharge_actif[indice_meteo][pas]
+
+                    # avec des jours représentatifs, les bornes du stock sont imposées jour par jour par
+                    # AgregationTemporelle.contraintes_stockage_jours_representatifs
+                    if self.agregations[indice_meteo] is None:
+                        contrainte = pulp.LpConstraint(
+                            e=borne_superieure_stock - stock,
+                            sense=pulp.LpConstraintGE,
+                            rhs=0,
+                            name="borne_superieure_stock_%s_meteo_%d_heure_%d" % (actif_stockage.cle, indice_meteo, heure)
+                        )
+                        self.addConstraint(contrainte)
 
                     contrainte = pulp.LpConstraint(
                         e=borne_superieure_puissance_charge - puissance_charge,
@@ -283,28 +337,28 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
             pulp.lpSum([
                 pulp.lpSum([
                     pulp.lpSum([
-                        (donnees_annuelles.prix_combustible(actif_pilotable, 0) / actif_pilotable.rendement + donnees_annuelles.prix_carbone(0) * actif_pilotable.emission_carbone) * self.production[actif_pilotable.cle][indice_meteo][heure] for heure in range(8760)
+                        (donnees_annuelles.prix_combustible(actif_pilotable, 0) / actif_pilotable.rendement + donnees_annuelles.prix_carbone(0) * actif_pilotable.emission_carbone) * self.poids[indice_meteo][pas] * self.production[actif_pilotable.cle][indice_meteo][pas] for pas in range(len(self.heures[indice_meteo]))
                     ]) for indice_meteo in range(donnees_annuelles.nombre_meteos())
                 ]) for actif_pilotable in donnees_entree.actifs_pilotables()
             ]),
             pulp.lpSum([
                 pulp.lpSum([
                     pulp.lpSum([
-                        actif_ENR.cout_variable * self.production[actif_ENR.cle][indice_meteo][heure] for heure in range(8760)
+                        actif_ENR.cout_variable * self.poids[indice_meteo][pas] * self.production[actif_ENR.cle][indice_meteo][pas] for pas in range(len(self.heures[indice_meteo]))
                     ]) for indice_meteo in range(donnees_annuelles.nombre_meteos())
                 ]) for actif_ENR in donnees_entree.actifs_ENR()
             ]),
             pulp.lpSum([
                 pulp.lpSum([
                     pulp.lpSum([
-                        actif_stockage.cout_variable * self.puissance_decharge[actif_stockage.cle][indice_meteo][heure] for heure in range(8760)
+                        actif_stockage.cout_variable * self.poids[indice_meteo][pas] * self.puissance_decharge[actif_stockage.cle][indice_meteo][pas] for pas in range(len(self.heures[indice_meteo]))
                     ]) for indice_meteo in range(donnees_annuelles.nombre_meteos())
                 ]) for actif_stockage in donnees_entree.actifs_stockage()])
             ])
 
         self.cout_defaillance = pulp.lpSum([
             pulp.lpSum([
-                donnees_entree.parametres_simulation.plafond_prix * self.defaillance[indice_meteo][heure] for heure in range(8760)
+                donnees_entree.parametres_simulation.plafond_prix * self.poids[indice_meteo][pas] * self.defaillance[indice_meteo][pas] for pas in range(len(self.heures[indice_meteo]))
             ]) for indice_meteo in range(donnees_annuelles.nombre_meteos())
         ])
 
@@ -321,6 +375,137 @@ class ProblemeGenerationMixOptimal(pulp.LpProblem):
 
         self.setObjective(self.cout_total)
 
+    def valeurs_horaires(self, variables, indice_meteo):
+        """
+        Renvoie les valeurs à chaque heure de l'année des variables de dispatch données, reconstituées à partir des
+        jours représentatifs si la météo est agrégée.
+
+        Paramètres
+        ----------
+        variables : dict
+            variables de dispatch de la météo, indexées par pas de temps
+        indice_meteo : int
+            indice de la météo des variables
+
+        Retours
+        -------
+        list
+            valeurs des variables à chaque heure de l'année
+        """
+
+        valeurs = [variables[pas].value() for pas in range(len(self.heures[indice_meteo]))]
+        agregation = self.agregations[indice_meteo]
+        if agregation is None:
+            return valeurs
+        return list(agregation.reconstitution(valeurs))
+
+    def prix_horaires(self, indice_meteo):
+        """
+        Renvoie les variables duales des contraintes de satisfaction de la demande à chaque heure de l'année. Pour une
+        météo agrégée, la variable duale d'un pas de temps est rapportée au nombre d'heures qu'il représente.
+
+        Paramètres
+        ----------
+        indice_meteo : int
+            indice de la météo considérée
+
+        Retours
+        -------
+        list
+            variables duales à chaque heure de l'année
+        """
+
+        contraintes = self.contraintes_satisfaction_demande[indice_meteo]
+        agregation = self.agregations[indice_meteo]
+        if agregation is None:
+            return [contrainte.pi for contrainte in contraintes]
+        return list(agregation.reconstitution(np.array([contrainte.pi for contrainte in contraintes]) / agregation.poids))
+
+    def stock_horaire(self, cle_actif, indice_meteo):
+        """
+        Renvoie le stock d'un actif de stockage à chaque heure de l'année.
+
+        Paramètres
+        ----------
+        cle_actif : str
+            clé de l'actif de stockage
+        indice_meteo : int
+            indice de la météo considérée
+
+        Retours
+        -------
+        list
+            stock à chaque heure de l'année
+        """
+
+        stock = self.stock[cle_actif][indice_meteo]
+        agregation = self.agregations[indice_meteo]
+        if agregation is None:
+            return [stock[heure].value() for heure in range(8760)]
+        niveaux_stock_debut_jour = self.niveaux_stock_debut_jour[cle_actif, indice_meteo]
+        valeurs_stock = [stock[pas].value() for pas in range(agregation.nombre_pas)]
+        valeurs_niveaux = [niveaux_stock_debut_jour[jour].value() for jour in range(AgregationTemporelle.NOMBRE_JOURS)]
+        return list(AgregationTemporelle.stock_horaire(agregation, valeurs_stock, valeurs_niveaux))
+
+
+def rapport_erreur_agregation(donnees_entree, annee, probleme, registre_couts, registre_annuel):
+    """
+    Mesure l'erreur commise par l'agrégation en jours représentatifs du problème de génération de mix optimal et
+    l'ajoute aux registres.
+
+    Comme pour GenerationMixCible.rapport_erreur_agregation, sont mesurées l'erreur sur les chroniques reconstituées
+    à partir des jours représentatifs et l'erreur sur le coût d'exploitation, le mix obtenu étant évalué par un
+    dispatch sur les 8760 heures de chaque météo. Ce dispatch ne contraint pas le stock initial des actifs de
+    stockage, ce qui explique un léger écart même sans agrégation effective.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    annee : int
+        année du problème
+    probleme : ProblemeGenerationMixOptimal
+        problème agrégé résolu
+    registre_couts : dict
+        registre des coûts, complété par le coût d'exploitation sur les heures complètes et l'erreur relative
+    registre_annuel : dict
+        registre annuel, complété par les erreurs moyennes sur les chroniques
+    """
+
+    donnees_annuelles = donnees_entree.ambiance_realisee[annee]
+    nombre_unites = {actif.cle: max(0, probleme.nombre_unites[actif.cle].value()) for actif in donnees_entree.tous_actifs()}
+
+    cout_exploitation_heures_completes = 0
+    erreurs_chroniques = dict()
+    for indice_meteo in range(donnees_annuelles.nombre_meteos()):
+        series = AgregationTemporelle.series_meteo(donnees_entree, donnees_annuelles[indice_meteo])
+        for cle_registre, erreur in AgregationTemporelle.erreurs_series(probleme.agregations[indice_meteo], series).items():
+            erreurs_chroniques[cle_registre] = erreurs_chroniques.get(cle_registre, 0) + erreur / donnees_annuelles.nombre_meteos()
+
+        # le problème de génération de mix optimal n'a pas de quota d'émissions ; le coût des météos n'y est pas
+        # pondéré, d'où la division par la pondération du sous-problème
+        sous_probleme = GenerationMixCible.SousProblemeGenerationMixCible(donnees_entree, annee, indice_meteo, np.inf)
+        resultat = sous_probleme.resoudre(nombre_unites)
+        if not(resultat["status"] == 1):
+            print("/!\\ /!\\ LE DISPATCH SUR LES HEURES COMPLETES N'A PAS PU ETRE RESOLU /!\\ /!\\")
+            continue
+        cout_exploitation_heures_completes += resultat["cout"] / sous_probleme.ponderation
+
+    cout_exploitation_agrege = registre_couts["cout_production"][0] + registre_couts["cout_defaillance"][0]
+    erreur_cout_exploitation = 0
+    if cout_exploitation_heures_completes != 0:
+        erreur_cout_exploitation = (cout_exploitation_agrege - cout_exploitation_heures_completes) / abs(cout_exploitation_heures_completes)
+
+    print("coût d'exploitation sur les jours représentatifs : ", cout_exploitation_agrege)
+    print("coût d'exploitation sur les heures complètes : ", cout_exploitation_heures_completes)
+    print("erreur relative d'agrégation sur le coût d'exploitation : ", erreur_cout_exploitation)
+
+    registre_couts["cout_exploitation_heures_completes"] = [cout_exploitation_heures_completes]
+    registre_couts["erreur_agregation_cout_exploitation"] = [erreur_cout_exploitation]
+    for cle_registre, erreur in erreurs_chroniques.items():
+        registre_annuel[cle_registre] = [erreur]
+
+
 def generation_mix_optimal(donnees_entree, annee, liste_contraintes_mix):
     """
     Génère un mix optimal "from scratch" pour l'année donnée en argument en optimisant  pour minimiser les coûts de
@@ -333,6 +518,8 @@ def generation_mix_optimal(donnees_entree, annee, liste_contraintes_mix):
     annee : int
         année à laquelle vont être considérées les données de l'ambiance de référence pour l'optimisation
 
+    Si le paramètre nombre_jours_representatifs est strictement positif, le dispatch de chaque météo est écrit sur des
+    jours représentatifs et l'erreur commise par cette agrégation est ajoutée aux registres.
 
     Retours
     -------
@@ -357,8 +544,9 @@ def generation_mix_optimal(donnees_entree, annee, liste_contraintes_mix):
     for actif in donnees_entree.tous_actifs():
         print(actif.cle, probleme_genration_mix_optimal.nombre_unites[actif.cle].value())
 
-    heures_defaillance = sum([1 * (probleme_genration_mix_optimal.defaillance[0][heure].value()>0) for heure in range(8760)])
-    volume_defaillance = sum([probleme_genration_mix_optimal.defaillance[0][heure].value() for heure in range(8760)])
+    defaillance_meteo_0 = probleme_genration_mix_optimal.valeurs_horaires(probleme_genration_mix_optimal.defaillance[0], 0)
+    heures_defaillance = sum([1 * (defaillance_horaire>0) for defaillance_horaire in defaillance_meteo_0])
+    volume_defaillance = sum(defaillance_meteo_0)
     print(heures_defaillance)
     print(volume_defaillance)
 
@@ -391,24 +579,27 @@ def generation_mix_optimal(donnees_entree, annee, liste_contraintes_mix):
         valeurs_variables_duales = contrainte_personnalisee.pi
         registre_annuel["variable_duale_%s" % nom_contrainte_mix] = [valeurs_variables_duales]
 
+    if donnees_entree.parametres_simulation.nombre_jours_representatifs > 0:
+        rapport_erreur_agregation(donnees_entree, annee, probleme_genration_mix_optimal, registre_couts, registre_annuel)
+
     registre_horaire = []
 
     donnees_annuelles = donnees_entree.ambiance_realisee[annee]
     for indice_meteo in range(donnees_annuelles.nombre_meteos()):
         donnees_horaires_meteo = dict()
         for actif in donnees_entree.actifs_hors_stockage():
-            production = [probleme_genration_mix_optimal.production[actif.cle][indice_meteo][heure].value() for heure in range(8760)]
+            production = probleme_genration_mix_optimal.valeurs_horaires(probleme_genration_mix_optimal.production[actif.cle][indice_meteo], indice_meteo)
             donnees_horaires_meteo["production_%s" % actif.cle] = production
         for actif_stockage in donnees_entree.actifs_stockage():
-            puissance_charge = [probleme_genration_mix_optimal.puissance_charge[actif_stockage.cle][indice_meteo][heure].value() for heure in range(8760)]
-            puissance_decharge = [probleme_genration_mix_optimal.puissance_decharge[actif_stockage.cle][indice_meteo][heure].value() for heure in range(8760)]
-            stock = [probleme_genration_mix_optimal.stock[actif_stockage.cle][indice_meteo][heure].value() for heure in range(8760)]
+            puissance_charge = probleme_genration_mix_optimal.valeurs_horaires(probleme_genration_mix_optimal.puissance_charge[actif_stockage.cle][indice_meteo], indice_meteo)
+            puissance_decharge = probleme_genration_mix_optimal.valeurs_horaires(probleme_genration_mix_optimal.puissance_decharge[actif_stockage.cle][indice_meteo], indice_meteo)
+            stock = probleme_genration_mix_optimal.stock_horaire(actif_stockage.cle, indice_meteo)
             donnees_horaires_meteo["puissance_charge_%s" % actif_stockage.cle] = puissance_charge
             donnees_horaires_meteo["puissance_decharge_%s" % actif_stockage.cle] = puissance_decharge
             donnees_horaires_meteo["stock_%s" % actif_stockage.cle] = stock
-        prix_horaires = [probleme_genration_mix_optimal.contraintes_satisfaction_demande[indice_meteo][heure].pi for heure in range(8760)]
+        prix_horaires = probleme_genration_mix_optimal.prix_horaires(indice_meteo)
         donnees_horaires_meteo["prix_horaire"] = prix_horaires
-        defaillance = [probleme_genration_mix_optimal.defaillance[indice_meteo][heure].value() for heure in range(8760)]
+        defaillance = probleme_genration_mix_optimal.valeurs_horaires(probleme_genration_mix_optimal.defaillance[indice_meteo], indice_meteo)
         donnees_horaires_meteo["defaillance"] = defaillance
         registre_horaire.append(donnees_horaires_meteo)
 
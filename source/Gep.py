@@ -8,7 +8,9 @@ import os
 import time
 import pulp
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 import DonneesSimulation
+import AgregationTemporelle
 
 def pjoin(*args, **kwargs):
     return os.path.join(*args, **kwargs).replace(os.sep, '//')
@@ -22,22 +24,62 @@ def pd_to_dict_rint(df):
         
     return dico
 
-def update_anticipation(donnees_entree, donnees_simulation,chemins_gep):
-    
+def update_anticipation(donnees_entree, donnees_simulation):
+    """
+    Met à jour le parc anticipé de chaque ambiance à partir d'un GEP résolu sur les années restantes de la simulation.
+    Les entrées du GEP sont construites en mémoire et les registres d'ouvertures et de fermetures obtenus sont 
+    directement convertis en Parc, sans passer par une copie de l'instance ni par des fichiers de sortie.
+
+    Les GEP des différentes ambiances sont indépendants : ils sont résolus en parallèle sur nb_processus_gep processus
+    (0 pour utiliser tous les coeurs disponibles), chaque résolution disposant de nb_threads_gep threads du solveur
+    (0 pour laisser le solveur choisir). Les parcs anticipés ne sont mis à jour qu'une fois tous les GEP résolus.
+
+    Si nombre_jours_representatifs est strictement positif, le dispatch de chaque GEP est écrit sur ce nombre de
+    jours représentatifs par année et par météo au lieu des 8760 heures.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser, le dictionnaire des parcs anticipés est modifié
+    """
     
-    for idx,chemin in enumerate(chemins_gep) :
+    liste_ambiances = list(donnees_entree.ambiances)
+    liste_entrees_gep = []
+    liste_chemins_sorties = []
     
-        ambiance = list(donnees_entree.ambiances.keys())[idx]
+    for ambiance in liste_ambiances :
         
-        chemin_rep = os.path.normpath(chemin)
-        chemin_sorties = pjoin(chemin,"results")
-        os.makedirs(chemin_sorties)
-        type_optim = "LP"
+        liste_entrees_gep.append(construction_entrees_gep(donnees_entree, donnees_simulation, ambiance))
         
-        run_gep(chemin_rep,chemin_sorties,type_optim)
+        # les sorties détaillées du GEP ne sont écrites que sur demande
+        chemin_sorties = None
+        if donnees_entree.parametres_simulation.ecriture_sorties_gep :
+            chemin_sorties = pjoin(donnees_entree.dossier_sortie,"SORTIES_GEP_%d_%s"%(donnees_simulation.annee_courante,ambiance))
+            os.makedirs(chemin_sorties)
+        liste_chemins_sorties.append(chemin_sorties)
         
-        df_reg_ouvertures = pd.read_excel(pjoin(chemin_sorties,"sorties_annuelles.xlsx"),sheet_name="nb_unites_ouvertes",index_col=0)
-        df_reg_fermetures = pd.read_excel(pjoin(chemin_sorties,"sorties_annuelles.xlsx"),sheet_name="nb_unites_fermees",index_col=0)
+    type_optim = "LP"
+    nb_threads = donnees_entree.parametres_simulation.nb_threads_gep
+    nombre_jours_representatifs = donnees_entree.parametres_simulation.nombre_jours_representatifs
+    
+    nb_ambiances = len(liste_ambiances)
+    nb_processus = donnees_entree.parametres_simulation.nb_processus_gep
+    if nb_processus <= 0:
+        nb_processus = os.cpu_count()
+    nb_processus = min(nb_processus, nb_ambiances)
+    
+    if nb_processus <= 1:
+        liste_sorties_gep = [resolution_gep(entrees_gep,type_optim,chemin_sorties,nb_threads,nombre_jours_representatifs) for entrees_gep, chemin_sorties in zip(liste_entrees_gep, liste_chemins_sorties)]
+    else :
+        with ProcessPoolExecutor(max_workers=nb_processus) as executeur:
+            liste_sorties_gep = list(executeur.map(resolution_gep, liste_entrees_gep, [type_optim]*nb_ambiances, liste_chemins_sorties, [nb_threads]*nb_ambiances, [nombre_jours_representatifs]*nb_ambiances))
+    
+    for ambiance, sorties_gep in zip(liste_ambiances, liste_sorties_gep) :
+        
+        df_reg_ouvertures = sorties_gep["nb_unites_ouvertes"].copy()
+        df_reg_fermetures = sorties_gep["nb_unites_fermees"].copy()
         
         # conversion des dataframes au format 
         
@@ -71,7 +113,120 @@ def update_anticipation(donnees_entree, donnees_simulation,chemins_gep):
     return None
     
     
-def run_gep(chemin_rep,chemin_sorties,type_optim):
+def construction_entrees_gep(donnees_entree, donnees_simulation, ambiance):
+    """
+    Construit en mémoire les entrées du GEP de l'ambiance donnée sur les années restantes de la simulation, dans le 
+    même format que lecture_entrees_gep sur un répertoire d'entrées du GEP. Les chroniques sont 
+    prises dans l'ambiance déjà chargée et le parc dans les données de simulation ; seuls les petits fichiers de 
+    paramètres et d'actifs sont relus depuis le dossier de l'instance.
+
+    Paramètres
+    ----------
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser
+    ambiance : str
+        nom de l'ambiance
+
+    Retours
+    -------
+    entrees_gep : dict
+        dictionnaire des données d'entrée du GEP
+    """
+    
+    chemin_dossier = donnees_entree.chemin_dossier
+    annee_courante = donnees_simulation.annee_courante
+
+    entrees_gep = {}
+    
+    #### Fichiers param
+    
+    df_param_simu = pd.read_csv(pjoin(chemin_dossier,"Parametres","parametres_simulation.csv"),sep=";",index_col=0)
+    horizon_total = int(df_param_simu.at["horizon_simulation","value"])
+    df_param_simu.at["horizon_simulation","value"] = int( horizon_total - annee_courante)
+    entrees_gep["df_param_simu"] = df_param_simu
+    
+    entrees_gep["df_param_ponderation"] = pd.read_csv(pjoin(chemin_dossier,"Parametres","parametres_ponderation.csv"),sep=";",index_col=0)
+    
+    annees_restantes = np.arange(annee_courante,horizon_total)
+    
+    #### Fichiers param GEP
+    
+    df_quota = pd.read_csv(pjoin(chemin_dossier,"GenerationMixCible","co2_quota.csv"),sep=";",index_col=0)
+    df_quota = df_quota.loc[["Annee_%d"%n for n in annees_restantes]].copy()
+    df_quota["CO2_quota"] = np.inf
+    df_quota.index = ["Annee_%d"%n for n in (annees_restantes - annee_courante)]
+    entrees_gep["df_quota"] = df_quota
+    
+    df_contraintes = pd.read_csv(pjoin(chemin_dossier,"GenerationMixCible","contraintes_trajectoire.csv"),sep=";",index_col=0)
+    df_contraintes = df_contraintes[["type_contrainte","grandeur_concernee"] + ["annee_%d"%n for n in annees_restantes]]
+    df_contraintes.columns = ["type_contrainte","grandeur_concernee"] + ["annee_%d"%n for n in (annees_restantes - annee_courante)]
+    entrees_gep["df_contraintes"] = df_contraintes.reset_index().T
+    
+    #### Fichiers actifs
+    
+    entrees_gep["df_actifs_enr"] = pd.read_csv(pjoin(chemin_dossier,"Actifs","actifs_enr.csv"),sep=";",index_col=0)
+    entrees_gep["df_actifs_pilot"] = pd.read_csv(pjoin(chemin_dossier,"Actifs","actifs_pilot.csv"),sep=";",index_col=0)
+    entrees_gep["df_actifs_stockage"] = pd.read_csv(pjoin(chemin_dossier,"Actifs","actifs_stockage.csv"),sep=";",index_col=0)
+    
+    #### Parc
+    
+    df_parc = donnees_simulation.parc.get_df_nb_unites()
+    
+    df_parc_initial = df_parc.loc[[annee_courante]].astype(int)
+    df_parc_initial.index = ["nombre"]
+    entrees_gep["df_parc_initial"] = df_parc_initial
+    
+    df_parc = df_parc.loc[annee_courante:]
+    df_rythme = df_parc.diff().fillna(0)
+    df_rythme.index = np.arange(len(df_rythme.index))
+    entrees_gep["df_reg_ouvertures"] = df_rythme.clip(lower=0).astype(int)
+    entrees_gep["df_reg_fermetures"] = -1* df_rythme.clip(upper=0).astype(int)
+    
+    #### Réalisation : chroniques de l'ambiance pour l'année courante, décalées pour que l'année courante devienne l'année 0
+    
+    ambiance_annee_courante = donnees_entree.ambiances[ambiance][annee_courante]
+    
+    def decalage_annees(df, colonnes_annee):
+        liste_tech = np.unique([ "_".join(col.split("_")[:-1]) for col in df.columns])
+        if colonnes_annee :
+            liste_tech = ["Annee"]
+        df_decale = df[[tech + "_%d"%n for tech in liste_tech for n in annees_restantes]].copy()
+        df_decale.columns = [tech + "_%d"%n for tech in liste_tech for n in (annees_restantes - annee_courante)]
+        return df_decale
+    
+    realisation = {}
+    realisation["couts_combustibles"] = decalage_annees(ambiance_annee_courante["couts_combustibles"], True)
+    
+    nb_meteo = int(df_param_simu.at["nb_meteo","value"])
+    
+    for met in range(nb_meteo):
+        donnees_meteo = ambiance_annee_courante["meteo_%d"%met]
+        realisation["meteo_%d"%met] = {}
+        realisation["meteo_%d"%met]["demande"] = decalage_annees(donnees_meteo["demande"], True)
+        realisation["meteo_%d"%met]["fc"] = decalage_annees(donnees_meteo["fc"], False)
+        realisation["meteo_%d"%met]["dispo"] = decalage_annees(donnees_meteo["dispo"], False)
+        
+    entrees_gep["realisation"] = realisation
+    
+    return entrees_gep
+    
+    
+def lecture_entrees_gep(chemin_rep):
+    """
+    Lit les données d'entrée du GEP dans le répertoire donné.
+
+    Paramètres
+    ----------
+    chemin_rep : str
+        chemin du répertoire contenant les données du GEP
+
+    Retours
+    -------
+    entrees_gep : dict
+        dictionnaire des données d'entrée du GEP
+    """
     
     ################### Lecture des données
     
@@ -82,8 +237,6 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
     chemin_param_simu = pjoin(chemin_rep,"Parametres","parametres_simulation.csv")
     df_param_simu = pd.read_csv(chemin_param_simu,sep=";",index_col=0)
 
-    taux_actualisation = float(df_param_simu.at["taux_actu_systeme","value"])
-
 
     chemin_param_ponderation = pjoin(chemin_rep,"Parametres","parametres_ponderation.csv")
     df_param_ponderation = pd.read_csv(chemin_param_ponderation,sep=";",index_col=0)
@@ -108,10 +261,6 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
     df_actifs_stockage = pd.read_csv(chemin_actifs_stockage,sep=";",index_col=0)
     
 
-    tous_actifs = np.concatenate([df_actifs_enr.index,df_actifs_pilot.index,df_actifs_stockage.index])
-    tous_actifs_hors_stockage = np.concatenate([df_actifs_enr.index,df_actifs_pilot.index])
-    df_tous_actifs = np.array([df_actifs_enr,df_actifs_pilot,df_actifs_stockage])
-    
     #### Fichier Parc
     
     chemin_parc_initial = pjoin(chemin_rep,"Parc","parc_initial.csv")
@@ -160,7 +309,102 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
             
         path_dispo = pjoin(rep_meteo,"disponibilite_pilot.csv")
         realisation["meteo_%d"%met]["dispo"] = pd.read_csv(path_dispo,sep=";",index_col=0)
-                
+    
+    entrees_gep = {"df_param_simu" : df_param_simu,
+                   "df_param_ponderation" : df_param_ponderation,
+                   "df_quota" : df_quota,
+                   "df_contraintes" : df_contraintes,
+                   "df_actifs_enr" : df_actifs_enr,
+                   "df_actifs_pilot" : df_actifs_pilot,
+                   "df_actifs_stockage" : df_actifs_stockage,
+                   "df_parc_initial" : df_parc_initial,
+                   "df_reg_fermetures" : df_reg_fermetures,
+                   "df_reg_ouvertures" : df_reg_ouvertures,
+                   "realisation" : realisation}
+                   
+    return entrees_gep
+    
+    
+def series_meteo_gep(realisation, indice_meteo, annee, df_actifs_enr, df_actifs_pilot):
+    """
+    Renvoie les chroniques d'une année et d'une météo du GEP sur lesquelles sont choisis les jours représentatifs : la
+    demande, le facteur de production de chaque actif ENR et la disponibilité de chaque actif pilotable.
+
+    Paramètres
+    ----------
+    realisation : dict
+        réalisation des données du GEP
+    indice_meteo : int
+        indice de la météo
+    annee : int
+        année du GEP
+    df_actifs_enr : pandas.DataFrame
+        actifs ENR du GEP
+    df_actifs_pilot : pandas.DataFrame
+        actifs pilotables du GEP
+
+    Retours
+    -------
+    dict
+        dictionnaire contenant, pour chaque nom de chronique, la série de ses 8760 valeurs horaires
+    """
+
+    donnees_meteo = realisation["meteo_%d"%indice_meteo]
+
+    series = {"demande": donnees_meteo["demande"]["Annee_%d"%annee].to_numpy()}
+    for techno in df_actifs_enr.index:
+        series["fc_%s"%techno] = donnees_meteo["fc"]["%s_%d"%(techno,annee)].to_numpy()
+    for techno in df_actifs_pilot.index:
+        series["dispo_%s"%techno] = donnees_meteo["dispo"]["%s_%d"%(techno,annee)].to_numpy()
+
+    return series
+
+
+def resolution_gep(entrees_gep,type_optim,chemin_sorties=None,nb_threads=0,nombre_jours_representatifs=0):
+    """
+    Construit et résout le GEP à partir des données d'entrée données.
+
+    Paramètres
+    ----------
+    entrees_gep : dict
+        dictionnaire des données d'entrée du GEP, construit par lecture_entrees_gep ou construction_entrees_gep
+    type_optim : str
+        "LP" ou "MIP"
+    chemin_sorties : str
+        répertoire dans lequel écrire le problème, les dispatchs et sorties_annuelles.xlsx, rien n'est écrit s'il vaut None
+    nb_threads : int
+        nombre de threads accordés au solveur, 0 pour laisser le solveur choisir
+    nombre_jours_representatifs : int
+        nombre de jours représentatifs sur lesquels est écrit le dispatch de chaque année et de chaque météo, 0 pour
+        l'écrire sur les 8760 heures ; les erreurs de l'agrégation sur les chroniques sont affichées et écrites dans
+        sorties_annuelles.xlsx
+
+    Retours
+    -------
+    sorties_nb_unites : dict
+        dictionnaire des dataframes (années x actifs) de nombres d'unités : "nb_unites", "nb_unites_ouvertes", 
+        "nb_unites_fermees", "nb_unites_forcee_fermee" et "nb_unites_forcees"
+    """
+    
+    df_param_simu = entrees_gep["df_param_simu"]
+    df_param_ponderation = entrees_gep["df_param_ponderation"]
+    df_quota = entrees_gep["df_quota"]
+    df_contraintes = entrees_gep["df_contraintes"]
+    df_actifs_enr = entrees_gep["df_actifs_enr"]
+    df_actifs_pilot = entrees_gep["df_actifs_pilot"]
+    df_actifs_stockage = entrees_gep["df_actifs_stockage"]
+    df_parc_initial = entrees_gep["df_parc_initial"]
+    df_reg_fermetures = entrees_gep["df_reg_fermetures"]
+    df_reg_ouvertures = entrees_gep["df_reg_ouvertures"]
+    realisation = entrees_gep["realisation"]
+    
+    taux_actualisation = float(df_param_simu.at["taux_actu_systeme","value"])
+    nb_meteo = int(df_param_simu.at["nb_meteo","value"])
+    
+    tous_actifs = np.concatenate([df_actifs_enr.index,df_actifs_pilot.index,df_actifs_stockage.index])
+    tous_actifs_hors_stockage = np.concatenate([df_actifs_enr.index,df_actifs_pilot.index])
+    df_tous_actifs = np.array([df_actifs_enr,df_actifs_pilot,df_actifs_stockage])
+    
     ################### Calculs préliminaires
 
     print("Calculs préliminaires")
@@ -209,6 +453,36 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
     df_nb_unites_parc_reference = df_nb_unites_parc_reference.fillna(0)
     df_nb_unites_parc_reference = df_nb_unites_parc_reference.clip(lower=0,upper=None)
     
+    # pas de temps du dispatch : les 8760 heures de l'année, ou les heures des jours représentatifs de chaque année
+    # et de chaque météo
+    
+    agregations = []
+    heures = []
+    poids = []
+    df_erreurs_agregation = pd.DataFrame(index=range(nombre_annees))
+    
+    for annee in range(nombre_annees):
+        agregations_annee = []
+        for indice_meteo in range(nb_meteo):
+            agregation = None
+            if nombre_jours_representatifs > 0:
+                series = series_meteo_gep(realisation, indice_meteo, annee, df_actifs_enr, df_actifs_pilot)
+                agregation = AgregationTemporelle.jours_representatifs(list(series.values()), nombre_jours_representatifs)
+                
+                coef_proba = df_param_ponderation.at[indice_meteo,"value"]
+                for nom_erreur, erreur in AgregationTemporelle.erreurs_series(agregation, series).items():
+                    if nom_erreur not in df_erreurs_agregation.columns:
+                        df_erreurs_agregation[nom_erreur] = 0.0
+                    df_erreurs_agregation.at[annee,nom_erreur] += coef_proba * erreur
+            agregations_annee.append(agregation)
+        agregations.append(agregations_annee)
+        heures.append([list(range(8760)) if agregation is None else agregation.heures.tolist() for agregation in agregations_annee])
+        poids.append([[1.0] * 8760 if agregation is None else agregation.poids.tolist() for agregation in agregations_annee])
+        
+    if nombre_jours_representatifs > 0:
+        print("Erreurs maximales de l'agrégation en %d jours représentatifs : "%nombre_jours_representatifs)
+        print(df_erreurs_agregation.abs().max().to_string())
+    
     ################### Realisation du GEP
 
     print("Ecriture du problème d'optimisation")
@@ -260,7 +534,7 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
             for annee in range(nombre_annees):
                 production_actif_annee = []
                 for indice_meteo in range(nb_meteo):
-                    production_actif_annee_meteo = pulp.LpVariable.dict("production_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
+                    production_actif_annee_meteo = pulp.LpVariable.dict("production_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), range(len(heures[annee][indice_meteo])), lowBound=0, cat="Continuous")
                     production_actif_annee.append(production_actif_annee_meteo)
                 production_actif.append(production_actif_annee)
             production[techno] = production_actif
@@ -276,9 +550,15 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
             puissance_charge_actif_annee = []
             puissance_decharge_actif_annee = []
             for indice_meteo in range(nb_meteo):
-                stock_actif_annee_meteo = pulp.LpVariable.dict("stock_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                puissance_charge_actif_annee_meteo = pulp.LpVariable.dict("puissance_charge_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
-                puissance_decharge_actif_annee_meteo = pulp.LpVariable.dict("puissance_decharge_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
+                pas_temps = range(len(heures[annee][indice_meteo]))
+                # avec des jours représentatifs, les variables de stock portent la variation du stock depuis le
+                # début de la journée, qui peut être négative
+                borne_inferieure_stock = 0
+                if agregations[annee][indice_meteo] is not None:
+                    borne_inferieure_stock = None
+                stock_actif_annee_meteo = pulp.LpVariable.dict("stock_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), pas_temps, lowBound=borne_inferieure_stock, cat="Continuous")
+                puissance_charge_actif_annee_meteo = pulp.LpVariable.dict("puissance_charge_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), pas_temps, lowBound=0, cat="Continuous")
+                puissance_decharge_actif_annee_meteo = pulp.LpVariable.dict("puissance_decharge_%s_annee_%d_meteo_%d" % (techno, annee, indice_meteo), pas_temps, lowBound=0, cat="Continuous")
                 stock_actif_annee.append(stock_actif_annee_meteo)
                 puissance_charge_actif_annee.append(puissance_charge_actif_annee_meteo)
                 puissance_decharge_actif_annee.append(puissance_decharge_actif_annee_meteo)
@@ -294,7 +574,7 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
     for annee in range(nombre_annees):
         defaillance_annee = []
         for indice_meteo in range(nb_meteo):
-            defaillance_annee_meteo = pulp.LpVariable.dict("defaillance_annee_%d_meteo_%d" % (annee, indice_meteo), range(8760), lowBound=0, cat="Continuous")
+            defaillance_annee_meteo = pulp.LpVariable.dict("defaillance_annee_%d_meteo_%d" % (annee, indice_meteo), range(len(heures[annee][indice_meteo])), lowBound=0, cat="Continuous")
             defaillance_annee.append(defaillance_annee_meteo)
         defaillance.append(defaillance_annee)
 
@@ -318,7 +598,9 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
         
             coef_proba = df_param_ponderation.at[indice_meteo,"value"]
             
-            for heure in range(8760):
+            for pas in range(len(heures[annee][indice_meteo])):
+            
+                poids_pas = poids[annee][indice_meteo][pas]
             
                 for techno in df_actifs_pilot.index:
                 
@@ -330,7 +612,7 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
                     cout_variable = (prix_combu / rendement) + (coef_emissions*prix_carbone)                    
                     df_couts_variables.at[annee,techno] = cout_variable
                     
-                    cout_production += coef_proba * coef_amo* production[techno][annee][indice_meteo][heure] * cout_variable
+                    cout_production += coef_proba * coef_amo * poids_pas * production[techno][annee][indice_meteo][pas] * cout_variable
 
                 for techno in df_actifs_enr.index : 
                 
@@ -340,14 +622,14 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
                     cout_variable_total = cout_variable + (coef_emissions*prix_carbone)
                     df_couts_variables.at[annee,techno] = cout_variable_total
                     
-                    cout_production += coef_proba * coef_amo  * cout_variable_total * production[techno][annee][indice_meteo][heure]
+                    cout_production += coef_proba * coef_amo * poids_pas * cout_variable_total * production[techno][annee][indice_meteo][pas]
                     
                 for techno in df_actifs_stockage.index : 
                 
                     cout_variable = df_actifs_stockage.at[techno,"CV"]
                     df_couts_variables.at[annee,techno] = cout_variable
                     
-                    cout_production += coef_proba * coef_amo* cout_variable* puissance_decharge[techno][annee][indice_meteo][heure] * cout_variable
+                    cout_production += coef_proba * coef_amo * poids_pas * cout_variable* puissance_decharge[techno][annee][indice_meteo][pas] * cout_variable
                 
     cout_defaillance = 0
 
@@ -358,9 +640,9 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
         
             coef_proba = df_param_ponderation.at[indice_meteo,"value"]
             
-            for heure in range(8760):
+            for pas in range(len(heures[annee][indice_meteo])):
             
-                cout_defaillance += coef_amo * coef_proba* float(df_param_simu.at["VOLL","value"]) * defaillance[annee][indice_meteo][heure]
+                cout_defaillance += coef_amo * coef_proba * poids[annee][indice_meteo][pas] * float(df_param_simu.at["VOLL","value"]) * defaillance[annee][indice_meteo][pas]
                 
                 
     cout_construction = 0
@@ -469,7 +751,7 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
                 
                 for techno in df_actifs_pilot.index:
                     coef_emissions = df_actifs_pilot.at[techno,"emission_CO2"]
-                    somme_emissions += pulp.lpSum([coef_proba*production[techno][annee][indice_meteo][heure]*coef_emissions for heure in range(8760)])
+                    somme_emissions += pulp.lpSum([coef_proba*poids[annee][indice_meteo][pas]*production[techno][annee][indice_meteo][pas]*coef_emissions for pas in range(len(heures[annee][indice_meteo]))])
                     
             contrainte = pulp.LpConstraint(
                 e=somme_emissions,
@@ -528,14 +810,14 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
         for indice_meteo in range(nb_meteo):
             contraintes_satisfaction_demande_annee_meteo = []
             
-            for heure in range(8760):
-                somme_productions = pulp.lpSum([production[techno][annee][indice_meteo][heure] for techno in tous_actifs_hors_stockage])
-                somme_puissances_charge = pulp.lpSum([puissance_charge[techno][annee][indice_meteo][heure] for techno in df_actifs_stockage.index])
-                somme_puissances_decharge = pulp.lpSum([puissance_decharge[techno][annee][indice_meteo][heure] for techno in df_actifs_stockage.index])
+            for pas, heure in enumerate(heures[annee][indice_meteo]):
+                somme_productions = pulp.lpSum([production[techno][annee][indice_meteo][pas] for techno in tous_actifs_hors_stockage])
+                somme_puissances_charge = pulp.lpSum([puissance_charge[techno][annee][indice_meteo][pas] for techno in df_actifs_stockage.index])
+                somme_puissances_decharge = pulp.lpSum([puissance_decharge[techno][annee][indice_meteo][pas] for techno in df_actifs_stockage.index])
                 
                 demande = realisation["meteo_%d"%indice_meteo]["demande"].at[heure,"Annee_%d"%annee]
 
-                defaillance_var = defaillance[annee][indice_meteo][heure]
+                defaillance_var = defaillance[annee][indice_meteo][pas]
                 
                 contrainte = pulp.LpConstraint(
                     e=somme_productions - somme_puissances_charge + somme_puissances_decharge + defaillance_var,
@@ -550,12 +832,29 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
 
     # contraintes de continuité du stock
     
+    niveaux_stock_debut_jour = dict()
+    
     for actif_stockage in df_actifs_stockage.index:
         stock_actif = stock[actif_stockage]
         puissance_decharge_actif = puissance_decharge[actif_stockage]
         puissance_charge_actif = puissance_charge[actif_stockage]
         for annee in range(nombre_annees):
             for indice_meteo in range(nb_meteo):
+                agregation = agregations[annee][indice_meteo]
+                if agregation is not None:
+                    # le stock est enchaîné entre les jours de l'année à travers leurs jours représentatifs
+                    niveaux_stock_debut_jour[actif_stockage, annee, indice_meteo] = AgregationTemporelle.contraintes_stockage_jours_representatifs(
+                        model,
+                        agregation,
+                        stock_actif[annee][indice_meteo],
+                        puissance_charge_actif[annee][indice_meteo],
+                        puissance_decharge_actif[annee][indice_meteo],
+                        nombre_unites[actif_stockage][annee] * df_actifs_stockage.at[actif_stockage,"stock_max_MWh"],
+                        df_actifs_stockage.at[actif_stockage,"rend_ch"],
+                        df_actifs_stockage.at[actif_stockage,"rend_dech"],
+                        "%s_annee_%d_meteo_%d" % (actif_stockage, annee, indice_meteo)
+                    )
+                    continue
                 for heure in range(8760):
                     stock_var = stock_actif[annee][indice_meteo][heure]
                     stock_suivant_var = stock_actif[annee][indice_meteo][(heure+1)%8760]
@@ -580,8 +879,8 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
         nombre_unites_actif = nombre_unites[actif]
         for annee in range(nombre_annees):
             for indice_meteo in range(nb_meteo):
-                for heure in range(8760):
-                    production_var = production_actif[annee][indice_meteo][heure]
+                for pas, heure in enumerate(heures[annee][indice_meteo]):
+                    production_var = production_actif[annee][indice_meteo][pas]
                     borne_superieure_production = None
                     if actif in df_actifs_enr.index:
                         puissance = float(df_actifs_enr.at[actif,"Pnom"])
@@ -615,18 +914,21 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
             borne_superieure_puissance_decharge = nombre_unites_actif[annee] * df_actifs_stockage.at[actif_stockage,"puissance"]
 
             for indice_meteo in range(nb_meteo):
-                for heure in range(8760):
-                    stock_var = stock_actif[annee][indice_meteo][heure]
-                    puissance_charge_var = puissance_charge_actif[annee][indice_meteo][heure]
-                    puissance_decharge_var = puissance_decharge_actif[annee][indice_meteo][heure]
-
-                    contrainte = pulp.LpConstraint(
-                        e=borne_superieure_stock - stock_var,
-                        sense=pulp.LpConstraintGE,
-                        rhs=0,
-                        name="borne_superieure_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage, annee, indice_meteo, heure)
-                    )
-                    model.addConstraint(contrainte)
+                for pas, heure in enumerate(heures[annee][indice_meteo]):
+                    stock_var = stock_actif[annee][indice_meteo][pas]
+                    puissance_charge_var = puissance_charge_actif[annee][indice_meteo][pas]
+                    puissance_decharge_var = puissance_decharge_actif[annee][indice_meteo][pas]
+
+                    # avec des jours représentatifs, les bornes du stock sont imposées jour par jour par
+                    # AgregationTemporelle.contraintes_stockage_jours_representatifs
+                    if agregations[annee][indice_meteo] is None:
+                        contrainte = pulp.LpConstraint(
+                            e=borne_superieure_stock - stock_var,
+                            sense=pulp.LpConstraintGE,
+                            rhs=0,
+                            name="borne_superieure_stock_%s_annee_%d_meteo_%d_heure_%d" % (actif_stockage, annee, indice_meteo, heure)
+                        )
+                        model.addConstraint(contrainte)
 
                     contrainte = pulp.LpConstraint(
                         e=borne_superieure_puissance_charge - puissance_charge_var,
@@ -776,13 +1078,15 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
 
     print("Resolution du problème")
     
-    log_path = os.path.join(chemin_sorties,"log.txt")
-
-    solver = pulp.CPLEX_CMD(path="/opt/cplex/12.8/cplex/bin/x86-64_linux/cplex")
+    options_solveur = []
+    if nb_threads > 0 :
+        options_solveur.append("set threads %d"%nb_threads)
+    solver = pulp.CPLEX_CMD(path="/opt/cplex/12.8/cplex/bin/x86-64_linux/cplex", options=options_solveur)
     
-    path_lp = os.path.join(chemin_sorties,"lp.lp")    
-
-    model.writeLP(path_lp)
+    if chemin_sorties is not None :
+        path_lp = os.path.join(chemin_sorties,"lp.lp")    
+        model.writeLP(path_lp)
+        
     model.setSolver(solver)
     model.solve()
     
@@ -796,6 +1100,31 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
     # Ecriture des sorties  #
     # ##################### #
     
+    # nb unites
+
+    dict_nb_unites = {"nb_unites":nombre_unites,
+                        "nb_unites_ouvertes":nombre_unites_ouvertes,
+                        "nb_unites_fermees":nombre_unites_fermees,
+                        "nb_unites_forcee_fermee":nombre_unites_ouverture_forcee_fermees,
+                        "nb_unites_forcees":nombre_unites_ouverture_forcee}
+
+    sorties_nb_unites = {}
+    
+    for nom_nb_unite in dict_nb_unites:
+    
+        df_nb_unites = pd.DataFrame(index=range(nombre_annees))
+        
+        nb_unite = dict_nb_unites[nom_nb_unite]
+            
+        for annee in range(nombre_annees):
+            for techno in tous_actifs :
+                df_nb_unites.at[annee,techno] = nb_unite[techno][annee].value()
+                
+        sorties_nb_unites[nom_nb_unite] = df_nb_unites
+        
+    if chemin_sorties is None :
+        return sorties_nb_unites
+
     print("Ecriture des sorties")   
     
     #### Sortie dispatch
@@ -808,36 +1137,48 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
         for indice_meteo in range(nb_meteo):
         
             coef_proba = df_param_ponderation.at[indice_meteo,"value"]
+            
+            agregation = agregations[annee][indice_meteo]
+            pas_temps = range(len(heures[annee][indice_meteo]))
+            
+            # valeurs aux 8760 heures, reconstituées à partir des jours représentatifs si besoin
+            def valeurs_horaires(valeurs):
+                if agregation is None:
+                    return np.array(valeurs, dtype=float)
+                return agregation.reconstitution(valeurs)
                 
             df_dispatch = pd.DataFrame(index=range(8760))
             
-            for heure in range(8760):
+            for techno in tous_actifs_hors_stockage :
+                df_dispatch["production_"+techno] = valeurs_horaires([production[techno][annee][indice_meteo][pas].value() for pas in pas_temps])
+                    
+            for techno in df_actifs_enr.index : 
             
-                for techno in tous_actifs_hors_stockage :
-                    df_dispatch.at[heure,"production_"+techno] = production[techno][annee][indice_meteo][heure].value()
-                        
-                for techno in df_actifs_enr.index : 
+                nb_unite = nombre_unites[techno][annee].value()
+                puissance = float(df_actifs_enr.at[techno,"Pnom"])
+                productible = realisation["meteo_%d"%indice_meteo]["fc"]["%s_%d"%(techno,annee)].to_numpy() * nb_unite *  puissance                
+           
+                df_dispatch["ecretement_"+techno] = productible - df_dispatch["production_"+techno].to_numpy()
+                                
                 
-                    nb_unite = nombre_unites[techno][annee].value()
-                    puissance = float(df_actifs_enr.at[techno,"Pnom"])
-                    productible = realisation["meteo_%d"%indice_meteo]["fc"].at[heure,"%s_%d"%(techno,annee)] * nb_unite *  puissance                
-               
-                    df_dispatch.at[heure,"ecretement_"+techno] = productible - production[techno][annee][indice_meteo][heure].value()
-                                    
-                    
-                for techno in df_actifs_stockage.index : 
+            for techno in df_actifs_stockage.index : 
 
-                    df_dispatch.at[heure,"decharge_"+techno] = puissance_decharge[techno][annee][indice_meteo][heure].value()
+                df_dispatch["decharge_"+techno] = valeurs_horaires([puissance_decharge[techno][annee][indice_meteo][pas].value() for pas in pas_temps])
 
-                        
-                df_dispatch.at[heure,"defaillance"] = defaillance[annee][indice_meteo][heure].value()
-                df_dispatch.at[heure,"demande"] = realisation["meteo_%d"%indice_meteo]["demande"].at[heure,"Annee_%d"%annee]
-                df_dispatch.at[heure,"cout_marginal"] = contraintes_satisfaction_demande[annee][indice_meteo][heure].pi /(coef_amo*coef_proba)
-                
-                for techno in df_actifs_stockage.index : 
-                    df_dispatch.at[heure,"charge_"+techno] = puissance_charge[techno][annee][indice_meteo][heure].value()
-                    df_dispatch.at[heure,"stock_"+techno] = stock[techno][annee][indice_meteo][heure].value()
-                                
+                    
+            df_dispatch["defaillance"] = valeurs_horaires([defaillance[annee][indice_meteo][pas].value() for pas in pas_temps])
+            df_dispatch["demande"] = realisation["meteo_%d"%indice_meteo]["demande"]["Annee_%d"%annee].to_numpy()
+            df_dispatch["cout_marginal"] = valeurs_horaires([contraintes_satisfaction_demande[annee][indice_meteo][pas].pi /(coef_amo*coef_proba*poids[annee][indice_meteo][pas]) for pas in pas_temps])
+            
+            for techno in df_actifs_stockage.index : 
+                df_dispatch["charge_"+techno] = valeurs_horaires([puissance_charge[techno][annee][indice_meteo][pas].value() for pas in pas_temps])
+                valeurs_stock = [stock[techno][annee][indice_meteo][pas].value() for pas in pas_temps]
+                if agregation is None:
+                    df_dispatch["stock_"+techno] = valeurs_stock
+                else:
+                    valeurs_niveaux = [niveaux_stock_debut_jour[techno, annee, indice_meteo][jour].value() for jour in range(AgregationTemporelle.NOMBRE_JOURS)]
+                    df_dispatch["stock_"+techno] = AgregationTemporelle.stock_horaire(agregation, valeurs_stock, valeurs_niveaux)
+                            
             chemin_dispatch = pjoin(chemin_sorties,"dispatch_annee_%d_meteo_%d.csv"%(annee,indice_meteo))
             df_dispatch.to_csv(chemin_dispatch,sep=";")
             
@@ -852,24 +1193,8 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
 
         # nb unites
 
-        dict_nb_unites = {"nb_unites":nombre_unites,
-                            "nb_unites_ouvertes":nombre_unites_ouvertes,
-                            "nb_unites_fermees":nombre_unites_fermees,
-                            "nb_unites_forcee_fermee":nombre_unites_ouverture_forcee_fermees,
-                            "nb_unites_forcees":nombre_unites_ouverture_forcee}
-
-        
-        for nom_nb_unite in dict_nb_unites:
-        
-            df_nb_unites = pd.DataFrame(index=range(nombre_annees))
-            
-            nb_unite = dict_nb_unites[nom_nb_unite]
-                
-            for annee in range(nombre_annees):
-                for techno in tous_actifs :
-                    df_nb_unites.at[annee,techno] = nb_unite[techno][annee].value()
-                    
-            df_nb_unites.to_excel(writer, sheet_name=nom_nb_unite)
+        for nom_nb_unite in sorties_nb_unites:
+            sorties_nb_unites[nom_nb_unite].to_excel(writer, sheet_name=nom_nb_unite)
 
         # capa
         
@@ -935,7 +1260,40 @@ def run_gep(chemin_rep,chemin_sorties,type_optim):
                 df_indicateurs.at[annee,"cout_marginal"] += coef_proba *  dispatch["cout_marginal"].mean()                
                 
         df_indicateurs.to_excel(writer, sheet_name="indicateurs")
+        
+        # erreurs de l'agrégation en jours représentatifs
+        
+        if nombre_jours_representatifs > 0:
+            df_erreurs_agregation.to_excel(writer, sheet_name="erreurs agregation")
                   
 
 
-    return df_reg_ouvertures, df_reg_fermetures
\ No newline at end of file
+    return sorties_nb_unites
+
+
+def run_gep(chemin_rep,chemin_sorties,type_optim):
+    """
+    Lit les données du GEP dans le répertoire donné, le résout et écrit ses sorties.
+
+    Paramètres
+    ----------
+    chemin_rep : str
+        chemin du répertoire contenant les données du GEP
+    chemin_sorties : str
+        répertoire dans lequel écrire les sorties
+    type_optim : str
+        "LP" ou "MIP"
+
+    Retours
+    -------
+    df_reg_ouvertures : pandas.DataFrame
+        registre des ouvertures donné en entrée du GEP
+    df_reg_fermetures : pandas.DataFrame
+        registre des fermetures donné en entrée du GEP
+    """
+    
+    entrees_gep = lecture_entrees_gep(chemin_rep)
+    
+    resolution_gep(entrees_gep,type_optim,chemin_sorties)
+
+    return entrees_gep["df_reg_ouvertures"], entrees_gep["df_reg_fermetures"]
\ No newline at end of file
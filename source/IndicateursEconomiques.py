@@ -4,6 +4,8 @@
 import statistics as stat
 import sys
 
+import numpy as np
+
 from DonneesEntree import *
 
 
@@ -26,34 +28,35 @@ def calcul_revenu_annuel_hors_contrat(actif, resultat_annuel, donnees_entree):
         revenu annuel hors contrat
     """
 
-    annee_courante = resultat_annuel.annee_courante
-    annee = resultat_annuel.annee
-    df_cv = resultat_annuel.df_cv
-    donnees_couts_var = resultat_annuel.donnees_couts_var
-    
+    revenu_annuel = calcul_revenu_annuel_hors_contrat_sans_CF(actif, resultat_annuel, donnees_entree) - actif.cout_fixe_maintenance
+            
+    return revenu_annuel
 
-    cout_variable_actif = 0
-    if actif.categorie == "Pilotable":
-        cout_variable_actif = df_cv.at[actif.cle,"CV"]
-    elif actif.categorie == "ENR":
-        cout_variable_actif = actif.cout_variable
-    elif actif.categorie == "Stockage":
-        cout_variable_actif = actif.cout_variable
 
-    revenu_annuel = np.sum((resultat_annuel.cout_marginal - cout_variable_actif) * resultat_annuel.production_unitaire(actif.cle)) - actif.cout_fixe_maintenance
+def cle_cohorte_revenus(unite):
+    """
+    Renvoie la clé de la cohorte de revenus à laquelle appartient une unité déjà ouverte.
 
+    Les revenus calculés par calcul_matrice_revenus_annuels et calcul_matrice_revenus_annuels_sans_CF à partir de
+    l'année courante ne dépendent que de l'actif, de l'année de fermeture et du contrat de l'unité : les unités
+    ouvertes de même clé ont les mêmes revenus pour les mêmes résultats de dispatch.
 
-    if actif.categorie == "Stockage":
-        nombre_unites_actif = max(1, resultat_annuel.compte_unites[actif.cle])
-        revenu_annuel += - np.sum(resultat_annuel.cout_marginal * resultat_annuel.charge[actif.cle] / nombre_unites_actif)
-
-    if actif.categorie == "ENR":
-        revenu_annuel += donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee] * np.sum(resultat_annuel.production_unitaire(actif.cle))
-        if donnees_entree.parametres_simulation.certificats_verts_au_productible:
-            nombre_unites_actif = max(1, resultat_annuel.compte_unites[actif.cle])
-            revenu_annuel += np.sum(resultat_annuel.ecretement[actif.cle]) * donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee] / nombre_unites_actif
-            
-    return revenu_annuel
+    Paramètres
+    ----------
+    unite : DonneesSimulation.Unite
+        unité déjà ouverte
+
+    Retours
+    -------
+    tuple
+        clé de l'actif, année de fermeture et identifiant du contrat (None si l'unité n'a pas de contrat)
+    """
+
+    identifiant_contrat = None
+    if unite.contrat:
+        identifiant_contrat = id(unite.contrat)
+
+    return (unite.actif.cle, unite.annee_fermeture, identifiant_contrat)
 
 
 def calcul_revenu_annuel(unite, annee, resultat_annuel, donnees_entree):
@@ -88,6 +91,56 @@ def calcul_revenu_annuel(unite, annee, resultat_annuel, donnees_entree):
         return unite.contrat.calcul_revenu_annuel(unite.actif, annee, resultat_annuel, donnees_entree)
 
 
+def matrice_revenus_annuels_hors_contrat(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, couts_fixes):
+    """
+    Calcule, pour une unité sans contrat, la matrice indexée par [ambiance][année][météo] de ses revenus annuels
+    entre annee_debut et annee_fin à partir du tenseur des revenus unitaires (voir
+    calcul_tenseur_revenus_annuels_sans_CF), avec les mêmes conventions que calcul_matrice_revenus_annuels et
+    calcul_matrice_revenus_annuels_sans_CF.
+
+    Paramètres
+    ----------
+    unite : DonneesSimulation.Unite
+        unité sans contrat dont on veut calculer les revenus
+    matrice_resultats_annuels : list
+        matrice indexée par [ambiance][année][météo] contenant les resultats de dispatchs à utiliser
+    annee_debut : int
+        première année pour laquelle on veut connaître le revenu, on suppose qu'elle coïncide avec l'année 0 de
+        matrice_resultats_annuels
+    annee_fin : int
+        dernière année, non incluse pour le calcul
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    couts_fixes : bool
+        si True, les coûts fixes de maintenance sont déduits et, comme dans calcul_matrice_revenus_annuels, le
+        fonctionnement de l'unité est apprécié à l'année des données utilisées ; sinon il l'est à l'année du revenu,
+        comme dans calcul_matrice_revenus_annuels_sans_CF
+
+    Retours
+    -------
+    list
+        matrice de revenus annuels indexée par [ambiance][année][météo]
+    """
+
+    indice_actif = [actif.cle for actif in donnees_entree.tous_actifs()].index(unite.actif.cle)
+    tenseur_revenus = calcul_tenseur_revenus_annuels_sans_CF(matrice_resultats_annuels, donnees_entree)[:, :, :, indice_actif]
+
+    # au delà de la période couverte par les résultats, les résultats de la dernière année sont réutilisés
+    annees_revenu = np.arange(annee_debut, annee_fin)
+    indices_annees_donnees = np.minimum(annees_revenu - annee_debut, tenseur_revenus.shape[1] - 1)
+
+    revenus = tenseur_revenus[:, indices_annees_donnees, :]
+    annees_fonctionnement = annees_revenu
+    if couts_fixes:
+        revenus = revenus - unite.actif.cout_fixe_maintenance
+        annees_fonctionnement = annee_debut + indices_annees_donnees
+
+    unite_en_fonctionnement = (unite.annee_ouverture <= annees_fonctionnement) & (annees_fonctionnement < unite.annee_fermeture)
+    revenus = np.where(unite_en_fonctionnement[None, :, None], revenus, 0)
+
+    return revenus.tolist()
+
+
 def calcul_matrice_revenus_annuels(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, donnees_simulation):
     """
     Renvoie une matrice indexée par [ambiance][année][météo] des revenus annuels de l'unité correspondant
@@ -118,6 +171,9 @@ def calcul_matrice_revenus_annuels(unite, matrice_resultats_annuels, annee_debut
         matrice de revenus annuels indexée par [ambiance][année][météo]
     """
     
+    if not unite.contrat:
+        return matrice_revenus_annuels_hors_contrat(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, True)
+
     matrice_revenus_annuels = []
     for indice_ambiance in range(len(matrice_resultats_annuels)):
         matrice_revenus_annuels_ambiance = []
@@ -170,35 +226,151 @@ def calcul_revenu_annuel_hors_contrat_sans_CF(actif, resultat_annuel, donnees_en
         revenu annuel hors contrat
     """
 
-    annee_courante = resultat_annuel.annee_courante
+    revenus_unitaires = revenus_unitaires_sans_CF(resultat_annuel, donnees_entree)
+    indice_actif = [actif_parc.cle for actif_parc in donnees_entree.tous_actifs()].index(actif.cle)
+
+    return revenus_unitaires[indice_actif]
+
+
+def revenus_unitaires_sans_CF(resultat_annuel, donnees_entree):
+    """
+    Renvoie les revenus hors contrat et hors coûts fixes d'une unité de chaque actif pour le résultat annuel donné.
+
+    Les revenus de tous les actifs sont calculés en une fois, sous forme matricielle : marge sur coût variable de la
+    production, coût de la charge des actifs de stockage et certificats verts des actifs ENR. Ils sont mémorisés
+    dans le résultat annuel, qui peut ainsi être réutilisé par les calculs de revenus successifs sans refaire les
+    produits entre coûts marginaux et productions.
+
+    Paramètres
+    ----------
+    resultat_annuel : DispatchV0.ResultatAnnuel
+        resultat de dispatch à utiliser
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+
+    Retours
+    -------
+    np.array
+        revenus annuels d'une unité de chaque actif, dans l'ordre de donnees_entree.tous_actifs()
+    """
+
+    if getattr(resultat_annuel, "revenus_unitaires_sans_CF", None) is not None:
+        return resultat_annuel.revenus_unitaires_sans_CF
+
     annee = resultat_annuel.annee
     df_cv = resultat_annuel.df_cv
     donnees_couts_var = resultat_annuel.donnees_couts_var
-    
+    cout_marginal = resultat_annuel.cout_marginal
+    liste_actifs = list(donnees_entree.tous_actifs())
+
+    # grandeurs indexées par [actif] ou [actif][heure], ramenées à une unité de chaque actif : comme dans
+    # ResultatAnnuel.production_unitaire, la production est divisée par le nombre d'unités dès qu'il est positif (il
+    # peut être fractionnaire pour un parc issu d'un GEP continu), la charge et l'écrêtement par ce nombre borné à 1
+    compte_unites = np.array([resultat_annuel.compte_unites[actif.cle] for actif in liste_actifs], dtype=float)
+    nombre_unites = np.maximum(1, compte_unites)
+    diviseur_production = np.where(compte_unites > 0, compte_unites, 1)
+    production = np.array([resultat_annuel.production[actif.cle] for actif in liste_actifs], dtype=float) / diviseur_production[:, None]
+    couts_variables = np.array([df_cv.at[actif.cle,"CV"] if actif.categorie == "Pilotable" else actif.cout_variable for actif in liste_actifs], dtype=float)
+
+    revenus = np.sum((cout_marginal[None, :] - couts_variables[:, None]) * production, axis=1)
+
+    for indice_actif, actif in enumerate(liste_actifs):
+
+        if actif.categorie == "Stockage":
+            revenus[indice_actif] += - np.sum(cout_marginal * resultat_annuel.charge[actif.cle] / nombre_unites[indice_actif])
+
+        elif actif.categorie == "ENR":
+            prix_certificats_verts = donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee]
+            revenus[indice_actif] += prix_certificats_verts * np.sum(production[indice_actif])
+            if donnees_entree.parametres_simulation.certificats_verts_au_productible:
+                revenus[indice_actif] += np.sum(resultat_annuel.ecretement[actif.cle]) * prix_certificats_verts / nombre_unites[indice_actif]
+
+    resultat_annuel.revenus_unitaires_sans_CF = revenus
+
+    return revenus
+
+
+def calcul_tenseur_revenus_annuels_sans_CF(matrice_resultats_annuels, donnees_entree):
+    """
+    Renvoie le tenseur des revenus hors contrat et hors coûts fixes d'une unité de chaque actif pour l'ensemble des
+    résultats d'une anticipation.
+
+    Paramètres
+    ----------
+    matrice_resultats_annuels : list
+        matrice indexée par [ambiance][année][météo] contenant les resultats de dispatchs à utiliser
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+
+    Retours
+    -------
+    np.array
+        tenseur indexé par [ambiance][année][météo][actif] des revenus annuels d'une unité de chaque actif, les
+        actifs étant dans l'ordre de donnees_entree.tous_actifs()
+    """
+
+    nombre_actifs = len(list(donnees_entree.tous_actifs()))
+    nombre_annees = max([len(resultats_annuels_ambiance) for resultats_annuels_ambiance in matrice_resultats_annuels], default=0)
+    nombre_meteo = max([len(resultats_annuels_ambiance_annee) for resultats_annuels_ambiance in matrice_resultats_annuels for resultats_annuels_ambiance_annee in resultats_annuels_ambiance], default=0)
+
+    tenseur_revenus = np.zeros((len(matrice_resultats_annuels), nombre_annees, nombre_meteo, nombre_actifs))
+    for indice_ambiance, resultats_annuels_ambiance in enumerate(matrice_resultats_annuels):
+        for indice_annee, resultats_annuels_ambiance_annee in enumerate(resultats_annuels_ambiance):
+            for indice_meteo, resultat_annuel in enumerate(resultats_annuels_ambiance_annee):
+                tenseur_revenus[indice_ambiance, indice_annee, indice_meteo] = revenus_unitaires_sans_CF(resultat_annuel, donnees_entree)
+
+    return tenseur_revenus
+
+
+def calcul_revenu_annuel_marginal_sans_CF(actif, resultat_annuel, donnees_entree, certificats_verts=True):
+    """
+    Estime le revenu hors contrat d'une unité supplémentaire de l'actif à partir d'un résultat de dispatch calculé
+    sans cette unité, comme pour calcul_revenu_annuel_hors_contrat_sans_CF.
+
+    Les coûts marginaux du dispatch sont supposés inchangés par l'ajout de l'unité (théorème de l'enveloppe) :
+    l'unité produit toute sa puissance disponible aux heures où le coût marginal dépasse son coût variable. Tant
+    que l'ajout de l'unité ne fait pas augmenter les coûts marginaux, l'estimation majore le revenu obtenu avec un
+    dispatch complet. Le revenu d'une unité de stockage dépendant de sa gestion, il n'est pas estimé.
+
+    Paramètres
+    ----------
+    actif : DonneesEntree.Actif
+        type d'actif de l'unité supplémentaire, pilotable ou ENR
+    resultat_annuel : DispatchV0.ResultatAnnuel
+        resultat de dispatch du parc sans l'unité supplémentaire
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    certificats_verts : bool
+        si True, le revenu des certificats verts des actifs ENR est inclus
+
+    Retours
+    -------
+    float
+        estimation du revenu annuel hors contrat
+    """
+
+    annee = resultat_annuel.annee
+    donnees_dispatch = resultat_annuel.donnees_dispatch
+    donnees_couts_var = resultat_annuel.donnees_couts_var
+    colonne = actif.cle + "_%d" % annee
 
-    cout_variable_actif = 0
     if actif.categorie == "Pilotable":
-        cout_variable_actif = df_cv.at[actif.cle,"CV"]
+        cout_variable_actif = resultat_annuel.df_cv.at[actif.cle,"CV"]
+        puissance_disponible = actif.puissance_nominale
+        if colonne in donnees_dispatch["dispo"].columns:
+            puissance_disponible = actif.puissance_nominale * donnees_dispatch["dispo"][colonne].values[:8760]
     elif actif.categorie == "ENR":
         cout_variable_actif = actif.cout_variable
-    elif actif.categorie == "Stockage":
-        cout_variable_actif = actif.cout_variable
-
-
-    revenu_annuel = np.sum((resultat_annuel.cout_marginal - cout_variable_actif) * resultat_annuel.production_unitaire(actif.cle))
+        puissance_disponible = actif.puissance_reference * donnees_dispatch["fc"][colonne].values[:8760]
+    else:
+        raise ValueError("le revenu marginal d'un actif de catégorie %s n'est pas estimé" % actif.categorie)
 
+    revenu_annuel = np.sum(np.maximum(resultat_annuel.cout_marginal - cout_variable_actif, 0) * puissance_disponible)
 
+    if actif.categorie == "ENR" and certificats_verts:
+        # majoration : les certificats verts sont comptés sur tout le productible
+        revenu_annuel += donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee] * np.sum(puissance_disponible)
 
-    if actif.categorie == "Stockage":
-        nombre_unites_actif = max(1, resultat_annuel.compte_unites[actif.cle])
-        revenu_annuel += - np.sum(resultat_annuel.cout_marginal * resultat_annuel.charge[actif.cle] / nombre_unites_actif)
-
-    if actif.categorie == "ENR":
-        revenu_annuel += donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee] * np.sum(resultat_annuel.production_unitaire(actif.cle))
-        if donnees_entree.parametres_simulation.certificats_verts_au_productible:
-            nombre_unites_actif = max(1, resultat_annuel.compte_unites[actif.cle])
-            revenu_annuel += np.sum(resultat_annuel.ecretement[actif.cle]) * donnees_couts_var.at["prix_certificats_verts","Annee_%d"%annee]/ nombre_unites_actif
-            
     return revenu_annuel
 
 
@@ -236,7 +408,7 @@ def calcul_revenu_annuel_sans_CF(unite, annee_donnee, annee_revenu, resultat_ann
         return unite.contrat.calcul_revenu_annuel_sans_CF(unite.actif, annee_donnee, resultat_annuel, donnees_entree)
 
 
-def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, donnees_simulation):
+def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, donnees_simulation, estimation_marginale=False):
     """
     Renvoie une matrice indexée par [ambiance][année][météo] des revenus annuels de l'unité correspondant
     aux resultats annuels de matrice_resultats_annuels pour les années entre annee_debut et annee_fin.
@@ -259,6 +431,9 @@ def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, ann
         données de simulation à utiliser
     donnees_simulation : DonneesSimulation.DonneesSimulation
         données de simulation à utiliser
+    estimation_marginale : bool
+        si True, les résultats de dispatch ne contiennent pas l'unité et son revenu est estimé avec
+        calcul_revenu_annuel_marginal_sans_CF
 
     Retours
     -------
@@ -266,6 +441,9 @@ def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, ann
         matrice de revenus annuels indexée par [ambiance][année][météo]
     """
     
+    if not (unite.contrat or estimation_marginale):
+        return matrice_revenus_annuels_hors_contrat(unite, matrice_resultats_annuels, annee_debut, annee_fin, donnees_entree, False)
+
     matrice_revenus_annuels = []
     for indice_ambiance in range(len(matrice_resultats_annuels)):
         matrice_revenus_annuels_ambiance = []
@@ -290,7 +468,10 @@ def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, ann
             
                 resultat_annuel = resultats_annuels_ambiance_annee[indice_meteo]
                 
-                revenu_annuel = calcul_revenu_annuel_sans_CF(unite, annee_donnees, annee_revenu, resultat_annuel, donnees_entree)
+                if estimation_marginale:
+                    revenu_annuel = calcul_revenu_annuel_marginal_sans_CF(unite.actif, resultat_annuel, donnees_entree) if unite.annee_ouverture <= annee_revenu < unite.annee_fermeture else 0
+                else:
+                    revenu_annuel = calcul_revenu_annuel_sans_CF(unite, annee_donnees, annee_revenu, resultat_annuel, donnees_entree)
                 
                 liste_revenus_annuels_ambiance_annee.append(revenu_annuel)
 
@@ -300,12 +481,99 @@ def calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, ann
     return matrice_revenus_annuels
 
 
+def indices_scenarios_meteo(nombres_meteo, donnees_entree, generateur):
+    """
+    Retourne les indices des scénarios météo à évaluer, un scénario associant une météo à chaque année.
+
+    Si le nombre de scénarios possibles ne dépasse pas le paramètre nombre_max_scenarios_meteo, tous les scénarios sont
+    énumérés dans l'ordre lexicographique. Sinon, nombre_tirages_meteo scénarios sont tirés uniformément à l'aide du
+    générateur fourni.
+
+    Paramètres
+    ----------
+    nombres_meteo : list
+        nombre de météos possibles pour chaque année
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    generateur : numpy.random.RandomState
+        générateur aléatoire utilisé pour les tirages
+
+    Retours
+    -------
+    numpy.ndarray
+        matrice d'indices de météo indexée par [scénario][année]
+    bool
+        True si tous les scénarios ont été énumérés, False s'ils ont été tirés
+    """
+
+    if len(nombres_meteo) == 0:
+        return np.zeros((1, 0), dtype=int), True
+
+    nombre_scenarios = np.prod([float(nombre_meteo) for nombre_meteo in nombres_meteo])
+    if nombre_scenarios <= donnees_entree.parametres_simulation.nombre_max_scenarios_meteo:
+        grilles = np.meshgrid(*[np.arange(nombre_meteo) for nombre_meteo in nombres_meteo], indexing="ij")
+        return np.stack([grille.ravel() for grille in grilles], axis=1), True
+
+    nombre_tirages = donnees_entree.parametres_simulation.nombre_tirages_meteo
+    tirages = [generateur.randint(nombre_meteo, size=nombre_tirages) for nombre_meteo in nombres_meteo]
+    return np.stack(tirages, axis=1), False
+
+
+def quantile_pondere(valeurs, poids, ordre):
+    """
+    Calcule le quantile d'ordre donné d'une liste de valeurs pondérées, par interpolation linéaire entre les valeurs
+    triées. Lorsque tous les poids sont égaux, le résultat est celui de numpy.quantile.
+
+    Paramètres
+    ----------
+    valeurs : list
+        valeurs dont on cherche le quantile
+    poids : list
+        poids de chaque valeur
+    ordre : float
+        ordre du quantile, compris entre 0 et 1
+
+    Retours
+    -------
+    float
+        quantile d'ordre donné des valeurs pondérées
+    """
+
+    valeurs = np.asarray(valeurs, dtype=float)
+    poids = np.asarray(poids, dtype=float)
+    tri = np.argsort(valeurs, kind="mergesort")
+    valeurs = valeurs[tri]
+    poids = poids[tri]
+    if len(valeurs) == 1:
+        return valeurs[0]
+
+    # chaque valeur est vue comme poids / poids_min copies d'une valeur de poids poids_min, et le quantile est celui de
+    # numpy.quantile sur ces copies : une valeur occupe l'intervalle de positions de ses copies, l'interpolation n'a
+    # lieu qu'entre deux valeurs consécutives
+    poids_min = poids.min()
+    poids_cumules = np.cumsum(poids)
+    debuts = (poids_cumules - poids) / (poids_cumules[-1] - poids_min)
+    fins = (poids_cumules - poids_min) / (poids_cumules[-1] - poids_min)
+    positions = np.column_stack((debuts, fins)).ravel()
+    valeurs = np.repeat(valeurs, 2)
+
+    indice = min(max(int(np.searchsorted(positions, ordre, side="right")) - 1, 0), len(valeurs) - 1)
+    if indice == len(valeurs) - 1 or positions[indice] == ordre or valeurs[indice] == valeurs[indice + 1]:
+        return valeurs[indice]
+    fraction = (ordre - positions[indice]) / (positions[indice + 1] - positions[indice])
+    return valeurs[indice] + fraction * (valeurs[indice + 1] - valeurs[indice])
+
+
 def calcul_VAN_equivalente(matrice_flux_financiers, taux_actualisation, donnees_entree, investissement_initial, nbAnneeNPV):
     """
     Calcule la VAN équivalente correspondant aux flux financiers donnés.
 
     Les flux financiers sont actualisés dès l'année actuelle, le seul terme d'ordre 0 est l'investissement initial.
 
+    Les ambiances sont équiprobables : pour la médiane et les quantiles, chaque scénario météo d'une ambiance est
+    pondéré par la probabilité de l'ambiance divisée par le nombre de scénarios évalués pour cette ambiance, de sorte
+    qu'une ambiance dont les scénarios sont tirés ne pèse pas plus qu'une ambiance dont les scénarios sont énumérés.
+
     Paramètres
     ----------
     matrice_flux_financiers : list
@@ -396,21 +664,31 @@ def calcul_VAN_equivalente(matrice_flux_financiers, taux_actualisation, donnees_
         return EC, EC_annualise, prime_risque, liste_EC_possibles
         
     
+    # chaque scénario associe une météo à chaque année, le nombre de scénarios croît exponentiellement avec
+    # l'horizon : au-delà de nombre_max_scenarios_meteo, les scénarios sont tirés aléatoirement
+    generateur = np.random.RandomState(donnees_entree.parametres_simulation.graine_tirages_meteo)
+    scenarios_enumeres = True
+    VAN_extremes = []
+    VAN_moyennes = []
+    poids_VAN_possibles = []
     for indice_ambiance in range(len(matrice_flux_financiers)):
-        liste_sommes_partielles = [-investissement_initial]
+        flux_actualises = [np.asarray(matrice_flux_financiers[indice_ambiance][annee], dtype=float) / (1 + taux_actualisation)**(annee) for annee in range(nbAnneeNPV)]
 
-        for annee in range(nbAnneeNPV):
-            nouvelle_liste_sommes_partielles = []
-            for somme_partielle in liste_sommes_partielles:
-                for indice_meteo in range(len(matrice_flux_financiers[indice_ambiance][annee])):
-                    flux_financier = matrice_flux_financiers[indice_ambiance][annee][indice_meteo]
-                    nouvelle_somme_partielle = somme_partielle + flux_financier/(1 + taux_actualisation)**(annee)
-                    nouvelle_liste_sommes_partielles.append(nouvelle_somme_partielle)
-            liste_sommes_partielles = nouvelle_liste_sommes_partielles
+        # la moyenne et les extrêmes se décomposent année par année et restent donc exacts même sans énumération
+        VAN_moyennes.append(-investissement_initial + sum(flux.mean() for flux in flux_actualises))
+        VAN_extremes.append(-investissement_initial + sum(flux.min() for flux in flux_actualises))
+        VAN_extremes.append(-investissement_initial + sum(flux.max() for flux in flux_actualises))
 
+        indices_meteo, enumeration = indices_scenarios_meteo([len(flux) for flux in flux_actualises], donnees_entree, generateur)
+        scenarios_enumeres = scenarios_enumeres and enumeration
 
-        liste_VAN_possibles_ambiance = liste_sommes_partielles
+        sommes_partielles = np.full(indices_meteo.shape[0], -float(investissement_initial))
+        for annee in range(nbAnneeNPV):
+            sommes_partielles = sommes_partielles + flux_actualises[annee][indices_meteo[:, annee]]
+
+        liste_VAN_possibles_ambiance = list(sommes_partielles)
         liste_VAN_possibles += liste_VAN_possibles_ambiance
+        poids_VAN_possibles += [1 / (len(matrice_flux_financiers) * len(liste_VAN_possibles_ambiance))] * len(liste_VAN_possibles_ambiance)
 
 
     
@@ -419,15 +697,19 @@ def calcul_VAN_equivalente(matrice_flux_financiers, taux_actualisation, donnees_
     VAN_equivalente = 0
 
     if parametre_VAN_equivalente == "moyenne":
-        VAN_equivalente = stat.mean(liste_VAN_possibles)
+        VAN_equivalente = stat.mean(VAN_moyennes)
+    elif not scenarios_enumeres and parametre_VAN_equivalente == "minimum":
+        VAN_equivalente = min(VAN_extremes)
+    elif not scenarios_enumeres and parametre_VAN_equivalente == "maximum":
+        VAN_equivalente = max(VAN_extremes)
     elif parametre_VAN_equivalente == "mediane":
-        VAN_equivalente = stat.median(liste_VAN_possibles)
+        VAN_equivalente = quantile_pondere(liste_VAN_possibles, poids_VAN_possibles, 0.5)
     elif parametre_VAN_equivalente == "minimum":
         VAN_equivalente = min(liste_VAN_possibles)
     elif parametre_VAN_equivalente == "maximum":
         VAN_equivalente = max(liste_VAN_possibles)
     elif parametre_VAN_equivalente == "quantile":
-        VAN_equivalente = np.quantile(liste_VAN_possibles, donnees_entree.parametres_simulation.quantile_meteo)
+        VAN_equivalente = quantile_pondere(liste_VAN_possibles, poids_VAN_possibles, donnees_entree.parametres_simulation.quantile_meteo)
         
     else:
         raise ValueError("Paramètre VAN_equiv %s non reconnu"%parametre_VAN_equivalente)
@@ -450,6 +732,10 @@ def calcul_taux_rentabilite_interne_equivalent(matrice_flux_financiers, donnees_
             matrice indexée par [ambiance][année][météo] contenant les flux financiers à utiliser
         donnees_entree : DonneesEntree.DonneesEntree
             données d'entrée à utiliser. Attention, éviter d'utiliser le TRI avec donnees_entree.parametres_simulation.VAN_equivalente == "moyenne".
+            Lorsque le nombre de scénarios météo dépasse nombre_max_scenarios_meteo, les scénarios sont tirés
+            aléatoirement : le TRI ne se décomposant pas année par année, les valeurs "minimum" et "maximum" sont alors
+            des approximations calculées sur les seuls scénarios tirés. Comme pour la VAN équivalente, chaque scénario
+            est pondéré par la probabilité de son ambiance divisée par le nombre de scénarios évalués pour celle-ci.
         investissement_initial : float
             investissement initial
         duree_construction : int
@@ -463,44 +749,35 @@ def calcul_taux_rentabilite_interne_equivalent(matrice_flux_financiers, donnees_
     horizon_prevision = donnees_entree.parametres_simulation.horizon_prevision
     parametre_VAN_equivalente = donnees_entree.parametres_simulation.VAN_equivalente
 
+    generateur = np.random.RandomState(donnees_entree.parametres_simulation.graine_tirages_meteo)
     liste_flux_financiers_possibles = []
+    poids_possibles = []
     for indice_ambiance in range(len(matrice_flux_financiers)):
-        liste_flux_financiers_partiels = [[-investissement_initial]+[0]*duree_construction]
+        flux_ambiance = [np.asarray(flux_annee, dtype=float) for flux_annee in matrice_flux_financiers[indice_ambiance]]
 
         # pour les années couvertes par l'horizon de prévision, chaque scénario météo est envisagé
-        # attention : le nombre de scénarios augmente exponentiellement avec l'horizon de simulation
-        for annee in range(duree_construction,min(horizon_prevision, len(matrice_flux_financiers[indice_ambiance]) + duree_construction)):
-            nouvelle_liste_flux_financiers_partiels = []
-            for flux_financiers_partiels in liste_flux_financiers_partiels:
-                for indice_meteo in range(len(matrice_flux_financiers[indice_ambiance][annee - duree_construction])):
-                    flux_financier = matrice_flux_financiers[indice_ambiance][annee - duree_construction][indice_meteo]
-                    nouveaux_flux_financiers_partiels = flux_financiers_partiels + [flux_financier]
-                    nouvelle_liste_flux_financiers_partiels.append(nouveaux_flux_financiers_partiels)
-            liste_flux_financiers_partiels = nouvelle_liste_flux_financiers_partiels
-
-        # au delà de l'horizon de simulation, on ajoute la somme correspondant à la réalisation d'une seule météo
-        # sur toutes les années restantes
+        # au-delà de l'horizon de prévision, une seule météo est retenue sur toutes les années restantes
+        # le nombre de scénarios augmente exponentiellement avec l'horizon : au-delà de nombre_max_scenarios_meteo,
+        # les scénarios sont tirés aléatoirement
+        annees_prevision = list(range(duree_construction, min(horizon_prevision, len(flux_ambiance) + duree_construction)))
         annee_debut_extrapolation = horizon_prevision
-        annee_fin_extrapolation = max(horizon_prevision, len(matrice_flux_financiers[indice_ambiance]) + duree_construction)
-        if (annee_debut_extrapolation < annee_fin_extrapolation):
-            liste_flux_extrapoles = []
-            for indice_meteo in range(len(matrice_flux_financiers[indice_ambiance][annee_debut_extrapolation - duree_construction])):
-                flux_financier = matrice_flux_financiers[indice_ambiance][annee_debut_extrapolation - duree_construction][indice_meteo]
-                liste_flux_extrapoles.append([flux_financier])
-            for annee in range(annee_debut_extrapolation + 1, annee_fin_extrapolation):
-                for indice_meteo in range(len(matrice_flux_financiers[indice_ambiance][annee - duree_construction])):
-                    flux_financier = matrice_flux_financiers[indice_ambiance][annee - duree_construction][indice_meteo]
-                    liste_flux_extrapoles[indice_meteo].append(flux_financier)
-
-            # ajout des termes extrapoles à la fin des sommes partielles
-            nouvelle_liste_flux_financiers_partiels = []
-            for flux_financiers_partiels in liste_flux_financiers_partiels:
-                for flux_extrapoles in liste_flux_extrapoles:
-                    nouvelle_liste_flux_financiers_partiels.append(flux_financiers_partiels + flux_extrapoles)
-            liste_flux_financiers_partiels = nouvelle_liste_flux_financiers_partiels
-
-        liste_flux_financiers_possibles_ambiance = liste_flux_financiers_partiels
+        annee_fin_extrapolation = max(horizon_prevision, len(flux_ambiance) + duree_construction)
+        annees_extrapolation = list(range(annee_debut_extrapolation, annee_fin_extrapolation))
+
+        nombres_meteo = [len(flux_ambiance[annee - duree_construction]) for annee in annees_prevision]
+        if annees_extrapolation:
+            nombres_meteo.append(len(flux_ambiance[annee_debut_extrapolation - duree_construction]))
+        indices_meteo, _ = indices_scenarios_meteo(nombres_meteo, donnees_entree, generateur)
+
+        flux_financiers = np.zeros((indices_meteo.shape[0], duree_construction + 1 + len(annees_prevision) + len(annees_extrapolation)))
+        flux_financiers[:, 0] = -investissement_initial
+        for indice_annee, annee in enumerate(annees_prevision + annees_extrapolation):
+            indice_dimension = min(indice_annee, len(annees_prevision))
+            flux_financiers[:, duree_construction + 1 + indice_annee] = flux_ambiance[annee - duree_construction][indices_meteo[:, indice_dimension]]
+
+        liste_flux_financiers_possibles_ambiance = list(flux_financiers)
         liste_flux_financiers_possibles += liste_flux_financiers_possibles_ambiance
+        poids_possibles += [1 / (len(matrice_flux_financiers) * len(liste_flux_financiers_possibles_ambiance))] * len(liste_flux_financiers_possibles_ambiance)
 
     liste_taux_rentabilite_interne_possibles = []
     for flux_financiers in liste_flux_financiers_possibles:
@@ -513,15 +790,15 @@ def calcul_taux_rentabilite_interne_equivalent(matrice_flux_financiers, donnees_
     # une fonction choisie par l'utilisateur
     taux_rentabilite_interne_equivalent = 0
     if parametre_VAN_equivalente == "moyenne":
-        taux_rentabilite_interne_equivalent = stat.mean(liste_taux_rentabilite_interne_possibles)
+        taux_rentabilite_interne_equivalent = np.dot(poids_possibles, liste_taux_rentabilite_interne_possibles)
     elif parametre_VAN_equivalente == "mediane":
-        taux_rentabilite_interne_equivalent = stat.median(liste_taux_rentabilite_interne_possibles)
+        taux_rentabilite_interne_equivalent = quantile_pondere(liste_taux_rentabilite_interne_possibles, poids_possibles, 0.5)
     elif parametre_VAN_equivalente == "minimum":
         taux_rentabilite_interne_equivalent = min(liste_taux_rentabilite_interne_possibles)
     elif parametre_VAN_equivalente == "maximum":
         taux_rentabilite_interne_equivalent = max(liste_taux_rentabilite_interne_possibles)
     elif parametre_VAN_equivalente == "quantile":
-        taux_rentabilite_interne_equivalent = np.quantile(liste_taux_rentabilite_interne_possibles, donnees_entree.parametres_simulation.quantile_meteo)
+        taux_rentabilite_interne_equivalent = quantile_pondere(liste_taux_rentabilite_interne_possibles, poids_possibles, donnees_entree.parametres_simulation.quantile_meteo)
     else:
         raise ValueError("Paramètre VAN_equiv %s non reconnu" % parametre_VAN_equivalente)
 
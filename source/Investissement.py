@@ -3,7 +3,6 @@
 
 import os
 import sys
-import copy
 
 import numpy as np
 import pandas as pd
@@ -118,6 +117,86 @@ def choix_actif_candidat(liste_actifs_eligibles, dict_criteres_investissement, d
 
     return actif_choisi, dict_criteres_investissement
 
+def calcul_indicateurs_investissement(actif, unite, matrice_resultats_annuels, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, donnees_entree, donnees_simulation, estimation_marginale=False):
+    """
+    Calcule les indicateurs économiques d'une unité testée à partir des résultats de dispatch de l'anticipation.
+
+    Paramètres
+    ----------
+    actif : DonneesEntree.Actif
+        actif de l'unité testée
+    unite : DonneesSimulation.Unite
+        unité testée
+    matrice_resultats_annuels : list
+        matrice indexée par [ambiance][année][météo] des résultats de dispatch de l'anticipation
+    annee_ouverture : int
+        année d'ouverture de l'unité, qui coïncide avec l'année 0 de matrice_resultats_annuels
+    annee_fin_calcul_NPV : int
+        dernière année, non incluse, du calcul de la VAN
+    nbAnneeNPV : int
+        nombre d'années du calcul de la VAN
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser
+    estimation_marginale : bool
+        si True, matrice_resultats_annuels correspond au parc sans l'unité testée et les revenus sont estimés à partir
+        des coûts marginaux, voir IndicateursEconomiques.calcul_revenu_annuel_marginal_sans_CF
+
+    Retours
+    -------
+    tuple
+        VAN équivalente, critère d'investissement, liste des VAN possibles par ambiance et revenu équivalent de la
+        première année de fonctionnement
+    """
+
+    annee_courante = donnees_simulation.annee_courante
+    duree_construction = actif.duree_construction
+
+    # calcul des revenus annuels à partir des résultats annuels avec extrapolation éventuelle au delà de
+    # l'horizon de prévision pour couvrir la totalité de la durée de vie
+    matrice_revenus_annuels = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_ouverture, annee_fin_calcul_NPV, donnees_entree, donnees_simulation, estimation_marginale)
+    
+    
+    # Calcul du volume de CAPEX à prendre en compte
+    
+    taux_actualisation = actif.taux_actualisation
+    annuite = IndicateursEconomiques.calcul_investissement_IDC_annualise(actif,annee_courante)
+    
+    print("annuite ",annuite)
+    
+
+    investissement_initial =  np.array([ annuite* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
+    
+                   
+    parametre_critere_investissement = donnees_entree.parametres_simulation.critere_investissement
+    critere_investissement = 0
+    
+    if(parametre_critere_investissement == "PI"):
+        VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeNPV)
+        VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
+        critere_investissement = IndicateursEconomiques.calcul_indice_profitabilite(actif, VAN_equivalente, investissement_initial)
+    elif(parametre_critere_investissement == "VAN_MW"):
+        VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeNPV)
+        VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
+        critere_investissement = IndicateursEconomiques.calcul_VAN_par_MW(actif, VAN_equivalente)
+    elif(parametre_critere_investissement == "TRI"):
+        taux_rentabilite_interne = IndicateursEconomiques.calcul_taux_rentabilite_interne_equivalent(matrice_revenus_annuels, donnees_entree, investissement_initial, duree_construction,False,"investissement")
+        critere_investissement = taux_rentabilite_interne - actif.taux_actualisation
+        VAN_equivalente = "non calculé"
+
+    # on construit une restriction de la matrice des revenus annuels à l'année d'ouverture de l'unité
+    matrice_revenus_annuels_annnee_ouverture = [[matrice_revenus_annuels_ambiance[0]] for matrice_revenus_annuels_ambiance in matrice_revenus_annuels]
+
+    # on calcule le "revenu équivalent" de la première année de fonctionnement en appliquant la fonction de calcul
+    # de VAN équivalente uniquement aux revenus de l'année d'ouverture sans actualisation ni investissement initial
+    
+    revenu_equivalent_premiere_annee_fonctionnement,revenu_equivalent_premiere_annee_fonctionnement_annualisee,prime_risque,liste_VAN_possibles_premiere_annee = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels_annnee_ouverture, 0, donnees_entree,0,1)
+    
+    revenu_equivalent_premiere_annee_fonctionnement -= actif.cout_fixe_maintenance
+
+    return VAN_equivalente, critere_investissement, liste_VAN_possibles, revenu_equivalent_premiere_annee_fonctionnement
+
 def evaluation_indicateurs_economiques_parc_exogene(liste_actifs_eligibles, donnees_entree, donnees_simulation,indice_boucle_investissement,dico_df_nb_unites_ambiances):
     """
     Calcule les indicateurs économiques qui permettent d'évaluer la rentabilité d'un investissement dans chacun
@@ -148,7 +227,9 @@ def evaluation_indicateurs_economiques_parc_exogene(liste_actifs_eligibles, donn
     
     df_resume_evaluation = pd.DataFrame()
     
-    # calcul des valeurs nécessaires pour comparer la rentabilité des différents actifs eligibles
+    # construction, pour chaque actif éligible, du parc de test avec une unité supplémentaire ; les anticipations
+    # correspondantes sont indépendantes les unes des autres et sont donc calculées ensemble
+    liste_tests = []
     for actif in liste_actifs_eligibles:
         # l'ajout de l'actif est testé
         print("\t\t test d'ajout  d'une unité de %s" % (actif.cle))
@@ -188,78 +269,81 @@ def evaluation_indicateurs_economiques_parc_exogene(liste_actifs_eligibles, donn
 
 
             nom_fic = "DF_PA_%s_MerchInvest_%s_%s_test_%s.csv"%(ambiance,str(annee_courante),str(indice_boucle_investissement),actif.cle)    
-            path_df_parc = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-            df_nb_unites_ambiances_test.to_csv(path_df_parc,sep=";")
+            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_ambiances_test)
             
             dico_nb_unites_ambiances_test[ambiance] = df_nb_unites_ambiances_test
         
-        # realisation de l'anticipation
-        
-        matrice_resultats_annuels = Anticipation.anticipation_resultats_annuels_parc_exogene(annee_debut_anticipation,annee_fin_anticipation, donnees_entree, donnees_simulation,dico_nb_unites_ambiances_test,True,"test_%s"%(actif.cle))
-        
+        liste_tests.append((actif, unite, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV,
+                            (annee_debut_anticipation, annee_fin_anticipation, dico_nb_unites_ambiances_test, True, "test_%s"%(actif.cle))))
+
+    # criblage éventuel : les indicateurs sont d'abord estimés à partir des coûts marginaux du parc sans l'unité
+    # testée, et seuls les actifs dont l'estimation n'est pas nettement sous le seuil de rentabilité sont réévalués
+    # avec un dispatch complet
+    dict_indicateurs = dict()
+    liste_tests_complets = liste_tests
+    if donnees_entree.parametres_simulation.criblage_investissement and len(liste_tests) > 0:
+        liste_tests_complets = []
+        seuil_critere = 1 if donnees_entree.parametres_simulation.critere_investissement == "PI" else 0
+        seuil_critere -= donnees_entree.parametres_simulation.marge_criblage_investissement
+
+        liste_anticipations_reference = [(anticipation[0], anticipation[1], dico_df_nb_unites_ambiances, False, "LP") for (actif, unite, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, anticipation) in liste_tests]
+        liste_matrices_resultats_reference = Anticipation.anticipations_resultats_annuels_parc_exogene(liste_anticipations_reference, donnees_entree, donnees_simulation)
+
+        for test, matrice_resultats_reference in zip(liste_tests, liste_matrices_resultats_reference):
+            actif, unite, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, anticipation = test
+            if actif.categorie == "Stockage":
+                # le revenu d'une unité de stockage supplémentaire dépend de sa gestion et n'est pas estimé
+                liste_tests_complets.append(test)
+                continue
+
+            indicateurs = calcul_indicateurs_investissement(actif, unite, matrice_resultats_reference, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, donnees_entree, donnees_simulation, True)
+            if indicateurs[1] <= seuil_critere:
+                print("\t\t %s écarté par criblage (critère estimé : %s)" % (actif.cle, indicateurs[1]))
+                dict_indicateurs[actif.cle] = indicateurs + ("estimation",)
+            else:
+                liste_tests_complets.append(test)
+
+    # realisation des anticipations par lots : tous les dispatchs d'un lot sont répartis sur le pool de processus de
+    # DispatchV0, les résultats étant restitués dans l'ordre des actifs éligibles
+    taille_lot = donnees_entree.parametres_simulation.taille_lot_evaluation_investissement
+    if taille_lot <= 0:
+        taille_lot = max(len(liste_tests_complets), 1)
+
+    liste_matrices_resultats_annuels = []
+    for indice_debut_lot in range(0, len(liste_tests_complets), taille_lot):
+        lot_tests = liste_tests_complets[indice_debut_lot:indice_debut_lot + taille_lot]
+        liste_matrices_resultats_annuels += Anticipation.anticipations_resultats_annuels_parc_exogene([test[-1] for test in lot_tests], donnees_entree, donnees_simulation)
+
+    # calcul des valeurs nécessaires pour comparer la rentabilité des différents actifs eligibles
+    for (actif, unite, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, anticipation), matrice_resultats_annuels in zip(liste_tests_complets, liste_matrices_resultats_annuels):
+
         Ecriture.ecriture_dispatch_boucle(matrice_resultats_annuels,donnees_entree,donnees_simulation,"rapport_investissement",indice_boucle_investissement,annee_courante,actif.cle)
 
+        indicateurs = calcul_indicateurs_investissement(actif, unite, matrice_resultats_annuels, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, donnees_entree, donnees_simulation)
+        dict_indicateurs[actif.cle] = indicateurs + ("dispatch",)
 
-        # calcul des revenus annuels à partir des résultats annuels avec extrapolation éventuelle au delà de
-        # l'horizon de prévision pour couvrir la totalité de la durée de vie
-        matrice_revenus_annuels = IndicateursEconomiques.calcul_matrice_revenus_annuels_sans_CF(unite, matrice_resultats_annuels, annee_ouverture, annee_fin_calcul_NPV, donnees_entree, donnees_simulation)
-        
-        
-        # Calcul du volume de CAPEX à prendre en compte
-        
-        taux_actualisation = actif.taux_actualisation
-        annuite = IndicateursEconomiques.calcul_investissement_IDC_annualise(actif,annee_courante)
-        
-        print("annuite ",annuite)
+        # retrait de l'actif testé du parc
         
+        if donnees_entree.parametres_simulation.test_avant_invest :        
+            if not donnees_entree.parametres_simulation.anticipation_parc_exogene :
+                donnees_simulation.parc.annule_tests()
 
-        investissement_initial =  np.array([ annuite* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
-        
-                       
-        parametre_critere_investissement = donnees_entree.parametres_simulation.critere_investissement
-        critere_investissement = 0
-        
-        if(parametre_critere_investissement == "PI"):
-            VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeNPV)
-            VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
-            critere_investissement = IndicateursEconomiques.calcul_indice_profitabilite(actif, VAN_equivalente, investissement_initial)
-        elif(parametre_critere_investissement == "VAN_MW"):
-            VAN_equivalente,VAN_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels, taux_actualisation, donnees_entree, investissement_initial, nbAnneeNPV)
-            VAN_equivalente -= np.array([ actif.cout_fixe_maintenance* (1+taux_actualisation)**(-n) for n in range(nbAnneeNPV)]).sum() 
-            critere_investissement = IndicateursEconomiques.calcul_VAN_par_MW(actif, VAN_equivalente)
-        elif(parametre_critere_investissement == "TRI"):
-            taux_rentabilite_interne = IndicateursEconomiques.calcul_taux_rentabilite_interne_equivalent(matrice_revenus_annuels, donnees_entree, investissement_initial, duree_construction,False,"investissement")
-            critere_investissement = taux_rentabilite_interne - actif.taux_actualisation
-            VAN_equivalente = "non calculé"
+    # regroupement des indicateurs dans l'ordre des actifs éligibles
+    for actif, unite, annee_ouverture, annee_fin_calcul_NPV, nbAnneeNPV, anticipation in liste_tests:
+
+        VAN_equivalente, critere_investissement, liste_VAN_possibles, revenu_equivalent_premiere_annee_fonctionnement, evaluation = dict_indicateurs[actif.cle]
 
-        
         # ecriture du resume 
         
         df_resume_evaluation.loc[ actif.cle , "VAN_equivalente"] = VAN_equivalente
         for idx,ambiance in enumerate(donnees_entree.ambiances) :
             df_resume_evaluation.loc[ actif.cle , "VAN_" + ambiance] = liste_VAN_possibles[idx]
-             
-
-        # on construit une restriction de la matrice des revenus annuels à l'année d'ouverture de l'unité
-        matrice_revenus_annuels_annnee_ouverture = [[matrice_revenus_annuels_ambiance[0]] for matrice_revenus_annuels_ambiance in matrice_revenus_annuels]
-
-        # on calcule le "revenu équivalent" de la première année de fonctionnement en appliquant la fonction de calcul
-        # de VAN équivalente uniquement aux revenus de l'année d'ouverture sans actualisation ni investissement initial
-        
-        revenu_equivalent_premiere_annee_fonctionnement,revenu_equivalent_premiere_annee_fonctionnement_annualisee,prime_risque,liste_VAN_possibles = IndicateursEconomiques.calcul_VAN_equivalente(matrice_revenus_annuels_annnee_ouverture, 0, donnees_entree,0,1)
-        
-        revenu_equivalent_premiere_annee_fonctionnement -= actif.cout_fixe_maintenance
+        df_resume_evaluation.loc[ actif.cle , "evaluation"] = evaluation
 
         dict_VAN_equivalentes[actif.cle] = VAN_equivalente
         dict_criteres_investissement[actif.cle] = critere_investissement
         dict_revenu_equivalent_premiere_annee_fonctionnement[actif.cle] = revenu_equivalent_premiere_annee_fonctionnement
 
-        # retrait de l'actif testé du parc
-        
-        if donnees_entree.parametres_simulation.test_avant_invest :        
-            if not donnees_entree.parametres_simulation.anticipation_parc_exogene :
-                donnees_simulation.parc.annule_tests()
-
                 
     path_resume_folder = os.path.join(donnees_entree.dossier_sortie,"annee_"+ str(annee_courante),"rapport_investissement",str(indice_boucle_investissement))
     if not os.path.isdir(path_resume_folder):
@@ -353,6 +437,87 @@ def selection_actifs_eligibles(capacite_investissement_argent, capacite_investis
     return liste_actifs_eligibles, dict_nombre_max_unites_investies
 
 
+def recherche_nombre_unites_investies(actif, nombre_max_unites_investies, donnees_entree, donnees_simulation, indice_boucle_investissement, dico_df_nb_unites_ambiances):
+    """
+    Recherche le nombre d'unités de l'actif choisi à ajouter au cours de la boucle d'investissement.
+
+    Les unités sont ajoutées par lots de granularite_investissement unités. Un lot supplémentaire est ajouté tant
+    que l'actif reste candidat à l'investissement (voir choix_actif_candidat) avec les lots précédents dans le parc,
+    comme le ferait la répétition des boucles d'investissement si l'actif restait le meilleur candidat. La
+    rentabilité décroissant avec le nombre d'unités ajoutées, le nombre de lots est recherché par doublement puis
+    par dichotomie, ce qui ne demande qu'un nombre logarithmique d'anticipations.
+
+    Paramètres
+    ----------
+    actif : DonneesEntree.Actif
+        actif choisi, candidat à l'investissement avec le parc dico_df_nb_unites_ambiances
+    nombre_max_unites_investies : int
+        nombre maximal d'unités de l'actif pouvant être construites
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
+    donnees_simulation : DonneesSimulation.DonneesSimulation
+        données de simulation à utiliser
+    indice_boucle_investissement : int
+        indice de la boucle d'investissement, utilisé pour nommer les sorties des tests
+    dico_df_nb_unites_ambiances : dict
+        dictionnaire contenant, pour chaque ambiance, le nombre d'unités de chaque actif par année dans le parc anticipé
+
+    Retours
+    -------
+    int
+        nombre d'unités de l'actif à ajouter
+    """
+
+    annee_courante = donnees_simulation.annee_courante
+    annee_ouverture = annee_courante + actif.duree_construction
+    annee_fermeture = annee_ouverture + actif.duree_vie
+
+    granularite = max(1, actif.granularite_investissement)
+    nombre_max_lots = -(-nombre_max_unites_investies // granularite)
+
+    def actif_candidat_apres_lots(nombre_lots):
+        # teste si l'actif reste candidat lorsque nombre_lots lots ont déjà été ajoutés au parc anticipé
+        nombre_unites = min(nombre_lots * granularite, nombre_max_unites_investies)
+        print("\t\t recherche du nombre d'unités : test après ajout de %d unités de %s" % (nombre_unites, actif.cle))
+
+        dico_df_nb_unites_ambiances_lots = {}
+        for ambiance in donnees_entree.ambiances:
+            df_nb_unites_ambiance_lots = dico_df_nb_unites_ambiances[ambiance].copy()
+            annees_fonctionnement = [annee for annee in range(annee_ouverture, annee_fermeture) if annee in df_nb_unites_ambiance_lots.index]
+            df_nb_unites_ambiance_lots.loc[annees_fonctionnement, actif.cle] += nombre_unites
+            dico_df_nb_unites_ambiances_lots[ambiance] = df_nb_unites_ambiance_lots
+
+        indice_test = "%s_recherche_%d" % (indice_boucle_investissement, nombre_unites)
+        dict_criteres_investissement, dict_revenu_equivalent_premiere_annee_fonctionnement, dict_VAN_equivalentes = evaluation_indicateurs_economiques_parc_exogene([actif], donnees_entree, donnees_simulation, indice_test, dico_df_nb_unites_ambiances_lots)
+        actif_candidat, dict_criteres_investissement = choix_actif_candidat([actif], dict_criteres_investissement, dict_revenu_equivalent_premiere_annee_fonctionnement, donnees_entree)
+
+        return actif_candidat is not None
+
+    # nombre_lots_bas : plus grand nombre de lots déjà ajoutés pour lequel l'actif reste candidat
+    # nombre_lots_haut : plus petit nombre de lots pour lequel il ne l'est plus, ou nombre maximal de lots
+    nombre_lots_bas = 0
+    nombre_lots_haut = nombre_max_lots
+
+    # recherche par doublement
+    nombre_lots = 1
+    while nombre_lots < nombre_lots_haut:
+        if actif_candidat_apres_lots(nombre_lots):
+            nombre_lots_bas = nombre_lots
+            nombre_lots *= 2
+        else:
+            nombre_lots_haut = nombre_lots
+
+    # recherche par dichotomie
+    while nombre_lots_haut - nombre_lots_bas > 1:
+        nombre_lots = (nombre_lots_bas + nombre_lots_haut) // 2
+        if actif_candidat_apres_lots(nombre_lots):
+            nombre_lots_bas = nombre_lots
+        else:
+            nombre_lots_haut = nombre_lots
+
+    return min((nombre_lots_bas + 1) * granularite, nombre_max_unites_investies)
+
+
 def sequence_investissement_classique(donnees_entree, donnees_simulation):
     """
     Cette fonction effectue la séquence d'investissement annuelle classique et renvoie le rapport associé.
@@ -385,7 +550,7 @@ def sequence_investissement_classique(donnees_entree, donnees_simulation):
     liste_rapports_investissement = []
     indice_boucle_investissement = 0
 
-    parc_avant_sequences = copy.deepcopy(donnees_simulation.parc_avant_sequences)
+    parc_avant_sequences = donnees_simulation.parc_avant_sequences.instantane()
     
     while (continuer_investissements):
         print("\t Investissement boucle %d \n" % indice_boucle_investissement)
@@ -398,8 +563,7 @@ def sequence_investissement_classique(donnees_entree, donnees_simulation):
         df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
         
         nom_fic = "DF_PR_MerchInvest_%s_%s.csv"%(str(annee_courante),str(indice_boucle_investissement))    
-        path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
         
         
         if donnees_entree.parametres_simulation.anticipation_parc_exogene :
@@ -426,14 +590,15 @@ def sequence_investissement_classique(donnees_entree, donnees_simulation):
             
             dico_df_nb_unites_ambiances = {}
             
+            if donnees_entree.parametres_simulation.extrapolation_capa :
+                df_nb_unites_extrapole = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,donnees_entree.parametres_simulation.nb_annee_extrapolation_capa)
+
             for ambiance in donnees_entree.ambiances :
             
 
                 if donnees_entree.parametres_simulation.extrapolation_capa :
                 
-                    nb_annee_extrapolation =  donnees_entree.parametres_simulation.nb_annee_extrapolation_capa
-                    
-                    dico_df_nb_unites_ambiances[ambiance] = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,nb_annee_extrapolation)
+                    dico_df_nb_unites_ambiances[ambiance] = df_nb_unites_extrapole.copy()
                     
                 else :
                     dico_df_nb_unites_ambiances[ambiance] = df_nb_unites.copy()
@@ -442,8 +607,7 @@ def sequence_investissement_classique(donnees_entree, donnees_simulation):
         for ambiance in donnees_entree.ambiances :
         
             nom_fic = "DF_PA_%s_MerchInvest_%s_%s.csv"%(ambiance,str(annee_courante),str(indice_boucle_investissement))    
-            path_df_parc_anticip = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-            dico_df_nb_unites_ambiances[ambiance].to_csv(path_df_parc_anticip,sep=";")
+            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[ambiance])
         
             
         dict_criteres_investissement, dict_revenu_equivalent_premiere_annee_fonctionnement, dict_VAN_equivalentes = evaluation_indicateurs_economiques_parc_exogene(liste_actifs_eligibles, donnees_entree, donnees_simulation,indice_boucle_investissement,dico_df_nb_unites_ambiances)
@@ -471,6 +635,8 @@ def sequence_investissement_classique(donnees_entree, donnees_simulation):
         # calcul du nombre d'unités investies selon la granularité et le nombre maximum possible
         nombre_max_unites_investies_actif_choisi = dict_nombre_max_unites_investies[actif_choisi.cle]
         nombre_unites_investies = min(nombre_max_unites_investies_actif_choisi, actif_choisi.granularite_investissement)
+        if donnees_entree.parametres_simulation.recherche_nombre_unites_investies and nombre_unites_investies < nombre_max_unites_investies_actif_choisi:
+            nombre_unites_investies = recherche_nombre_unites_investies(actif_choisi, nombre_max_unites_investies_actif_choisi, donnees_entree, donnees_simulation, indice_boucle_investissement, dico_df_nb_unites_ambiances)
 
         # mise à jour des capacités d'investissement
         capacite_investissement_argent -= actif_choisi.cout_fixe_construction(annee_courante) * nombre_unites_investies
@@ -17,7 +17,115 @@ import GenerationMixOptimal
 
 def pjoin(*args, **kwargs):
     return os.path.join(*args, **kwargs).replace(os.sep, '//')
+
+
+def lecture_csv_cache(chemin_fichier, chemin_dossier, dossier_cache):
+    """
+    Lit un fichier csv de séries horaires ou de coûts (séparateur ";", première colonne en index) et renvoie le
+    DataFrame correspondant, en passant par un cache binaire.
+
+    Lors de la première lecture, les valeurs du fichier sont enregistrées dans dossier_cache au format npy (et l'index,
+    les colonnes, leurs types et la date de modification du fichier dans un fichier npz associé), à l'emplacement
+    relatif qu'occupe le fichier dans chemin_dossier. Lors des lectures suivantes, le fichier npy est projeté en
+    mémoire au lieu de relire le csv et les types des colonnes sont restaurés, de sorte que le DataFrame renvoyé est
+    le même que le cache existe ou non. Le cache est reconstruit si le fichier source a été modifié depuis sa création.
+    Les fichiers contenant des colonnes non numériques sont lus directement. Si dossier_cache vaut None, le fichier
+    est lu sans cache.
+
+    Paramètres
+    ----------
+    chemin_fichier : str
+        chemin du fichier csv à lire
+    chemin_dossier : str
+        chemin du dossier de données d'entrée contenant le fichier
+    dossier_cache : str
+        chemin du dossier du cache, None pour ne pas utiliser de cache
+
+    Retours
+    -------
+    pandas.DataFrame
+        données du fichier
+    """
+
+    if dossier_cache is None:
+        return pd.read_csv(chemin_fichier, sep=";", index_col=0)
+
+    chemin_relatif = os.path.relpath(chemin_fichier, chemin_dossier)
+    chemin_valeurs = os.path.join(dossier_cache, chemin_relatif + ".npy")
+    chemin_description = os.path.join(dossier_cache, chemin_relatif + ".npz")
+
+    statistiques_fichier = os.stat(chemin_fichier)
+    signature_fichier = np.array([statistiques_fichier.st_mtime_ns, statistiques_fichier.st_size], dtype=np.int64)
+
+    # lecture du cache s'il existe et correspond à l'état actuel du fichier source
+    if os.path.isfile(chemin_valeurs) and os.path.isfile(chemin_description):
+        try:
+            with np.load(chemin_description) as description:
+                if np.array_equal(description["signature"], signature_fichier):
+                    valeurs = np.load(chemin_valeurs, mmap_mode="c")
+                    nom_index = str(description["nom_index"][0]) if len(description["nom_index"]) > 0 else None
+                    index = pd.Index(description["index"], name=nom_index)
+                    data_frame = pd.DataFrame(valeurs, index=index, columns=description["colonnes"], copy=False)
+                    types_colonnes = dict(zip(data_frame.columns, description["types_colonnes"]))
+                    # les valeurs sont enregistrées en flottants, les colonnes d'un autre type sont converties
+                    if any(type_colonne != "float64" for type_colonne in types_colonnes.values()):
+                        data_frame = data_frame.astype(types_colonnes)
+                    return data_frame
+        except (OSError, ValueError, KeyError):
+            pass
+
+    data_frame = pd.read_csv(chemin_fichier, sep=";", index_col=0)
+
+    # seuls les fichiers entièrement numériques sont mis en cache
+    if all(pd.api.types.is_numeric_dtype(type_colonne) for type_colonne in data_frame.dtypes):
+        os.makedirs(os.path.dirname(chemin_valeurs), exist_ok=True)
+        np.save(chemin_valeurs, data_frame.values.astype(float))
+        nom_index = [] if data_frame.index.name is None else [str(data_frame.index.name)]
+        index = data_frame.index.values.astype(str) if data_frame.index.dtype == object else data_frame.index.values
+        types_colonnes = np.array([str(type_colonne) for type_colonne in data_frame.dtypes], dtype=str)
+        np.savez(chemin_description, signature=signature_fichier, index=index, colonnes=np.array(data_frame.columns, dtype=str), types_colonnes=types_colonnes, nom_index=np.array(nom_index, dtype=str))
+
+    return data_frame
     
+def lecture_tranche_ambiance(chemin_dossier, dossier_cache, ambiance, annee, cle):
+    """
+    Lit une tranche des chroniques d'une ambiance : les coûts des combustibles et du carbone d'une année, ou la
+    demande, les facteurs de production ENR et les disponibilités des actifs pilotables d'une météo d'une année.
+
+    Paramètres
+    ----------
+    chemin_dossier : str
+        chemin du dossier de données d'entrée
+    dossier_cache : str
+        chemin du dossier du cache de lecture, None pour lire les fichiers sans cache
+    ambiance : str
+        nom de l'ambiance
+    annee : int
+        année de l'ambiance
+    cle : str
+        "couts_combustibles" ou "meteo_%d"
+
+    Retours
+    -------
+    pandas.DataFrame ou dict
+        DataFrame des coûts, ou dictionnaire des DataFrame "demande", "fc" et "dispo" de la météo
+    """
+
+    rep_annee = pjoin(chemin_dossier,"Ambiances",ambiance,"Annee_%d"%annee)
+
+    if cle == "couts_combustibles":
+        return lecture_csv_cache(pjoin(rep_annee,"couts_combustibles_et_carbone.csv"),chemin_dossier,dossier_cache)
+
+    rep_meteo = pjoin(rep_annee,cle)
+
+    donnees_meteo = {}
+    donnees_meteo["demande"] = lecture_csv_cache(pjoin(rep_meteo,"demande.csv"),chemin_dossier,dossier_cache)
+    donnees_meteo["fc"] = lecture_csv_cache(pjoin(rep_meteo,"facteurs_production_ENR.csv"),chemin_dossier,dossier_cache)
+    donnees_meteo["dispo"] = lecture_csv_cache(pjoin(rep_meteo,"disponibilite_pilot.csv"),chemin_dossier,dossier_cache)
+
+    return donnees_meteo
+
+
 # ######################### fonctions de lecture des fichiers d'actifs ##################################
 
 def lecture_fichier_actifs_pilotables(chemin_fichier):
@@ -658,6 +766,12 @@ def lecture_generale(nom_dossier_donnees, callType):
 
     nombre_annees = parametres_simulation.horizon_simulation
     nb_meteo = parametres_simulation.nb_meteo
+
+    # cache binaire des séries des ambiances et de la réalisation, écrit dans le dossier de données d'entrée et donc
+    # activé seulement sur demande
+    dossier_cache = None
+    if parametres_simulation.cache_lecture :
+        dossier_cache = pjoin(chemin_dossier, "cache_lecture")
    
    
     # ##################### #
@@ -670,43 +784,16 @@ def lecture_generale(nom_dossier_donnees, callType):
     liste_dossiers_ambiances = [dossier for dossier in os.listdir(chemin_ambiances) if not os.path.isfile(pjoin(chemin_ambiances,dossier))]
         
 
-    ambiances = {}
-    
-    for amb in liste_dossiers_ambiances :
-    
-        ambiances[amb] = {}
-        
-        for n in range(nombre_annees):
-        
-            ambiances[amb][n] = {}
-            
-            rep_annee = pjoin(chemin_dossier,"Ambiances",amb,"Annee_%d"%n)
+    # les chroniques des ambiances sont lues à la demande, ou toutes dès maintenant si la lecture paresseuse est
+    # désactivée
+    memoire_max_ambiances = parametres_simulation.memoire_max_ambiances * 1024**2
+    if not parametres_simulation.lecture_paresseuse_ambiances:
+        memoire_max_ambiances = 0
 
-            # couts combustibles 
-            
-            path_couts_comb = pjoin(rep_annee,"couts_combustibles_et_carbone.csv")
-            ambiances[amb][n]["couts_combustibles"] = pd.read_csv(path_couts_comb,sep=";",index_col=0)
-            
-            for met in range(nb_meteo):
-            
-                ambiances[amb][n]["meteo_%d"%met] = {}
-            
-                rep_meteo = pjoin(chemin_dossier,"Ambiances",amb,"Annee_%d"%n,"meteo_%d"%met)
-                
-                # Demande
-                
-                path_demande = pjoin(rep_meteo,"demande.csv")
-                ambiances[amb][n]["meteo_%d"%met]["demande"] = pd.read_csv(path_demande,sep=";",index_col=0)
-                
-                # EnR
-                
-                path_fc = pjoin(rep_meteo,"facteurs_production_ENR.csv")
-                ambiances[amb][n]["meteo_%d"%met]["fc"] = pd.read_csv(path_fc,sep=";",index_col=0)
-                
-                # Dispo
-                
-                path_dispo = pjoin(rep_meteo,"disponibilite_pilot.csv")
-                ambiances[amb][n]["meteo_%d"%met]["dispo"] = pd.read_csv(path_dispo,sep=";",index_col=0)
+    ambiances = DonneesEntree.MagasinAmbiances(liste_dossiers_ambiances, nombre_annees, nb_meteo, chemin_dossier, dossier_cache, memoire_max_ambiances)
+
+    if not parametres_simulation.lecture_paresseuse_ambiances:
+        ambiances.chargement_complet()
 
     # ############################## #
     # lecture de l'ambiance realisee #
@@ -722,7 +809,7 @@ def lecture_generale(nom_dossier_donnees, callType):
     # couts combustibles 
     
     path_couts_comb = pjoin(rep_real,"couts_combustibles_et_carbone.csv")
-    realisation["couts_combustibles"] = pd.read_csv(path_couts_comb,sep=";",index_col=0)
+    realisation["couts_combustibles"] = lecture_csv_cache(path_couts_comb,chemin_dossier,dossier_cache)
     
     for met in range(nb_meteo):
     
@@ -733,17 +820,17 @@ def lecture_generale(nom_dossier_donnees, callType):
         # Demande
         
         path_demande = pjoin(rep_meteo,"demande.csv")
-        realisation["meteo_%d"%met]["demande"] = pd.read_csv(path_demande,sep=";",index_col=0)
+        realisation["meteo_%d"%met]["demande"] = lecture_csv_cache(path_demande,chemin_dossier,dossier_cache)
         
         # EnR
         
         path_fc = pjoin(rep_meteo,"facteurs_production_ENR.csv")
-        realisation["meteo_%d"%met]["fc"] = pd.read_csv(path_fc,sep=";",index_col=0)
+        realisation["meteo_%d"%met]["fc"] = lecture_csv_cache(path_fc,chemin_dossier,dossier_cache)
 
         # Dispo
             
         path_dispo = pjoin(rep_meteo,"disponibilite_pilot.csv")
-        realisation["meteo_%d"%met]["dispo"] = pd.read_csv(path_dispo,sep=";",index_col=0)
+        realisation["meteo_%d"%met]["dispo"] = lecture_csv_cache(path_dispo,chemin_dossier,dossier_cache)
 
 
     donnees_entree = DonneesEntree.DonneesEntree(dict_actifs_pilotables, dict_actifs_ENR, dict_actifs_stockage, ambiances, realisation, parametres_optimisation, parametres_simulation, df_parametres_ponderation)
@@ -182,74 +182,92 @@ def selection_actifs_mecanisme_capacite(capacite_investissement_argent, capacite
     return liste_actifs_mecanisme_capacite, dict_nombre_max_unites
 
 
-def facteur_de_charge_mecapa(actif, annee_livraison, donnees_entree) :
+def calcul_facteurs_charge_mecapa(annee, donnees_entree) :
     """
-    Détermine pour l'actif, le facteur de charge moyen pour l'année de livraison. Ce dernier permet de déterminer la contribution de l'actif à la production lors de la pointe hivernale et donc calculer la capacité offerte pendant l'enchère.
+    Détermine pour l'année donnée le facteur de charge du mécanisme de capacité de tous les actifs à partir des chroniques 
+    de la réalisation. Les actifs pilotables et ENR sont traités ensemble : pour chaque météo, les chroniques de tous les 
+    actifs d'une même catégorie sont réunies dans un tableau dont le quart d'heures le plus disponible est isolé par np.partition.
 
-     Paramètres
+    Paramètres
     ----------
-    actif : DonneesEntree.Actif
-        actif dont on souhaite déterminer le facteur de charge
-    annee_livraison : int
-        année de livraison
+    annee : int
+        année pour laquelle les facteurs de charge sont calculés
     donnees_entree : DonneesEntree.DonneesEntree
         données d'entrée à utiliser
 
     Retours
     -------
-    facteur_de_charge_mecapa : float
-        Facteur de charge moyen jusque la fin de l'anticipation
-
+    facteurs_charge_annee : dict
+        dictionnaire contenant le facteur de charge de chaque actif, indexé par la clé de l'actif
     """
     realisation = donnees_entree.realisation
 
     df_ponderation = donnees_entree.df_parametres_ponderation
+    
+    facteurs_charge_annee = {actif.cle : 0 for actif in donnees_entree.tous_actifs()}
+    
+    actifs_pilotables = [actif.cle for actif in donnees_entree.actifs_pilotables()]
+    actifs_ENR = [actif.cle for actif in donnees_entree.actifs_ENR()]
 
-    puissance = 0
-    if actif.categorie == "Stockage":
-        puissance = actif.puissance_nominale_decharge
-    elif actif.categorie == "Pilotable":
-        puissance = actif.puissance_nominale
-    elif actif.categorie == "ENR":
-        puissance = actif.puissance_reference
-
-
-    facteur_de_charge_mecapa = 0
-
-    for annee in range (annee_livraison, annee_livraison + 1) :
+    for meteo in [meteo for meteo in realisation.keys()][1:]  :
 
-        disponibilite_annee = pd.DataFrame([0 for k in range(8760)], columns = ["Annee_%d"%annee])["Annee_%d"%annee]
+        indice_meteo = int(meteo[-1])
+        ponderation = df_ponderation.at[indice_meteo, "value"]
+        
+        for cles_actifs, chroniques, heures_pointe in [(actifs_pilotables, realisation[meteo]["dispo"], True), (actifs_ENR, realisation[meteo]["fc"], False)] :
+            
+            # les actifs sans chronique sont considérés comme toujours disponibles
+            cles_avec_chronique = [cle for cle in cles_actifs if "%s_%d"%(cle, annee) in chroniques.columns]
+            for cle in cles_actifs :
+                if cle not in cles_avec_chronique :
+                    facteurs_charge_annee[cle] += ponderation
+            if not cles_avec_chronique :
+                continue
+                
+            disponibilites = chroniques[["%s_%d"%(cle, annee) for cle in cles_avec_chronique]].to_numpy(dtype=float)
+            if heures_pointe :
+                # moyenne sur le quart des heures de l'année les plus disponibles
+                nb_heures = min(int(8760/4), disponibilites.shape[0])
+                disponibilites = np.partition(disponibilites, disponibilites.shape[0] - nb_heures, axis=0)[disponibilites.shape[0] - nb_heures:]
+            for cle, facteur_charge in zip(cles_avec_chronique, disponibilites.mean(axis=0)) :
+                facteurs_charge_annee[cle] += facteur_charge * ponderation
+        
+        for actif in donnees_entree.actifs_stockage() :
+            if actif.cle == "bat_4h" :
+                facteurs_charge_annee[actif.cle] = 0.85
+            if actif.cle == "bat_1h" :
+                facteurs_charge_annee[actif.cle] = 0.46
 
-        for meteo in [meteo for meteo in realisation.keys()][1:]  :
+    return facteurs_charge_annee
 
-            indice_meteo = int(meteo[-1])
-            dispo_pilot_meteo = realisation[meteo]["dispo"]
-            facteur_charge_enr_meteo = realisation[meteo]["fc"]
 
-            if actif.categorie == "Pilotable":
-                try :
-                    disponibilite_annee = dispo_pilot_meteo["%s_%d"%(actif.cle, annee)]
-                    facteur_de_charge_mecapa += disponibilite_annee.sort_values(ascending = False).head(int(8760/4)).mean() * df_ponderation.at[indice_meteo, "value"]
-                except KeyError:
-                    disponibilite_annee = pd.DataFrame([1 for k in range(8760)], columns = ["Annee_%d"%annee])["Annee_%d"%annee]
-                    facteur_de_charge_mecapa += (disponibilite_annee.mean()) * df_ponderation.at[indice_meteo, "value"]
-            elif actif.categorie == "ENR":
-                try :
-                    disponibilite_annee = facteur_charge_enr_meteo["%s_%d"%(actif.cle, annee)]
-                    facteur_de_charge_mecapa += (disponibilite_annee.mean()) * df_ponderation.at[indice_meteo, "value"]
-                except KeyError:
-                    disponibilite_annee = pd.DataFrame([1 for k in range(8760)], columns = ["Annee_%d"%annee])["Annee_%d"%annee]
-                    facteur_de_charge_mecapa += (disponibilite_annee.mean()) * df_ponderation.at[indice_meteo, "value"]
+def facteur_de_charge_mecapa(actif, annee_livraison, donnees_entree) :
+    """
+    Détermine pour l'actif, le facteur de charge moyen pour l'année de livraison. Ce dernier permet de déterminer la contribution de l'actif à la production lors de la pointe hivernale et donc calculer la capacité offerte pendant l'enchère.
+    Les facteurs de charge de tous les actifs sont calculés une seule fois par année et conservés dans donnees_entree.facteurs_charge_mecapa.
 
-            elif actif.categorie == "Stockage" :
-                if actif.cle == "bat_4h" :
-                    facteur_de_charge_mecapa = 0.85
-                if actif.cle == "bat_1h" :
-                    facteur_de_charge_mecapa = 0.46
+     Paramètres
+    ----------
+    actif : DonneesEntree.Actif
+        actif dont on souhaite déterminer le facteur de charge
+    annee_livraison : int
+        année de livraison
+    donnees_entree : DonneesEntree.DonneesEntree
+        données d'entrée à utiliser
 
+    Retours
+    -------
+    facteur_de_charge_mecapa : float
+        Facteur de charge moyen jusque la fin de l'anticipation
 
+    """
+    try :
+        facteurs_charge_annee = donnees_entree.facteurs_charge_mecapa[annee_livraison]
+    except KeyError :
+        facteurs_charge_annee = calcul_facteurs_charge_mecapa(annee_livraison, donnees_entree)
+        donnees_entree.facteurs_charge_mecapa[annee_livraison] = facteurs_charge_annee
 
-    return facteur_de_charge_mecapa
+    return facteurs_charge_annee[actif.cle]
 
 
 def enchere_mecanisme_capacite(donnees_entree, demande_capacite_annee_livraison, df_bid_mecapa):
@@ -272,48 +290,54 @@ def enchere_mecanisme_capacite(donnees_entree, demande_capacite_annee_livraison,
     df_actifs_laureats_mecapa : dataframe
         dataframe contenant l'ensemble des actifs lauréats avec les informations correspondantes    
     """
-    df_bid_mecapa_sort = (df_bid_mecapa.dropna()).sort_values(by = "bid", ascending = True)
+    colonnes = ["actif", 'bid', 'capacite', 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires']
+    df_bid_mecapa_sort = (df_bid_mecapa.dropna()).sort_values(by = "bid", ascending = True, kind = "mergesort")
     
-    capacite_laureate_totale = 0
     price_cap = 1000000
     try : 
         price_cap = float(donnees_entree.df_param_mecapa.at["price_cap", "value"])
     except KeyError : 
         pass
-        
-    df_actifs_laureats_mecapa = pd.DataFrame(columns = ["actif", 'bid', 'capacite', 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
     
-    while capacite_laureate_totale < demande_capacite_annee_livraison and not(df_bid_mecapa_sort.empty) :
-        
-        actif_laureat = df_bid_mecapa_sort.index[0]
-        cle_actif_laureat = df_bid_mecapa_sort.at[actif_laureat, "actif"]
-        bid_laureat_actif = df_bid_mecapa_sort.at[actif_laureat, "bid"]
-        capacite_laureate_actif = df_bid_mecapa_sort.at[actif_laureat, "capacite"]
-        fc_laureate_actif = df_bid_mecapa_sort.at[actif_laureat, "fc"]
-        investissement_initial = df_bid_mecapa_sort.at[actif_laureat, "CAPEX"]
-        couts_fixes_maintenance = df_bid_mecapa_sort.at[actif_laureat, "FO&M"]
-        revenus_energie = df_bid_mecapa_sort.at[actif_laureat, "revenus_energie"]
-        prime_risque_energie = df_bid_mecapa_sort.at[actif_laureat, "prime_risque_energie"]
-        anticipation_revenus_capacitaires = df_bid_mecapa_sort.at[actif_laureat, "revenus_capacitaires"]
-        
-        if bid_laureat_actif > price_cap :
-            prix_capacite = price_cap
-            print("La capacité a atteint le plafond de prix de : %f"%price_cap)
-            break
-        
-        nbr_unite_deja_laureate = 0
-        if actif_laureat in df_actifs_laureats_mecapa.index : 
-            nbr_unite_deja_laureate = df_actifs_laureats_mecapa.at[actif_laureat, "nbr_unite"]
-        
-        df_actifs_laureats_mecapa.loc[actif_laureat] = [cle_actif_laureat, bid_laureat_actif, capacite_laureate_actif, fc_laureate_actif, nbr_unite_deja_laureate+1, investissement_initial, couts_fixes_maintenance, revenus_energie, prime_risque_energie, anticipation_revenus_capacitaires]
-        
-        df_bid_mecapa_sort.at[actif_laureat, "nbr_unite"] -= 1 
-        if df_bid_mecapa_sort.at[actif_laureat, "nbr_unite"] <= 0 : 
-            df_bid_mecapa_sort = df_bid_mecapa_sort.drop(index = [actif_laureat])
-        
-        capacite_laureate_totale = (df_actifs_laureats_mecapa['capacite']*df_actifs_laureats_mecapa['nbr_unite']*df_actifs_laureats_mecapa['fc']).sum()
+    # les offres au-dessus du plafond de prix ne sont jamais retenues
+    df_offres_recevables = df_bid_mecapa_sort[df_bid_mecapa_sort["bid"].to_numpy(dtype=float) <= price_cap]
+    plafond_atteint = len(df_offres_recevables) < len(df_bid_mecapa_sort)
     
+    # courbe d'offre : capacité cumulée des offres triées par prix croissant, chaque unité apportant capacite * fc
+    # une offre porte toujours sur au moins une unité, y compris lorsque son nombre d'unités est nul ou négatif
+    capacite_unitaire = df_offres_recevables["capacite"].to_numpy(dtype=float) * df_offres_recevables["fc"].to_numpy(dtype=float)
+    nbr_unite_offert = np.maximum(1, np.ceil(df_offres_recevables["nbr_unite"].to_numpy(dtype=float))).astype(int)
+    capacite_cumulee = np.cumsum(capacite_unitaire * nbr_unite_offert)
+    
+    nbr_unite_laureat = np.zeros(len(df_offres_recevables), dtype=int)
+    if demande_capacite_annee_livraison > 0 and len(df_offres_recevables) > 0 :
+        # intersection de l'offre et de la demande : première offre dont la capacité cumulée couvre la demande
+        indice_marginal = int(np.searchsorted(capacite_cumulee, demande_capacite_annee_livraison, side = "left"))
+        if indice_marginal >= len(df_offres_recevables) :
+            nbr_unite_laureat[:] = nbr_unite_offert
+        else :
+            nbr_unite_laureat[:indice_marginal] = nbr_unite_offert[:indice_marginal]
+            capacite_deja_laureate = capacite_cumulee[indice_marginal - 1] if indice_marginal > 0 else 0
+            nbr_unite_marginal = int(np.ceil((demande_capacite_annee_livraison - capacite_deja_laureate) / capacite_unitaire[indice_marginal]))
+            # correction des arrondis flottants autour de la demande
+            while nbr_unite_marginal > 1 and capacite_deja_laureate + (nbr_unite_marginal - 1) * capacite_unitaire[indice_marginal] >= demande_capacite_annee_livraison :
+                nbr_unite_marginal -= 1
+            while nbr_unite_marginal < nbr_unite_offert[indice_marginal] and capacite_deja_laureate + nbr_unite_marginal * capacite_unitaire[indice_marginal] < demande_capacite_annee_livraison :
+                nbr_unite_marginal += 1
+            nbr_unite_laureat[indice_marginal] = max(1, min(nbr_unite_marginal, nbr_unite_offert[indice_marginal]))
+            
+    est_laureat = nbr_unite_laureat > 0
+    df_actifs_laureats_mecapa = df_offres_recevables.loc[est_laureat, colonnes].copy()
+    df_actifs_laureats_mecapa["nbr_unite"] = nbr_unite_laureat[est_laureat]
+    
+    capacite_laureate_totale = (capacite_unitaire[est_laureat] * nbr_unite_laureat[est_laureat]).sum()
+    
+    prix_capacite = 0
+    if not df_actifs_laureats_mecapa.empty :
         prix_capacite = df_actifs_laureats_mecapa['bid'].max()
+    if plafond_atteint and capacite_laureate_totale < demande_capacite_annee_livraison :
+        prix_capacite = price_cap
+        print("La capacité a atteint le plafond de prix de : %f"%price_cap)
     
     if capacite_laureate_totale < demande_capacite_annee_livraison : 
             print("\t\t La capacité demandée n'a pas été atteinte, seulement %d MW ont été pourvus"%capacite_laureate_totale)
@@ -428,7 +452,7 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
             parc_qui_se_conserve_ambiance.at[annee_debut_anticipation_capacite - 1, actif_ajoute.cle] -= 1 
 
         # détermination du missing money des actifs existants éligibles au mécanisme de capacité
-        df_bid_mecapa_ambiance = pd.DataFrame(columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+        offres_mecapa_ambiance = dict()
         
         for cle_actif in donnees_entree.data_frame_actifs_eligibles_mecapa.index :
             if not donnees_entree.data_frame_actifs_eligibles_mecapa.at[cle_actif, 'eligible'] :
@@ -480,7 +504,7 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
                 if not donnees_entree.df_param_mecapa.at["MM_CT", "value"] : 
                     anticipation_revenus_capacitaires = np.array([ missing_money_actif_divest  * (1+taux_actualisation)**(-n) for n in range(1,nbAnneeNPV)]).sum()
             
-                df_bid_mecapa_ambiance.loc["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nb_unite_qui_se_conservent, 0, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
+                offres_mecapa_ambiance["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nb_unite_qui_se_conservent, 0, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
             
           
           
@@ -523,9 +547,11 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
 
                 anticipation_revenus_capacitaires = np.array([ missing_money_actif_invest  * (1+taux_actualisation)**(-n) for n in range(1,nbAnneeNPV)]).sum()
 
-                df_bid_mecapa_ambiance.loc["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc,nb_unite_invest, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc) ]
+                offres_mecapa_ambiance["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc,nb_unite_invest, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc) ]
         
             
+        df_bid_mecapa_ambiance = pd.DataFrame(list(offres_mecapa_ambiance.values()), index = list(offres_mecapa_ambiance.keys()), columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+        
         # La courbe de demande est estimée par le TSO de manière exogène
         demande_capacite_apres_horizon_ambiance = donnees_entree.data_frame_capacite_cible.at[annee_livraison, ambiance]
 
@@ -583,7 +609,7 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
                 parc_qui_se_conserve_ambiance_horizon_prevision.at[annee_debut_anticipation_capacite - 1, actif_ajoute.cle] -= 1 
                   
             # détermination du missing money des actifs existants éligibles au mécanisme de capacité
-            df_bid_mecapa_ambiance = pd.DataFrame(columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+            offres_mecapa_ambiance = dict()
             for cle_actif in donnees_entree.data_frame_actifs_eligibles_mecapa.index :
                 if not donnees_entree.data_frame_actifs_eligibles_mecapa.at[cle_actif, 'eligible'] :
                     continue
@@ -634,7 +660,7 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
                     puissance = actif.puissance
                     fc = facteur_de_charge_mecapa(actif, annee_livraison, donnees_entree)
                     
-                    df_bid_mecapa_ambiance.loc["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nb_unite_qui_se_conservent, 0, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
+                    offres_mecapa_ambiance["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nb_unite_qui_se_conservent, 0, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
 
                 
                 
@@ -676,10 +702,12 @@ def calcul_anticipation_prix_capacite(actif_ajoute, annee_debut_anticipation_cap
                     puissance = actif.puissance 
                     fc = facteur_de_charge_mecapa(actif, annee_livraison, donnees_entree)
 
-                    df_bid_mecapa_ambiance.loc["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc, nb_unite_invest, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
+                    offres_mecapa_ambiance["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc, nb_unite_invest, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
                         
 
                  
+            df_bid_mecapa_ambiance = pd.DataFrame(list(offres_mecapa_ambiance.values()), index = list(offres_mecapa_ambiance.keys()), columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+            
             demande_capacite_annee_livraison = donnees_entree.data_frame_capacite_cible.at[annee_livraison, ambiance]  
             
             capacite_laureate_annee_livraison, prix_capacite_annee_livraison, df_actifs_laureats_mecapa_ambiance = enchere_mecanisme_capacite(donnees_entree, demande_capacite_annee_livraison, df_bid_mecapa_ambiance)        
@@ -776,8 +804,7 @@ def calcul_missing_money_actif_ajoutable(actif, annee_livraison, donnees_entree,
 
 
         nom_fic = "DF_PA_%s_MerchMeCapa_%s_%s_test_%s.csv"%(ambiance,str(annee_courante),str(indice_enchere_mecanisme_capacite),actif.cle)    
-        path_df_parc = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        df_nb_unites_ambiances_test.to_csv(path_df_parc,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_ambiances_test)
         
         dico_df_nb_unites_ambiances_test[ambiance] = df_nb_unites_ambiances_test
     
@@ -1006,35 +1033,33 @@ def sequence_mecanisme_capacite(donnees_entree, donnees_simulation) :
         df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
         
         nom_fic = "DF_PR_MeCapa_%s_%s.csv"%(str(annee_courante),str(indice_enchere_mecanisme_capacite))    
-        path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
      
         # anticipation des résultats annuels pour la prochaine année de fonctionnement
         
         if donnees_entree.parametres_simulation.anticipation_parc_exogene :
 
             dico_parcs_annee_courante = {}
+
+            # la mise en cohérence traite toutes les ambiances en un seul appel
+            if donnees_entree.parametres_simulation.anticipation_investissement :
+          
+                dico_df_nb_unites_ambiances = donnees_entree.mise_en_coherence_parc(annee_livraison,
+                                                                                    dico_parcs_anticipes_boucle,
+                                                                                    donnees_simulation.parc,
+                                                                                    add_current_investment=True)
             
-            for ambiance in donnees_entree.ambiances :
+            else : 
             
-                
-                if donnees_entree.parametres_simulation.anticipation_investissement :
-              
-                    dico_df_nb_unites_ambiances = donnees_entree.mise_en_coherence_parc(annee_livraison,
-                                                                                        dico_parcs_anticipes_boucle,
-                                                                                        donnees_simulation.parc,
-                                                                                        add_current_investment=True)
-                
-                else : 
-                
-                    dico_df_nb_unites_ambiances = donnees_entree.mise_en_coherence_parc(annee_livraison,
-                                                                                        dico_parcs_anticipes_boucle,
-                                                                                        donnees_simulation.parc,
-                                                                                        add_current_investment=False)                
+                dico_df_nb_unites_ambiances = donnees_entree.mise_en_coherence_parc(annee_livraison,
+                                                                                    dico_parcs_anticipes_boucle,
+                                                                                    donnees_simulation.parc,
+                                                                                    add_current_investment=False)                
+            
+            for ambiance in donnees_entree.ambiances :
                 
                 nom_fic = "DF_PA_%s_MeCapa_%s_%s.csv"%(ambiance,str(annee_courante),str(indice_enchere_mecanisme_capacite))    
-                path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-                dico_df_nb_unites_ambiances[ambiance].to_csv(path_df_parc_reel,sep=";")
+                Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[ambiance])
                 
             print("\t Calcul du Missing money pour le désinvestissement")
             if donnees_entree.df_param_mecapa.at["MM_CT", "value"] :    
@@ -1064,7 +1089,7 @@ def sequence_mecanisme_capacite(donnees_entree, donnees_simulation) :
          
             
         # détermination du missing money des actifs existants éligibles au mécanisme de capacité
-        df_bid_mecapa = pd.DataFrame(columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+        offres_mecapa = dict()
         
         for cle_actif in donnees_simulation.parc.get_df_nb_unites().columns:
 
@@ -1082,7 +1107,7 @@ def sequence_mecanisme_capacite(donnees_entree, donnees_simulation) :
                     puissance = actif.puissance
                     fc = facteur_de_charge_mecapa(actif, annee_livraison, donnees_entree)
                     
-                    df_bid_mecapa.loc["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nbr_unite, 0, couts_fixes_maintenance/puissance, revenus_energie_anticipe/puissance, prime_risque_unite/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
+                    offres_mecapa["%s_divest"%actif.cle] = [actif.cle, missing_money_actif_divest/(puissance*fc), puissance, fc, nbr_unite, 0, couts_fixes_maintenance/puissance, revenus_energie_anticipe/puissance, prime_risque_unite/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
                         
                         
                 
@@ -1103,9 +1128,11 @@ def sequence_mecanisme_capacite(donnees_entree, donnees_simulation) :
                     
                     investissement_initial = actif.cout_fixe_construction(annee_livraison + actif.duree_construction)
                     
-                    df_bid_mecapa.loc["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc, nbr_unite, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
+                    offres_mecapa["%s_invest"%actif.cle] = [actif.cle, missing_money_actif_invest/(puissance*fc), puissance, fc, nbr_unite, investissement_initial/puissance, couts_fixes_maintenance/puissance, VAN_revenus_energie/puissance, prime_risque_energie/puissance, anticipation_revenus_capacitaires/(puissance*fc)]
 
 
+        df_bid_mecapa = pd.DataFrame(list(offres_mecapa.values()), index = list(offres_mecapa.keys()), columns = ["actif", "bid", "capacite", 'fc', 'nbr_unite', 'CAPEX', 'FO&M', 'revenus_energie', 'prime_risque_energie', 'revenus_capacitaires'])
+        
         print(df_bid_mecapa.loc[:,["bid", "capacite", 'fc', 'nbr_unite', 'revenus_energie', 'revenus_capacitaires']])
         # La courbe de demande est estimée par le TSO de manière exogène (le calcul est tout de même fait au sein d'Antigone pour éviter les erreurs à partir d'un critère dans la table de paramètre du MeCapa)
         demande_capacite_annee_livraison = donnees_entree.data_frame_capacite_cible.at[annee_livraison, "reference"]
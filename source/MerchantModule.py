@@ -16,7 +16,7 @@ import Lecture
 import statistics as stat
 
 
-def calcul_VAN_equivalente(donnees_entree,donnees_simulation,actif,annee_ouverture,annee_fin_calcul_VAN,matrice_resultats_annuels):
+def calcul_VAN_equivalente(donnees_entree,donnees_simulation,actif,annee_ouverture,annee_fin_calcul_VAN,matrice_resultats_annuels,estimation_marginale=False):
 
     print("calcul VAN equivalente")
 
@@ -69,6 +69,10 @@ def calcul_VAN_equivalente(donnees_entree,donnees_simulation,actif,annee_ouvertu
                          
                 resultat_annuel  = resultats_annuels_ambiance_annee[indice_meteo]
 
+                if estimation_marginale:
+                    # le dispatch a été calculé sans l'unité testée, son revenu est estimé à coûts marginaux inchangés
+                    revenus_par_meteo[indice_meteo] = IndicateursEconomiques.calcul_revenu_annuel_marginal_sans_CF(actif, resultat_annuel, donnees_entree, False) / puissance
+                    continue
                 
                 cout_variable_actif = resultat_annuel.df_cv.at[actif.cle,"CV"]
       
@@ -275,8 +279,7 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
         df_nb_unites_parc_reel = donnees_simulation.parc.get_df_nb_unites().loc[0:idx_fin]
         
         nom_fic = "DF_PR_MerchantModule_%s_%s.csv"%(str(annee_courante),str(indice_boucle))    
-        path_df_parc_reel = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-        df_nb_unites_parc_reel.to_csv(path_df_parc_reel,sep=";")
+        Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_parc_reel)
         
         ######## parc anticipe
 
@@ -294,14 +297,15 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
             
             dico_df_nb_unites_ambiances = {}
             
+            if donnees_entree.parametres_simulation.extrapolation_capa :
+                df_nb_unites_extrapole = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,donnees_entree.parametres_simulation.nb_annee_extrapolation_capa)
+
             for ambiance in donnees_entree.ambiances :
             
 
                 if donnees_entree.parametres_simulation.extrapolation_capa :
                 
-                    nb_annee_extrapolation =  donnees_entree.parametres_simulation.nb_annee_extrapolation_capa
-                    
-                    dico_df_nb_unites_ambiances[ambiance] = donnees_simulation.parc.get_df_nb_unites_extrapole(annee_courante,nb_annee_extrapolation)
+                    dico_df_nb_unites_ambiances[ambiance] = df_nb_unites_extrapole.copy()
                     
                 else :
                     dico_df_nb_unites_ambiances[ambiance] = df_nb_unites.copy()
@@ -310,8 +314,7 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
         for nom_amb in donnees_entree.ambiances :
                  
             nom_fic = "DF_PA_%s_MerchantModule_%s_%s.csv"%(nom_amb,str(annee_courante),str(indice_boucle))    
-            path_df_parc_anticipe = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-            dico_df_nb_unites_ambiances[nom_amb].to_csv(path_df_parc_anticipe,sep=";")
+            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), dico_df_nb_unites_ambiances[nom_amb])
                     
                                 
         ######## evaluation des investissements potentiels
@@ -328,6 +331,32 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
         resume_market_module_invest = pd.DataFrame()
         id_option_invest = 0        
 
+        # criblage éventuel : la VAN de chaque actif non stockage est d'abord estimée à partir des coûts marginaux
+        # du parc sans unité supplémentaire, les actifs nettement non rentables ne sont pas réévalués
+
+        dict_VAN_estimees = dict()
+
+        if donnees_entree.parametres_simulation.criblage_investissement :
+
+            actifs_a_cribler = [actif for actif in actifs_a_tester_pour_ajout if not actif.categorie == "Stockage"]
+            liste_anticipations_reference = []
+
+            for actif in actifs_a_cribler :
+                annee_ouverture = annee_courante + actif.duree_construction
+                annee_fin_anticipation = min(annee_courante + donnees_entree.parametres_simulation.horizon_prevision,
+                                                annee_ouverture + actif.duree_vie,
+                                                donnees_entree.parametres_simulation.horizon_simulation)
+                liste_anticipations_reference.append((annee_ouverture, annee_fin_anticipation, dico_df_nb_unites_ambiances, False, "LP"))
+
+            liste_matrices_resultats_reference = Anticipation.anticipations_resultats_annuels_parc_exogene(liste_anticipations_reference, donnees_entree, donnees_simulation)
+
+            for actif, anticipation, matrice_resultats_reference in zip(actifs_a_cribler, liste_anticipations_reference, liste_matrices_resultats_reference) :
+                annee_ouverture, annee_fin_anticipation = anticipation[0], anticipation[1]
+                annee_fin_calcul_VAN = annee_ouverture + actif.duree_vie if donnees_entree.parametres_simulation.extrapolation_merchant else annee_fin_anticipation
+                dict_VAN_estimee, dict_VAN_possibles = calcul_VAN_equivalente(donnees_entree,donnees_simulation,actif,annee_ouverture,annee_fin_calcul_VAN,matrice_resultats_reference,True)
+                if dict_VAN_estimee["VAN_avec_capex"] <= - donnees_entree.parametres_simulation.marge_criblage_investissement :
+                    dict_VAN_estimees[actif.cle] = dict_VAN_estimee
+
         for actif in actifs_a_tester_pour_ajout :
         
             print("\t\t\t Evaluation : %s"%(actif.cle))
@@ -340,6 +369,27 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
                                             annee_fermeture,
                                             donnees_entree.parametres_simulation.horizon_simulation)
 
+            if actif.cle in dict_VAN_estimees :
+
+                # actif écarté par le criblage, sa VAN estimée majore celle d'un dispatch complet
+
+                dict_VAN_equivalente = dict_VAN_estimees[actif.cle]
+
+                dict_VAN_equivalentes_avec_CAPEX[actif.cle] = dict_VAN_equivalente["VAN_avec_capex"]
+                dict_VAN_equivalentes_sans_CAPEX[actif.cle] = dict_VAN_equivalente["VAN_sans_capex"]
+
+                print("\t\t\t\t VAN estimée (avec CAPEX) : %s, actif écarté par criblage"%(dict_VAN_equivalente["VAN_avec_capex"]))
+
+                resume_market_module_invest.at[id_option_invest,"name"] = actif.cle
+                resume_market_module_invest.at[id_option_invest,"type_invest"] = "new"
+                resume_market_module_invest.at[id_option_invest,"VAN_unite_test"] = dict_VAN_equivalente["VAN_avec_capex"] / 1e3
+                resume_market_module_invest.at[id_option_invest,"REVENUS_unite_test"] = dict_VAN_equivalente["revenus"] / 1e3
+                resume_market_module_invest.at[id_option_invest,"COUTS_FIXES_unite_test"] = dict_VAN_equivalente["couts_fixes_totaux"] / 1e3
+                resume_market_module_invest.at[id_option_invest,"evaluation"] = "estimation"
+
+                id_option_invest += 1
+                continue
+
             # preparation du parc pour le test
                                         
             dico_nb_unites_ambiances_test = {}
@@ -355,8 +405,7 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
             
 
                 nom_fic = "DF_PA_%s_MerchantModule_%s_%s_test_%s.csv"%(nom_amb,str(annee_courante),str(indice_boucle),actif.cle)    
-                path_df_parc = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-                df_nb_unites_ambiances_test.to_csv(path_df_parc,sep=";")
+                Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_ambiances_test)
                 
                 dico_nb_unites_ambiances_test[nom_amb] = df_nb_unites_ambiances_test                
             
@@ -387,6 +436,7 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
             resume_market_module_invest.at[id_option_invest,"VAN_unite_test"] = dict_VAN_equivalente["VAN_avec_capex"] / 1e3
             resume_market_module_invest.at[id_option_invest,"REVENUS_unite_test"] = dict_VAN_equivalente["revenus"] / 1e3
             resume_market_module_invest.at[id_option_invest,"COUTS_FIXES_unite_test"] = dict_VAN_equivalente["couts_fixes_totaux"] / 1e3
+            resume_market_module_invest.at[id_option_invest,"evaluation"] = "dispatch"
               
             id_option_invest += 1
 
@@ -435,8 +485,7 @@ def sequence_merchant_decisions(donnees_entree, donnees_simulation):
                     dico_nb_unites_ambiances_test[nom_amb] = df_nb_unites_ambiances_test      
                     
                     nom_fic = "DF_PA_%s_MerchantModule_%s_%s_test_second_chance_%s.csv"%(nom_amb,str(annee_courante),str(indice_boucle),actif.cle)    
-                    path_df_parc = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-                    df_nb_unites_ambiances_test.to_csv(path_df_parc,sep=";")
+                    Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites_ambiances_test)
                                          
 
                 matrice_resultats_annuels = Anticipation.anticipation_resultats_annuels_parc_exogene(annee_courante,annee_courante+1, donnees_entree, donnees_simulation,dico_nb_unites_ambiances_test)
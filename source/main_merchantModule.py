@@ -9,13 +9,13 @@ import Realisation
 import AppelsOffresInvestissement
 import AppelsOffresDemantelement
 import MerchantModule
+import DispatchV0
 import Gep
 
 import sys
 import time
 import os
 import pandas as pd
-import copy
 
 def simulation(nom_dossier_donnees):
     """ 
@@ -64,59 +64,70 @@ def simulation(nom_dossier_donnees):
             path_df_pa = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
             df_nb_unites.to_csv(path_df_pa,sep=";")            
         
+    # les processus de calcul des dispatchs sont créés une seule fois pour toute la simulation
+    DispatchV0.ouverture_pool_dispatch(donnees_entree)
+    
     # DEBUT DES SEQUENCES
     
-    for annee in range(donnees_entree.parametres_simulation.horizon_simulation):
+    try :
+        for annee in range(donnees_entree.parametres_simulation.horizon_simulation):
+
+            # les sorties intermédiaires de l'année sont écrites dans une archive ouverte une seule fois
+            Ecriture.ouverture_archive_sorties_intermediaires(donnees_entree)
 
-        if donnees_entree.parametres_simulation.update_gep == True :
-            if donnees_simulation.annee_courante > 0 : 
-                if ( donnees_simulation.annee_courante % donnees_entree.parametres_simulation.update_gep_frequency) == 0 :
+            if donnees_entree.parametres_simulation.update_gep == True :
+                if donnees_simulation.annee_courante > 0 : 
+                    if ( donnees_simulation.annee_courante % donnees_entree.parametres_simulation.update_gep_frequency) == 0 :
             
-                    chemins_gep = Ecriture.ecriture_entrees_gep(donnees_entree, donnees_simulation)
-                    Gep.update_anticipation(donnees_entree, donnees_simulation,chemins_gep)
+                        Gep.update_anticipation(donnees_entree, donnees_simulation)
                     
                
-                    for ambiance in donnees_entree.ambiances :
+                        for ambiance in donnees_entree.ambiances :
 
-                        parc = donnees_simulation.dico_parcs_anticipes[ambiance]
+                            parc = donnees_simulation.dico_parcs_anticipes[ambiance]
 
-                        df_nb_unites = parc.get_df_nb_unites().loc[0:]
+                            df_nb_unites = parc.get_df_nb_unites().loc[0:]
 
-                        nom_fic = "DF_PA_updated_%s_%d.csv"%(ambiance,annee)    
-                        path_df_pa = os.path.join(donnees_entree.dossier_sortie,"parc_vision",nom_fic)
-                        df_nb_unites.to_csv(path_df_pa,sep=";")  
+                            nom_fic = "DF_PA_updated_%s_%d.csv"%(ambiance,annee)    
+                            Ecriture.ecriture_sortie_intermediaire(donnees_entree, os.path.join("parc_vision",nom_fic), df_nb_unites)  
                         
         
         
-        rapport_appels_offres_investissement = AppelsOffresInvestissement.RapportAppelsOffresInvestissement(0, 0, [])
-        rapport_appels_offres_demantelement = AppelsOffresDemantelement.RapportAppelsOffresDemantelement(0, [])
-        dict_rapport_annuel_mecanisme_capacite = {}
+            rapport_appels_offres_investissement = AppelsOffresInvestissement.RapportAppelsOffresInvestissement(0, 0, [])
+            rapport_appels_offres_demantelement = AppelsOffresDemantelement.RapportAppelsOffresDemantelement(0, [])
+            dict_rapport_annuel_mecanisme_capacite = {}
         
-        if(donnees_entree.parametres_simulation.architecture == "AOCLT"):
-            print("ANNEE %d | APPELS D'OFFRES INVESTISSEMENT"%annee)
-            rapport_appels_offres_investissement = AppelsOffresInvestissement.sequence_appels_offres_investissement(donnees_entree, donnees_simulation)
-            print("ANNEE %d | APPELS D'OFFRES DEMANTELEMENT" % annee)
-            rapport_appels_offres_demantelement = AppelsOffresDemantelement.sequence_appels_offres_demantelement(donnees_entree, donnees_simulation)
+            if(donnees_entree.parametres_simulation.architecture == "AOCLT"):
+                print("ANNEE %d | APPELS D'OFFRES INVESTISSEMENT"%annee)
+                rapport_appels_offres_investissement = AppelsOffresInvestissement.sequence_appels_offres_investissement(donnees_entree, donnees_simulation)
+                print("ANNEE %d | APPELS D'OFFRES DEMANTELEMENT" % annee)
+                rapport_appels_offres_demantelement = AppelsOffresDemantelement.sequence_appels_offres_demantelement(donnees_entree, donnees_simulation)
             
 
-        donnees_simulation.parc_avant_sequences = copy.deepcopy(donnees_simulation.parc)
+            donnees_simulation.parc_avant_sequences = donnees_simulation.parc.instantane()
         
         
         
-        print("ANNEE %d | DEMANTELEMENT"%annee)
-        rapport_demantelement = Demantelement.sequence_demantelement(donnees_entree, donnees_simulation)
+            print("ANNEE %d | DEMANTELEMENT"%annee)
+            rapport_demantelement = Demantelement.sequence_demantelement(donnees_entree, donnees_simulation)
 
-        print("ANNEE %d | INVESTISSEMENT" % annee)
-        rapport_investissement = Investissement.sequence_investissement(donnees_entree, donnees_simulation)
+            print("ANNEE %d | INVESTISSEMENT" % annee)
+            rapport_investissement = Investissement.sequence_investissement(donnees_entree, donnees_simulation)
         
-        MerchantModule.sequence_merchant_decisions(donnees_entree, donnees_simulation)
+            MerchantModule.sequence_merchant_decisions(donnees_entree, donnees_simulation)
 
-        print("ANNEE %d | REALISATION" % annee)
-        liste_resultats_annuels = Realisation.realisation_annee_courante(donnees_entree, donnees_simulation)
+            print("ANNEE %d | REALISATION" % annee)
+            liste_resultats_annuels = Realisation.realisation_annee_courante(donnees_entree, donnees_simulation)
 
-        print("ANNEE %d TERMINEE" % annee)
+            print("ANNEE %d TERMINEE" % annee)
 
-        donnees_simulation.incrementation_annee(rapport_investissement, rapport_demantelement, rapport_appels_offres_investissement, rapport_appels_offres_demantelement, dict_rapport_annuel_mecanisme_capacite, liste_resultats_annuels)
+            donnees_simulation.incrementation_annee(rapport_investissement, rapport_demantelement, rapport_appels_offres_investissement, rapport_appels_offres_demantelement, dict_rapport_annuel_mecanisme_capacite, liste_resultats_annuels)
+            
+            Ecriture.fermeture_archive_sorties_intermediaires()
+        
+    finally :
+        Ecriture.fermeture_archive_sorties_intermediaires()
+        DispatchV0.fermeture_pool_dispatch()
         
     print("ECRITURE DES FICHIERS DE SORTIE")
     Ecriture.ecriture_generale(donnees_entree, donnees_simulation, nom_dossier_donnees)